@@ -108,6 +108,7 @@ if PY3:
     from urllib import parse
     from urllib.error import URLError
     import http.server as BaseHTTPServer
+    import http.client as httplib
     from urllib.error import HTTPError
     urlparse = parse
     from urllib.parse import quote as url_quote
@@ -120,6 +121,7 @@ if PY3:
 else:
     from urlparse import urlparse
     import BaseHTTPServer
+    import httplib
     from urllib2 import HTTPError, URLError
     from urllib import quote as url_quote
     from urllib import quote_plus as url_quote_plus
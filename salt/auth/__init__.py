@@ -11,9 +11,23 @@ so that any external authentication system can be used inside of Salt
 # 4. Execute auth function
 # 5. Cache auth token with relative data opts['token_dir']
 # 6. Interface to verify tokens
+#
+# The token files in token_dir are the token store shared by the master
+# worker processes. Each LoadAuth keeps the tokens it read in an in memory
+# LRU so that a token is not read and deserialized on every publish, the
+# cached token is only used while its file still exists so that a token
+# removed from token_dir is revoked for all of the workers. Expired tokens are
+# swept from token_dir by clean_expired_tokens, which the master runs every
+# minute.
+#
+# When eauth_cache_ttl is set the successful verifications of credentials are
+# cached for that many seconds, keyed by a keyed hash of the credentials.
+# Failures are never cached and still take the same randomized amount of
+# time, so the cache does not help to guess credentials.
 
 # Import Python libs
 import os
+import hmac
 import hashlib
 import time
 import logging
@@ -24,9 +38,47 @@ import getpass
 import salt.loader
 import salt.utils
 import salt.payload
+import salt.utils.atomicfile
 
 log = logging.getLogger(__name__)
 
+# The most tokens a LoadAuth keeps in memory
+TOKEN_CACHE_SIZE = 1000
+
+
+def clean_expired_tokens(opts):
+    '''
+    Remove the expired and the invalid tokens from the token_dir, return the
+    number of tokens removed. The dotfiles are skipped, they are the
+    temporary files of the tokens which are being written.
+    '''
+    serial = salt.payload.Serial(opts)
+    now = time.time()
+    removed = 0
+    try:
+        toks = os.listdir(opts['token_dir'])
+    except (IOError, OSError):
+        return removed
+    for tok in toks:
+        if tok.startswith('.'):
+            continue
+        t_path = os.path.join(opts['token_dir'], tok)
+        try:
+            with open(t_path, 'rb') as fp_:
+                tdata = serial.loads(fp_.read())
+        except (IOError, OSError):
+            # Removed in the meantime
+            continue
+        except Exception:
+            tdata = {}
+        if not isinstance(tdata, dict) or tdata.get('expire', 0) < now:
+            try:
+                os.remove(t_path)
+                removed += 1
+            except (IOError, OSError):
+                pass
+    return removed
+
 
 class LoadAuth(object):
     '''
@@ -37,6 +89,11 @@ class LoadAuth(object):
         self.max_fail = 1.0
         self.serial = salt.payload.Serial(opts)
         self.auth = salt.loader.auth(opts)
+        # The tokens read from the token_dir, keyed by the token
+        self.tokens = {}
+        # The successful verifications, keyed by the hash of the credentials
+        self.auth_cache = {}
+        self.auth_cache_key = os.urandom(32)
 
     def load_name(self, load):
         '''
@@ -78,13 +135,40 @@ class LoadAuth(object):
             return False
         return False
 
+    def __auth_cache_key(self, load):
+        '''
+        Return the key of the credentials in the load for the auth cache, the
+        credentials themselves are not kept
+        '''
+        fstr = '{0}.auth'.format(load.get('eauth'))
+        if not fstr in self.auth:
+            return None
+        fcall = salt.utils.format_call(self.auth[fstr], load)
+        creds = repr((load['eauth'],
+                      fcall['args'],
+                      sorted(fcall.get('kwargs', {}).items())))
+        return hmac.new(self.auth_cache_key, creds, hashlib.sha256).hexdigest()
+
     def time_auth(self, load):
         '''
         Make sure that all failures happen in the same amount of time
         '''
         start = time.time()
+        ttl = self.opts.get('eauth_cache_ttl', 0)
+        key = None
+        if ttl:
+            key = self.__auth_cache_key(load)
+            cached = self.auth_cache.get(key)
+            if cached and cached[0] > start:
+                return cached[1]
         ret = self.__auth_call(load)
         if ret:
+            if key:
+                if len(self.auth_cache) >= TOKEN_CACHE_SIZE:
+                    self.auth_cache = dict(
+                        (ckey, cval) for ckey, cval
+                        in self.auth_cache.items() if cval[0] > start)
+                self.auth_cache[key] = (start + ttl, ret)
             return ret
         f_time = time.time() - start
         if f_time > self.max_fail:
@@ -117,10 +201,22 @@ class LoadAuth(object):
                  'name': fcall['args'][0],
                  'eauth': load['eauth'],
                  'token': tok}
-        with open(t_path, 'w+') as fp_:
+        with salt.utils.atomicfile.atomic_open(t_path, 'w+') as fp_:
             fp_.write(self.serial.dumps(tdata))
+        self.__cache_tok(tdata)
         return tdata
 
+    def __cache_tok(self, tdata):
+        '''
+        Keep the token data in memory, the least recently used tokens are
+        dropped when the cache is full
+        '''
+        if len(self.tokens) >= TOKEN_CACHE_SIZE:
+            lru = sorted(self.tokens, key=lambda tok: self.tokens[tok][0])
+            for tok in lru[:TOKEN_CACHE_SIZE // 10 or 1]:
+                del self.tokens[tok]
+        self.tokens[tdata['token']] = [time.time(), tdata]
+
     def get_tok(self, tok):
         '''
         Return the name associate with the token, or False if the token is
@@ -128,9 +224,21 @@ class LoadAuth(object):
         '''
         t_path = os.path.join(self.opts['token_dir'], tok)
         if not os.path.isfile(t_path):
+            self.tokens.pop(tok, None)
             return {}
-        with open(t_path, 'r') as fp_:
-            tdata = self.serial.loads(fp_.read())
+        if tok in self.tokens:
+            entry = self.tokens[tok]
+            if entry[1]['expire'] >= time.time():
+                entry[0] = time.time()
+                return entry[1]
+            del self.tokens[tok]
+        try:
+            with open(t_path, 'r') as fp_:
+                tdata = self.serial.loads(fp_.read())
+        except (IOError, OSError):
+            return {}
+        if not isinstance(tdata, dict):
+            tdata = {}
         rm_tok = False
         if not 'expire' in tdata:
             # invalid token, delete it!
@@ -140,9 +248,11 @@ class LoadAuth(object):
         if rm_tok:
             try:
                 os.remove(t_path)
-                return {}
             except (IOError, OSError):
                 pass
+            return {}
+        tdata['token'] = tok
+        self.__cache_tok(tdata)
         return tdata
 
 
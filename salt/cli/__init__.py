@@ -6,14 +6,11 @@ The management of salt command line utilities are stored in here
 import os
 import sys
 
-# Import salt components
-import salt.cli.caller
-import salt.cli.cp
-import salt.cli.key
+# Import salt components, the modules only one of the commands needs are
+# imported by that command so the others start faster
 import salt.cli.batch
 import salt.client
 import salt.output
-import salt.runner
 import salt.auth
 
 from salt.utils import parsers
@@ -161,6 +158,7 @@ class SaltCP(parsers.SaltCPOptionParser):
         '''
         Execute salt-cp
         '''
+        import salt.cli.cp
         self.parse_args()
         cp_ = salt.cli.cp.SaltCP(self.config)
         cp_.run()
@@ -175,6 +173,7 @@ class SaltKey(parsers.SaltKeyOptionParser):
         '''
         Execute salt-key
         '''
+        import salt.cli.key
         self.parse_args()
 
         if self.config['verify_env']:
@@ -209,6 +208,7 @@ class SaltCall(parsers.SaltCallOptionParser):
         '''
         Execute the salt call!
         '''
+        import salt.cli.caller
         self.parse_args()
 
         if self.config['verify_env']:
@@ -244,6 +244,7 @@ class SaltRun(parsers.SaltRunOptionParser):
         '''
         Execute salt-run
         '''
+        import salt.runner
         self.parse_args()
 
         runner = salt.runner.Runner(self.config)
@@ -5,6 +5,7 @@ minion modules.
 
 # Import python modules
 import sys
+import types
 import logging
 import traceback
 
@@ -12,6 +13,7 @@ import traceback
 import salt.loader
 import salt.minion
 import salt.output
+import salt.utils.hashcache
 from salt._compat import string_types
 from salt.log import LOG_LEVELS
 
@@ -54,6 +56,10 @@ class Caller(object):
             args, kw = salt.minion.detect_kwargs(
                 self.minion.functions[fun], self.opts['arg'])
             ret['return'] = self.minion.functions[fun](*args, **kw)
+            if isinstance(ret['return'], types.GeneratorType):
+                ret['return'] = list(ret['return'])
+            # Keep the hashes of the files the function read
+            salt.utils.hashcache.save()
         except (TypeError, CommandExecutionError) as exc:
             msg = 'Error running \'{0}\': {1}\n'
             active_level = LOG_LEVELS.get(
@@ -10,6 +10,7 @@ import logging
 import glob
 # Import salt modules
 import salt.crypt
+import salt.output
 import salt.utils
 import salt.utils.event
 
@@ -40,6 +40,8 @@ import salt.payload
 import salt.utils
 import salt.utils.verify
 import salt.utils.event
+import salt.utils.minions
+import salt.utils.retstream
 from salt.exceptions import SaltInvocationError
 
 # Try to import range from https://github.com/ytoolshed/range
@@ -72,7 +74,17 @@ class LocalClient(object):
         self.serial = salt.payload.Serial(self.opts)
         self.salt_user = self.__get_user()
         self.key = self.__read_master_key()
-        self.event = salt.utils.event.MasterEvent(self.opts['sock_dir'])
+        self._event = None
+
+    @property
+    def event(self):
+        '''
+        The connection to the master event bus, made when the client first
+        waits for an event since many commands never do
+        '''
+        if self._event is None:
+            self._event = salt.utils.event.MasterEvent(self.opts['sock_dir'])
+        return self._event
 
     def __read_master_key(self):
         '''
@@ -502,6 +514,31 @@ class LocalClient(object):
             yield None
             time.sleep(0.02)
 
+    def iter_return(self, jid, minion):
+        '''
+        Return a generator of the items of the return of the minion from the
+        job cache, a large return which the minion sent in chunks is read an
+        item at a time
+        '''
+        jid_dir = salt.utils.jid_dir(
+                jid,
+                self.opts['cachedir'],
+                self.opts['hash_type']
+                )
+        retp = os.path.join(jid_dir, minion, 'return.p')
+        if not os.path.isfile(retp):
+            return iter([])
+        return salt.utils.retstream.iter_items(retp, self.serial)
+
+    def _event_return(self, jid, raw):
+        '''
+        Return the return data of a return event, the return of a chunked
+        return is read from the job cache
+        '''
+        if raw.get('chunks'):
+            return list(self.iter_return(jid, raw['id']))
+        return raw['return']
+
     def get_returns(self, jid, minions, timeout=None):
         '''
         This method starts off a watcher looking at the return data for
@@ -644,7 +681,7 @@ class LocalClient(object):
             raw = self.event.get_event(timeout, jid)
             if not raw is None:
                 found.add(raw['id'])
-                ret[raw['id']] = {'ret': raw['return']}
+                ret[raw['id']] = {'ret': self._event_return(jid, raw)}
                 if 'out' in raw:
                     ret[raw['id']]['out'] = raw['out']
                 if len(found.intersection(minions)) >= len(minions):
@@ -715,7 +752,7 @@ class LocalClient(object):
                     minions.update(raw['syndic'])
                     continue
                 found.add(raw['id'])
-                ret = {raw['id']: {'ret': raw['return']}}
+                ret = {raw['id']: {'ret': self._event_return(jid, raw)}}
                 if 'out' in raw:
                     ret[raw['id']]['out'] = raw['out']
                 yield ret
@@ -776,8 +813,11 @@ class LocalClient(object):
             if raw is None:
                 # Timeout reached
                 break
+            if 'return' not in raw:
+                # Not a return, like the progress of a chunked return
+                continue
             found.add(raw['id'])
-            ret = {raw['id']: {'ret': raw['return']}}
+            ret = {raw['id']: {'ret': self._event_return(jid, raw)}}
             if 'out' in raw:
                 ret[raw['id']]['out'] = raw['out']
             yield ret
@@ -964,6 +1004,8 @@ class Caller(object):
     Create an object used to call salt functions directly on a minion
     '''
     def __init__(self, c_path='/etc/salt/minion'):
+        # The minion modules are only loaded by the clients which call them
+        import salt.minion
         self.opts = salt.config.minion_config(c_path)
         self.sminion = salt.minion.SMinion(self.opts)
 
@@ -5,26 +5,22 @@ All salt configuration loading and defaults should be in this module
 # Import python modules
 import glob
 import os
+import sys
 import socket
 import logging
-
-# import third party libs
-import yaml
-try:
-    yaml.Loader = yaml.CLoader
-    yaml.Dumper = yaml.CDumper
-except Exception:
-    pass
+import marshal
 
 # Import salt libs
-import salt.crypt
-import salt.loader
 import salt.utils
-import salt.pillar
+import salt.utils.atomicfile
 from salt.exceptions import SaltClientError
 
 log = logging.getLogger(__name__)
 
+# The parsed configuration files are kept in a hidden file next to each of
+# them, and yaml is only imported when a file changed since it was cached
+CONF_CACHE_VERSION = 1
+
 __dflt_log_datefmt = '%Y-%m-%d %H:%M:%S'
 __dflt_log_fmt_console = '[%(levelname)-8s] %(message)s'
 __dflt_log_fmt_logfile = '%(asctime)s,%(msecs)03.0f [%(name)-17s][%(levelname)-8s] %(message)s'
@@ -58,13 +54,80 @@ def _append_domain(opts):
     return "{0[id]}.{0[append_domain]}".format(opts)
 
 
-def _read_conf_file(path):
+def _conf_cache_path(path):
+    '''
+    Return the path of the cache of the parsed configuration file
+    '''
+    dirname, basename = os.path.split(os.path.abspath(path))
+    return os.path.join(dirname, '.{0}.cache'.format(basename.lstrip('.')))
+
+
+def _conf_stamp(stat):
+    '''
+    Return what identifies a version of a configuration file, the ctime
+    changes with every write and can not be set back
+    '''
+    return (stat.st_ino, stat.st_size, stat.st_mtime, stat.st_ctime)
+
+
+def _read_conf_cache(path, stamp):
+    '''
+    Return the cached options of the configuration file, or None if the file
+    changed since it was cached
+    '''
+    try:
+        with open(_conf_cache_path(path), 'rb') as fp_:
+            version, pyver, cstamp, conf_opts = marshal.loads(fp_.read())
+    except Exception:
+        return None
+    if (version, pyver, cstamp) != (CONF_CACHE_VERSION,
+                                    sys.version_info[:2],
+                                    stamp):
+        return None
+    return conf_opts
+
+
+def _write_conf_cache(path, stat, stamp, conf_opts):
+    '''
+    Cache the options of the configuration file, with the permissions of the
+    file. The cache is skipped when the options can not be marshalled or the
+    directory of the file is not writable.
+    '''
+    try:
+        data = marshal.dumps(
+                (CONF_CACHE_VERSION, sys.version_info[:2], stamp, conf_opts))
+    except ValueError:
+        return
+    cpath = _conf_cache_path(path)
+    try:
+        with salt.utils.atomicfile.atomic_open(cpath, 'w+b') as fp_:
+            fp_.write(data)
+        os.chmod(cpath, stat.st_mode & 0o777)
+    except (IOError, OSError):
+        pass
+
+
+def _parse_conf_file(path):
+    '''
+    Parse the configuration file with the C yaml loader when it is available
+    '''
+    import yaml
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
     with open(path, 'r') as conf_file:
-        conf_opts = yaml.safe_load(conf_file.read()) or {}
-        # allow using numeric ids: convert int to string
-        if 'id' in conf_opts:
-            conf_opts['id'] = str(conf_opts['id'])
-        return conf_opts
+        return yaml.load(conf_file.read(), Loader=loader) or {}
+
+
+def _read_conf_file(path):
+    stat = os.stat(path)
+    stamp = _conf_stamp(stat)
+    conf_opts = _read_conf_cache(path, stamp)
+    if conf_opts is None:
+        conf_opts = _parse_conf_file(path)
+        _write_conf_cache(path, stat, stamp, conf_opts)
+    # allow using numeric ids: convert int to string
+    if 'id' in conf_opts:
+        conf_opts['id'] = str(conf_opts['id'])
+    return conf_opts
 
 
 def load_config(opts, path, env_var):
@@ -156,11 +219,17 @@ def minion_config(path):
             'id': socket.getfqdn(),
             'cachedir': '/var/cache/salt',
             'cache_jobs': False,
+            'return_chunk_size': 1048576,
+            'hash_cache': True,
             'conf_file': path,
             'sock_dir': '/var/run/salt',
             'backup_mode': '',
+            'diff_max_bytes': 1048576,
+            'diff_max_lines': 1000,
             'renderer': 'yaml_jinja',
+            'render_cache': False,
             'failhard': False,
+            'state_aggregate': True,
             'autoload_dynamic_modules': True,
             'environment': None,
             'state_top': 'top.sls',
@@ -168,6 +237,7 @@ def minion_config(path):
             'sls_list': [],
             'top_file': '',
             'file_client': 'remote',
+            'file_client_threads': 4,
             'file_roots': {
                 'base': ['/srv/salt'],
                 },
@@ -186,7 +256,11 @@ def minion_config(path):
             'clean_dynamic_modules': True,
             'open_mode': False,
             'multiprocessing': True,
+            'connection_pool_size': 4,
+            'connection_pool_idle_timeout': 300,
             'sub_timeout': 60,
+            'presence_interval': 0,
+            'schedule': {},
             'ipc_mode': 'ipc',
             'tcp_pub_port': 4510,
             'tcp_pull_port': 4511,
@@ -209,6 +283,8 @@ def minion_config(path):
             'default_include': 'minion.d/*.conf',
             'update_url': False,
             'update_restart_services': [],
+            'payload_compression': ['lz4', 'zlib'],
+            'payload_compression_threshold': 4096,
             }
 
     if len(opts['sock_dir']) > len(opts['cachedir']) + 10:
@@ -274,28 +350,42 @@ def master_config(path):
                 'base': ['/srv/pillar'],
                 },
             'ext_pillar': [],
+            'ext_pillar_cache_ttl': 0,
+            'connection_pool_size': 4,
+            'connection_pool_idle_timeout': 300,
             # TODO - Set this to 2 by default in 0.10.5
             'pillar_version': 1,
             'syndic_master': '',
+            'syndic_batch_size': 100,
+            'syndic_batch_wait': 1,
             'runner_dirs': [],
             'client_acl': {},
             'external_auth': {},
             'token_expire': 720,
+            'eauth_cache_ttl': 0,
             'file_buffer_size': 1048576,
             'max_open_files': 100000,
             'hash_type': 'md5',
             'conf_file': path,
             'pub_refresh': False,
+            'pub_hwm': 1000,
+            'pub_stats_interval': 60,
             'open_mode': False,
             'auto_accept': False,
             'renderer': 'yaml_jinja',
+            'render_cache': False,
+            'render_cache_size': 104857600,
             'failhard': False,
             'state_top': 'top.sls',
             'master_tops': {},
             'external_nodes': '',
+            'tops_cache_ttl': 0,
+            'external_nodes_batch': 0,
             'order_masters': False,
             'job_cache': True,
             'minion_data_cache': True,
+            'presence': False,
+            'presence_timeout': 180,
             'log_file': '/var/log/salt/master',
             'log_level': None,
             'log_level_logfile': None,
@@ -316,6 +406,8 @@ def master_config(path):
             'verify_env': True,
             'permissive_pki_access': False,
             'default_include': 'master.d/*.conf',
+            'payload_compression': ['lz4', 'zlib'],
+            'payload_compression_threshold': 4096,
     }
 
     if len(opts['sock_dir']) > len(opts['cachedir']) + 10:
@@ -329,6 +421,8 @@ def master_config(path):
     opts = include_config(default_include, opts, path, verbose=False)
     opts = include_config(include, opts, path, verbose=True)
 
+    # The crypto libraries are not needed to load the configuration
+    import salt.crypt
     opts['aes'] = salt.crypt.Crypticle.generate_key_string()
 
     opts['extension_modules'] = (
@@ -8,14 +8,22 @@ authenticating peers
 import os
 import sys
 import hmac
+import zlib
 import hashlib
 import logging
 import tempfile
 
-# Import Cryptography libs
-from M2Crypto import RSA
+# Import Cryptography libs, M2Crypto is slow to import and only needed for
+# the RSA keys, the functions which use them import it
 from Crypto.Cipher import AES
 
+# lz4 is an optional, faster alternative to zlib for payload compression
+try:
+    import lz4
+    HAS_LZ4 = True
+except ImportError:
+    HAS_LZ4 = False
+
 # Import salt utils
 import salt.utils
 import salt.payload
@@ -24,12 +32,49 @@ from salt.exceptions import AuthenticationError, SaltClientError, SaltReqTimeout
 
 log = logging.getLogger(__name__)
 
+try:
+    # Python 2.7.7 and later ship a constant time comparison in C
+    from hmac import compare_digest
+except ImportError:
+    def compare_digest(a, b):
+        '''
+        Compare two strings in time which only depends on their length
+        '''
+        if len(a) != len(b):
+            return False
+        result = 0
+        for x, y in zip(a, b):
+            result |= ord(x) ^ ord(y)
+        return result == 0
+
+# Map the payload compression algorithms to their (compress, decompress)
+# callables, zlib is always available so any peer which speaks the
+# compressed framing can be assumed to understand it
+COMPRESSORS = {'zlib': (zlib.compress, zlib.decompress)}
+if HAS_LZ4:
+    COMPRESSORS['lz4'] = (lz4.compress, lz4.decompress)
+
+
+def compression_algos(opts):
+    '''
+    Return the list of payload compression algorithms which are configured
+    and available on this system, in order of preference
+    '''
+    algos = opts.get('payload_compression', [])
+    if not algos:
+        return []
+    if isinstance(algos, basestring):
+        algos = [algos]
+    return [algo for algo in algos if algo in COMPRESSORS]
+
 
 def clean_old_key(rsa_path):
     '''
     Read in an old m2crypto key and save it back in the clear so
     pycrypto can handle it
     '''
+    from M2Crypto import RSA
+
     def foo_pass(self, data=''):
         return 'foo'
     mkey = RSA.load_key(rsa_path, callback=foo_pass)
@@ -61,6 +106,7 @@ def gen_keys(keydir, keyname, keysize):
     '''
     Generate a keypair for use with salt
     '''
+    from M2Crypto import RSA
     base = os.path.join(keydir, keyname)
     priv = '{0}.pem'.format(base)
     pub = '{0}.pub'.format(base)
@@ -90,6 +136,7 @@ class MasterKeys(dict):
         '''
         Returns a key objects for the master
         '''
+        from M2Crypto import RSA
         key = None
         if os.path.exists(self.rsa_path):
             try:
@@ -144,6 +191,7 @@ class Auth(object):
         '''
         Returns a key objects for the minion
         '''
+        from M2Crypto import RSA
         key = None
         # Make sure all key parent directories are accessible
         user = self.opts.get('user', 'root')
@@ -169,6 +217,7 @@ class Auth(object):
         server. This payload consists of the passed in id_ and the ssh
         public key to encrypt the AES key sent back form the master.
         '''
+        from M2Crypto import RSA
         payload = {}
         key = self.get_keys()
         fd_, tmp_pub = tempfile.mkstemp()
@@ -178,6 +227,11 @@ class Auth(object):
         payload['load'] = {}
         payload['load']['cmd'] = '_auth'
         payload['load']['id'] = self.opts['id']
+        # Advertise the compression algorithms this minion can handle,
+        # masters which predate payload compression ignore this key
+        compression = compression_algos(self.opts)
+        if compression:
+            payload['load']['compression'] = compression
         try:
             pub = RSA.load_pub_key(os.path.join(self.opts['pki_dir'], self.mpub))
             payload['load']['token'] = pub.public_encrypt(self.token, 4)
@@ -309,6 +363,8 @@ class Auth(object):
                 sys.exit(42)
         auth['aes'] = self.decrypt_aes(payload['aes'])
         auth['publish_port'] = payload['publish_port']
+        # Only masters which understand payload compression send this back
+        auth['compression'] = payload.get('compression', [])
         return auth
 
 
@@ -318,16 +374,36 @@ class Crypticle(object):
 
     Encryption algorithm: AES-CBC
     Signing algorithm: HMAC-SHA256
+
+    Payloads larger than the ``payload_compression_threshold`` are compressed
+    before encryption when the peer has agreed to a compression algorithm.
+    Compressed payloads are framed with ``COMPRESS_PAD`` followed by the
+    algorithm name, payloads sent with the ``COMPRESS_PAD`` framing also tell
+    the receiving end that compressed replies are understood. Peers which
+    have not negotiated compression only ever see the ``PICKLE_PAD`` framing.
     '''
 
     PICKLE_PAD = 'pickle::'
+    COMPRESS_PAD = 'zpickle:'
+    COMPRESS_NONE = 'none'
     AES_BLOCK_SIZE = 16
+    # Payloads smaller than this are padded with a plain copy
+    COPY_LIMIT = 65536
     SIG_SIZE = hashlib.sha256().digest_size
 
-    def __init__(self, opts, key_string, key_size=192):
+    def __init__(self, opts, key_string, key_size=192, compression=None):
         self.keys = self.extract_keys(key_string, key_size)
         self.key_size = key_size
         self.serial = salt.payload.Serial(opts)
+        self.compression = [
+                algo for algo in (compression or [])
+                if algo in COMPRESSORS
+                ]
+        self.threshold = opts.get('payload_compression_threshold', 4096)
+        self.stats = {'compressed': 0,
+                      'raw_bytes': 0,
+                      'sent_bytes': 0,
+                      'saved_bytes': 0}
 
     @classmethod
     def generate_key_string(cls, key_size=192):
@@ -344,53 +420,158 @@ class Crypticle(object):
         '''
         encrypt data with AES-CBC and sign it with HMAC-SHA256
         '''
+        return self._encrypt('', data)
+
+    def _encrypt(self, header, data):
+        '''
+        Encrypt the concatenation of the header and the data without building
+        a padded copy of the data, only the first and last blocks are copied.
+        The bulk of the data is handed to the cypher and the HMAC as a buffer.
+        '''
         aes_key, hmac_key = self.keys
-        pad = self.AES_BLOCK_SIZE - len(data) % self.AES_BLOCK_SIZE
-        data = data + pad * chr(pad)
+        size = len(header) + len(data)
+        pad = self.AES_BLOCK_SIZE - size % self.AES_BLOCK_SIZE
+        # Pull enough of the data into the header to align it to a block
+        split = min(
+                len(data),
+                -len(header) % self.AES_BLOCK_SIZE
+                )
+        lead = header + data[:split]
+        if len(lead) % self.AES_BLOCK_SIZE or size < self.COPY_LIMIT:
+            # Small payloads are cheaper to copy than to split up
+            chunks = [header + data + pad * chr(pad)]
+        else:
+            end = split + (len(data) - split) \
+                    // self.AES_BLOCK_SIZE * self.AES_BLOCK_SIZE
+            chunks = [
+                    lead,
+                    buffer(data, split, end - split),
+                    data[end:] + pad * chr(pad)
+                    ]
         iv_bytes = os.urandom(self.AES_BLOCK_SIZE)
         cypher = AES.new(aes_key, AES.MODE_CBC, iv_bytes)
-        data = iv_bytes + cypher.encrypt(data)
-        sig = hmac.new(hmac_key, data, hashlib.sha256).digest()
-        return data + sig
+        mac = hmac.new(hmac_key, iv_bytes, hashlib.sha256)
+        ret = [iv_bytes]
+        for chunk in chunks:
+            if not len(chunk):
+                continue
+            # The CBC state carries over between calls to encrypt
+            chunk = cypher.encrypt(chunk)
+            mac.update(chunk)
+            ret.append(chunk)
+        ret.append(mac.digest())
+        return ''.join(ret)
 
     def decrypt(self, data):
         '''
         verify HMAC-SHA256 signature and decrypt data with AES-CBC
         '''
+        data, pad = self._decrypt(data)
+        return data[:-pad]
+
+    def _decrypt(self, data):
+        '''
+        Verify and decrypt the data, returns a tuple of the decrypted data,
+        still carrying the padding, and the length of the padding. This
+        allows callers to strip the padding and any framing in one slice.
+        '''
         aes_key, hmac_key = self.keys
-        sig = data[-self.SIG_SIZE:]
-        data = data[:-self.SIG_SIZE]
-        mac_bytes = hmac.new(hmac_key, data, hashlib.sha256).digest()
-        if len(mac_bytes) != len(sig):
+        body = len(data) - self.SIG_SIZE
+        if body < self.AES_BLOCK_SIZE * 2 \
+                or (body - self.AES_BLOCK_SIZE) % self.AES_BLOCK_SIZE:
             log.warning('Failed to authenticate message')
             raise AuthenticationError('message authentication failed')
-        result = 0
-        for x, y in zip(mac_bytes, sig):
-            result |= ord(x) ^ ord(y)
-        if result != 0:
+        mac_bytes = hmac.new(
+                hmac_key,
+                buffer(data, 0, body),
+                hashlib.sha256).digest()
+        if not compare_digest(mac_bytes, data[body:]):
             log.warning('Failed to authenticate message')
             raise AuthenticationError('message authentication failed')
         iv_bytes = data[:self.AES_BLOCK_SIZE]
-        data = data[self.AES_BLOCK_SIZE:]
         cypher = AES.new(aes_key, AES.MODE_CBC, iv_bytes)
-        data = cypher.decrypt(data)
-        return data[:-ord(data[-1])]
+        data = cypher.decrypt(
+                buffer(data, self.AES_BLOCK_SIZE, body - self.AES_BLOCK_SIZE)
+                )
+        return data, ord(data[-1])
 
-    def dumps(self, obj):
+    def _compress(self, data, compression):
+        '''
+        Return the framing header for the serialized data and the data,
+        compressing it with the first of the passed algorithms if it is
+        large enough to be worth the effort
+        '''
+        if not compression:
+            return self.PICKLE_PAD, data
+        algo = compression[0]
+        if len(data) >= self.threshold:
+            comp = COMPRESSORS[algo][0](data)
+            if len(comp) < len(data):
+                self.stats['compressed'] += 1
+                self.stats['raw_bytes'] += len(data)
+                self.stats['sent_bytes'] += len(comp)
+                self.stats['saved_bytes'] += len(data) - len(comp)
+                return '{0}{1}::'.format(self.COMPRESS_PAD, algo), comp
+        return '{0}{1}::'.format(self.COMPRESS_PAD, self.COMPRESS_NONE), data
+
+    def _decompress(self, data, pad):
         '''
-        Serialize and encrypt a python object
+        Strip the framing and padding off of decrypted data, returns a tuple
+        of the serialized data and the compression algorithms the sender
+        accepts. None is returned for the data if the framing is not
+        recognized.
         '''
-        return self.encrypt(self.PICKLE_PAD + self.serial.dumps(obj))
+        end = len(data) - pad
+        if data.startswith(self.PICKLE_PAD):
+            return data[len(self.PICKLE_PAD):end], []
+        if not data.startswith(self.COMPRESS_PAD):
+            return None, []
+        start = data.find('::', len(self.COMPRESS_PAD))
+        if start == -1:
+            return None, []
+        algo = data[len(self.COMPRESS_PAD):start]
+        start += 2
+        accept = ['zlib']
+        if algo == self.COMPRESS_NONE:
+            return data[start:end], accept
+        if algo not in COMPRESSORS:
+            log.error(
+                'Received a payload compressed with {0}, which is not '
+                'available on this system'.format(algo)
+            )
+            return None, []
+        if algo not in accept:
+            accept.insert(0, algo)
+        return COMPRESSORS[algo][1](data[start:end]), accept
+
+    def dumps(self, obj, compression=None):
+        '''
+        Serialize and encrypt a python object, pass a list of compression
+        algorithms to override the ones negotiated for this crypticle
+        '''
+        if compression is None:
+            compression = self.compression
+        return self._encrypt(
+                *self._compress(self.serial.dumps(obj), compression)
+                )
 
     def loads(self, data):
         '''
         Decrypt and un-serialize a python object
         '''
-        data = self.decrypt(data)
+        return self.loads_peer(data)[0]
+
+    def loads_peer(self, data):
+        '''
+        Decrypt and un-serialize a python object, returns a tuple of the
+        object and the list of compression algorithms the sender accepts
+        for replies
+        '''
+        data, accept = self._decompress(*self._decrypt(data))
         # simple integrity check to verify that we got meaningful data
-        if not data.startswith(self.PICKLE_PAD):
-            return {}
-        return self.serial.loads(data[len(self.PICKLE_PAD):])
+        if data is None:
+            return {}, []
+        return self.serial.loads(data), accept
 
 
 class SAuth(Auth):
@@ -414,7 +595,10 @@ class SAuth(Auth):
             log.error('Failed to authenticate with the master, verify this'\
                 + ' minion\'s public key has been accepted on the salt master')
             sys.exit(2)
-        return Crypticle(self.opts, creds['aes'])
+        return Crypticle(
+                self.opts,
+                creds['aes'],
+                compression=creds.get('compression'))
 
     def gen_token(self, clear_tok):
         '''
@@ -6,8 +6,11 @@ import contextlib
 import logging
 import hashlib
 import os
+import Queue
 import shutil
 import string
+import tempfile
+import threading
 import subprocess
 
 # Import third-party libs
@@ -21,6 +24,10 @@ import salt.loader
 import salt.utils
 import salt.payload
 import salt.utils
+import salt.utils.hashcache
+import salt.utils.manifest
+import salt.utils.metacache
+import salt.utils.rendercache
 import salt.utils.templates
 from salt._compat import (
     URLError, HTTPError, BaseHTTPServer, urlparse, url_open)
@@ -145,7 +152,7 @@ class Client(object):
             )
         )
         for fn_ in self.file_list(env):
-            if fn_.startswith(path):
+            if salt.utils.manifest.in_dir(fn_, path):
                 local = self.cache_file('salt://{0}'.format(fn_), env)
                 if not fn_.strip():
                     continue
@@ -161,7 +168,7 @@ class Client(object):
             #else:
             #    prefix = separated[0]
             for fn_ in self.file_list_emptydirs(env):
-                if fn_.startswith(path):
+                if salt.utils.manifest.in_dir(fn_, path):
                     dest = salt.utils.path_join(
                         self.opts['cachedir'],
                         'files',
@@ -209,6 +216,19 @@ class Client(object):
         '''
         return []
 
+    def file_manifest(self, path, env='base'):
+        '''
+        This function must be overwritten
+        '''
+        return {}
+
+    def render_sls(self, sls, env, renderer, grains, pillar):
+        '''
+        Return the sls rendered by the master, None if it has to be rendered
+        locally
+        '''
+        return None
+
     def is_cached(self, path, env='base'):
         '''
         Returns the full path to a file if it is cached locally on the minion
@@ -274,7 +294,7 @@ class Client(object):
 
         # Copy files from master
         for fn_ in self.file_list(env):
-            if fn_.startswith(path):
+            if salt.utils.manifest.in_dir(fn_, path):
                 # Remove the leading directories from path to derive
                 # the relative path on the minion.
                 minion_relpath = string.lstrip(fn_[len(prefix):], '/')
@@ -287,7 +307,7 @@ class Client(object):
                 )
         # Replicate empty dirs from master
         for fn_ in self.file_list_emptydirs(env):
-            if fn_.startswith(path):
+            if salt.utils.manifest.in_dir(fn_, path):
                 # Remove the leading directories from path to derive
                 # the relative path on the minion.
                 minion_relpath = string.lstrip(fn_[len(prefix):], '/')
@@ -467,6 +487,15 @@ class LocalClient(Client):
                 ret.append(os.path.relpath(root, path))
         return ret
 
+    def file_manifest(self, path, env='base'):
+        '''
+        Return the manifest of a directory in the file_roots
+        '''
+        return salt.utils.manifest.build(
+                self.opts['file_roots'].get(env, []),
+                path,
+                self.opts['hash_type'])
+
     def hash_file(self, path, env='base'):
         '''
         Return the hash of a file, to get the hash of a file in the file_roots
@@ -482,17 +511,16 @@ class LocalClient(Client):
                 log.warning(err.format(path))
                 return ret
             else:
-                with open(path, 'rb') as f:
-                    ret['hsum'] = hashlib.md5(f.read()).hexdigest()
+                ret['hsum'] = salt.utils.hashcache.get_hash(
+                        path, 'md5', self.opts)
                 ret['hash_type'] = 'md5'
                 return ret
         path = self._find_file(path, env)['path']
         if not path:
             return {}
         ret = {}
-        with open(path, 'rb') as f:
-            ret['hsum'] = getattr(hashlib, self.opts['hash_type'])(
-                f.read()).hexdigest()
+        ret['hsum'] = salt.utils.hashcache.get_hash(
+                path, self.opts['hash_type'], self.opts)
         ret['hash_type'] = self.opts['hash_type']
         return ret
 
@@ -551,6 +579,126 @@ class RemoteClient(Client):
         Client.__init__(self, opts)
         self.auth = salt.crypt.SAuth(opts)
         self.sreq = salt.payload.SREQ(self.opts['master_uri'])
+        # The files brought up to date from a manifest, keyed by the
+        # environment and the path on the master
+        self.synced = {}
+        # Set to False when the master does not render sls files
+        self.render_service = True
+        # The last replies of the master to the metadata requests
+        self.meta = salt.utils.metacache.MinionCache(self.opts)
+
+    def _conditional(self, load):
+        '''
+        Send a metadata request to the master, the master only sends the data
+        again when it changed since the reply in the minion cache
+        '''
+        def send(load):
+            return self.auth.crypticle.loads(
+                    self.sreq.send(
+                        'aes',
+                        self.auth.crypticle.dumps(load),
+                        3,
+                        60)
+                    )
+        return self.meta.request(load, send)
+
+    def _up_to_date(self, dest, info, hash_type):
+        '''
+        Return True if the local file dest matches the manifest entry info
+        '''
+        try:
+            if os.path.getsize(dest) != info['size']:
+                return False
+            return salt.utils.hashcache.get_hash(
+                    dest, hash_type, self.opts) == info['hsum']
+        except (IOError, OSError):
+            return False
+
+    def _fetch_file(self, sreq, path, dest, env, hash_type):
+        '''
+        Download the file path from the master to dest over the passed request
+        socket. The data is written to a temporary file which is moved over
+        dest once complete, the hash of the data is returned, or an empty
+        string if the download failed.
+        '''
+        load = {'path': path,
+                'env': env,
+                'cmd': '_serve_file'}
+        hasher = getattr(hashlib, hash_type)()
+        fd_, tmp = tempfile.mkstemp(
+                prefix='.{0}.'.format(os.path.basename(dest)),
+                dir=os.path.dirname(dest))
+        try:
+            with os.fdopen(fd_, 'wb') as fp_:
+                while True:
+                    load['loc'] = fp_.tell()
+                    data = self.auth.crypticle.loads(
+                            sreq.send(
+                                'aes',
+                                self.auth.crypticle.dumps(load),
+                                3,
+                                60)
+                            )
+                    if not data or not data.get('dest'):
+                        # The file is no longer on the master
+                        return ''
+                    if not data['data']:
+                        break
+                    fp_.write(data['data'])
+                    hasher.update(data['data'])
+            os.rename(tmp, dest)
+            tmp = None
+        except SaltReqTimeoutError:
+            return ''
+        finally:
+            if tmp:
+                salt.utils.safe_rm(tmp)
+        return hasher.hexdigest()
+
+    def _fetch_files(self, files, env, hash_type):
+        '''
+        Download the passed (path, dest) pairs from the master in parallel,
+        every thread uses its own request socket. Returns the hashes of the
+        downloaded files keyed by path, the files which failed to download
+        are left out.
+        '''
+        ret = {}
+        if not files:
+            return ret
+        queue = Queue.Queue()
+        for item in files:
+            queue.put(item)
+
+        def fetch():
+            sreq = salt.payload.SREQ(self.opts['master_uri'])
+            while True:
+                try:
+                    path, dest = queue.get_nowait()
+                except Queue.Empty:
+                    return
+                try:
+                    hsum = self._fetch_file(sreq, path, dest, env, hash_type)
+                except Exception as exc:
+                    log.error('Error fetching {0}: {1}'.format(path, exc))
+                    hsum = ''
+                if hsum:
+                    ret[path] = hsum
+                    continue
+                log.error('Failed to fetch file \'{0}\''.format(path))
+                # The request socket is out of step after a failure
+                sreq = salt.payload.SREQ(self.opts['master_uri'])
+
+        threads = []
+        for ind in range(
+                max(1, min(self.opts.get('file_client_threads', 4),
+                           len(files)))):
+            thread = threading.Thread(target=fetch)
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        return ret
 
     def get_file(self, path, dest='', makedirs=False, env='base'):
         '''
@@ -606,12 +754,110 @@ class RemoteClient(Client):
             fn_.close()
         return dest
 
-    def file_list(self, env='base'):
+    def cache_dir(self, path, env='base', include_empty=False):
         '''
-        List the files on the master
+        Download all of the files in a subdir of the master, the manifest of
+        the subdir is fetched from the master and only the files which differ
+        from the copies in the minion cache are downloaded
         '''
-        load = {'env': env,
-                'cmd': '_file_list'}
+        rel = self._check_proto(path).strip('/')
+        manifest = self.file_manifest(rel, env)
+        if not isinstance(manifest, dict) or 'files' not in manifest:
+            # The master can not send manifests
+            return Client.cache_dir(self, path, env, include_empty)
+        log.info(
+            'Caching directory \'{0}\' for environment \'{1}\''.format(
+                rel, env
+            )
+        )
+        hash_type = manifest['hash_type']
+        dests = {}
+        fetch = []
+        for fn_, info in manifest['files'].items():
+            with self._cache_loc(fn_, env) as dest:
+                dests[fn_] = dest
+                if not self._up_to_date(dest, info, hash_type):
+                    fetch.append((fn_, dest))
+        fetched = self._fetch_files(fetch, env, hash_type)
+        fetching = set(fn_ for fn_, dest in fetch)
+        ret = []
+        for fn_ in sorted(dests):
+            hsum = manifest['files'][fn_]['hsum']
+            if fn_ in fetching and fetched.get(fn_) != hsum:
+                if fn_ in fetched:
+                    # The file changed on the master since the manifest was
+                    # made, the cached copy is current but not in the manifest
+                    ret.append(dests[fn_])
+                continue
+            self.synced[(env, fn_)] = {'dest': dests[fn_],
+                                       'hsum': hsum,
+                                       'hash_type': hash_type}
+            ret.append(dests[fn_])
+        log.debug(
+            'Fetched {0} of the {1} files in \'{2}\''.format(
+                len(fetched), len(dests), rel
+            )
+        )
+
+        if include_empty:
+            for fn_ in manifest['empty_dirs']:
+                minion_dir = os.path.join(
+                        self.opts['cachedir'],
+                        'files',
+                        env,
+                        fn_)
+                if not os.path.isdir(minion_dir):
+                    os.makedirs(minion_dir)
+                ret.append(minion_dir)
+        return ret
+
+    def get_dir(self, path, dest='', env='base'):
+        '''
+        Get a directory recursively from the salt-master, the files which are
+        already present in dest with the same content are not downloaded
+        again and the downloaded files get the mode they have on the master
+        '''
+        rel = self._check_proto(path).rstrip('/')
+        manifest = self.file_manifest(rel, env)
+        if not isinstance(manifest, dict) or 'files' not in manifest:
+            # The master can not send manifests
+            return Client.get_dir(self, path, dest, env)
+        hash_type = manifest['hash_type']
+        # The bottom-level directory is copied into dest
+        prefix = rel.rsplit('/', 1)[0] if '/' in rel else ''
+        ret = []
+        fetch = []
+        for fn_, info in manifest['files'].items():
+            minion_path = '{0}/{1}'.format(dest, fn_[len(prefix):].lstrip('/'))
+            if self._up_to_date(minion_path, info, hash_type):
+                ret.append(minion_path)
+                continue
+            destdir = os.path.dirname(minion_path)
+            if not os.path.isdir(destdir):
+                os.makedirs(destdir)
+            fetch.append((fn_, minion_path))
+        fetched = self._fetch_files(fetch, env, hash_type)
+        for fn_, minion_path in fetch:
+            if fn_ in fetched:
+                os.chmod(minion_path, manifest['files'][fn_]['mode'])
+                ret.append(minion_path)
+        # Replicate empty dirs from master
+        for fn_ in manifest['empty_dirs']:
+            minion_mkdir = '{0}/{1}'.format(dest, fn_[len(prefix):].lstrip('/'))
+            if not os.path.isdir(minion_mkdir):
+                os.makedirs(minion_mkdir)
+            ret.append(minion_mkdir)
+        ret.sort()
+        return ret
+
+    def file_manifest(self, path, env='base'):
+        '''
+        Return the manifest of a directory on the master, the size, mode and
+        hash of the files below it
+        '''
+        load = {'path': path,
+                'env': env,
+                'cmd': '_file_manifest'}
         try:
             return self.auth.crypticle.loads(
                     self.sreq.send(
@@ -623,6 +869,55 @@ class RemoteClient(Client):
         except SaltReqTimeoutError:
             return ''
 
+    def render_sls(self, sls, env, renderer, grains, pillar):
+        '''
+        Return the sls rendered by the master from its render cache, None if
+        it has to be rendered locally
+        '''
+        if not self.render_service:
+            return None
+        load = {'cmd': '_render_sls',
+                'id': self.opts['id'],
+                'env': env,
+                'sls': sls,
+                'renderer': renderer,
+                'allow_undefined': self.opts.get('allow_undefined', False),
+                'grains': salt.utils.rendercache.digests(grains),
+                'pillar': salt.utils.rendercache.digests(pillar)}
+        for full in (False, True):
+            if full:
+                load.update({'full': True, 'grains': grains, 'pillar': pillar})
+            try:
+                ret = self.auth.crypticle.loads(
+                        self.sreq.send(
+                            'aes',
+                            self.auth.crypticle.dumps(load),
+                            3,
+                            60)
+                        )
+            except SaltReqTimeoutError:
+                return None
+            if not isinstance(ret, dict) or ret.get('disabled'):
+                # The master is too old or has the render cache turned off
+                self.render_service = False
+                return None
+            if 'state' in ret:
+                return ret['state']
+            if not ret.get('need'):
+                return None
+        return None
+
+    def file_list(self, env='base'):
+        '''
+        List the files on the master
+        '''
+        load = {'env': env,
+                'cmd': '_file_list'}
+        try:
+            return self._conditional(load)
+        except SaltReqTimeoutError:
+            return ''
+
     def file_list_emptydirs(self, env='base'):
         '''
         List the empty dirs on the master
@@ -630,13 +925,7 @@ class RemoteClient(Client):
         load = {'env': env,
                 'cmd': '_file_list_emptydirs'}
         try:
-            return self.auth.crypticle.loads(
-                    self.sreq.send(
-                        'aes',
-                        self.auth.crypticle.dumps(load),
-                        3,
-                        60)
-                    )
+            return self._conditional(load)
         except SaltReqTimeoutError:
             return ''
 
@@ -647,13 +936,7 @@ class RemoteClient(Client):
         load = {'env': env,
                 'cmd': '_dir_list'}
         try:
-            return self.auth.crypticle.loads(
-                    self.sreq.send(
-                        'aes',
-                        self.auth.crypticle.dumps(load),
-                        3,
-                        60)
-                    )
+            return self._conditional(load)
         except SaltReqTimeoutError:
             return ''
 
@@ -672,8 +955,8 @@ class RemoteClient(Client):
                 return {}
             else:
                 ret = {}
-                with open(path, 'rb') as f:
-                    ret['hsum'] = hashlib.md5(f.read()).hexdigest()
+                ret['hsum'] = salt.utils.hashcache.get_hash(
+                        path, 'md5', self.opts)
                 ret['hash_type'] = 'md5'
                 return ret
         load = {'path': path,
@@ -697,13 +980,7 @@ class RemoteClient(Client):
         load = {'env': env,
                 'cmd': '_file_list'}
         try:
-            return self.auth.crypticle.loads(
-                    self.sreq.send(
-                        'aes',
-                        self.auth.crypticle.dumps(load),
-                        3,
-                        60)
-                    )
+            return self._conditional(load)
         except SaltReqTimeoutError:
             return ''
 
@@ -713,13 +990,7 @@ class RemoteClient(Client):
         '''
         load = {'cmd': '_master_opts'}
         try:
-            return self.auth.crypticle.loads(
-                    self.sreq.send(
-                        'aes',
-                        self.auth.crypticle.dumps(load),
-                        3,
-                        60)
-                    )
+            return self._conditional(load)
         except SaltReqTimeoutError:
             return ''
 
@@ -58,16 +58,21 @@ def _create_loader(
     return Loader(module_dirs, opts, tag)
 
 
-def minion_mods(opts):
+def minion_mods(opts, context=None):
     '''
-    Returns the minion modules
+    Returns the minion modules, context is a dict shared by the modules,
+    during a state run it is shared with the state modules
     '''
     load = _create_loader(opts, 'modules', 'module')
-    functions = load.apply_introspection(load.gen_functions())
+    if context is None:
+        context = {}
+    pack = {'name': '__context__',
+            'value': context}
+    functions = load.apply_introspection(load.gen_functions(pack))
     if opts.get('providers', False):
         if isinstance(opts['providers'], dict):
             for mod, provider in opts['providers'].items():
-                funcs = raw_mod(opts, provider, functions)
+                funcs = raw_mod(opts, provider, functions, context)
                 if funcs:
                     for func in funcs:
                         f_key = '{0}{1}'.format(mod, func[func.rindex('.'):])
@@ -75,12 +80,16 @@ def minion_mods(opts):
     return functions
 
 
-def raw_mod(opts, name, functions):
+def raw_mod(opts, name, functions, context=None):
     '''
     Returns a single module loaded raw and bypassing the __virtual__ function
     '''
     load = _create_loader(opts, 'modules', 'rawmodule')
-    return load.gen_module(name, functions)
+    if context is None:
+        context = {}
+    pack = {'name': '__context__',
+            'value': context}
+    return load.gen_module(name, functions, pack)
 
 
 def returners(opts, functions):
@@ -135,13 +144,18 @@ def auth(opts):
     return load.gen_functions()
 
 
-def states(opts, functions):
+def states(opts, functions, context=None):
     '''
-    Returns the state modules
+    Returns the state modules, context is a dict shared by the state modules
+    for the length of a state run
     '''
     load = _create_loader(opts, 'states', 'states')
-    pack = {'name': '__salt__',
-            'value': functions}
+    if context is None:
+        context = {}
+    pack = [{'name': '__salt__',
+             'value': functions},
+            {'name': '__context__',
+             'value': context}]
     return load.gen_functions(pack)
 
 
@@ -163,6 +177,51 @@ def render(opts, functions):
     return rend
 
 
+def module_files(opts, ext_type):
+    '''
+    Returns the names of the modules of an extension type, "modules",
+    "states" or "renderers", mapped to the files they are loaded from and
+    the modification times of the files
+    '''
+    return _create_reload_loader(opts, ext_type).module_files()
+
+
+def reload_modules(opts, ext_type, names, funcs, pack=None):
+    '''
+    Load the named modules of an extension type, "modules", "states" or
+    "renderers", again. The functions of the modules replace their previous
+    functions in the passed funcs dict, so that the modules which hold a
+    reference to the dict see them.
+    '''
+    load = _create_reload_loader(opts, ext_type)
+    if pack is None and ext_type == 'modules':
+        pack = [{'name': '__salt__',
+                 'value': funcs},
+                {'name': '__context__',
+                 'value': {}}]
+    for key in funcs.keys():
+        if getattr(funcs[key], '__module__', '').split('.')[-1] in names:
+            funcs.pop(key)
+    if ext_type == 'renderers':
+        funcs.update(load.filter_func('render', pack, names))
+    else:
+        funcs.update(load.gen_functions(pack, names=names))
+    return funcs
+
+
+def _create_reload_loader(opts, ext_type):
+    '''
+    Create the loader for an extension type which can be reloaded
+    '''
+    if ext_type == 'renderers':
+        return _create_loader(
+            opts, 'renderers', 'render', ext_type_dirs='render_dirs'
+        )
+    if ext_type == 'states':
+        return _create_loader(opts, 'states', 'states')
+    return _create_loader(opts, 'modules', 'module')
+
+
 def grains(opts):
     '''
     Return the functions for the dynamic grains and the values for the static
@@ -394,10 +453,46 @@ class Loader(object):
             mod.__salt__ = functions
         return funcs
 
-    def gen_functions(self, pack=None, virtual_enable=True):
+    def module_files(self):
         '''
-        Return a dict of functions found in the defined module_dirs
+        Return a dict of the module names found in the defined module_dirs,
+        the values are dicts of the module files and their modification
+        times. Compiled python files are skipped, they change whenever the
+        module is imported.
         '''
+        files = {}
+        disable = set(self.opts.get('disable_{0}s'.format(self.tag), []))
+        for mod_dir in self.module_dirs:
+            if not os.path.isabs(mod_dir):
+                continue
+            if not os.path.isdir(mod_dir):
+                continue
+            for fn_ in os.listdir(mod_dir):
+                if fn_.startswith('_'):
+                    continue
+                if fn_.split('.')[0] in disable:
+                    continue
+                path = os.path.join(mod_dir, fn_)
+                if not (fn_.endswith(('.py', '.pyx', '.so'))
+                        or os.path.isdir(path)):
+                    continue
+                extpos = fn_.rfind('.')
+                if extpos > 0:
+                    name = fn_[:extpos]
+                else:
+                    name = fn_
+                try:
+                    files.setdefault(name, {})[path] = os.path.getmtime(path)
+                except OSError:
+                    continue
+        return files
+
+    def gen_functions(self, pack=None, virtual_enable=True, names=None):
+        '''
+        Return a dict of functions found in the defined module_dirs, if a
+        list of module names is passed only those modules are loaded
+        '''
+        load_names = names
         names = {}
         modules = []
         funcs = {}
@@ -431,6 +526,8 @@ class Loader(object):
                         _name = fn_[:extpos]
                     else:
                         _name = fn_
+                    if load_names is not None and _name not in load_names:
+                        continue
                     names[_name] = os.path.join(mod_dir, fn_)
         for name in names:
             try:
@@ -574,13 +671,13 @@ class Loader(object):
             modules.add(comps[0])
         return sorted(list(modules))
 
-    def filter_func(self, name, pack=None):
+    def filter_func(self, name, pack=None, names=None):
         '''
         Filter a specific function out of the functions, this is used to load
         the returners for the salt minion
         '''
         funcs = {}
-        gen = self.gen_functions(pack) if pack else self.gen_functions()
+        gen = self.gen_functions(pack, names=names)
         for key, fun in gen.items():
             if key[key.index('.') + 1:] == name:
                 funcs[key[:key.index('.')]] = fun
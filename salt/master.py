@@ -13,7 +13,6 @@ import signal
 import shutil
 import stat
 import logging
-import hashlib
 import tempfile
 import datetime
 import pwd
@@ -43,6 +42,12 @@ import salt.auth
 import salt.wheel
 import salt.utils.atomicfile
 import salt.utils.event
+import salt.utils.presence
+import salt.utils.retstream
+import salt.utils.manifest
+import salt.utils.metacache
+import salt.utils.rendercache
+import salt.utils.topscache
 import salt.utils.verify
 import salt.utils.minions
 from salt.utils.debug import enable_sigusr1_handler
@@ -50,6 +55,9 @@ from salt.utils.debug import enable_sigusr1_handler
 
 log = logging.getLogger(__name__)
 
+# How often the workers log their payload compression stats, in seconds
+COMPRESSION_STATS_INTERVAL = 300
+
 
 def clean_proc(proc, wait_for_kill=10):
     '''
@@ -159,28 +167,28 @@ class Master(SMaster):
 
     def _clear_old_jobs(self):
         '''
-        Clean out the old jobs
+        Clean out the old jobs and the expired eauth tokens
         '''
-        if self.opts['keep_jobs'] == 0:
-            return
         jid_root = os.path.join(self.opts['cachedir'], 'jobs')
         while True:
-            cur = "{0:%Y%m%d%H}".format(datetime.datetime.now())
-
-            for top in os.listdir(jid_root):
-                t_path = os.path.join(jid_root, top)
-                for final in os.listdir(t_path):
-                    f_path = os.path.join(t_path, final)
-                    jid_file = os.path.join(f_path, 'jid')
-                    if not os.path.isfile(jid_file):
-                        continue
-                    with open(jid_file, 'r') as fn_:
-                        jid = fn_.read()
-                    if len(jid) < 18:
-                        # Invalid jid, scrub the dir
-                        shutil.rmtree(f_path)
-                    elif int(cur) - int(jid[:10]) > self.opts['keep_jobs']:
-                        shutil.rmtree(f_path)
+            salt.auth.clean_expired_tokens(self.opts)
+            if self.opts['keep_jobs'] != 0:
+                cur = "{0:%Y%m%d%H}".format(datetime.datetime.now())
+
+                for top in os.listdir(jid_root):
+                    t_path = os.path.join(jid_root, top)
+                    for final in os.listdir(t_path):
+                        f_path = os.path.join(t_path, final)
+                        jid_file = os.path.join(f_path, 'jid')
+                        if not os.path.isfile(jid_file):
+                            continue
+                        with open(jid_file, 'r') as fn_:
+                            jid = fn_.read()
+                        if len(jid) < 18:
+                            # Invalid jid, scrub the dir
+                            shutil.rmtree(f_path)
+                        elif int(cur) - int(jid[:10]) > self.opts['keep_jobs']:
+                            shutil.rmtree(f_path)
             try:
                 time.sleep(60)
             except KeyboardInterrupt:
@@ -238,6 +246,10 @@ class Master(SMaster):
                 self.master_key)
         reqserv.start_publisher()
         reqserv.start_event_publisher()
+        presence_proc = None
+        if self.opts['presence']:
+            presence_proc = salt.utils.presence.Tracker(self.opts)
+            presence_proc.start()
 
         def sigterm_clean(signum, frame):
             '''
@@ -250,6 +262,7 @@ class Master(SMaster):
             clean_proc(clear_old_jobs_proc)
             clean_proc(reqserv.publisher)
             clean_proc(reqserv.eventpublisher)
+            clean_proc(presence_proc)
             for proc in reqserv.work_procs:
                 clean_proc(proc)
             if os.path.isfile(self.opts['pidfile']):
@@ -275,26 +288,116 @@ class Publisher(multiprocessing.Process):
     '''
     The publishing interface, a simple zeromq publisher that sends out the
     commands.
+
+    Everything waiting on the pull socket is drained and published in one
+    pass, the publish socket queues up to ``pub_hwm`` messages for each
+    subscriber. Statistics about the publishes are fired on the master event
+    bus under the ``pub_stats`` tag every ``pub_stats_interval`` seconds.
     '''
+    # The upper bounds, in milliseconds, of the publish latency histogram
+    LATENCY_BUCKETS = (1, 5, 10, 50, 100, 500, 1000)
+
     def __init__(self, opts):
         super(Publisher, self).__init__()
         self.opts = opts
+        self.event = None
+        self.stats = self.__new_stats()
 
-    def run(self):
+    def __new_stats(self):
         '''
-        Bind to the interface specified in the configuration file
+        Return a fresh set of publish statistics
+        '''
+        latency = dict(
+                (str(bound), 0) for bound in self.LATENCY_BUCKETS
+                )
+        latency['inf'] = 0
+        return {'published': 0,
+                'batches': 0,
+                'max_batch': 0,
+                'refreshes': 0,
+                'latency_ms': latency}
+
+    def _record_latency(self, stamp):
+        '''
+        Add the time a publish spent between being sent to the pull socket
+        and being handed to the publish socket to the histogram
+        '''
+        try:
+            latency = (time.time() - float(stamp)) * 1000
+        except ValueError:
+            return
+        for bound in self.LATENCY_BUCKETS:
+            if latency <= bound:
+                self.stats['latency_ms'][str(bound)] += 1
+                return
+        self.stats['latency_ms']['inf'] += 1
+
+    def _fire_stats(self):
+        '''
+        Fire the publish statistics on the master event bus and reset them
+        '''
+        if not self.stats['published']:
+            return
+        self.stats['hwm'] = self.opts['pub_hwm']
+        self.stats['interval'] = self.opts['pub_stats_interval']
+        try:
+            if self.event is None:
+                self.event = salt.utils.event.MasterEvent(
+                        self.opts['sock_dir']
+                        )
+            self.event.fire_event(self.stats, 'pub_stats')
+        except zmq.ZMQError as exc:
+            log.error('Failed to fire publisher stats: {0}'.format(exc))
+        self.stats = self.__new_stats()
+
+    def _pub_sock(self, context):
+        '''
+        Create a publish socket with the configured high water mark
         '''
-        # Set up the context
-        context = zmq.Context(1)
-        # Prepare minion publish socket
         pub_sock = context.socket(zmq.PUB)
+        hwm = int(self.opts['pub_hwm'])
         # if 2.1 >= zmq < 3.0, we only have one HWM setting
         try:
-            pub_sock.setsockopt(zmq.HWM, 1)
+            pub_sock.setsockopt(zmq.HWM, hwm)
         # in zmq >= 3.0, there are separate send and receive HWM settings
         except AttributeError:
-            pub_sock.setsockopt(zmq.SNDHWM, 1)
-            pub_sock.setsockopt(zmq.RCVHWM, 1)
+            pub_sock.setsockopt(zmq.SNDHWM, hwm)
+            pub_sock.setsockopt(zmq.RCVHWM, hwm)
+        return pub_sock
+
+    def _drain(self, pull_sock, pub_sock):
+        '''
+        Publish everything which is waiting on the pull socket, returns the
+        number of messages sent
+        '''
+        count = 0
+        while True:
+            try:
+                frames = pull_sock.recv_multipart(zmq.NOBLOCK)
+            except zmq.ZMQError as exc:
+                if exc.errno == errno.EAGAIN:
+                    break
+                raise exc
+            # Publishes sent from the master carry the time they were sent
+            # as a leading frame, only the last frame goes to the minions
+            pub_sock.send(frames[-1])
+            if len(frames) > 1:
+                self._record_latency(frames[0])
+            count += 1
+        if count:
+            self.stats['published'] += count
+            self.stats['batches'] += 1
+            self.stats['max_batch'] = max(self.stats['max_batch'], count)
+        return count
+
+    def run(self):
+        '''
+        Bind to the interface specified in the configuration file
+        '''
+        # Set up the context
+        context = zmq.Context(1)
+        # Prepare minion publish socket
+        pub_sock = self._pub_sock(context)
         pub_uri = 'tcp://{interface}:{publish_port}'.format(**self.opts)
         # Prepare minion pull socket
         pull_sock = context.socket(zmq.PULL)
@@ -311,35 +414,40 @@ class Publisher(multiprocessing.Process):
                     'publish_pull.ipc'),
                 448
                 )
+        poller = zmq.Poller()
+        poller.register(pull_sock, zmq.POLLIN)
+        interval = self.opts['pub_stats_interval']
+        last_stats = time.time()
 
         try:
             while True:
                 # Catch and handle EINTR from when this process is sent
                 # SIGUSR1 gracefully so we don't choke and die horribly
                 try:
-                    package = pull_sock.recv()
-                    pub_sock.send(package)
+                    socks = dict(poller.poll(1000))
+                    sent = 0
+                    if socks.get(pull_sock) == zmq.POLLIN:
+                        sent = self._drain(pull_sock, pub_sock)
                 except zmq.ZMQError as exc:
                     if exc.errno == errno.EINTR:
                         continue
                     raise exc
-                if self.opts['pub_refresh']:
+                if interval and time.time() - last_stats >= interval:
+                    self._fire_stats()
+                    last_stats = time.time()
+                if sent and self.opts['pub_refresh']:
+                    # Refresh the connections once per batch of publishes
+                    # instead of after every single message
                     pub_sock.close()
-                    #time.sleep(0.5)
-                    pub_sock = context.socket(zmq.PUB)
-                    try:
-                        pub_sock.setsockopt(zmq.HWM, 1)
-                    except AttributeError:
-                        pub_sock.setsockopt(zmq.SNDHWM, 1)
-                        pub_sock.setsockopt(zmq.RCVHWM, 1)
+                    pub_sock = self._pub_sock(context)
                     con = False
                     while not con:
-                        time.sleep(0.1)
                         try:
                             pub_sock.bind(pub_uri)
                             con = True
                         except zmq.ZMQError:
-                            pass
+                            time.sleep(0.1)
+                    self.stats['refreshes'] += 1
 
         except KeyboardInterrupt:
             pub_sock.close()
@@ -433,6 +541,7 @@ class MWorker(multiprocessing.Process):
         self.crypticle = crypticle
         self.mkey = mkey
         self.key = key
+        self.stats_logged = time.time()
 
     def __bind(self):
         '''
@@ -494,14 +603,31 @@ class MWorker(multiprocessing.Process):
         Handle a command sent via an aes key
         '''
         try:
-            data = self.crypticle.loads(load)
+            data, accept = self.crypticle.loads_peer(load)
         except Exception:
             return ''
         if 'cmd' not in data:
             log.error('Received malformed command {0}'.format(data))
             return {}
         log.info('AES payload received with command {0}'.format(data['cmd']))
-        return self.aes_funcs.run_func(data['cmd'], data)
+        # Only compress the reply if the minion has shown that it can read
+        # compressed payloads and the master has compression enabled
+        compression = [
+                algo for algo in accept
+                if algo in salt.crypt.compression_algos(self.opts)
+                ]
+        ret = self.aes_funcs.run_func(data['cmd'], data, compression)
+        if self.crypticle.stats['compressed'] \
+                and time.time() - self.stats_logged \
+                >= COMPRESSION_STATS_INTERVAL:
+            self.stats_logged = time.time()
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug(
+                    'Payload compression stats for this worker: {0}'.format(
+                        self.crypticle.stats
+                    )
+                )
+        return ret
 
     def run(self):
         '''
@@ -530,8 +656,16 @@ class AESFuncs(object):
         self.ckminions = salt.utils.minions.CkMinions(opts)
         # Create the tops dict for loading external top data
         self.tops = salt.loader.tops(self.opts)
+        self.tops_cache = salt.utils.topscache.TopsCache(self.opts)
         # Make a client
         self.local = salt.client.LocalClient(self.opts['conf_file'])
+        # The hashes of the files on the file server, keyed by path
+        self.hash_cache = {}
+        # The file lists of the environments for the conditional requests
+        self.file_lists = salt.utils.metacache.FileLists(self.opts)
+        self.render_cache = salt.utils.rendercache.RenderCache(
+                self.opts,
+                self.hash_cache)
 
     def __find_file(self, path, env='base'):
         '''
@@ -590,6 +724,19 @@ class AESFuncs(object):
         if not 'id' in load:
             log.error('Received call for external nodes without an id')
             return {}
+        grains = {}
+        if 'opts' in load:
+            grains = load['opts'].get('grains', {})
+        return self.tops_cache.get(
+                load['id'],
+                grains,
+                lambda: self.__gather_tops(load))
+
+    def __gather_tops(self, load):
+        '''
+        Gather the top data for a minion from the external node classifier
+        and the master_tops interfaces
+        '''
         ret = {}
         # The old ext_nodes method is set to be deprecated in 0.10.4
         # and should be removed within 3-5 releases in favor of the
@@ -600,25 +747,11 @@ class AESFuncs(object):
                            ' available, please verify that it is installed'
                            '').format(self.opts['external_nodes']))
                 return {}
-            cmd = '{0} {1}'.format(self.opts['external_nodes'], load['id'])
-            ndata = yaml.safe_load(
-                    subprocess.Popen(
-                        cmd,
-                        shell=True,
-                        stdout=subprocess.PIPE
-                        ).communicate()[0])
-            if 'environment' in ndata:
-                env = ndata['environment']
-            else:
-                env = 'base'
-
-            if 'classes' in ndata:
-                if isinstance(ndata['classes'], dict):
-                    ret[env] = list(ndata['classes'])
-                elif isinstance(ndata['classes'], list):
-                    ret[env] = ndata['classes']
-                else:
-                    return ret
+            ret.update(
+                    salt.utils.topscache.parse_enc(
+                        self.tops_cache.enc(
+                            self.opts['external_nodes'],
+                            load['id'])))
         # Evaluate all configured master_tops interfaces
 
         opts = {}
@@ -666,64 +799,62 @@ class AESFuncs(object):
         if not path:
             return {}
         ret = {}
-        with open(path, 'rb') as fp_:
-            ret['hsum'] = getattr(hashlib, self.opts['hash_type'])(
-                    fp_.read()).hexdigest()
+        ret['hsum'] = salt.utils.manifest.hash_file(
+                path,
+                self.opts['hash_type'],
+                self.hash_cache)
         ret['hash_type'] = self.opts['hash_type']
         return ret
 
+    def _file_manifest(self, load):
+        '''
+        Return the manifest of a directory on the file server, the size, mode
+        and hash of every file below it, so that the minion can tell which
+        files it needs to download with a single request
+        '''
+        if 'path' not in load or 'env' not in load:
+            return {}
+        return salt.utils.manifest.build(
+                self.opts['file_roots'].get(load['env'], []),
+                load['path'],
+                self.opts['hash_type'],
+                self.hash_cache)
+
     def _file_list(self, load):
         '''
         Return a list of all files on the file server in a specified
-        environment
+        environment, or that the copy of the minion is current
         '''
-        ret = []
-        if load['env'] not in self.opts['file_roots']:
-            return ret
-        for path in self.opts['file_roots'][load['env']]:
-            for root, dirs, files in os.walk(path, followlinks=True):
-                for fn in files:
-                    ret.append(
-                        os.path.relpath(
-                            os.path.join(
-                                root,
-                                fn
-                                ),
-                            path
-                            )
-                        )
-        return ret
+        return salt.utils.metacache.reply(
+                load,
+                *self.file_lists.get(load['env'], 'files'))
 
     def _file_list_emptydirs(self, load):
         '''
-        Return a list of all empty directories on the master
+        Return a list of all empty directories on the master, or that the
+        copy of the minion is current
         '''
-        ret = []
-        if load['env'] not in self.opts['file_roots']:
-            return ret
-        for path in self.opts['file_roots'][load['env']]:
-            for root, dirs, files in os.walk(path, followlinks=True):
-                if len(dirs) == 0 and len(files) == 0:
-                    ret.append(os.path.relpath(root, path))
-        return ret
+        return salt.utils.metacache.reply(
+                load,
+                *self.file_lists.get(load['env'], 'emptydirs'))
 
     def _dir_list(self, load):
         '''
-        Return a list of all directories on the master
+        Return a list of all directories on the master, or that the copy of
+        the minion is current
         '''
-        ret = []
-        if load['env'] not in self.opts['file_roots']:
-            return ret
-        for path in self.opts['file_roots'][load['env']]:
-            for root, dirs, files in os.walk(path, followlinks=True):
-                ret.append(os.path.relpath(root, path))
-        return ret
+        return salt.utils.metacache.reply(
+                load,
+                *self.file_lists.get(load['env'], 'dirs'))
 
     def _master_opts(self, load):
         '''
-        Return the master options to the minion
+        Return the master options the minions use, or that the copy of the
+        minion is current
         '''
-        return self.opts
+        return salt.utils.metacache.reply(
+                load,
+                salt.utils.metacache.master_opts(self.opts))
 
     def _pillar(self, load):
         '''
@@ -763,6 +894,27 @@ class AESFuncs(object):
                 load['opts']['id'],
                 load['opts']['environment'])
 
+    def _render_sls(self, load):
+        '''
+        Return an sls file rendered for the minion from the render cache.
+        The minion sends the digests of its grains and pillar values, if the
+        master has no result for them it asks for the values themselves.
+        '''
+        for key in ('id', 'env', 'sls', 'renderer', 'grains', 'pillar'):
+            if key not in load:
+                return {'local': True}
+        if not self.opts['render_cache']:
+            return {'disabled': True}
+        args = (load['env'],
+                load['sls'],
+                load['renderer'],
+                load.get('allow_undefined', False),
+                load['grains'],
+                load['pillar'])
+        if load.get('full'):
+            return self.render_cache.render(*args)
+        return self.render_cache.get(*args)
+
     def _minion_event(self, load):
         '''
         Receive an event from the minion and fire it on the master event
@@ -786,7 +938,9 @@ class AESFuncs(object):
                     self.opts['cachedir'],
                     self.opts['hash_type'])
         log.info('Got return from {id} for job {jid}'.format(**load))
-        self.event.fire_event(load, load['jid'])
+        chunked = 'chunks' in load
+        if not chunked:
+            self.event.fire_event(load, load['jid'])
         if not self.opts['job_cache']:
             return
         jid_dir = salt.utils.jid_dir(
@@ -800,6 +954,52 @@ class AESFuncs(object):
                 'that is not present on the master: {jid}'.format(**load)
             )
             return False
+        ret = self._store_return(jid_dir, load)
+        if chunked:
+            # The return is read from the job cache
+            self.event.fire_event(load, load['jid'])
+        return ret
+
+    def _return_chunk(self, load):
+        '''
+        Receive a chunk of a large return from a minion and keep it in the
+        job cache until the rest of the return comes in. The assembled
+        return is written as msgpack, so the chunks are only taken when the
+        job cache is serialized with msgpack.
+        '''
+        for key in ('jid', 'id', 'seq', 'chunk'):
+            if key not in load:
+                return False
+        if not self.opts['job_cache'] or load['jid'] == 'req' \
+                or self.opts.get('serial', 'msgpack') != 'msgpack':
+            # The minion has to send the whole return at once
+            return False
+        jid_dir = salt.utils.jid_dir(
+                load['jid'],
+                self.opts['cachedir'],
+                self.opts['hash_type']
+                )
+        if not os.path.isdir(jid_dir) \
+                or os.path.isdir(os.path.join(jid_dir, load['id'])):
+            return False
+        salt.utils.retstream.store_chunk(
+                jid_dir,
+                load['id'],
+                load['seq'],
+                load['chunk'],
+                self.serial)
+        self.event.fire_event(
+                {'jid': load['jid'],
+                 'id': load['id'],
+                 'seq': load['seq'],
+                 'items': len(load['chunk'])},
+                salt.utils.retstream.CHUNK_TAG)
+        return {'seq': load['seq']}
+
+    def _store_return(self, jid_dir, load):
+        '''
+        Write a single minion return into the job cache directory jid_dir
+        '''
         hn_dir = os.path.join(jid_dir, load['id'])
         if not os.path.isdir(hn_dir):
             os.makedirs(hn_dir)
@@ -813,14 +1013,27 @@ class AESFuncs(object):
                     )
             return False
 
-        self.serial.dump(
-            load['return'],
-            # Use atomic open here to avoid the file being read before it's
-            # completely written to. Refs #1935
-            salt.utils.atomicfile.atomic_open(
-                os.path.join(hn_dir, 'return.p'), 'w+'
+        if 'chunks' in load:
+            # The return was sent in chunks
+            if not salt.utils.retstream.assemble(
+                    jid_dir,
+                    load['id'],
+                    load['chunks'],
+                    os.path.join(hn_dir, 'return.p'),
+                    self.serial):
+                load['return'] = 'Chunks of the return are missing'
+                load.pop('chunks')
+        else:
+            salt.utils.retstream.discard(jid_dir, load['id'])
+        if 'chunks' not in load:
+            self.serial.dump(
+                load['return'],
+                # Use atomic open here to avoid the file being read before
+                # it's completely written to. Refs #1935
+                salt.utils.atomicfile.atomic_open(
+                    os.path.join(hn_dir, 'return.p'), 'w+'
+                )
             )
-        )
         if 'out' in load:
             self.serial.dump(
                 load['out'],
@@ -833,13 +1046,18 @@ class AESFuncs(object):
 
     def _syndic_return(self, load):
         '''
-        Receive a syndic minion return and format it to look like returns from
-        individual minions.
+        Receive a batch of returns forwarded by a syndic minion and format it
+        to look like returns from individual minions.
+
+        Current syndics send the list of minions the lower master expects to
+        return in a "minions" key, the list is fired to the event bus so that
+        waiting clients extend their wait list without polling the job cache.
+        Loads without it come from older syndics which deliver every return
+        in a single load, these are guarded with a write tag as before.
         '''
         # Verify the load
         if 'return' not in load or 'jid' not in load or 'id' not in load:
             return None
-        # set the write flag
         jid_dir = salt.utils.jid_dir(
                 load['jid'],
                 self.opts['cachedir'],
@@ -851,27 +1069,49 @@ class AESFuncs(object):
                 'that is not present on the master: {jid}'.format(**load)
             )
             return False
-        wtag = os.path.join(jid_dir, 'wtag_{0}'.format(load['id']))
-        try:
-            with open(wtag, 'w+') as fp_:
-                fp_.write('')
-        except (IOError, OSError):
-            log.error(
-                    ('Failed to commit the write tag for the syndic return,'
-                    ' are permissions correct in the cache dir:'
-                    ' {0}?').format(self.opts['cachedir'])
+        wtag = None
+        if 'minions' in load:
+            if load['minions']:
+                self.event.fire_event(
+                        {'syndic': list(load['minions'])},
+                        load['jid']
+                        )
+        else:
+            # set the write flag
+            wtag = os.path.join(jid_dir, 'wtag_{0}'.format(load['id']))
+            try:
+                with open(wtag, 'w+') as fp_:
+                    fp_.write('')
+            except (IOError, OSError):
+                log.error(
+                        ('Failed to commit the write tag for the syndic return,'
+                        ' are permissions correct in the cache dir:'
+                        ' {0}?').format(self.opts['cachedir'])
+                        )
+                return False
+            self.event.fire_event(
+                    {'syndic': load['return'].keys()},
+                    load['jid']
                     )
-            return False
 
         # Format individual return loads
-        self.event.fire_event({'syndic': load['return'].keys()}, load['jid'])
+        log.info(
+            'Got {0} returns from syndic {id} for job {jid}'.format(
+                len(load['return']), **load
+            )
+        )
         for key, item in load['return'].items():
             ret = {'jid': load['jid'],
                    'id': key,
                    'return': item}
-            self._return(ret)
-        if os.path.isfile(wtag):
+            if 'out' in load:
+                ret['out'] = load['out']
+            self.event.fire_event(ret, load['jid'])
+            if self.opts['job_cache']:
+                self._store_return(jid_dir, ret)
+        if wtag and os.path.isfile(wtag):
             os.remove(wtag)
+        return True
 
     def minion_runner(self, clear_load):
         '''
@@ -893,16 +1133,12 @@ class AESFuncs(object):
                     clear_load['id'])
             log.warn(msg)
             return {}
-        perms = set()
-        for match in self.opts['peer_run']:
-            if re.match(match, clear_load['id']):
-                # This is the list of funcs/modules!
-                if isinstance(self.opts['peer_run'][match], list):
-                    perms.update(self.opts['peer_run'][match])
+        perms = self.ckminions.peer_perms('peer_run', clear_load['id'])
         good = False
         for perm in perms:
-            if re.match(perm, clear_load['fun']):
+            if self.ckminions.match_check(perm, clear_load['fun']):
                 good = True
+                break
         if not good:
             return {}
         # Prepare the runner object
@@ -955,12 +1191,7 @@ class AESFuncs(object):
                     clear_load['id'])
             log.warn(msg)
             return {}
-        perms = []
-        for match in self.opts['peer']:
-            if re.match(match, clear_load['id']):
-                # This is the list of funcs/modules!
-                if isinstance(self.opts['peer'][match], list):
-                    perms.extend(self.opts['peer'][match])
+        perms = self.ckminions.peer_perms('peer', clear_load['id'])
         if ',' in clear_load['fun']:
             # 'arg': [['cat', '/proc/cpuinfo'], [], ['foo']]
             clear_load['fun'] = clear_load['fun'].split(',')
@@ -1027,7 +1258,9 @@ class AESFuncs(object):
         pub_sock.connect(pull_uri)
         log.info(('Publishing minion job: #{jid}, func: "{fun}", args:'
                   ' "{arg}", target: "{tgt}"').format(**load))
-        pub_sock.send(self.serial.dumps(payload))
+        pub_sock.send_multipart([
+            '{0:.6f}'.format(time.time()),
+            self.serial.dumps(payload)])
         # Run the client get_returns method based on the form data sent
         if 'form' in clear_load:
             ret_form = clear_load['form']
@@ -1054,20 +1287,21 @@ class AESFuncs(object):
             ret['__jid__'] = jid
             return ret
 
-    def run_func(self, func, load):
+    def run_func(self, func, load, compression=None):
         '''
-        Wrapper for running functions executed with AES encryption
+        Wrapper for running functions executed with AES encryption, the
+        return is compressed with the passed compression algorithms
         '''
         # Don't honor private functions
         if func.startswith('__'):
-            return self.crypticle.dumps({})
+            return self.crypticle.dumps({}, compression)
         # Run the func
         try:
             ret = getattr(self, func)(load)
         except AttributeError as exc:
             log.error(('Received function {0} which in unavailable on the '
                        'master, returning False').format(exc))
-            return self.crypticle.dumps(False)
+            return self.crypticle.dumps(False, compression)
         # Don't encrypt the return value for the _return func
         # (we don't care about the return value, so why encrypt it?)
         if func == '_return':
@@ -1075,7 +1309,7 @@ class AESFuncs(object):
         if func == '_pillar' and 'id' in load:
             if not load.get('ver') == '2' and self.opts['pillar_version'] == 1:
                 # Authorized to return old pillar proto
-                return self.crypticle.dumps(ret)
+                return self.crypticle.dumps(ret, compression)
             # encrypt with a specific aes key
             pubfn = os.path.join(self.opts['pki_dir'],
                     'minions',
@@ -1083,18 +1317,19 @@ class AESFuncs(object):
             key = salt.crypt.Crypticle.generate_key_string()
             pcrypt = salt.crypt.Crypticle(
                     self.opts,
-                    key)
+                    key,
+                    compression=compression)
             try:
                 pub = RSA.load_pub_key(pubfn)
             except RSA.RSAError, e:
-                return self.crypticle.dumps({})
+                return self.crypticle.dumps({}, compression)
 
             pret = {}
             pret['key'] = pub.public_encrypt(key, 4)
             pret['pillar'] = pcrypt.dumps(ret)
             return pret
         # AES Encrypt the return
-        return self.crypticle.dumps(ret)
+        return self.crypticle.dumps(ret, compression)
 
 
 class ClearFuncs(object):
@@ -1403,6 +1638,13 @@ class ClearFuncs(object):
                 pass
 
         ret['aes'] = pub.public_encrypt(self.opts['aes'], 4)
+        if 'compression' in load:
+            # The minion understands payload compression, agree on the
+            # algorithms both sides have available in the master's order
+            ret['compression'] = [
+                    algo for algo in salt.crypt.compression_algos(self.opts)
+                    if algo in load['compression']
+                    ]
         eload = {'result': True,
                  'act': 'accept',
                  'id': load['id'],
@@ -1588,7 +1830,10 @@ class ClearFuncs(object):
             os.path.join(self.opts['sock_dir'], 'publish_pull.ipc')
             )
         pub_sock.connect(pull_uri)
-        pub_sock.send(self.serial.dumps(payload))
+        # The leading frame lets the publisher measure the publish latency
+        pub_sock.send_multipart([
+            '{0:.6f}'.format(time.time()),
+            self.serial.dumps(payload)])
         minions = self.ckminions.check_minions(load['tgt'], load.get('tgt_type', 'glob'))
         return {'enc': 'clear',
                 'load': {'jid': clear_load['jid'],
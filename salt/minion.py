@@ -8,14 +8,22 @@ import logging
 import getpass
 import multiprocessing
 
+import errno
 import fnmatch
 import os
 import hashlib
 import re
+import signal
 import threading
 import time
+import types
 import traceback
 import sys
+try:
+    import fcntl
+except ImportError:
+    # Windows has no SIGCHLD, the children are reaped as the loop wakes up
+    pass
 
 # Import third party libs
 import zmq
@@ -27,13 +35,24 @@ from salt.exceptions import AuthenticationError, \
 import salt.client
 import salt.crypt
 import salt.loader
+import salt.pillar
+import salt.state
 import salt.utils
+import salt.utils.event
+import salt.utils.hashcache
+import salt.utils.presence
+import salt.utils.retstream
+import salt.utils.schedule
 import salt.payload
 from salt._compat import string_types
 from salt.utils.debug import enable_sigusr1_handler
 
 log = logging.getLogger(__name__)
 
+# How often the idle minion checks for refresh requests which were not
+# announced with a module_refresh event, in seconds
+REFRESH_INTERVAL = 60
+
 # To set up a minion:
 # 1, Read in the configuration
 # 2. Generate the function mapping dict
@@ -58,6 +77,15 @@ def get_proc_dir(cachedir):
     return fn_
 
 
+def default_sigchld():
+    '''
+    Restore the default SIGCHLD handler in a job process, the handler of the
+    minion main loop would wake up the minion for every process the job runs
+    '''
+    if hasattr(signal, 'SIGCHLD'):
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+
+
 def detect_kwargs(func, args, data=None):
     '''
     Detect the args and kwargs that need to be passed to a function call
@@ -170,7 +198,7 @@ class Minion(object):
         returners = salt.loader.returners(self.opts, functions)
         return functions, returners
 
-    def _fire_master(self, data, tag):
+    def _fire_master(self, data, tag, timeout=60):
         '''
         Fire an event on the master
         '''
@@ -180,7 +208,7 @@ class Minion(object):
                 'cmd': '_minion_event'}
         sreq = salt.payload.SREQ(self.opts['master_uri'])
         try:
-            sreq.send('aes', self.crypticle.dumps(load))
+            sreq.send('aes', self.crypticle.dumps(load), timeout=timeout)
         except:
             pass
 
@@ -245,7 +273,7 @@ class Minion(object):
     def _handle_decoded_payload(self, data):
         '''
         Override this method if you wish to handle the decoded data
-        differently.
+        differently. Returns the thread or process running the job.
         '''
         if isinstance(data['fun'], string_types):
             if data['fun'] == 'sys.reload_modules':
@@ -264,9 +292,13 @@ class Minion(object):
                 # let python reconstruct the minion on the other side if we're
                 # running on windows
                 instance = None
-            multiprocessing.Process(target=target, args=(instance, self.opts, data)).start()
+            proc = multiprocessing.Process(
+                    target=target, args=(instance, self.opts, data))
         else:
-            threading.Thread(target=target, args=(instance, self.opts, data)).start()
+            proc = threading.Thread(
+                    target=target, args=(instance, self.opts, data))
+        proc.start()
+        return proc
 
     @classmethod
     def _thread_return(class_, minion_instance, opts, data):
@@ -279,6 +311,7 @@ class Minion(object):
         if not minion_instance:
             minion_instance = class_(opts)
         if opts['multiprocessing']:
+            default_sigchld()
             fn_ = os.path.join(minion_instance.proc_dir, data['jid'])
             sdata = {'pid': os.getpid()}
             sdata.update(data)
@@ -303,6 +336,12 @@ class Minion(object):
                 func = minion_instance.functions[data['fun']]
                 args, kw = detect_kwargs(func, data['arg'], data)
                 ret['return'] = func(*args, **kw)
+                if isinstance(ret['return'], types.GeneratorType) and (
+                        data['ret']
+                        or opts['cache_jobs']
+                        or not opts['return_chunk_size']):
+                    # Only the master return is streamed
+                    ret['return'] = list(ret['return'])
                 ret['success'] = True
             except CommandNotFoundError as exc:
                 msg = 'Command required for \'{0}\' not found: {1}'
@@ -321,12 +360,14 @@ class Minion(object):
                 msg = 'The minion function caused an exception: {0}'
                 log.warning(msg.format(trb))
                 ret['return'] = trb
+            # Keep the hashes of the files the function read
+            salt.utils.hashcache.save()
         else:
             ret['return'] = '"{0}" is not available.'.format(function_name)
 
         ret['jid'] = data['jid']
         ret['fun'] = data['fun']
-        minion_instance._return_pub(ret)
+        minion_instance._return_pub(ret, standalone=data.get('standalone'))
         if data['ret']:
             for returner in set(data['ret'].split(',')):
                 ret['id'] = opts['id']
@@ -350,6 +391,8 @@ class Minion(object):
         # multiprocessing communication.
         if not minion_instance:
             minion_instance = class_(opts)
+        if opts['multiprocessing']:
+            default_sigchld()
         ret = {
                 'return': {},
                 'success': {},
@@ -372,6 +415,10 @@ class Minion(object):
                 func = minion_instance.functions[data['fun'][ind]]
                 args, kw = detect_kwargs(func, data['arg'][ind], data)
                 ret['return'][data['fun'][ind]] = func(*args, **kw)
+                if isinstance(ret['return'][data['fun'][ind]],
+                              types.GeneratorType):
+                    ret['return'][data['fun'][ind]] = list(
+                            ret['return'][data['fun'][ind]])
                 ret['success'][data['fun'][ind]] = True
             except Exception as exc:
                 trb = traceback.format_exc()
@@ -382,7 +429,9 @@ class Minion(object):
                         )
                 ret['return'][data['fun'][ind]] = trb
             ret['jid'] = data['jid']
-        minion_instance._return_pub(ret)
+        # Keep the hashes of the files the functions read
+        salt.utils.hashcache.save()
+        minion_instance._return_pub(ret, standalone=data.get('standalone'))
         if data['ret']:
             for returner in set(data['ret'].split(',')):
                 ret['id'] = opts['id']
@@ -396,9 +445,11 @@ class Minion(object):
                                 )
                             )
 
-    def _return_pub(self, ret, ret_cmd='_return'):
+    def _return_pub(self, ret, ret_cmd='_return', standalone=False):
         '''
-        Return the data from the executed command to the master server
+        Return the data from the executed command to the master server, the
+        master gives the standalone jobs started by the minion a job id of its
+        own
         '''
         if self.opts['multiprocessing']:
             fn_ = os.path.join(self.proc_dir, ret['jid'])
@@ -422,7 +473,7 @@ class Minion(object):
         else:
             load = {'return': ret['return'],
                     'cmd': ret_cmd,
-                    'jid': ret['jid'],
+                    'jid': 'req' if standalone else ret['jid'],
                     'id': self.opts['id']}
         try:
             if hasattr(self.functions[ret['fun']], '__outputter__'):
@@ -431,20 +482,17 @@ class Minion(object):
                     load['out'] = oput
         except KeyError:
             pass
-        try:
-            ret_val = sreq.send('aes', self.crypticle.dumps(load))
-        except SaltReqTimeoutError:
-            ret_val = ''
-        if isinstance(ret_val, string_types) and not ret_val:
-            # The master AES key has changed, reauth
-            self.authenticate()
-            ret_val = sreq.send('aes', self.crypticle.dumps(load))
+        if ret_cmd == '_return' and self.opts['return_chunk_size'] \
+                and isinstance(load['return'], (list, types.GeneratorType)):
+            ret_val = self._return_chunks(sreq, load)
+        else:
+            ret_val = self._send_load(sreq, load)
         if self.opts['cache_jobs']:
             # Local job cache has been enabled
             fn_ = os.path.join(
                     self.opts['cachedir'],
                     'minion_jobs',
-                    load['jid'],
+                    ret['jid'],
                     'return.p')
             jdir = os.path.dirname(fn_)
             if not os.path.isdir(jdir):
@@ -452,12 +500,89 @@ class Minion(object):
             open(fn_, 'w+').write(self.serial.dumps(ret))
         return ret_val
 
+    def _send_load(self, sreq, load):
+        '''
+        Send the load to the master, authenticate again and resend it if the
+        master AES key has changed
+        '''
+        try:
+            ret_val = sreq.send('aes', self.crypticle.dumps(load))
+        except SaltReqTimeoutError:
+            ret_val = ''
+        if isinstance(ret_val, string_types) and not ret_val:
+            # The master AES key has changed, reauth
+            self.authenticate()
+            ret_val = sreq.send('aes', self.crypticle.dumps(load))
+        return ret_val
+
+    def _send_chunk(self, sreq, load, seq, chunk):
+        '''
+        Send a chunk of the return to the master, return False if the master
+        did not take it
+        '''
+        reply = self._send_load(
+                sreq,
+                {'cmd': '_return_chunk',
+                 'jid': load['jid'],
+                 'id': load['id'],
+                 'seq': seq,
+                 'chunk': chunk})
+        try:
+            return isinstance(self.crypticle.loads(reply), dict)
+        except Exception:
+            return False
+
+    def _return_chunks(self, sreq, load):
+        '''
+        Send a large return to the master in chunks of return_chunk_size
+        bytes, followed by the return load with the number of chunks. A
+        return which fits in one chunk, or which the master does not take in
+        chunks, is sent at once.
+        '''
+        chunks = salt.utils.retstream.split(
+                load['return'],
+                self.opts['return_chunk_size'],
+                self.serial)
+        seq = 0
+        try:
+            pending = next(chunks, [])
+            for chunk in chunks:
+                if not self._send_chunk(sreq, load, seq, pending):
+                    if seq:
+                        raise SaltClientError(
+                            'The master did not take chunk {0} of the '
+                            'return'.format(seq))
+                    # The master does not take chunks
+                    pending.extend(chunk)
+                    for chunk in chunks:
+                        pending.extend(chunk)
+                    break
+                seq += 1
+                pending = chunk
+            if seq and not self._send_chunk(sreq, load, seq, pending):
+                raise SaltClientError(
+                    'The master did not take chunk {0} of the return'.format(
+                        seq))
+        except Exception:
+            # The chunks sent are dropped by the master
+            trb = traceback.format_exc()
+            log.warning('The return of job {0} failed: {1}'.format(
+                load['jid'], trb))
+            load['return'] = trb
+            return self._send_load(sreq, load)
+        if seq:
+            load['return'] = None
+            load['chunks'] = seq + 1
+        else:
+            load['return'] = pending
+        return self._send_load(sreq, load)
+
     def _state_run(self):
         '''
         Execute a state run based on information set in the minion config file
         '''
         if self.opts['startup_states']:
-            data = {'jid': 'req', 'ret': ''}
+            data = {'jid': salt.utils.gen_jid(), 'standalone': True, 'ret': ''}
             if self.opts['startup_states'] == 'sls':
                 data['fun'] = 'state.sls'
                 data['arg'] = [self.opts['sls_list']]
@@ -494,7 +619,10 @@ class Minion(object):
             time.sleep(self.opts['acceptance_wait_time'])
         self.aes = creds['aes']
         self.publish_port = creds['publish_port']
-        self.crypticle = salt.crypt.Crypticle(self.opts, self.aes)
+        self.crypticle = salt.crypt.Crypticle(
+                self.opts,
+                self.aes,
+                compression=creds.get('compression'))
 
     def passive_refresh(self):
         '''
@@ -583,14 +711,12 @@ class Minion(object):
                     )
 
         poller = zmq.Poller()
-        epoller = zmq.Poller()
-        socket = context.socket(zmq.SUB)
-        socket.setsockopt(zmq.SUBSCRIBE, '')
-        if self.opts['sub_timeout']:
-            socket.setsockopt(zmq.IDENTITY, self.opts['id'])
-        socket.connect(self.master_pub)
+        socket = self._sub_socket(context)
         poller.register(socket, zmq.POLLIN)
-        epoller.register(epull_sock, zmq.POLLIN)
+        poller.register(epull_sock, zmq.POLLIN)
+        reap_fd = self._reap_pipe()
+        if reap_fd is not None:
+            poller.register(reap_fd, zmq.POLLIN)
         # Send an event to the master that the minion is live
         self._fire_master(
                 'Minion {0} started at {1}'.format(
@@ -603,69 +729,141 @@ class Minion(object):
         # Make sure to gracefully handle SIGUSR1
         enable_sigusr1_handler()
 
+        # Pick up the refresh requests made while the minion was down
+        self.passive_refresh()
+
         # On first startup execute a state run if configured to do so
         self._state_run()
 
-        if self.opts['sub_timeout']:
-            last = time.time()
-            while True:
-                try:
-                    socks = dict(poller.poll(self.opts['sub_timeout'] * 1000))
-                    if socket in socks and socks[socket] == zmq.POLLIN:
-                        self.passive_refresh()
-                        payload = self.serial.loads(socket.recv())
-                        self._handle_payload(payload)
-                        last = time.time()
-                    if time.time() - last > self.opts['sub_timeout']:
-                        # It has been a while since the last command, make sure
-                        # the connection is fresh by reconnecting
-                        if self.opts['dns_check']:
-                            try:
-                                # Verify that the dns entry has not changed
-                                self.opts['master_ip'] = salt.utils.dns_check(
-                                    self.opts['master'], safe=True)
-                            except SaltClientError:
-                                # Failed to update the dns, keep the old addr
-                                pass
-                        poller.unregister(socket)
-                        socket.close()
-                        socket = context.socket(zmq.SUB)
-                        socket.setsockopt(zmq.SUBSCRIBE, '')
-                        socket.setsockopt(zmq.IDENTITY, self.opts['id'])
-                        socket.connect(self.master_pub)
-                        poller.register(socket, zmq.POLLIN)
-                        last = time.time()
-                    time.sleep(0.05)
-                    multiprocessing.active_children()
-                    # Check the event system
-                    if epoller.poll(1):
-                        try:
-                            package = epull_sock.recv(zmq.NOBLOCK)
-                            epub_sock.send(package)
-                        except Exception:
-                            pass
-                except Exception:
-                    log.critical(traceback.format_exc())
-        else:
-            while True:
+        # Run the scheduled jobs with the loaded modules
+        schedule = salt.utils.schedule.Schedule(
+                self.opts,
+                self._handle_decoded_payload)
+
+        # Block on the publisher, the event bus and the exiting children at
+        # once, the only timers are the sub_timeout reconnect, the presence
+        # heartbeat, the scheduled jobs and a check for refresh requests
+        # which did not come with an event
+        last = time.time()
+        beat = self.opts['presence_interval']
+        next_beat = last + beat
+        while True:
+            try:
+                wait = REFRESH_INTERVAL
+                due = schedule.eval()
+                if due is not None:
+                    wait = min(wait, due)
+                if self.opts['sub_timeout']:
+                    wait = min(
+                        wait,
+                        max(last + self.opts['sub_timeout'] - time.time(), 0))
+                if beat:
+                    wait = min(wait, max(next_beat - time.time(), 0))
                 try:
-                    socks = dict(poller.poll(60000))
-                    if socket in socks and socks[socket] == zmq.POLLIN:
-                        payload = self.serial.loads(socket.recv())
-                        self._handle_payload(payload)
-                        last = time.time()
-                    time.sleep(0.05)
+                    socks = dict(poller.poll(wait * 1000))
+                except zmq.ZMQError as exc:
+                    if exc.errno == errno.EINTR:
+                        continue
+                    raise
+                if reap_fd in socks:
+                    try:
+                        os.read(reap_fd, 512)
+                    except OSError:
+                        pass
                     multiprocessing.active_children()
+                if epull_sock in socks:
+                    if self._forward_events(epull_sock, epub_sock):
+                        self.passive_refresh()
+                if socket in socks:
+                    payload = self.serial.loads(socket.recv())
+                    self._handle_payload(payload)
+                    last = time.time()
+                if not socks:
                     self.passive_refresh()
-                    # Check the event system
-                    if epoller.poll(1):
+                    if reap_fd is None:
+                        multiprocessing.active_children()
+                if beat and time.time() >= next_beat:
+                    # Tell the master the minion is still connected, without
+                    # holding up the main loop long if the master is away
+                    self._fire_master(
+                            {},
+                            salt.utils.presence.HEARTBEAT_TAG,
+                            timeout=5)
+                    next_beat = time.time() + beat
+                if self.opts['sub_timeout'] and \
+                        time.time() - last > self.opts['sub_timeout']:
+                    # It has been a while since the last command, make sure
+                    # the connection is fresh by reconnecting
+                    if self.opts['dns_check']:
                         try:
-                            package = epull_sock.recv(zmq.NOBLOCK)
-                            epub_sock.send(package)
-                        except Exception:
+                            # Verify that the dns entry has not changed
+                            self.opts['master_ip'] = salt.utils.dns_check(
+                                self.opts['master'], safe=True)
+                        except SaltClientError:
+                            # Failed to update the dns, keep the old addr
                             pass
-                except Exception:
-                    log.critical(traceback.format_exc())
+                    poller.unregister(socket)
+                    socket.close()
+                    socket = self._sub_socket(context)
+                    poller.register(socket, zmq.POLLIN)
+                    last = time.time()
+            except Exception:
+                log.critical(traceback.format_exc())
+
+    def _sub_socket(self, context):
+        '''
+        Return a SUB socket connected to the master publisher
+        '''
+        socket = context.socket(zmq.SUB)
+        socket.setsockopt(zmq.SUBSCRIBE, '')
+        if self.opts['sub_timeout']:
+            socket.setsockopt(zmq.IDENTITY, self.opts['id'])
+        socket.connect(self.master_pub)
+        return socket
+
+    def _reap_pipe(self):
+        '''
+        Return the read end of a pipe which is written to whenever a child
+        process exits, so that the main loop wakes up to reap it. Returns
+        None when the jobs do not run in child processes or the platform
+        has no SIGCHLD.
+        '''
+        if not self.opts['multiprocessing'] or not hasattr(signal, 'SIGCHLD'):
+            return None
+        rfd, wfd = os.pipe()
+        for fd_ in (rfd, wfd):
+            flags = fcntl.fcntl(fd_, fcntl.F_GETFL)
+            fcntl.fcntl(fd_, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+        def sigchld(signum, frame):
+            try:
+                os.write(wfd, '.')
+            except OSError:
+                # The pipe is full, the loop is already due to wake up
+                pass
+        signal.signal(signal.SIGCHLD, sigchld)
+        # Restart the system calls the signal interrupts in the job threads
+        signal.siginterrupt(signal.SIGCHLD, False)
+        return rfd
+
+    def _forward_events(self, epull_sock, epub_sock):
+        '''
+        Publish the events waiting on the pull socket, returns True if one of
+        them asks the minion to refresh its modules
+        '''
+        refresh = False
+        while True:
+            try:
+                package = epull_sock.recv(zmq.NOBLOCK)
+            except zmq.ZMQError:
+                break
+            if package[:20].rstrip('|') == 'module_refresh':
+                refresh = True
+            try:
+                epub_sock.send(package)
+            except Exception:
+                pass
+        return refresh
 
 
 class Syndic(salt.client.LocalClient, Minion):
@@ -676,6 +874,9 @@ class Syndic(salt.client.LocalClient, Minion):
     def __init__(self, opts):
         self._syndic = True
         salt.client.LocalClient.__init__(self, opts['_master_conf_file'])
+        # The Minion init replaces the local master opts, keep the location
+        # of the local master event bus
+        self.local_sock_dir = self.opts['sock_dir']
         Minion.__init__(self, opts)
 
     def _handle_aes(self, load):
@@ -720,11 +921,29 @@ class Syndic(salt.client.LocalClient, Minion):
 
     def syndic_cmd(self, data):
         '''
-        Take the now clear load and forward it on to the client cmd
+        Take the now clear load and forward it on to the client cmd, the
+        returns are streamed back up to the master in batches as they arrive
+        on the event bus of the local master
         '''
         # Set up default tgt_type
         if 'tgt_type' not in data:
             data['tgt_type'] = 'glob'
+        # Listen for the returns before the publication goes out so that
+        # none of them are missed
+        event = salt.utils.event.MasterEvent(self.local_sock_dir)
+        event.connect_pub()
+        try:
+            self._forward_returns(data, event)
+        finally:
+            event.sub.close()
+            event.context.term()
+
+    def _forward_returns(self, data, event):
+        '''
+        Publish the job to the local master and forward the returns which
+        arrive on its event bus
+        '''
+        event.sub.setsockopt(zmq.SUBSCRIBE, data['jid'])
         # Send out the publication
         pub_data = self.pub(
                 data['tgt'],
@@ -735,16 +954,83 @@ class Syndic(salt.client.LocalClient, Minion):
                 data['jid'],
                 data['to']
                 )
-        # Gather the return data
-        ret = self.get_returns(
-                pub_data['jid'],
-                pub_data['minions'],
-                data['to']
-                )
-        ret['jid'] = data['jid']
-        ret['fun'] = data['fun']
-        # Return the publication data up the pipe
-        self._return_pub(ret, '_syndic_return')
+        if not pub_data:
+            return
+        minions = set(pub_data['minions'])
+        # Tell the master which minions to wait for
+        if minions:
+            self._return_batch(data, {}, minions)
+        found = set()
+        batch = {}
+        flush = None
+        start = time.time()
+        while True:
+            now = time.time()
+            if now > start + data['to']:
+                break
+            wait = start + data['to'] - now
+            if flush is not None:
+                wait = min(wait, flush - now)
+            raw = event.get_event(max(wait, 0), data['jid'])
+            if raw is not None:
+                if 'syndic' in raw:
+                    # A syndic below the local master has more minions
+                    new = set(raw['syndic']).difference(minions)
+                    if new:
+                        minions.update(new)
+                        self._return_batch(data, {}, new)
+                    continue
+                if 'id' not in raw or raw['id'] in found:
+                    continue
+                found.add(raw['id'])
+                # A chunked return is read from the job cache of the local
+                # master
+                batch[raw['id']] = self._event_return(data['jid'], raw)
+                if flush is None:
+                    flush = time.time() + self.opts['syndic_batch_wait']
+            done = len(found.intersection(minions)) >= len(minions)
+            if batch and (done
+                    or len(batch) >= self.opts['syndic_batch_size']
+                    or time.time() >= flush):
+                self._return_batch(data, batch)
+                batch = {}
+                flush = None
+            if done:
+                break
+        if batch:
+            self._return_batch(data, batch)
+
+    def _return_batch(self, data, batch, minions=None):
+        '''
+        Send a batch of returns for the job described in data up to the
+        master, minions is the list of minions the master should expect
+        returns from
+        '''
+        load = {'cmd': '_syndic_return',
+                'jid': data['jid'],
+                'id': self.opts['id'],
+                'return': batch,
+                'minions': list(minions or [])}
+        try:
+            if hasattr(self.functions[data['fun']], '__outputter__'):
+                oput = self.functions[data['fun']].__outputter__
+                if isinstance(oput, string_types):
+                    load['out'] = oput
+        except KeyError:
+            pass
+        log.debug(
+            'Forwarding {0} returns for job {1}'.format(len(batch), load['jid'])
+        )
+        sreq = salt.payload.SREQ(self.opts['master_uri'])
+        try:
+            ret_val = sreq.send('aes', self.crypticle.dumps(load))
+        except SaltReqTimeoutError:
+            ret_val = ''
+        if isinstance(ret_val, string_types) and not ret_val:
+            # The master AES key has changed, reauth
+            self.authenticate()
+            ret_val = sreq.send('aes', self.crypticle.dumps(load))
+        return ret_val
 
 
 class Matcher(object):
@@ -12,6 +12,18 @@ import salt.fileclient
 log = logging.getLogger(__name__)
 
 
+def _synced(path, env):
+    '''
+    Return the cache location and hash of a salt:// file which was brought
+    up to date by a cp.cache_dir earlier in the running state run, an empty
+    dict if the file is not known
+    '''
+    if not __context__.get('state.run') or not path.startswith('salt://'):
+        return {}
+    key = (env, os.path.normpath(path[7:]).strip('/'))
+    return __context__.get('cp.synced', {}).get(key, {})
+
+
 def recv(files, dest):
     '''
     Used with salt-cp, pass the files dict, and the destination.
@@ -108,6 +120,9 @@ def cache_file(path, env='base'):
 
         salt '*' cp.cache_file salt://path/to/file
     '''
+    synced = _synced(path, env)
+    if synced and os.path.isfile(synced['dest']):
+        return synced['dest']
     client = salt.fileclient.get_file_client(__opts__)
     return client.cache_file(path, env)
 
@@ -135,7 +150,13 @@ def cache_dir(path, env='base', include_empty=False):
         salt '*' cp.cache_dir salt://path/to/dir
     '''
     client = salt.fileclient.get_file_client(__opts__)
-    return client.cache_dir(path, env, include_empty)
+    ret = client.cache_dir(path, env, include_empty)
+    if __context__.get('state.run'):
+        # The states which manage the files one by one need not ask the
+        # master for them again
+        __context__.setdefault('cp.synced', {}).update(
+                getattr(client, 'synced', {}))
+    return ret
 
 
 def cache_master(env='base'):
@@ -247,5 +268,8 @@ def hash_file(path, env='base'):
 
         salt '*' cp.hash_file salt://path/to/file
     '''
+    synced = _synced(path, env)
+    if synced:
+        return {'hsum': synced['hsum'], 'hash_type': synced['hash_type']}
     client = salt.fileclient.get_file_client(__opts__)
     return client.hash_file(path, env)
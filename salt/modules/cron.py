@@ -179,21 +179,11 @@ def set_special(user, special, cmd):
     return 'new'
 
 
-def set_job(user, minute, hour, dom, month, dow, cmd):
+def _set_job_line(lst, minute, hour, dom, month, dow, cmd):
     '''
-    Sets a cron job up for a specified user.
-
-    CLI Example::
-
-        salt '*' cron.set_job root \* \* \* \* 1 /usr/local/weekly
+    Set up a cron job in a crontab structure returned by list_tab, returns
+    "present", "updated" or "new"
     '''
-    # Scrub the types
-    minute = str(minute)
-    hour = str(hour)
-    dom = str(dom)
-    month = str(month)
-    dow = str(dow)
-    lst = list_tab(user)
     for cron in lst['crons']:
         if cmd == cron['cmd']:
             if not minute == cron['min'] or \
@@ -201,12 +191,12 @@ def set_job(user, minute, hour, dom, month, dow, cmd):
                     not dom == cron['daymonth'] or \
                     not month == cron['month'] or \
                     not dow == cron['dayweek']:
-                rm_job(user, minute, hour, dom, month, dow, cmd)
-                jret = set_job(user, minute, hour, dom, month, dow, cmd)
-                if jret == 'new':
-                    return 'updated'
-                else:
-                    return jret
+                cron.update({'min': minute,
+                             'hour': hour,
+                             'daymonth': dom,
+                             'month': month,
+                             'dayweek': dow})
+                return 'updated'
             return 'present'
     cron = {'min': minute,
             'hour': hour,
@@ -215,20 +205,31 @@ def set_job(user, minute, hour, dom, month, dow, cmd):
             'dayweek': dow,
             'cmd': cmd}
     lst['crons'].append(cron)
-    comdat = _write_cron_lines(user, _render_tab(lst))
-    if comdat['retcode']:
-        # Failed to commit, return the error
-        return comdat['stderr']
     return 'new'
 
 
-def rm_job(user, minute, hour, dom, month, dow, cmd):
+def _rm_job_line(lst, cmd):
     '''
-    Remove a cron job for a specified user.
+    Remove a cron job from a crontab structure returned by list_tab, returns
+    "removed" or "absent"
+    '''
+    rm_ = None
+    for ind in range(len(lst['crons'])):
+        if cmd == lst['crons'][ind]['cmd']:
+            rm_ = ind
+    if rm_ is None:
+        return 'absent'
+    lst['crons'].pop(rm_)
+    return 'removed'
+
+
+def set_job(user, minute, hour, dom, month, dow, cmd):
+    '''
+    Sets a cron job up for a specified user.
 
     CLI Example::
 
-        salt '*' cron.rm_job root \* \* \* \* 1 /usr/local/weekly
+        salt '*' cron.set_job root \* \* \* \* 1 /usr/local/weekly
     '''
     # Scrub the types
     minute = str(minute)
@@ -237,20 +238,73 @@ def rm_job(user, minute, hour, dom, month, dow, cmd):
     month = str(month)
     dow = str(dow)
     lst = list_tab(user)
-    ret = 'absent'
-    rm_ = None
-    for ind in range(len(lst['crons'])):
-        if cmd == lst['crons'][ind]['cmd']:
-            rm_ = ind
-    if rm_ is not None:
-        lst['crons'].pop(rm_)
-        ret = 'removed'
+    ret = _set_job_line(lst, minute, hour, dom, month, dow, cmd)
+    if ret == 'present':
+        return ret
     comdat = _write_cron_lines(user, _render_tab(lst))
     if comdat['retcode']:
         # Failed to commit, return the error
         return comdat['stderr']
     return ret
 
+
+def rm_job(user, minute, hour, dom, month, dow, cmd):
+    '''
+    Remove a cron job for a specified user.
+
+    CLI Example::
+
+        salt '*' cron.rm_job root \* \* \* \* 1 /usr/local/weekly
+    '''
+    lst = list_tab(user)
+    ret = _rm_job_line(lst, cmd)
+    if ret == 'absent':
+        return ret
+    comdat = _write_cron_lines(user, _render_tab(lst))
+    if comdat['retcode']:
+        # Failed to commit, return the error
+        return comdat['stderr']
+    return ret
+
+
+def edit_jobs(user, present=None, absent=None):
+    '''
+    Set up and remove a number of cron jobs for a specified user with a
+    single read and write of the crontab. present is a list of dicts with
+    the cmd and the minute, hour, daymonth, month and dayweek of the jobs to
+    set up, absent is a list of the commands of the jobs to remove.
+
+    Returns a dict of the commands and the status set_job or rm_job returns
+    for them, if the crontab fails to be written the status of the jobs
+    which would have changed is the error.
+
+    CLI Example::
+
+        salt '*' cron.edit_jobs root absent='[/usr/local/weekly]'
+    '''
+    lst = list_tab(user)
+    ret = {}
+    for cmd in absent or []:
+        ret[cmd] = _rm_job_line(lst, cmd)
+    for job in present or []:
+        ret[job['cmd']] = _set_job_line(
+                lst,
+                str(job.get('minute', '*')),
+                str(job.get('hour', '*')),
+                str(job.get('daymonth', '*')),
+                str(job.get('month', '*')),
+                str(job.get('dayweek', '*')),
+                job['cmd'])
+    changed = [cmd for cmd in ret if ret[cmd] in ('new', 'updated', 'removed')]
+    if not changed:
+        return ret
+    comdat = _write_cron_lines(user, _render_tab(lst))
+    if comdat['retcode']:
+        # Failed to commit, every change gets the error
+        for cmd in changed:
+            ret[cmd] = comdat['stderr']
+    return ret
+
 rm = rm_job
 
 
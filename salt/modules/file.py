@@ -7,7 +7,6 @@ data
 # some time in the future
 
 # Import python libs
-from contextlib import nested  # For < 2.7 compat
 import os
 import re
 import time
@@ -17,7 +16,6 @@ import stat
 import sys
 import getpass
 import hashlib
-import difflib
 import fnmatch
 try:
     import grp
@@ -26,7 +24,9 @@ except ImportError:
     pass
 
 # Import salt libs
+import salt.utils.filediff
 import salt.utils.find
+import salt.utils.hashcache
 from salt.utils.filebuffer import BufferedReader
 from salt.exceptions import CommandExecutionError, SaltInvocationError
 from salt._compat import string_types, urlparse
@@ -57,15 +57,6 @@ def __clean_tmp(sfn):
             os.remove(sfn)
 
 
-def _is_bin(path):
-    '''
-    Return True if a file is a bin, just checks for NULL char, this should be
-    expanded to reflect how git checks for bins
-    '''
-    with open(path, 'rb') as f:
-        return '\0' in f.read(2048)
-
-
 def gid_to_group(gid):
     '''
     Convert the group id to the group name on this system
@@ -268,8 +259,7 @@ def get_sum(path, form='md5'):
     if not os.path.isfile(path):
         return 'File not found'
     try:
-        with open(path, 'rb') as f:
-            return getattr(hashlib, form)(f.read()).hexdigest()
+        return salt.utils.hashcache.get_hash(path, form, __opts__)
     except (IOError, OSError) as e:
         return 'File Error: {0}'.format(e)
     except AttributeError as e:
@@ -285,22 +275,16 @@ def get_hash(path, form='md5', chunk_size=4096):
     Get the hash sum of a file
 
     This is better than ``get_sum`` for the following reasons:
-        - It does not read the entire file into memory.
         - It does not return a string on error. The returned value of
             ``get_sum`` cannot really be trusted since it is vulnerable to
             collisions: ``get_sum(..., 'xyz') == 'Hash xyz not supported'``
+
+    Both read the file in chunks and reuse the hash from the minion hash
+    cache when the file did not change, chunk_size is no longer used.
     '''
-    try:
-        hash_type = getattr(hashlib, form)
-    except AttributeError:
+    if not hasattr(hashlib, form):
         raise ValueError('Invalid hash type: {0}'.format(form))
-    with open(path, 'rb') as f:
-        hash_obj = hash_type()
-        while True:
-            chunk = f.read(chunk_size)
-            if not chunk:
-                return hash_obj.hexdigest()
-            hash_obj.update(chunk)
+    return salt.utils.hashcache.get_hash(path, form, __opts__)
 
 
 def check_hash(path, hash):
@@ -954,9 +938,7 @@ def get_managed(
 
         if data['result']:
             sfn = data['data']
-            hsum = ''
-            with open(sfn, 'r') as source:
-                hsum = hashlib.md5(source.read()).hexdigest()
+            hsum = salt.utils.hashcache.get_hash(sfn, 'md5', __opts__)
             source_sum = {'hash_type': 'md5',
                           'hsum': hsum}
         else:
@@ -1093,6 +1075,7 @@ def check_managed(
         context,
         defaults,
         env,
+        show_diff=None,
         **kwargs):
     '''
     Check to see what changes need to be made for a file
@@ -1118,7 +1101,7 @@ def check_managed(
     if comment:
         return False, comment
     changes = check_file_meta(name, sfn, source, source_sum, user,
-                              group, mode, env)
+                              group, mode, env, show_diff)
     if changes:
         comment = 'The following values are set to be changed:\n'
         for key, val in changes.items():
@@ -1135,7 +1118,8 @@ def check_file_meta(
         user,
         group,
         mode,
-        env):
+        env,
+        show_diff=None):
     '''
     Check for the changes in the file metadata
     '''
@@ -1151,12 +1135,8 @@ def check_file_meta(
             if not sfn and source:
                 sfn = __salt__['cp.cache_file'](source, env)
             if sfn:
-                with nested(open(sfn, 'rb'), open(name, 'rb')) as (src, name_):
-                    slines = src.readlines()
-                    nlines = name_.readlines()
-                changes['diff'] = (
-                        ''.join(difflib.unified_diff(nlines, slines))
-                        )
+                changes['diff'] = salt.utils.filediff.file_diff(
+                        name, sfn, __opts__, show_diff)
             else:
                 changes['sum'] = 'Checksum differs'
     if not user is None and user != stats['user']:
@@ -1180,10 +1160,15 @@ def manage_file(name,
         group,
         mode,
         env,
-        backup):
+        backup,
+        show_diff=None):
     '''
     Checks the destination against what was retrieved with get_managed and
     makes the appropriate modifications (if necessary).
+
+    The diff of the changed contents is cut short or replaced with a summary
+    as set by the diff_max_bytes and diff_max_lines options, show_diff set to
+    False never shows the diff and set to True always shows all of it.
     '''
     if not ret:
         ret = {'name': name,
@@ -1194,10 +1179,8 @@ def manage_file(name,
     if os.path.isfile(name):
         # Only test the checksums on files with managed contents
         if source:
-            name_sum = ''
-            hash_func = getattr(hashlib, source_sum['hash_type'])
-            with open(name, 'rb') as namefile:
-                name_sum = hash_func(namefile.read()).hexdigest()
+            name_sum = salt.utils.hashcache.get_hash(
+                    name, source_sum['hash_type'], __opts__)
 
         # Check if file needs to be replaced
         if source and source_sum['hsum'] != name_sum:
@@ -1209,8 +1192,8 @@ def manage_file(name,
             # If the downloaded file came from a non salt server source verify
             # that it matches the intended sum value
             if urlparse(source).scheme != 'salt':
-                with open(sfn, 'rb') as dlfile:
-                    dl_sum = hash_func(dlfile.read()).hexdigest()
+                dl_sum = salt.utils.hashcache.get_hash(
+                        sfn, source_sum['hash_type'], __opts__)
                 if dl_sum != source_sum['hsum']:
                     ret['comment'] = ('File sum set for file {0} of {1} does '
                                       'not match real sum of {2}'
@@ -1222,17 +1205,10 @@ def manage_file(name,
                     ret['result'] = False
                     return ret
 
-            # Check to see if the files are bins
-            if _is_bin(sfn) or _is_bin(name):
-                ret['changes']['diff'] = 'Replace binary file'
-            else:
-                with nested(open(sfn, 'rb'), open(name, 'rb')) as (src, name_):
-                    slines = src.readlines()
-                    nlines = name_.readlines()
-                # Print a diff equivalent to diff -u old new
-                    ret['changes']['diff'] = (''.join(difflib
-                                                      .unified_diff(nlines,
-                                                                    slines)))
+            # Print a diff equivalent to diff -u old new, or a summary of
+            # the change for binary and large files
+            ret['changes']['diff'] = salt.utils.filediff.file_diff(
+                    name, sfn, __opts__, show_diff)
             # Pre requisites are met, and the file needs to be replaced, do it
             try:
                 salt.utils.copyfile(
@@ -1267,9 +1243,8 @@ def manage_file(name,
             # If the downloaded file came from a non salt server source verify
             # that it matches the intended sum value
             if urlparse(source).scheme != 'salt':
-                hash_func = getattr(hashlib, source_sum['hash_type'])
-                with open(sfn, 'rb') as dlfile:
-                    dl_sum = hash_func(dlfile.read()).hexdigest()
+                dl_sum = salt.utils.hashcache.get_hash(
+                        sfn, source_sum['hash_type'], __opts__)
                 if dl_sum != source_sum['hsum']:
                     ret['comment'] = ('File sum set for file {0} of {1} does '
                                       'not match real sum of {2}'
@@ -1338,10 +1313,8 @@ def manage_file(name,
     if os.path.isfile(name):
         # Only test the checksums on files with managed contents
         if source:
-            name_sum = ''
-            hash_func = getattr(hashlib, source_sum['hash_type'])
-            with open(name, 'rb') as namefile:
-                name_sum = hash_func(namefile.read()).hexdigest()
+            name_sum = salt.utils.hashcache.get_hash(
+                    name, source_sum['hash_type'], __opts__)
 
         # Check if file needs to be replaced
         if source and source_sum['hsum'] != name_sum:
@@ -1353,8 +1326,8 @@ def manage_file(name,
             # If the downloaded file came from a non salt server source verify
             # that it matches the intended sum value
             if urlparse(source).scheme != 'salt':
-                with open(sfn, 'rb') as dlfile:
-                    dl_sum = hash_func(dlfile.read()).hexdigest()
+                dl_sum = salt.utils.hashcache.get_hash(
+                        sfn, source_sum['hash_type'], __opts__)
                 if dl_sum != source_sum['hsum']:
                     ret['comment'] = ('File sum set for file {0} of {1} does '
                                       'not match real sum of {2}'
@@ -1366,17 +1339,10 @@ def manage_file(name,
                     ret['result'] = False
                     return ret
 
-            # Check to see if the files are bins
-            if _is_bin(sfn) or _is_bin(name):
-                ret['changes']['diff'] = 'Replace binary file'
-            else:
-                with nested(open(sfn, 'rb'), open(name, 'rb')) as (src, name_):
-                    slines = src.readlines()
-                    nlines = name_.readlines()
-                # Print a diff equivalent to diff -u old new
-                    ret['changes']['diff'] = (''.join(difflib
-                                                      .unified_diff(nlines,
-                                                                    slines)))
+            # Print a diff equivalent to diff -u old new, or a summary of
+            # the change for binary and large files
+            ret['changes']['diff'] = salt.utils.filediff.file_diff(
+                    name, sfn, __opts__, show_diff)
             # Pre requisites are met, and the file needs to be replaced, do it
             try:
                 salt.utils.copyfile(
@@ -1411,9 +1377,8 @@ def manage_file(name,
             # If the downloaded file came from a non salt server source verify
             # that it matches the intended sum value
             if urlparse(source).scheme != 'salt':
-                hash_func = getattr(hashlib, source_sum['hash_type'])
-                with open(sfn, 'rb') as dlfile:
-                    dl_sum = hash_func(dlfile.read()).hexdigest()
+                dl_sum = salt.utils.hashcache.get_hash(
+                        sfn, source_sum['hash_type'], __opts__)
                 if dl_sum != source_sum['hsum']:
                     ret['comment'] = ('File sum set for file {0} of {1} does '
                                       'not match real sum of {2}'
@@ -6,6 +6,9 @@ try:
 except ImportError:
     pass
 
+# Import salt libs
+import salt.utils.inventory
+
 
 def __virtual__():
     '''
@@ -14,6 +17,15 @@ def __virtual__():
     return 'group' if __grains__['kernel'] == 'Linux' else False
 
 
+def _changed(name):
+    '''
+    Update the state run inventory after the named group changed
+    '''
+    inv = salt.utils.inventory.get(__context__)
+    if inv is not None:
+        inv.update_group(name)
+
+
 def add(name, gid=None, system=False):
     '''
     Add the specified group
@@ -30,6 +42,7 @@ def add(name, gid=None, system=False):
     cmd += name
 
     ret = __salt__['cmd.run_all'](cmd)
+    _changed(name)
 
     return not ret['retcode']
 
@@ -43,6 +56,7 @@ def delete(name):
         salt '*' group.delete foo
     '''
     ret = __salt__['cmd.run_all']('groupdel {0}'.format(name))
+    _changed(name)
 
     return not ret['retcode']
 
@@ -55,8 +69,14 @@ def info(name):
 
         salt '*' group.info foo
     '''
+    inv = salt.utils.inventory.get(__context__)
     try:
-        grinfo = grp.getgrnam(name)
+        if inv is None:
+            grinfo = grp.getgrnam(name)
+        else:
+            grinfo = inv.group(name)
+            if grinfo is None:
+                raise KeyError(name)
     except KeyError:
         return {}
     else:
@@ -75,7 +95,12 @@ def getent():
         salt '*' group.getent
     '''
     ret = []
-    for grinfo in grp.getgrall():
+    inv = salt.utils.inventory.get(__context__)
+    if inv is None:
+        groups = grp.getgrall()
+    else:
+        groups = inv.groups()
+    for grinfo in groups:
         ret.append(info(grinfo.gr_name))
     return ret
 
@@ -93,6 +118,7 @@ def chgid(name, gid):
         return True
     cmd = 'groupmod -g {0} {1}'.format(gid, name)
     __salt__['cmd.run'](cmd)
+    _changed(name)
     post_gid = __salt__['file.group_to_gid'](name)
     if post_gid != pre_gid:
         return post_gid == gid
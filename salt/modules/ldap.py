@@ -38,6 +38,7 @@ import time
 import logging
 
 # Import salt libs
+import salt.utils.connpool
 from salt.exceptions import CommandExecutionError, SaltInvocationError
 
 # Import third party libs
@@ -90,13 +91,20 @@ def _config(name, key=None, **kwargs):
 
 def _connect(**kwargs):
     '''
-    Instantiate LDAP Connection class and return an LDAP connection object
+    Return a bound LDAP connection object, the connection is taken from the
+    connection pool and goes back to it when it is closed
     '''
     connargs = {}
     for name in ['server', 'port', 'tls', 'binddn', 'bindpw']:
         connargs[name] = _config(name, **kwargs)
 
-    return _LDAPConnection(**connargs).LDAP
+    pool = salt.utils.connpool.get_pool(
+            'ldap',
+            __opts__,
+            close=lambda conn: conn.unbind_s())
+    return pool.acquire(
+            tuple(sorted(connargs.items())),
+            lambda: _LDAPConnection(**connargs).LDAP)
 
 
 def search(filter, dn=None, scope=None, attrs=None, **kwargs):
@@ -135,7 +143,17 @@ def search(filter, dn=None, scope=None, attrs=None, **kwargs):
     msg = 'Running LDAP search with filter:%s, dn:%s, scope:%s, attrs:%s' %\
         (filter, dn, scope, attrs)
     log.debug(msg)
-    results = _ldap.search_s(dn, int(scope), filter, attrs)
+    try:
+        results = _ldap.search_s(dn, int(scope), filter, attrs)
+    except ldap.SERVER_DOWN:
+        _ldap.discard()
+        if not _ldap.reused:
+            raise
+        # The pooled connection was closed by the server, connect again
+        _ldap = _connect(**kwargs)
+        results = _ldap.search_s(dn, int(scope), filter, attrs)
+    finally:
+        _ldap.close()
     elapsed = (time.time() - start)
     if elapsed < 0.200:
         elapsed_h = str(round(elapsed * 1000, 1)) + 'ms'
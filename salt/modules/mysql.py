@@ -26,6 +26,9 @@ import time
 import logging
 import re
 
+# Import salt libs
+import salt.utils.connpool
+
 # Import third party libs
 try:
     import MySQLdb
@@ -53,40 +56,52 @@ def __virtual__():
 
 def __check_table(name, table):
     db = connect()
-    cur = db.cursor(MySQLdb.cursors.DictCursor)
-    query = 'CHECK TABLE `{0}`.`{1}`'.format(name, table)
-    log.debug('Doing query: {0}'.format(query))
-    cur.execute(query)
-    results = cur.fetchall()
-    log.debug(results)
-    return results
+    try:
+        cur = db.cursor(MySQLdb.cursors.DictCursor)
+        query = 'CHECK TABLE `{0}`.`{1}`'.format(name, table)
+        log.debug('Doing query: {0}'.format(query))
+        cur.execute(query)
+        results = cur.fetchall()
+        log.debug(results)
+        return results
+    finally:
+        db.close()
 
 
 def __repair_table(name, table):
     db = connect()
-    cur = db.cursor(MySQLdb.cursors.DictCursor)
-    query = 'REPAIR TABLE `{0}`.`{1}`'.format(name, table)
-    log.debug('Doing query: {0}'.format(query))
-    cur.execute(query)
-    results = cur.fetchall()
-    log.debug(results)
-    return results
+    try:
+        cur = db.cursor(MySQLdb.cursors.DictCursor)
+        query = 'REPAIR TABLE `{0}`.`{1}`'.format(name, table)
+        log.debug('Doing query: {0}'.format(query))
+        cur.execute(query)
+        results = cur.fetchall()
+        log.debug(results)
+        return results
+    finally:
+        db.close()
 
 
 def __optimize_table(name, table):
     db = connect()
-    cur = db.cursor(MySQLdb.cursors.DictCursor)
-    query = 'OPTIMIZE TABLE `{0}`.`{1}`'.format(name, table)
-    log.debug('Doing query: {0}'.format(query))
-    cur.execute(query)
-    results = cur.fetchall()
-    log.debug(results)
-    return results
+    try:
+        cur = db.cursor(MySQLdb.cursors.DictCursor)
+        query = 'OPTIMIZE TABLE `{0}`.`{1}`'.format(name, table)
+        log.debug('Doing query: {0}'.format(query))
+        cur.execute(query)
+        results = cur.fetchall()
+        log.debug(results)
+        return results
+    finally:
+        db.close()
 
 
 def connect(**kwargs):
     '''
-    wrap authentication credentials here
+    wrap authentication credentials here, the connection is taken from the
+    minion's connection pool and goes back to it when it is closed, the
+    callers close it when they are done. Pass pooled=False for a connection
+    of its own, which is not shared with later calls.
     '''
     connargs = dict()
 
@@ -112,9 +127,18 @@ def connect(**kwargs):
     _connarg('db')
     _connarg('default_file', 'read_default_file')
 
-    db = MySQLdb.connect(**connargs)
-    db.autocommit(True)
-    return db
+    def _create():
+        db = MySQLdb.connect(**connargs)
+        db.autocommit(True)
+        return db
+
+    if not kwargs.get('pooled', True):
+        return _create()
+    pool = salt.utils.connpool.get_pool(
+            'mysql',
+            __opts__,
+            check=lambda db: db.ping())
+    return pool.acquire(tuple(sorted(connargs.items())), _create)
 
 
 def query(database, query):
@@ -153,13 +177,19 @@ def query(database, query):
     #Doesn't do anything about sql warnings, e.g. empty values on an insert.
     #I don't think it handles multiple queries at once, so adding "commit" might not work.
     ret = {}
-    db = connect(**{'db': database})
-    cur = db.cursor()
-    start = time.time()
-    affected = cur.execute(query)
-    log.debug('Using db: ' + database + ' to run query: ' + query)
-    results = cur.fetchall()
-    elapsed = (time.time() - start)
+    # An arbitrary query can change the state of its session, with USE, SET
+    # SESSION, LOCK TABLES, temporary tables or an open transaction, so it
+    # does not run on a pooled connection
+    db = connect(**{'db': database, 'pooled': False})
+    try:
+        cur = db.cursor()
+        start = time.time()
+        affected = cur.execute(query)
+        log.debug('Using db: ' + database + ' to run query: ' + query)
+        results = cur.fetchall()
+        elapsed = (time.time() - start)
+    finally:
+        db.close()
     if elapsed < 0.200:
         elapsed_h = str(round(elapsed * 1000, 1)) + 'ms'
     else:
@@ -189,12 +219,15 @@ def status():
     '''
     ret = {}
     db = connect()
-    cur = db.cursor()
-    cur.execute('SHOW STATUS')
-    for i in range(cur.rowcount):
-        row = cur.fetchone()
-        ret[row[0]] = row[1]
-    return ret
+    try:
+        cur = db.cursor()
+        cur.execute('SHOW STATUS')
+        for i in range(cur.rowcount):
+            row = cur.fetchone()
+            ret[row[0]] = row[1]
+        return ret
+    finally:
+        db.close()
 
 
 def version():
@@ -207,10 +240,13 @@ def version():
         salt '*' mysql.version
     '''
     db = connect()
-    cur = db.cursor()
-    cur.execute('SELECT VERSION()')
-    row = cur.fetchone()
-    return row
+    try:
+        cur = db.cursor()
+        cur.execute('SELECT VERSION()')
+        row = cur.fetchone()
+        return row
+    finally:
+        db.close()
 
 
 def slave_lag():
@@ -225,21 +261,24 @@ def slave_lag():
         salt '*' mysql.slave_lag
     '''
     db = connect()
-    cur = db.cursor(MySQLdb.cursors.DictCursor)
-    cur.execute('show slave status')
-    results = cur.fetchone()
-    if cur.rowcount == 0:
-        # Server is not a slave if master is not defined.  Return empty tuple
-        # in this case.  Could probably check to see if Slave_IO_Running and
-        # Slave_SQL_Running are both set to 'Yes' as well to be really really
-        # sure that it is a slave.
-        return -1
-    else:
-        if results['Slave_IO_Running'] == 'Yes':
-            return results['Seconds_Behind_Master']
+    try:
+        cur = db.cursor(MySQLdb.cursors.DictCursor)
+        cur.execute('show slave status')
+        results = cur.fetchone()
+        if cur.rowcount == 0:
+            # Server is not a slave if master is not defined.  Return empty
+            # tuple in this case.  Could probably check to see if
+            # Slave_IO_Running and Slave_SQL_Running are both set to 'Yes' as
+            # well to be really really sure that it is a slave.
+            return -1
         else:
-            # Replication is broken if you get here.
-            return -2
+            if results['Slave_IO_Running'] == 'Yes':
+                return results['Seconds_Behind_Master']
+            else:
+                # Replication is broken if you get here.
+                return -2
+    finally:
+        db.close()
 
 
 def free_slave():
@@ -247,34 +286,39 @@ def free_slave():
     Frees a slave from its master.  This is a WIP, do not use.
     '''
     slave_db = connect()
-    slave_cur = slave_db.cursor(MySQLdb.cursors.DictCursor)
-    slave_cur.execute("show slave status")
-    slave_status = slave_cur.fetchone()
-    master = {'host': slave_status['Master_Host']}
-
     try:
-        # Try to connect to the master and flush logs before promoting to
-        # master.  This may fail if the master is no longer available.
-        # I am also assuming that the admin password is the same on both
-        # servers here, and only overriding the host option in the connect
-        # function.
-        master_db = connect(**master)
-        master_cur = master_db.cursor()
-        master_cur.execute("flush logs")
-        master_db.close()
-    except MySQLdb.OperationalError:
-        pass
-
-    slave_cur.execute("stop slave")
-    slave_cur.execute("reset master")
-    slave_cur.execute("change master to MASTER_HOST=''")
-    slave_cur.execute("show slave status")
-    results = slave_cur.fetchone()
-
-    if results is None:
-        return 'promoted'
-    else:
-        return 'failed'
+        slave_cur = slave_db.cursor(MySQLdb.cursors.DictCursor)
+        slave_cur.execute("show slave status")
+        slave_status = slave_cur.fetchone()
+        master = {'host': slave_status['Master_Host']}
+
+        try:
+            # Try to connect to the master and flush logs before promoting to
+            # master.  This may fail if the master is no longer available.
+            # I am also assuming that the admin password is the same on both
+            # servers here, and only overriding the host option in the connect
+            # function.
+            master_db = connect(**master)
+            try:
+                master_cur = master_db.cursor()
+                master_cur.execute("flush logs")
+            finally:
+                master_db.close()
+        except MySQLdb.OperationalError:
+            pass
+
+        slave_cur.execute("stop slave")
+        slave_cur.execute("reset master")
+        slave_cur.execute("change master to MASTER_HOST=''")
+        slave_cur.execute("show slave status")
+        results = slave_cur.fetchone()
+
+        if results is None:
+            return 'promoted'
+        else:
+            return 'failed'
+    finally:
+        slave_db.close()
 
 
 #Database related actions
@@ -289,14 +333,17 @@ def db_list():
     '''
     ret = []
     db = connect()
-    cur = db.cursor()
-    cur.execute('SHOW DATABASES')
-    results = cur.fetchall()
-    for dbs in results:
-        ret.append(dbs[0])
+    try:
+        cur = db.cursor()
+        cur.execute('SHOW DATABASES')
+        results = cur.fetchall()
+        for dbs in results:
+            ret.append(dbs[0])
 
-    log.debug(ret)
-    return ret
+        log.debug(ret)
+        return ret
+    finally:
+        db.close()
 
 
 def db_tables(name):
@@ -313,16 +360,19 @@ def db_tables(name):
 
     ret = []
     db = connect()
-    cur = db.cursor()
-    query = 'SHOW TABLES IN {0}'.format(name)
-    log.debug('Doing query: {0}'.format(query))
-
-    cur.execute(query)
-    results = cur.fetchall()
-    for table in results:
-        ret.append(table[0])
-    log.debug(ret)
-    return ret
+    try:
+        cur = db.cursor()
+        query = 'SHOW TABLES IN {0}'.format(name)
+        log.debug('Doing query: {0}'.format(query))
+
+        cur.execute(query)
+        results = cur.fetchall()
+        for table in results:
+            ret.append(table[0])
+        log.debug(ret)
+        return ret
+    finally:
+        db.close()
 
 
 def db_exists(name):
@@ -334,12 +384,15 @@ def db_exists(name):
         salt '*' mysql.db_exists 'dbname'
     '''
     db = connect()
-    cur = db.cursor()
-    query = 'SHOW DATABASES LIKE \'{0}\''.format(name)
-    log.debug('Doing query: {0}'.format(query))
-    cur.execute(query)
-    cur.fetchall()
-    return cur.rowcount == 1
+    try:
+        cur = db.cursor()
+        query = 'SHOW DATABASES LIKE \'{0}\''.format(name)
+        log.debug('Doing query: {0}'.format(query))
+        cur.execute(query)
+        cur.fetchall()
+        return cur.rowcount == 1
+    finally:
+        db.close()
 
 
 def db_create(name):
@@ -357,13 +410,16 @@ def db_create(name):
 
     # db doesnt exist, proceed
     db = connect()
-    cur = db.cursor()
-    query = 'CREATE DATABASE `{0}`;'.format(name)
-    log.debug('Query: {0}'.format(query))
-    if cur.execute(query):
-        log.info('DB \'{0}\' created'.format(name))
-        return True
-    return False
+    try:
+        cur = db.cursor()
+        query = 'CREATE DATABASE `{0}`;'.format(name)
+        log.debug('Query: {0}'.format(query))
+        if cur.execute(query):
+            log.info('DB \'{0}\' created'.format(name))
+            return True
+        return False
+    finally:
+        db.close()
 
 
 def db_remove(name):
@@ -385,17 +441,20 @@ def db_remove(name):
 
     # db doesnt exist, proceed
     db = connect()
-    cur = db.cursor()
-    query = 'DROP DATABASE `{0}`;'.format(name)
-    log.debug('Doing query: {0}'.format(query))
-    cur.execute(query)
+    try:
+        cur = db.cursor()
+        query = 'DROP DATABASE `{0}`;'.format(name)
+        log.debug('Doing query: {0}'.format(query))
+        cur.execute(query)
 
-    if not db_exists(name):
-        log.info('Database \'{0}\' has been removed'.format(name))
-        return True
+        if not db_exists(name):
+            log.info('Database \'{0}\' has been removed'.format(name))
+            return True
 
-    log.info('Database \'{0}\' has not been removed'.format(name))
-    return False
+        log.info('Database \'{0}\' has not been removed'.format(name))
+        return False
+    finally:
+        db.close()
 
 
 # User related actions
@@ -408,11 +467,14 @@ def user_list():
         salt '*' mysql.user_list
     '''
     db = connect()
-    cur = db.cursor(MySQLdb.cursors.DictCursor)
-    cur.execute('SELECT User,Host FROM mysql.user')
-    results = cur.fetchall()
-    log.debug(results)
-    return results
+    try:
+        cur = db.cursor(MySQLdb.cursors.DictCursor)
+        cur.execute('SELECT User,Host FROM mysql.user')
+        results = cur.fetchall()
+        log.debug(results)
+        return results
+    finally:
+        db.close()
 
 
 def user_exists(user, host='localhost'):
@@ -424,12 +486,15 @@ def user_exists(user, host='localhost'):
         salt '*' mysql.user_exists 'username' 'hostname'
     '''
     db = connect()
-    cur = db.cursor()
-    query = ('SELECT User,Host FROM mysql.user WHERE User = \'{0}\' AND '
-             'Host = \'{1}\''.format(user, host))
-    log.debug('Doing query: {0}'.format(query))
-    cur.execute(query)
-    return cur.rowcount == 1
+    try:
+        cur = db.cursor()
+        query = ('SELECT User,Host FROM mysql.user WHERE User = \'{0}\' AND '
+                 'Host = \'{1}\''.format(user, host))
+        log.debug('Doing query: {0}'.format(query))
+        cur.execute(query)
+        return cur.rowcount == 1
+    finally:
+        db.close()
 
 
 def user_info(user, host='localhost'):
@@ -441,14 +506,17 @@ def user_info(user, host='localhost'):
         salt '*' mysql.user_info root localhost
     '''
     db = connect()
-    cur = db.cursor(MySQLdb.cursors.DictCursor)
-    query = ('SELECT * FROM mysql.user WHERE User = \'{0}\' AND '
-             'Host = \'{1}\''.format(user, host))
-    log.debug('Query: {0}'.format(query))
-    cur.execute(query)
-    result = cur.fetchone()
-    log.debug(result)
-    return result
+    try:
+        cur = db.cursor(MySQLdb.cursors.DictCursor)
+        query = ('SELECT * FROM mysql.user WHERE User = \'{0}\' AND '
+                 'Host = \'{1}\''.format(user, host))
+        log.debug('Query: {0}'.format(query))
+        cur.execute(query)
+        result = cur.fetchone()
+        log.debug(result)
+        return result
+    finally:
+        db.close()
 
 
 def user_create(user,
@@ -469,22 +537,27 @@ def user_create(user,
         return False
 
     db = connect()
-    cur = db.cursor()
-    query = 'CREATE USER \'{0}\'@\'{1}\''.format(user, host)
-    if password is not None:
-        query = query + ' IDENTIFIED BY \'{0}\''.format(password)
-    elif password_hash is not None:
-        query = query + ' IDENTIFIED BY PASSWORD \'{0}\''.format(password_hash)
-
-    log.debug('Query: {0}'.format(query))
-    cur.execute(query)
-
-    if user_exists(user, host):
-        log.info('User \'{0}\'@\'{1}\' has been created'.format(user, host))
-        return True
-
-    log.info('User \'{0}\'@\'{1}\' is not created'.format(user, host))
-    return False
+    try:
+        cur = db.cursor()
+        query = 'CREATE USER \'{0}\'@\'{1}\''.format(user, host)
+        if password is not None:
+            query = query + ' IDENTIFIED BY \'{0}\''.format(password)
+        elif password_hash is not None:
+            query = query + ' IDENTIFIED BY PASSWORD \'{0}\''.format(
+                    password_hash)
+
+        log.debug('Query: {0}'.format(query))
+        cur.execute(query)
+
+        if user_exists(user, host):
+            log.info('User \'{0}\'@\'{1}\' has been created'.format(
+                user, host))
+            return True
+
+        log.info('User \'{0}\'@\'{1}\' is not created'.format(user, host))
+        return False
+    finally:
+        db.close()
 
 
 def user_chpass(user,
@@ -509,23 +582,27 @@ def user_chpass(user,
         password_sql = '"{0}"'.format(password_hash)
 
     db = connect()
-    cur = db.cursor()
-    query = ('UPDATE mysql.user SET password={0} WHERE User=\'{1}\' AND '
-             'Host = \'{2}\';'.format(password_sql, user, host))
-    log.debug('Query: {0}'.format(query))
-    if cur.execute(query):
-        cur.execute('FLUSH PRIVILEGES;')
-        log.info(
-            'Password for user \'{0}\'@\'{1}\' has been changed'.format(
-                user, host
+    try:
+        cur = db.cursor()
+        query = ('UPDATE mysql.user SET password={0} WHERE User=\'{1}\' AND '
+                 'Host = \'{2}\';'.format(password_sql, user, host))
+        log.debug('Query: {0}'.format(query))
+        if cur.execute(query):
+            cur.execute('FLUSH PRIVILEGES;')
+            log.info(
+                'Password for user \'{0}\'@\'{1}\' has been changed'.format(
+                    user, host
+                )
             )
-        )
-        return True
+            return True
 
-    log.info(
-        'Password for user \'{0}\'@\'{1}\' is not changed'.format(user, host)
-    )
-    return False
+        log.info(
+            'Password for user \'{0}\'@\'{1}\' is not changed'.format(
+                user, host)
+        )
+        return False
+    finally:
+        db.close()
 
 
 def user_remove(user,
@@ -538,16 +615,21 @@ def user_remove(user,
         salt '*' mysql.user_remove frank localhost
     '''
     db = connect()
-    cur = db.cursor()
-    query = 'DROP USER \'{0}\'@\'{1}\''.format(user, host)
-    log.debug('Query: {0}'.format(query))
-    cur.execute(query)
-    if not user_exists(user, host):
-        log.info('User \'{0}\'@\'{1}\' has been removed'.format(user, host))
-        return True
-
-    log.info('User \'{0}\'@\'{1}\' has NOT been removed'.format(user, host))
-    return False
+    try:
+        cur = db.cursor()
+        query = 'DROP USER \'{0}\'@\'{1}\''.format(user, host)
+        log.debug('Query: {0}'.format(query))
+        cur.execute(query)
+        if not user_exists(user, host):
+            log.info('User \'{0}\'@\'{1}\' has been removed'.format(
+                user, host))
+            return True
+
+        log.info('User \'{0}\'@\'{1}\' has NOT been removed'.format(
+            user, host))
+        return False
+    finally:
+        db.close()
 
 
 # Maintenance
@@ -674,16 +756,19 @@ def user_grants(user,
 
     ret = []
     db = connect()
-    cur = db.cursor()
-    query = 'SHOW GRANTS FOR \'{0}\'@\'{1}\''.format(user, host)
-    log.debug('Doing query: {0}'.format(query))
-
-    cur.execute(query)
-    results = cur.fetchall()
-    for grant in results:
-        ret.append(grant[0].split(' IDENTIFIED BY')[0])
-    log.debug(ret)
-    return ret
+    try:
+        cur = db.cursor()
+        query = 'SHOW GRANTS FOR \'{0}\'@\'{1}\''.format(user, host)
+        log.debug('Doing query: {0}'.format(query))
+
+        cur.execute(query)
+        results = cur.fetchall()
+        for grant in results:
+            ret.append(grant[0].split(' IDENTIFIED BY')[0])
+        log.debug(ret)
+        return ret
+    finally:
+        db.close()
 
 
 def grant_exists(grant,
@@ -725,25 +810,31 @@ def grant_add(grant,
     '''
     # todo: validate grant
     db = connect()
-    cur = db.cursor()
+    try:
+        cur = db.cursor()
+
+        query = __grant_generate(
+                grant, database, user, host, grant_option, escape)
+        log.debug('Query: {0}'.format(query))
+        cur.execute(query)
+        if grant_exists(grant, database, user, host, grant_option, escape):
+            log.info(
+                'Grant \'{0}\' on \'{1}\' for user \'{2}\' '
+                'has been added'.format(
+                    grant, database, user
+                )
+            )
+            return True
 
-    query = __grant_generate(grant, database, user, host, grant_option, escape)
-    log.debug('Query: {0}'.format(query))
-    cur.execute(query)
-    if grant_exists(grant, database, user, host, grant_option, escape):
         log.info(
-            'Grant \'{0}\' on \'{1}\' for user \'{2}\' has been added'.format(
+            'Grant \'{0}\' on \'{1}\' for user \'{2}\' '
+            'has NOT been added'.format(
                 grant, database, user
             )
         )
-        return True
-
-    log.info(
-        'Grant \'{0}\' on \'{1}\' for user \'{2}\' has NOT been added'.format(
-            grant, database, user
-        )
-    )
-    return False
+        return False
+    finally:
+        db.close()
 
 
 def grant_revoke(grant,
@@ -761,24 +852,27 @@ def grant_revoke(grant,
     '''
     # todo: validate grant
     db = connect()
-    cur = db.cursor()
+    try:
+        cur = db.cursor()
+
+        if grant_option:
+            grant += ', GRANT OPTION'
+        query = 'REVOKE {0} ON {1} FROM \'{2}\'@\'{3}\';'.format(
+            grant, database, user, host
+        )
+        log.debug('Query: {0}'.format(query))
+        cur.execute(query)
+        if not grant_exists(grant, database, user, host, grant_option, escape):
+            log.info(
+                'Grant \'{0}\' on \'{1}\' for user \'{2}\' has been '
+                'revoked'.format(grant, database, user)
+            )
+            return True
 
-    if grant_option:
-        grant += ', GRANT OPTION'
-    query = 'REVOKE {0} ON {1} FROM \'{2}\'@\'{3}\';'.format(
-        grant, database, user, host
-    )
-    log.debug('Query: {0}'.format(query))
-    cur.execute(query)
-    if not grant_exists(grant, database, user, host, grant_option, escape):
         log.info(
-            'Grant \'{0}\' on \'{1}\' for user \'{2}\' has been '
+            'Grant \'{0}\' on \'{1}\' for user \'{2}\' has NOT been '
             'revoked'.format(grant, database, user)
         )
-        return True
-
-    log.info(
-        'Grant \'{0}\' on \'{1}\' for user \'{2}\' has NOT been '
-        'revoked'.format(grant, database, user)
-    )
-    return False
+        return False
+    finally:
+        db.close()
@@ -84,6 +84,25 @@ def _psql_cmd(*args, **kwargs):
     return cmdstr
 
 
+def _list_cache():
+    '''
+    Return the dict which caches the database and user lists for the length
+    of a state run, None outside of a state run
+    '''
+    if not __context__.get('state.run'):
+        return None
+    return __context__.setdefault('postgres.lists', {})
+
+
+def _psql_change(cmd, runas=None):
+    '''
+    Run a psql command which changes the databases or users, the cached lists
+    are dropped
+    '''
+    __context__.pop('postgres.lists', None)
+    return __salt__['cmd.run'](cmd, runas=runas)
+
+
 '''
 Database related actions
 '''
@@ -100,6 +119,11 @@ def db_list(user=None, host=None, port=None, runas=None):
     '''
     (user, host, port) = _connection_defaults(user, host, port)
 
+    cache = _list_cache()
+    key = ('db', user, host, port, runas)
+    if cache is not None and key in cache:
+        return cache[key]
+
     ret = []
     cmd = _psql_cmd('-l', user=user, host=host, port=port)
     cmdret = __salt__['cmd.run'](cmd, runas=runas)
@@ -110,6 +134,8 @@ def db_list(user=None, host=None, port=None, runas=None):
         if not line[0] == "":
             ret.append(list(zip(header[:-1], line[:-1])))
 
+    if cache is not None:
+        cache[key] = ret
     return ret
 
 
@@ -189,7 +215,7 @@ def db_create(name,
 
     # Execute the command
     cmd = _psql_cmd('-c', query, user=user, host=host, port=port)
-    __salt__['cmd.run'](cmd, runas=runas)
+    _psql_change(cmd, runas)
 
     # Check the result
     if db_exists(name, user, host, port, runas=runas):
@@ -217,7 +243,7 @@ def db_remove(name, user=None, host=None, port=None, runas=None):
     # db doesnt exist, proceed
     query = 'DROP DATABASE {0}'.format(name)
     cmd = _psql_cmd('-c', query, user=user, host=host, port=port)
-    __salt__['cmd.run'](cmd, runas=runas)
+    _psql_change(cmd, runas)
     if not db_exists(name, user, host, port, runas=runas):
         return True
     else:
@@ -238,6 +264,11 @@ def user_list(user=None, host=None, port=None, runas=None):
     '''
     (user, host, port) = _connection_defaults(user, host, port)
 
+    cache = _list_cache()
+    key = ('user', user, host, port, runas)
+    if cache is not None and key in cache:
+        return cache[key]
+
     ret = []
     query = (
         '''SELECT rolname, rolsuper, rolinherit, rolcreaterole, rolcreatedb,
@@ -256,6 +287,8 @@ def user_list(user=None, host=None, port=None, runas=None):
         if not line[0] == "":
             ret.append(list(zip(header[:-1], line[:-1])))
 
+    if cache is not None:
+        cache[key] = ret
     return ret
 
 def user_exists(name, user=None, host=None, port=None, runas=None):
@@ -268,6 +301,11 @@ def user_exists(name, user=None, host=None, port=None, runas=None):
     '''
     (user, host, port) = _connection_defaults(user, host, port)
 
+    if _list_cache() is not None:
+        # During a state run the users are listed once
+        users = user_list(user=user, host=host, port=port, runas=runas)
+        return name in [dict(row).get('rolname') for row in users]
+
     query = (
         "SELECT true "
         "FROM pg_roles "
@@ -322,7 +360,7 @@ def user_create(username,
         sub_cmd = sub_cmd.replace(" WITH", "")
 
     cmd = _psql_cmd('-c', sub_cmd, host=host, user=user, port=port)
-    return __salt__['cmd.run'](cmd, runas=runas)
+    return _psql_change(cmd, runas)
 
 def user_update(username,
                 user=None,
@@ -361,7 +399,7 @@ def user_update(username,
         sub_cmd = sub_cmd.replace(" WITH", "")
 
     cmd = _psql_cmd('-c', sub_cmd, host=host, user=user, port=port)
-    return __salt__['cmd.run'](cmd, runas=runas)
+    return _psql_change(cmd, runas)
 
 def user_remove(username, user=None, host=None, port=None, runas=None):
     '''
@@ -381,7 +419,7 @@ def user_remove(username, user=None, host=None, port=None, runas=None):
     # user exists, proceed
     sub_cmd = 'DROP USER {0}'.format(username)
     cmd = _psql_cmd('-c', sub_cmd, host=host, user=user, port=port)
-    __salt__['cmd.run'](cmd, runas=runas)
+    _psql_change(cmd, runas)
     if not user_exists(username, user, host, port, runas=runas):
         return True
     else:
@@ -5,7 +5,6 @@ used to manage minion modules as well as automate updates to the salt minion
 
 # Import Python libs
 import os
-import hashlib
 import shutil
 import signal
 import logging
@@ -14,6 +13,9 @@ import sys
 # Import Salt libs
 import salt.payload
 import salt.state
+import salt.fileclient
+import salt.utils.event
+import salt.utils.hashcache
 from salt._compat import string_types
 
 # Import esky for update functionality
@@ -50,7 +52,11 @@ def _sync(form, env=None):
         log.info('Syncing {0} for environment \'{1}\''.format(form, sub_env))
         cache = []
         log.info('Loading cache from {0}, for {1})'.format(source, sub_env))
-        cache.extend(__salt__['cp.cache_dir'](source, sub_env))
+        client = salt.fileclient.get_file_client(__opts__)
+        cache.extend(client.cache_dir(source, sub_env))
+        # The hashes of the files brought up to date from the manifest of
+        # the master, the cached copies need not be read again
+        synced = getattr(client, 'synced', {})
         local_cache_dir=os.path.join(
                 __opts__['cachedir'],
                 'files',
@@ -77,8 +83,17 @@ def _sync(form, env=None):
             log.info('Copying \'{0}\' to \'{1}\''.format(fn_, dest))
             if os.path.isfile(dest):
                 # The file is present, if the sum differs replace it
-                srch = hashlib.md5(open(fn_, 'r').read()).hexdigest()
-                dsth = hashlib.md5(open(dest, 'r').read()).hexdigest()
+                known = synced.get(
+                        (sub_env, '_{0}/{1}'.format(form, relpath)))
+                if known:
+                    srch = known['hsum']
+                    dsth = salt.utils.hashcache.get_hash(
+                            dest, known['hash_type'], __opts__)
+                else:
+                    srch = salt.utils.hashcache.get_hash(
+                            fn_, 'md5', __opts__)
+                    dsth = salt.utils.hashcache.get_hash(
+                            dest, 'md5', __opts__)
                 if srch != dsth:
                     # The downloaded file differes, replace!
                     shutil.copyfile(fn_, dest)
@@ -108,9 +123,7 @@ def _sync(form, env=None):
                 os.rmdir(emptydir)
     #dest mod_dir is touched? trigger reload if requested
     if touched:
-        mod_file = os.path.join(__opts__['cachedir'], 'module_refresh')
-        with open(mod_file, 'a+') as f:
-            f.write('')
+        salt.utils.event.minion_refresh(__opts__)
     return ret
 
 def _listdir_recursively(rootdir):
@@ -265,10 +278,8 @@ def refresh_pillar():
 
         salt '*' saltutil.refresh_pillar
     '''
-    mod_file = os.path.join(__opts__['cachedir'], 'module_refresh')
     try:
-        with open(mod_file, 'a+') as f:
-            f.write('pillar')
+        salt.utils.event.minion_refresh(__opts__, pillar=True)
         return True
     except IOError:
         return False
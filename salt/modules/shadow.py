@@ -8,6 +8,9 @@ try:
 except ImportError:
     pass
 
+# Import salt libs
+import salt.utils.inventory
+
 def __virtual__():
     '''
     Only work on posix-like systems
@@ -19,6 +22,15 @@ def __virtual__():
     return 'shadow'
 
 
+def _changed(name):
+    '''
+    Update the state run inventory after the named user changed
+    '''
+    inv = salt.utils.inventory.get(__context__)
+    if inv is not None:
+        inv.update_user(name)
+
+
 def info(name):
     '''
     Return information for the specified user
@@ -27,8 +39,14 @@ def info(name):
 
         salt '*' shadow.info root
     '''
+    inv = salt.utils.inventory.get(__context__)
     try:
-        data = spwd.getspnam(name)
+        if inv is None:
+            data = spwd.getspnam(name)
+        else:
+            data = inv.shadow(name)
+            if data is None:
+                raise KeyError(name)
         ret = {
             'name': data.sp_nam,
             'pwd': data.sp_pwd,
@@ -63,6 +81,7 @@ def set_inactdays(name, inactdays):
         return True
     cmd = 'chage -I {0} {1}'.format(inactdays, name)
     __salt__['cmd.run'](cmd)
+    _changed(name)
     post_info = info(name)
     if post_info['inact'] != pre_info['inact']:
         return post_info['inact'] == inactdays
@@ -80,6 +99,7 @@ def set_maxdays(name, maxdays):
         return True
     cmd = 'chage -M {0} {1}'.format(maxdays, name)
     __salt__['cmd.run'](cmd)
+    _changed(name)
     post_info = info(name)
     if post_info['max'] != pre_info['max']:
         return post_info['max'] == maxdays
@@ -97,6 +117,7 @@ def set_mindays(name, mindays):
         return True
     cmd = 'chage -m {0} {1}'.format(mindays, name)
     __salt__['cmd.run'](cmd)
+    _changed(name)
     post_info = info(name)
     if post_info['min'] != pre_info['min']:
         return post_info['min'] == mindays
@@ -126,6 +147,7 @@ def set_password(name, password):
         line = ':'.join(comps)
         lines.append('{0}\n'.format(line))
     open(s_file, 'w+').writelines(lines)
+    _changed(name)
     uinfo = info(name)
     return uinfo['pwd'] == password
 
@@ -142,6 +164,7 @@ def set_warndays(name, warndays):
         return True
     cmd = 'chage -W {0} {1}'.format(warndays, name)
     __salt__['cmd.run'](cmd)
+    _changed(name)
     post_info = info(name)
     if post_info['warn'] != pre_info['warn']:
         return post_info['warn'] == warndays
@@ -157,4 +180,4 @@ def set_date(name, date):
     '''
     cmd = 'chage -d {0} {1}'.format(date, name)
     __salt__['cmd.run'](cmd)
-    
+    _changed(name)
@@ -63,10 +63,12 @@ verbose : True
 
 import json
 import os
+import socket
 
 # Import Salt libs
 import salt.utils
-from salt._compat import string_types, url_open
+import salt.utils.connpool
+from salt._compat import string_types, url_open, urlparse, httplib
 
 #sane defaults
 __opts__ = {'solr.cores': [],
@@ -254,7 +256,10 @@ def _http_request(url, request_timeout=None):
     try:
 
         request_timeout = __opts__['solr.request_timeout']
-        if request_timeout is None:
+        parts = urlparse(url)
+        if parts.scheme in ('http', 'https') and '@' not in parts.netloc:
+            data = json.loads(_http_get(parts, request_timeout))
+        elif request_timeout is None:
             data = json.load(url_open(url))
         else:
             data = json.load(url_open(url, timeout=request_timeout))
@@ -263,6 +268,59 @@ def _http_request(url, request_timeout=None):
         return _get_return_dict(False, {}, ["{0} : {1}".format(url, e)])
 
 
+def _http_conn(conn_class, netloc, request_timeout=None):
+    '''
+    PRIVATE METHOD
+    Opens an http connection, the python global timeout setting is used
+    when no request_timeout is given.
+    '''
+    if request_timeout is None:
+        return conn_class(netloc)
+    return conn_class(netloc, timeout=request_timeout)
+
+
+def _http_get(parts, request_timeout=None):
+    '''
+    PRIVATE METHOD
+    Fetches the body of the url parsed into parts over a kept alive
+    connection of the minion's connection pool.
+
+    parts : ParseResult
+        the parsed http or https url
+    request_timeout : int (None)
+        The number of seconds before the timeout should fail.
+
+    Return: str
+    '''
+    if parts.scheme == 'https':
+        conn_class = httplib.HTTPSConnection
+    else:
+        conn_class = httplib.HTTPConnection
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    pool = salt.utils.connpool.get_pool('http', __opts__)
+    key = (parts.scheme, parts.netloc, request_timeout)
+    while True:
+        conn = pool.acquire(key, lambda: _http_conn(conn_class, parts.netloc,
+                                                    request_timeout))
+        try:
+            conn.request('GET', path)
+            resp = conn.getresponse()
+            body = resp.read()
+        except (httplib.HTTPException, socket.error):
+            conn.discard()
+            # The server may have closed the kept alive connection
+            if conn.reused:
+                continue
+            raise
+        conn.close()
+        if resp.status != 200:
+            raise IOError('HTTP Error {0}: {1}'.format(
+                resp.status, resp.reason))
+        return body
+
+
 def _replication_request(command, host=None, core_name=None, params=None):
     '''
     PRIVATE METHOD
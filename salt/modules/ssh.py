@@ -3,9 +3,16 @@ Manage client ssh components
 '''
 import os
 import re
+import stat
 import binascii
 import hashlib
 
+# Import salt libs
+import salt.utils.atomicfile
+
+# Matches the "{options} {enc} {key} {comment}" lines of authorized_keys
+LINE_RE = re.compile(r'^(.*?)\s?((?:ssh\-|ecds).+)$')
+
 
 def _refine_enc(enc):
     '''
@@ -86,6 +93,26 @@ def _replace_auth_key(
     open(full, 'w+').writelines(lines)
 
 
+def _parse_auth_line(line):
+    '''
+    Return the key, enc, comment and options of a line of an authorized keys
+    file, None if the line does not hold a key
+    '''
+    if line.startswith('#'):
+        return None
+    ln = re.search(LINE_RE, line)
+    if not ln:
+        return None
+    comps = ln.group(2).split()
+    if len(comps) < 2:
+        return None
+    if ln.group(1):
+        options = ln.group(1).split(',')
+    else:
+        options = []
+    return comps[1], comps[0], ' '.join(comps[2:]), options
+
+
 def _validate_keys(key_file):
     '''
     Return a dict containing validated keys in the passed file
@@ -286,6 +313,101 @@ def rm_auth_key(user, key, config='.ssh/authorized_keys'):
         return 'Key removed'
     return 'Key not present'
 
+def edit_auth_keys(
+        user,
+        present=None,
+        absent=None,
+        config='.ssh/authorized_keys'):
+    '''
+    Add, update and remove a number of keys in the authorized keys file of
+    a user with a single read and write of the file. present is a list of
+    dicts with the key and optionally the enc, comment and options of the
+    keys to set, absent is a list of the keys to remove.
+
+    Returns a dict of the keys and the status set_auth_key or rm_auth_key
+    returns for them.
+
+    CLI Example::
+
+        salt '*' ssh.edit_auth_keys <user> absent='[<key>]'
+    '''
+    ret = {}
+    uinfo = __salt__['user.info'](user)
+    home = uinfo.get('home', '') if uinfo else ''
+    full = os.path.join(home, config)
+    lines = []
+    if os.path.isfile(full):
+        lines = open(full, 'r').readlines()
+    keys = [_parse_auth_line(line) for line in lines]
+    changed = []
+    for key in absent or []:
+        found = [ind for ind in range(len(lines))
+                 if keys[ind] and keys[ind][0] == key]
+        if not found:
+            ret[key] = 'Key not present'
+            continue
+        for ind in reversed(found):
+            lines.pop(ind)
+            keys.pop(ind)
+        ret[key] = 'Key removed'
+        changed.append(key)
+    for entry in present or []:
+        key = entry['key']
+        if len(key.split()) > 1:
+            ret[key] = 'invalid'
+            continue
+        auth_line = _format_auth_line(
+                key,
+                _refine_enc(entry.get('enc', 'ssh-rsa')),
+                entry.get('comment', ''),
+                entry.get('options') or [])
+        ret[key] = 'new'
+        for ind in range(len(lines)):
+            if not keys[ind] or keys[ind][0] != key:
+                continue
+            if _format_auth_line(*keys[ind]) != auth_line:
+                lines[ind] = auth_line
+                keys[ind] = _parse_auth_line(auth_line)
+                ret[key] = 'replace'
+            elif ret[key] == 'new':
+                ret[key] = 'no change'
+        if ret[key] == 'no change':
+            continue
+        if ret[key] == 'new':
+            if not os.path.isdir(home):
+                ret[key] = 'fail'
+                continue
+            if lines and not lines[-1].endswith('\n'):
+                lines[-1] += '\n'
+            lines.append(auth_line)
+            keys.append(_parse_auth_line(auth_line))
+        changed.append(key)
+    if not changed:
+        return ret
+    try:
+        dpath = os.path.dirname(full)
+        if not os.path.isdir(dpath):
+            os.makedirs(dpath)
+            if os.geteuid() == 0:
+                os.chown(dpath, uinfo['uid'], uinfo['gid'])
+            os.chmod(dpath, 448)
+        mode = 384
+        if os.path.isfile(full):
+            mode = stat.S_IMODE(os.stat(full).st_mode)
+        with salt.utils.atomicfile.atomic_open(full) as fp_:
+            fp_.writelines(lines)
+        if os.geteuid() == 0:
+            os.chown(full, uinfo['uid'], uinfo['gid'])
+        os.chmod(full, mode)
+    except (IOError, OSError):
+        for key in changed:
+            if ret[key] == 'Key removed':
+                ret[key] = 'Failed to write the authorized keys file'
+            else:
+                ret[key] = 'fail'
+    return ret
+
+
 def set_auth_key_from_file(
         user,
         source,
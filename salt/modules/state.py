@@ -32,7 +32,9 @@ def low(data):
     err = st_.verify_data(data)
     if err:
         return err
-    return st_.call(data)
+    ret = st_.call(data)
+    st_.finish_run(False)
+    return ret
 
 
 def high(data):
@@ -213,5 +215,7 @@ def single(fun, name, test=None, **kwargs):
     err = st_.verify_data(kwargs)
     if err:
         return err
-    return {'{0[state]}_|-{0[__id__]}_|-{0[name]}_|-{0[fun]}'.format(kwargs):
+    ret = {'{0[state]}_|-{0[__id__]}_|-{0[name]}_|-{0[fun]}'.format(kwargs):
             st_.call(kwargs)}
+    st_.finish_run(False)
+    return ret
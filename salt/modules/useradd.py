@@ -11,6 +11,7 @@ import logging
 from copy import deepcopy
 
 from salt._compat import string_types, callable
+import salt.utils.inventory
 
 log = logging.getLogger(__name__)
 
@@ -30,6 +31,18 @@ def __virtual__():
     return 'user' if __grains__['kernel'] in ('Linux', 'Darwin') else False
 
 
+def _changed(name, groups=()):
+    '''
+    Update the state run inventory after the named user and groups changed
+    '''
+    inv = salt.utils.inventory.get(__context__)
+    if inv is None:
+        return
+    inv.update_user(name)
+    for group in groups:
+        inv.update_group(group)
+
+
 def _get_gecos(name):
     '''
     Retrieve GECOS field info and return it in dictionary form
@@ -105,6 +118,8 @@ def add(name,
     if ret != 0:
         return False
     else:
+        # useradd can create a group named after the user
+        _changed(name, [name] + list(groups or []))
         # At this point, the user was successfully created, so return true
         # regardless of the outcome of the below functions. If there is a
         # problem wth changing any of the user's info below, it will be raised
@@ -139,7 +154,12 @@ def delete(name, remove=False, force=False):
         cmd += '-f '
     cmd += name
 
+    try:
+        groups = list_groups(name)
+    except KeyError:
+        groups = []
     ret = __salt__['cmd.run_all'](cmd)
+    _changed(name, [name] + groups)
 
     return not ret['retcode']
 
@@ -153,7 +173,12 @@ def getent():
         salt '*' user.getent
     '''
     ret = []
-    for data in pwd.getpwall():
+    inv = salt.utils.inventory.get(__context__)
+    if inv is None:
+        users = pwd.getpwall()
+    else:
+        users = inv.users()
+    for data in users:
         ret.append(info(data.pw_name))
     return ret
 
@@ -171,6 +196,7 @@ def chuid(name, uid):
         return True
     cmd = 'usermod -u {0} {1}'.format(uid, name)
     __salt__['cmd.run'](cmd)
+    _changed(name)
     post_info = info(name)
     if post_info['uid'] != pre_info['uid']:
         return post_info['uid'] == uid
@@ -190,6 +216,7 @@ def chgid(name, gid):
         return True
     cmd = 'usermod -g {0} {1}'.format(gid, name)
     __salt__['cmd.run'](cmd)
+    _changed(name)
     post_info = info(name)
     if post_info['gid'] != pre_info['gid']:
         return post_info['gid'] == gid
@@ -209,6 +236,7 @@ def chshell(name, shell):
         return True
     cmd = 'usermod -s {0} {1}'.format(shell, name)
     __salt__['cmd.run'](cmd)
+    _changed(name)
     post_info = info(name)
     if post_info['shell'] != pre_info['shell']:
         return post_info['shell'] == shell
@@ -232,6 +260,7 @@ def chhome(name, home, persist=False):
         cmd += ' -m '
     cmd += name
     __salt__['cmd.run'](cmd)
+    _changed(name)
     post_info = info(name)
     if post_info['home'] != pre_info['home']:
         return post_info['home'] == home
@@ -256,7 +285,9 @@ def chgroups(name, groups, append=False):
     if append:
         cmd += '-a '
     cmd += '-G {0} {1}'.format(','.join(groups), name)
-    return not __salt__['cmd.retcode'](cmd)
+    ret = not __salt__['cmd.retcode'](cmd)
+    _changed(name, ugrps.union(groups))
+    return ret
 
 
 def chfullname(name, fullname):
@@ -276,6 +307,7 @@ def chfullname(name, fullname):
     gecos_field['fullname'] = fullname
     cmd = 'usermod -c "{0}" {1}'.format(_build_gecos(gecos_field), name)
     __salt__['cmd.run'](cmd)
+    _changed(name)
     post_info = info(name)
     if post_info['fullname'] != pre_info['fullname']:
         return post_info['fullname'] == fullname
@@ -299,6 +331,7 @@ def chroomnumber(name, roomnumber):
     gecos_field['roomnumber'] = roomnumber
     cmd = 'usermod -c "{0}" {1}'.format(_build_gecos(gecos_field), name)
     __salt__['cmd.run'](cmd)
+    _changed(name)
     post_info = info(name)
     if post_info['roomnumber'] != pre_info['roomnumber']:
         return post_info['roomnumber'] == roomnumber
@@ -322,6 +355,7 @@ def chworkphone(name, workphone):
     gecos_field['workphone'] = workphone
     cmd = 'usermod -c "{0}" {1}'.format(_build_gecos(gecos_field), name)
     __salt__['cmd.run'](cmd)
+    _changed(name)
     post_info = info(name)
     if post_info['workphone'] != pre_info['workphone']:
         return post_info['workphone'] == workphone
@@ -345,6 +379,7 @@ def chhomephone(name, homephone):
     gecos_field['homephone'] = homephone
     cmd = 'usermod -c "{0}" {1}'.format(_build_gecos(gecos_field), name)
     __salt__['cmd.run'](cmd)
+    _changed(name)
     post_info = info(name)
     if post_info['homephone'] != pre_info['homephone']:
         return post_info['homephone'] == homephone
@@ -360,8 +395,14 @@ def info(name):
         salt '*' user.info root
     '''
     ret = {}
+    inv = salt.utils.inventory.get(__context__)
     try:
-        data = pwd.getpwnam(name)
+        if inv is None:
+            data = pwd.getpwnam(name)
+        else:
+            data = inv.user(name)
+            if data is None:
+                raise KeyError(name)
         ret['gid'] = data.pw_gid
         ret['groups'] = list_groups(name)
         ret['home'] = data.pw_dir
@@ -400,6 +441,9 @@ def list_groups(name):
 
         salt '*' user.list_groups foo
     '''
+    inv = salt.utils.inventory.get(__context__)
+    if inv is not None:
+        return inv.user_groups(name)
     ugrp = set()
     # Add the primary user's group
     ugrp.add(grp.getgrgid(pwd.getpwnam(name).pw_gid).gr_name)
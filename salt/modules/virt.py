@@ -2,6 +2,11 @@
 Work with virtual machines managed by libvirt
 
 Required python modules: libvirt
+
+The hypervisor to connect to can be set in the minion config, it defaults
+to qemu:///system::
+
+    virt.connect_uri: qemu:///system
 '''
 # Special Thanks to Michael Dehann, many of the concepts, and a few structures
 # of his in the virt func module have been used
@@ -20,6 +25,7 @@ except ImportError:
     has_libvirt = False
 import yaml
 
+import salt.utils.connpool
 from salt._compat import StringIO
 from salt.exceptions import CommandExecutionError
 
@@ -45,12 +51,16 @@ def __get_conn():
     '''
     # This has only been tested on kvm and xen, it needs to be expanded to support
     # all vm layers supported by libvirt
+    uri = __opts__.get('virt.connect_uri', 'qemu:///system')
+    pool = salt.utils.connpool.get_pool(
+            'virt',
+            __opts__,
+            check=lambda conn: conn.getLibVersion())
     try:
-        conn = libvirt.open("qemu:///system")
+        return pool.acquire(uri, lambda: libvirt.open(uri))
     except Exception:
         msg = 'Sorry, {0} failed to open a connection to the hypervisor software'
         raise CommandExecutionError(msg.format(__grains__['fqdn']))
-    return conn
 
 
 def _get_dom(vm_):
@@ -58,9 +68,12 @@ def _get_dom(vm_):
     Return a domain object for the named vm
     '''
     conn = __get_conn()
-    if vm_ not in list_vms():
-        raise CommandExecutionError('The specified vm is not present')
-    return conn.lookupByName(vm_)
+    try:
+        if vm_ not in list_vms():
+            raise CommandExecutionError('The specified vm is not present')
+        return conn.lookupByName(vm_)
+    finally:
+        conn.close()
 
 
 def _libvirt_creds():
@@ -106,10 +119,13 @@ def list_active_vms():
         salt '*' virt.list_active_vms
     '''
     conn = __get_conn()
-    vms = []
-    for id_ in conn.listDomainsID():
-        vms.append(conn.lookupByID(id_).name())
-    return vms
+    try:
+        vms = []
+        for id_ in conn.listDomainsID():
+            vms.append(conn.lookupByID(id_).name())
+        return vms
+    finally:
+        conn.close()
 
 def list_inactive_vms():
     '''
@@ -120,10 +136,13 @@ def list_inactive_vms():
         salt '*' virt.list_inactive_vms
     '''
     conn = __get_conn()
-    vms = []
-    for id_ in conn.listDefinedDomains():
-        vms.append(id_)
-    return vms
+    try:
+        vms = []
+        for id_ in conn.listDefinedDomains():
+            vms.append(id_)
+        return vms
+    finally:
+        conn.close()
 
 def vm_info(vm_=None):
     '''
@@ -189,16 +208,19 @@ def node_info():
         salt '*' virt.node_info
     '''
     conn = __get_conn()
-    raw = conn.getInfo()
-    info = {'cpucores': raw[6],
-            'cpumhz': raw[3],
-            'cpumodel': str(raw[0]),
-            'cpus': raw[2],
-            'cputhreads': raw[7],
-            'numanodes': raw[4],
-            'phymemory': raw[1],
-            'sockets': raw[5]}
-    return info
+    try:
+        raw = conn.getInfo()
+        info = {'cpucores': raw[6],
+                'cpumhz': raw[3],
+                'cpumodel': str(raw[0]),
+                'cpus': raw[2],
+                'cputhreads': raw[7],
+                'numanodes': raw[4],
+                'phymemory': raw[1],
+                'sockets': raw[5]}
+        return info
+    finally:
+        conn.close()
 
 def get_nics(vm_):
     '''
@@ -384,14 +406,17 @@ def freemem():
         salt '*' virt.freemem
     '''
     conn = __get_conn()
-    mem = conn.getInfo()[1]
-    # Take off just enough to sustain the hypervisor
-    mem -= 256
-    for vm_ in list_vms():
-        dom = _get_dom(vm_)
-        if dom.ID() > 0:
-            mem -= dom.info()[2] / 1024
-    return mem
+    try:
+        mem = conn.getInfo()[1]
+        # Take off just enough to sustain the hypervisor
+        mem -= 256
+        for vm_ in list_vms():
+            dom = _get_dom(vm_)
+            if dom.ID() > 0:
+                mem -= dom.info()[2] / 1024
+        return mem
+    finally:
+        conn.close()
 
 
 def freecpu():
@@ -404,12 +429,15 @@ def freecpu():
         salt '*' virt.freecpu
     '''
     conn = __get_conn()
-    cpus = conn.getInfo()[2]
-    for vm_ in list_vms():
-        dom = _get_dom(vm_)
-        if dom.ID() > 0:
-            cpus -= dom.info()[3]
-    return cpus
+    try:
+        cpus = conn.getInfo()[2]
+        for vm_ in list_vms():
+            dom = _get_dom(vm_)
+            if dom.ID() > 0:
+                cpus -= dom.info()[3]
+        return cpus
+    finally:
+        conn.close()
 
 
 def full_info():
@@ -549,7 +577,10 @@ def create_xml_str(xml):
         salt '*' virt.create_xml_str <xml in string format>
     '''
     conn = __get_conn()
-    return conn.createXML(xml, 0) is not None
+    try:
+        return conn.createXML(xml, 0) is not None
+    finally:
+        conn.close()
 
 
 def create_xml_path(path):
@@ -14,6 +14,10 @@ STATIC = (
           'json_out',
           )
 
+# The outputters loaded in this process and the opts they were loaded with,
+# the command line prints a return at a time with the same opts
+_LOADED = {}
+
 def display_output(data, out, opts=None):
     '''
     Print the passed data using the desired output
@@ -41,7 +45,10 @@ def get_printout(out, opts=None, **kwargs):
     opts.update(kwargs)
     if not 'color' in opts:
         opts['color'] = not bool(opts.get('no_color', False))
-    outputters = salt.loader.outputters(opts)
+    if _LOADED.get('opts') is not opts:
+        _LOADED['outputters'] = salt.loader.outputters(opts)
+        _LOADED['opts'] = opts
+    outputters = _LOADED['outputters']
     if not out in outputters:
         return outputters['pprint']
     return outputters[out]
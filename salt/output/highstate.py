@@ -1,5 +1,11 @@
 '''
 Print out highstate data
+
+The output of each host is printed as it is formatted, and the return data is
+not changed. With the state_output option set to 'summary' only the number of
+unchanged, changed and failed states of each host is printed. The statistics
+of the run under the __run_stats__ key of the return are not states and are
+not printed.
 '''
 # Import salt libs
 import pprint
@@ -7,6 +13,9 @@ import pprint
 import salt.utils
 from salt._compat import string_types
 
+# The key of the statistics of the run in the return, see salt.state
+RUN_STATS = '__run_stats__'
+
 
 def output(data):
     '''
@@ -15,111 +24,149 @@ def output(data):
     highstate return data.
     '''
     colors = salt.utils.get_colors(__opts__.get('color'))
+    state_output = __opts__.get('state_output', 'full').lower()
     for host in data:
-        hcolor = colors['GREEN']
-        hstrs = []
-        if isinstance(data[host], list):
-            # Errors have been detected, list them in RED!
-            hcolor = colors['RED_BOLD']
-            hstrs.append(('    {0}Data failed to compile:{1[ENDC]}'
-                          .format(hcolor, colors)))
-            for err in data[host]:
-                hstrs.append(('{0}----------\n    {1}{2[ENDC]}'
-                              .format(hcolor, err, colors)))
-        if isinstance(data[host], dict):
-            # Strip out the result: True, without changes returns if
-            # state_verbose is False
-            if not __opts__.get('state_verbose', False):
-                data[host] = _strip_clean(data[host])
-            # Verify that the needed data is present
-            for tname, info in data[host].items():
-                if not '__run_num__' in info:
-                    err = ('The State execution failed to record the order '
-                           'in which all states were executed. The state '
-                           'return missing data is:')
-                    print(err)
-                    pprint.pprint(info)
-            # Everything rendered as it should display the output
-            for tname in sorted(
-                    data[host],
-                    key=lambda k: data[host][k].get('__run_num__', 0)):
-                ret = data[host][tname]
-                tcolor = colors['GREEN']
-                if ret['changes']:
-                    tcolor = colors['CYAN']
-                if ret['result'] is False:
-                    hcolor = colors['RED']
-                    tcolor = colors['RED']
-                if ret['result'] is None:
-                    hcolor = colors['YELLOW']
-                    tcolor = colors['YELLOW']
-                comps = tname.split('_|-')
-                if __opts__.get('state_output', 'full').lower() == 'terse':
-                    # Print this chunk in a terse way and continue in the
-                    # loop
-                    msg = (' {0}Name: {1} - Function: {2} - Result: {3}{4}'
-                            ).format(
-                                    tcolor,
-                                    comps[2],
-                                    comps[-1],
-                                    str(ret['result']),
-                                    colors['ENDC']
-                                    )
-                    hstrs.append(msg)
-                    continue
+        if state_output == 'summary':
+            _print_summary(host, data[host], colors)
+        else:
+            _print_host(host, data[host], colors, state_output)
+
+
+def _states(ret):
+    '''
+    Return the states of the return of a host, without the statistics of the
+    run
+    '''
+    return dict((tag, info) for tag, info in ret.items() if tag != RUN_STATS)
+
 
-                hstrs.append(('{0}----------\n    State: - {1}{2[ENDC]}'
-                              .format(tcolor, comps[0], colors)))
-                hstrs.append('    {0}Name:      {1}{2[ENDC]}'.format(
-                    tcolor,
-                    comps[2],
-                    colors
-                    ))
-                hstrs.append('    {0}Function:  {1}{2[ENDC]}'.format(
-                    tcolor,
-                    comps[-1],
-                    colors
-                    ))
-                hstrs.append('        {0}Result:    {1}{2[ENDC]}'.format(
-                    tcolor,
-                    str(ret['result']),
-                    colors
-                    ))
-                hstrs.append('        {0}Comment:   {1}{2[ENDC]}'.format(
-                    tcolor,
-                    ret['comment'],
-                    colors
-                    ))
-                changes = '        Changes:   '
-                for key in ret['changes']:
-                    if isinstance(ret['changes'][key], string_types):
-                        changes += (key + ': ' + ret['changes'][key] +
-                                    '\n                   ')
-                    elif isinstance(ret['changes'][key], dict):
-                        changes += (key + ': ' +
-                                    pprint.pformat(ret['changes'][key]) +
-                                    '\n                   ')
-                    else:
-                        changes += (key + ': ' +
-                                    pprint.pformat(ret['changes'][key]) +
-                                    '\n                   ')
-                hstrs.append(('{0}{1}{2[ENDC]}'
-                              .format(tcolor, changes, colors)))
+def _print_host(host, states, colors, state_output):
+    '''
+    Print the return of the states of one host
+    '''
+    if isinstance(states, list):
+        # Errors have been detected, list them in RED!
+        hcolor = colors['RED_BOLD']
         print(('{0}{1}:{2[ENDC]}'.format(hcolor, host, colors)))
-        for hstr in hstrs:
-            print(hstr)
+        print(('    {0}Data failed to compile:{1[ENDC]}'
+               .format(hcolor, colors)))
+        for err in states:
+            print(('{0}----------\n    {1}{2[ENDC]}'
+                   .format(hcolor, err, colors)))
+        return
+    if not isinstance(states, dict):
+        print(('{0}{1}:{2[ENDC]}'.format(colors['GREEN'], host, colors)))
+        return
+    states = _states(states)
+    # Strip out the result: True, without changes returns if
+    # state_verbose is False
+    verbose = __opts__.get('state_verbose', False)
+    hcolor = colors['GREEN']
+    for tname, info in states.items():
+        if not '__run_num__' in info:
+            err = ('The State execution failed to record the order '
+                   'in which all states were executed. The state '
+                   'return missing data is:')
+            print(err)
+            pprint.pprint(info)
+        if info.get('result') is False:
+            hcolor = colors['RED']
+        elif info.get('result') is None and hcolor != colors['RED']:
+            hcolor = colors['YELLOW']
+    print(('{0}{1}:{2[ENDC]}'.format(hcolor, host, colors)))
+    # Everything rendered as it should display the output
+    for tname in sorted(
+            states,
+            key=lambda k: states[k].get('__run_num__', 0)):
+        ret = states[tname]
+        if not verbose and ret['result'] and not ret['changes']:
+            continue
+        tcolor = colors['GREEN']
+        if ret['changes']:
+            tcolor = colors['CYAN']
+        if ret['result'] is False:
+            tcolor = colors['RED']
+        if ret['result'] is None:
+            tcolor = colors['YELLOW']
+        comps = tname.split('_|-')
+        if state_output == 'terse':
+            # Print this chunk in a terse way and continue in the
+            # loop
+            msg = (' {0}Name: {1} - Function: {2} - Result: {3}{4}'
+                    ).format(
+                            tcolor,
+                            comps[2],
+                            comps[-1],
+                            str(ret['result']),
+                            colors['ENDC']
+                            )
+            print(msg)
+            continue
+
+        print(('{0}----------\n    State: - {1}{2[ENDC]}'
+               .format(tcolor, comps[0], colors)))
+        print('    {0}Name:      {1}{2[ENDC]}'.format(
+            tcolor,
+            comps[2],
+            colors
+            ))
+        print('    {0}Function:  {1}{2[ENDC]}'.format(
+            tcolor,
+            comps[-1],
+            colors
+            ))
+        print('        {0}Result:    {1}{2[ENDC]}'.format(
+            tcolor,
+            str(ret['result']),
+            colors
+            ))
+        print('        {0}Comment:   {1}{2[ENDC]}'.format(
+            tcolor,
+            ret['comment'],
+            colors
+            ))
+        changes = '        Changes:   '
+        for key in ret['changes']:
+            if isinstance(ret['changes'][key], string_types):
+                changes += (key + ': ' + ret['changes'][key] +
+                            '\n                   ')
+            else:
+                changes += (key + ': ' +
+                            pprint.pformat(ret['changes'][key]) +
+                            '\n                   ')
+        print(('{0}{1}{2[ENDC]}'
+               .format(tcolor, changes, colors)))
 
 
-def _strip_clean(returns):
+def summary(states):
     '''
-    Check for the state_verbose option and strip out the result=True
-    and changes={} members of the state return list.
+    Return the number of unchanged, changed and failed states of the return
+    of a host, states which would change in a test run count as changed
     '''
-    rm_tags = []
-    for tag in returns:
-        if returns[tag]['result'] and not returns[tag]['changes']:
-            rm_tags.append(tag)
-    for tag in rm_tags:
-        returns.pop(tag)
-    return returns
+    ret = {'unchanged': 0, 'changed': 0, 'failed': 0}
+    for info in _states(states).values():
+        if info.get('result') is False:
+            ret['failed'] += 1
+        elif info.get('changes') or info.get('result') is None:
+            ret['changed'] += 1
+        else:
+            ret['unchanged'] += 1
+    return ret
 
+
+def _print_summary(host, states, colors):
+    '''
+    Print the number of unchanged, changed and failed states of one host
+    '''
+    if not isinstance(states, dict):
+        print(('{0}{1}: Data failed to compile{2[ENDC]}'
+               .format(colors['RED_BOLD'], host, colors)))
+        return
+    counts = summary(states)
+    hcolor = colors['GREEN']
+    if counts['failed']:
+        hcolor = colors['RED']
+    elif counts['changed']:
+        hcolor = colors['CYAN']
+    print(('{0}{1}: {2[unchanged]} unchanged, {2[changed]} changed, '
+           '{2[failed]} failed{3[ENDC]}').format(hcolor, host, counts, colors))
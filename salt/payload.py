@@ -9,7 +9,6 @@ import sys
 
 # Import salt libs
 import salt.log
-import salt.crypt
 from salt.exceptions import SaltReqTimeoutError
 from salt._compat import pickle
 
@@ -13,6 +13,7 @@ import salt.loader
 import salt.fileclient
 import salt.minion
 import salt.crypt
+import salt.utils.pillarcache
 from salt._compat import string_types
 from salt.template import compile_template
 
@@ -75,7 +76,10 @@ class Pillar(object):
             self.functions = salt.loader.minion_mods(self.opts)
         self.matcher = salt.minion.Matcher(self.opts, self.functions)
         self.rend = salt.loader.render(self.opts, self.functions)
-        self.ext_pillars = salt.loader.pillars(self.opts, self.functions)
+        if self.opts.get('ext_pillar'):
+            self.ext_pillars = salt.loader.pillars(self.opts, self.functions)
+        else:
+            self.ext_pillars = {}
 
     def __gen_opts(self, opts_in, grains, id_, env=None):
         '''
@@ -325,16 +329,31 @@ class Pillar(object):
                     log.critical(err)
                     continue
                 try:
-                    if isinstance(val, dict):
-                        ext.update(self.ext_pillars[key](**val))
-                    elif isinstance(val, list):
-                        ext.update(self.ext_pillars[key](*val))
-                    else:
-                        ext.update(self.ext_pillars[key](val))
+                    ext.update(self._call_ext(key, val))
                 except Exception:
                     log.exception('Failed to load ext_pillar {0}'.format(key))
         return ext
 
+    def _call_ext(self, key, val):
+        '''
+        Call the ext_pillar interface key with the configured val, the result
+        is taken from the ext_pillar cache when the interface allows it
+        '''
+        fun = self.ext_pillars[key]
+        if isinstance(val, dict):
+            call = lambda: fun(**val)
+        elif isinstance(val, list):
+            call = lambda: fun(*val)
+        else:
+            call = lambda: fun(val)
+        inputs = getattr(fun, 'pillar_cache_inputs', None)
+        ttl = salt.utils.pillarcache.cache_ttl(self.opts, key)
+        if inputs is None or ttl <= 0:
+            return call()
+        cache_key = salt.utils.pillarcache.cache_key(inputs, val, self.opts)
+        return salt.utils.pillarcache.PillarCache(self.opts).get(
+                key, cache_key, ttl, call)
+
     def compile_pillar(self):
         '''
         Render the pillar dta and return
@@ -9,10 +9,14 @@ import logging
 # Import third party libs
 import yaml
 
+# Import salt libs
+import salt.utils.pillarcache
+
 # Set up logging
 log = logging.getLogger(__name__)
 
 
+@salt.utils.pillarcache.cacheable()
 def ext_pillar(command):
     '''
     Execute a command and read the output as YAML
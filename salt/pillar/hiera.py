@@ -8,6 +8,7 @@ import logging
 
 # Import salt libs
 import salt.utils
+import salt.utils.pillarcache
 from salt._compat import string_types
 
 # Import third party libs
@@ -24,6 +25,7 @@ def __virtual__():
     return 'hiera' if salt.utils.which('hiera') else False
 
 
+@salt.utils.pillarcache.cacheable('grains')
 def ext_pillar(conf):
     '''
     Execute hiera and return the data
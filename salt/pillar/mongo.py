@@ -58,10 +58,15 @@ import re
 
 try:
     import pymongo
+    import pymongo.errors
     has_pymongo = True
 except ImportError:
     has_pymongo = False
 
+# Import salt libs
+import salt.utils.connpool
+import salt.utils.pillarcache
+
 
 __opts__ = {'mongo.db': 'salt',
             'mongo.host': 'salt',
@@ -79,6 +84,37 @@ def __virtual__():
 log = logging.getLogger(__name__)
 
 
+def _connect():
+    '''
+    Return the mongo database, the connection is taken from the connection
+    pool of the master worker and goes back to it when it is closed
+    '''
+    host = __opts__['mongo.host']
+    port = __opts__['mongo.port']
+    user = __opts__.get('mongo.user')
+    password = __opts__.get('mongo.password')
+
+    def _create():
+        log.info("connecting to {0}:{1} for mongo ext_pillar".format(
+            host, port))
+        conn = pymongo.Connection(host, port)
+        log.debug("using database '{0}'".format(__opts__['mongo.db']))
+        db = conn[__opts__['mongo.db']]
+        if user and password:
+            log.debug("authenticating as '{0}'".format(user))
+            db.authenticate(user, password)
+        return db
+
+    pool = salt.utils.connpool.get_pool(
+            'mongo',
+            __opts__,
+            close=lambda db: db.connection.disconnect())
+    return pool.acquire(
+            (host, port, __opts__['mongo.db'], user, password),
+            _create)
+
+
+@salt.utils.pillarcache.cacheable('id')
 def ext_pillar(collection='pillar', id_field='_id', re_pattern=None,
                re_replace='', fields=None):
     """
@@ -104,20 +140,7 @@ def ext_pillar(collection='pillar', id_field='_id', re_pattern=None,
           careful with other fields in the document as they must be string
           serializable. Defaults to ``None``.
     """
-    host = __opts__['mongo.host']
-    port = __opts__['mongo.port']
-    log.info("connecting to {0}:{1} for mongo ext_pillar".format(host, port))
-    conn = pymongo.Connection(host, port)
-
-    log.debug("using database '{0}'".format(__opts__['mongo.db']))
-    db = conn[__opts__['mongo.db']]
-
-    user = __opts__.get('mongo.user')
-    password = __opts__.get('mongo.password')
-
-    if user and password:
-        log.debug("authenticating as '{0}'".format(user))
-        db.authenticate(user, password)
+    db = _connect()
 
     # Do the regex string replacement on the minion id
     minion_id = __opts__['id']
@@ -128,7 +151,17 @@ def ext_pillar(collection='pillar', id_field='_id', re_pattern=None,
              "in mongo".format(id_field, minion_id))
 
 
-    pillar = db[collection].find_one({id_field: minion_id}, fields=fields)
+    try:
+        pillar = db[collection].find_one({id_field: minion_id}, fields=fields)
+    except pymongo.errors.AutoReconnect:
+        db.discard()
+        if not db.reused:
+            raise
+        # The pooled connection went stale, try once more on a new one
+        db = _connect()
+        pillar = db[collection].find_one({id_field: minion_id}, fields=fields)
+    finally:
+        db.close()
     if pillar:
         if fields:
             log.debug("ext_pillar.mongo: found document, returning fields "
@@ -21,6 +21,9 @@ try:
 except ImportError:
     has_ldap = False
 
+# Import salt libs
+import salt.utils.pillarcache
+
 # Set up logging
 log = logging.getLogger(__name__)
 
@@ -141,6 +144,7 @@ def _do_search(conf):
     return result
 
 
+@salt.utils.pillarcache.cacheable('grains')
 def ext_pillar(config_file):
     '''
     Execute LDAP searches and return the aggregated data
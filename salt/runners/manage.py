@@ -1,22 +1,43 @@
 '''
 General management functions for salt, tools like seeing what hosts are up
 and what hosts are down
+
+When the presence option is set on the master the functions answer from the
+presence table of the master, otherwise all of the minions are pinged
 '''
 
+# Import python libs
+import time
+
+# Import salt libs
 import salt.cli.key
 import salt.client
+import salt.utils.presence
 
 
-def down():
+def _status():
     '''
-    Print a list of all the down or unresponsive salt minions
+    Return the presence of all of the accepted minions
     '''
+    keys = salt.cli.key.Key(__opts__)._keys('acc')
+    if __opts__.get('presence'):
+        return salt.utils.presence.status(__opts__, keys)
     client = salt.client.LocalClient(__opts__['conf_file'])
-    key = salt.cli.key.Key(__opts__)
     minions = client.cmd('*', 'test.ping', timeout=__opts__['timeout'])
-    keys = key._keys('acc')
+    now = time.time()
+    ret = {}
+    for id_ in keys:
+        ret[id_] = {'up': id_ in minions,
+                    'last_seen': now if id_ in minions else None,
+                    'via': 'ping' if id_ in minions else None}
+    return ret
+
 
-    ret = sorted(keys - set(minions))
+def down():
+    '''
+    Print a list of all the down or unresponsive salt minions
+    '''
+    ret = sorted(id_ for id_, val in _status().items() if not val['up'])
     for minion in ret:
         print(minion)
     return ret
@@ -26,10 +47,34 @@ def up():
     '''
     Print a list of all of the minions that are up
     '''
-    client = salt.client.LocalClient(__opts__['conf_file'])
-    minions = client.cmd('*', 'test.ping', timeout=__opts__['timeout'])
-
-    for minion in sorted(minions):
+    ret = sorted(id_ for id_, val in _status().items() if val['up'])
+    for minion in ret:
         print(minion)
+    return ret
+
 
-    return sorted(minions)
+def status():
+    '''
+    Print whether each minion is up and when it was last seen, return a dict
+    mapping the minion ids to whether they are up, the time they were last
+    seen and what they were seen doing
+
+    CLI Example::
+
+        salt-run manage.status
+    '''
+    ret = _status()
+    for id_ in sorted(ret):
+        if ret[id_]['last_seen']:
+            seen = 'last seen {0} ({1})'.format(
+                time.strftime(
+                    '%Y-%m-%d %H:%M:%S',
+                    time.localtime(ret[id_]['last_seen'])),
+                ret[id_]['via'])
+        else:
+            seen = 'never seen'
+        print('{0}: {1}, {2}'.format(
+            id_,
+            'up' if ret[id_]['up'] else 'down',
+            seen))
+    return ret
@@ -0,0 +1,22 @@
+'''
+Manage the cache of the top data gathered from the external node classifier
+and the master_tops interfaces
+'''
+
+import salt.utils.topscache
+
+
+def invalidate(tgt='*'):
+    '''
+    Remove the cached top data of the minions matching the glob tgt, the top
+    data is gathered again the next time the minions ask for it
+
+    CLI Example::
+
+        salt-run tops.invalidate
+        salt-run tops.invalidate 'web*'
+    '''
+    ret = salt.utils.topscache.TopsCache(__opts__).invalidate(tgt)
+    for minion in ret:
+        print(minion)
+    return ret
@@ -16,12 +16,16 @@ import os
 import copy
 import inspect
 import fnmatch
+import time
 import logging
 import collections
 import traceback
 
 # Import Salt libs
+import salt.crypt
 import salt.utils
+import salt.utils.event
+import salt.utils.hashcache
 import salt.loader
 import salt.minion
 import salt.pillar
@@ -33,6 +37,9 @@ from salt.exceptions import SaltReqTimeoutError, SaltException
 
 log = logging.getLogger(__name__)
 
+# The key of the statistics of a run in the state return, it is not a state
+RUN_STATS = '__run_stats__'
+
 
 def _gen_tag(low):
     '''
@@ -41,6 +48,14 @@ def _gen_tag(low):
     return '{0[state]}_|-{0[__id__]}_|-{0[name]}_|-{0[fun]}'.format(low)
 
 
+def _module_names(funcs):
+    '''
+    Return the names of the modules which provide the passed functions
+    '''
+    return set(getattr(func, '__module__', '').split('.')[-1]
+               for func in funcs.values())
+
+
 def _getargs(func):
     '''
     A small wrapper around getargspec that also supports callable classes
@@ -181,6 +196,14 @@ class State(object):
             opts['grains'] = salt.loader.grains(opts)
         self.opts = opts
         self.opts['pillar'] = self.__gather_pillar()
+        # Data shared by the modules for the length of the run
+        self.context = {'state.run': True}
+        # The files the loaded modules were loaded from
+        self.module_files = {}
+        # The state modules which changed the modules since they were loaded
+        self.module_dirty = set()
+        self.module_reloads = {'count': 0, 'time': 0.0}
+        self.refresh_minion = False
         self.load_modules()
         self.mod_init = set()
         self.__run_num = 0
@@ -215,7 +238,7 @@ class State(object):
         Load the modules into the state
         '''
         log.info('Loading fresh modules for state activity')
-        self.functions = salt.loader.minion_mods(self.opts)
+        self.functions = salt.loader.minion_mods(self.opts, self.context)
         if isinstance(data, dict):
             if data.get('provider', False):
                 provider = {}
@@ -227,7 +250,8 @@ class State(object):
                     for mod in provider:
                         funcs = salt.loader.raw_mod(self.opts,
                                 provider[mod],
-                                self.functions)
+                                self.functions,
+                                self.context)
                         if funcs:
                             for func in funcs:
                                 f_key = '{0}{1}'.format(
@@ -235,34 +259,164 @@ class State(object):
                                         func[func.rindex('.'):]
                                         )
                                 self.functions[f_key] = funcs[func]
-        self.states = salt.loader.states(self.opts, self.functions)
+        self.states = salt.loader.states(
+                self.opts,
+                self.functions,
+                self.context)
         self.rend = salt.loader.render(self.opts, self.functions)
+        self.module_files = self.__gather_module_files()
 
-    def module_refresh(self, data):
+    def __gather_module_files(self):
         '''
-        Check to see if the modules for this state instance need to be
-        updated, only update if the state is a file. If the function is
-        managed check to see if the file is a possible module type, e.g. a
-        python, pyx, or .so. Always refresh if the function is recurse,
-        since that can lay down anything.
+        Return the files of the execution modules, states and renderers
         '''
-        def _refresh():
-            self.load_modules()
-            module_refresh_path = os.path.join(
-                self.opts['cachedir'],
-                'module_refresh')
-            with open(module_refresh_path, 'w+') as f:
-                f.write('')
+        files = {}
+        for ext_type in ('modules', 'states', 'renderers'):
+            files[ext_type] = salt.loader.module_files(self.opts, ext_type)
+        return files
 
+    def _changes_modules(self, data):
+        '''
+        Check to see if the chunk can change the modules, only if the state
+        is a file or a package. If the function is managed check to see if
+        the file is a possible module type, e.g. a python, pyx, or .so.
+        Always refresh if the function is recurse, since that can lay down
+        anything.
+        '''
         if data['state'] == 'file':
             if data['fun'] == 'managed':
-                if data['name'].endswith(
-                    ('.py', '.pyx', '.pyo', '.pyc', '.so')):
-                    _refresh()
-            elif data['fun'] == 'recurse':
-                _refresh()
-        elif data['state'] == 'pkg':
-            _refresh()
+                return data['name'].endswith(
+                    ('.py', '.pyx', '.pyo', '.pyc', '.so'))
+            return data['fun'] == 'recurse'
+        return data['state'] == 'pkg'
+
+    def _changed_modules(self, files):
+        '''
+        Compare the passed module files with the files the modules were
+        loaded from, return the names of the changed modules of each type or
+        None if modules were removed
+        '''
+        changed = {}
+        for ext_type, mods in files.items():
+            old = self.module_files.get(ext_type, {})
+            if set(old).difference(mods):
+                return None
+            changed[ext_type] = set(
+                    name for name in mods if mods[name] != old.get(name))
+        return changed
+
+    def module_refresh(self, data):
+        '''
+        Check to see if the modules for this state instance need to be
+        updated. The modules are not reloaded right away, they are marked
+        dirty so that the refreshes of a number of chunks are coalesced, the
+        reload happens before the next chunk which needs the modules or at
+        the end of the run.
+        '''
+        if self._changes_modules(data):
+            self.module_dirty.add(data['state'])
+
+    def _needs_refresh(self, data):
+        '''
+        Check to see if dirty modules need to be reloaded before the chunk
+        runs. The chunks which change modules themselves do not wait for the
+        reload unless their own state module changed.
+        '''
+        if not self.module_dirty:
+            return False
+        if not self._changes_modules(data):
+            return True
+        if '{0[state]}.{0[fun]}'.format(data) not in self.states:
+            return True
+        if 'file' not in self.module_dirty:
+            return False
+        changed = self._changed_modules(self.__gather_module_files())
+        if changed is None:
+            return True
+        return (data['state'] in changed['states']
+                or data['state'] in changed['modules'])
+
+    def refresh_modules(self):
+        '''
+        Reload the dirty modules, only the modules whose files changed since
+        they were loaded are loaded again. When packages were installed the
+        modules which failed to load are tried again as well, the packages
+        can provide their dependencies.
+        '''
+        if not self.module_dirty:
+            return
+        start = time.time()
+        dirty = self.module_dirty
+        self.module_dirty = set()
+        files = self.__gather_module_files()
+        changed = self._changed_modules(files)
+        if changed is None or self.opts.get('providers'):
+            log.info('Reloading all modules for state activity')
+            self.load_modules()
+            self.refresh_minion = True
+        else:
+            loaded = {'modules': self.functions,
+                      'states': self.states,
+                      'renderers': self.rend}
+            retry = 'pkg' in dirty or changed['modules']
+            before = {}
+            for ext_type, funcs in loaded.items():
+                if changed[ext_type]:
+                    self.refresh_minion = True
+                if retry:
+                    # Modules which did not load can depend on libraries or
+                    # on the execution modules which were just changed
+                    changed[ext_type].update(set(files[ext_type]).difference(
+                        _module_names(funcs)))
+                before[ext_type] = set(funcs)
+            if not any(changed.values()):
+                return
+            log.info(
+                'Reloading changed modules for state activity: {0}'.format(
+                    ', '.join(sorted(set().union(*changed.values())))))
+            salt.loader.reload_modules(
+                    self.opts,
+                    'modules',
+                    changed['modules'],
+                    self.functions,
+                    [{'name': '__salt__', 'value': self.functions},
+                     {'name': '__context__', 'value': self.context}])
+            salt.loader.reload_modules(
+                    self.opts,
+                    'states',
+                    changed['states'],
+                    self.states,
+                    [{'name': '__salt__', 'value': self.functions},
+                     {'name': '__context__', 'value': self.context}])
+            salt.loader.reload_modules(
+                    self.opts,
+                    'renderers',
+                    changed['renderers'],
+                    self.rend,
+                    {'name': '__salt__', 'value': self.functions})
+            for ext_type, funcs in loaded.items():
+                if set(funcs) != before[ext_type]:
+                    self.refresh_minion = True
+            self.module_files = files
+        self.module_reloads['count'] += 1
+        self.module_reloads['time'] += time.time() - start
+
+    def finish_run(self, reload_modules=True):
+        '''
+        Reload the dirty modules, tell the minion to reload its own modules
+        if they changed during the run and drop the data the modules shared
+        during the run. The loaded modules can be shared with the minion,
+        which must not see the data of a finished run.
+        '''
+        self.context.clear()
+        if reload_modules:
+            self.refresh_modules()
+        elif self.module_dirty:
+            self.refresh_minion = True
+        if not self.refresh_minion:
+            return
+        salt.utils.event.minion_refresh(self.opts)
+        self.refresh_minion = False
 
     def verify_ret(self, ret):
         '''
@@ -853,6 +1007,8 @@ class State(object):
         Call a state directly with the low data structure, verify data
         before processing.
         '''
+        if self._needs_refresh(data):
+            self.refresh_modules()
         errors = self.verify_data(data)
         if errors:
             ret = {
@@ -906,15 +1062,25 @@ class State(object):
         Iterate over a list of chunks and call them, checking for requires.
         '''
         running = {}
+        self.context['state.run'] = True
+        # Count the bytes hashed during this run only
+        salt.utils.hashcache.stats()
         for low in chunks:
             if '__FAILHARD__' in running:
                 running.pop('__FAILHARD__')
-                return running
+                break
             tag = _gen_tag(low)
             if tag not in running:
                 running = self.call_chunk(low, running, chunks)
                 if self.check_failhard(low, running):
-                    return running
+                    break
+        self.finish_run()
+        salt.utils.hashcache.save()
+        hashed = salt.utils.hashcache.stats()
+        running[RUN_STATS] = {'reloads': self.module_reloads['count'],
+                              'reload_time': self.module_reloads['time'],
+                              'hashed': hashed['hashed'],
+                              'cached': hashed['cached']}
         return running
 
     def check_failhard(self, low, running):
@@ -985,6 +1151,39 @@ class State(object):
             return 'change'
         return 'met'
 
+    def aggregate(self, low, running, chunks):
+        '''
+        Pass the chunks of the same state module as low which are ready to
+        run to the mod_aggregate function of the state module, this allows
+        the state module to act on all of them at once, like installing all
+        of the packages in a single transaction. The chunks are still called
+        one by one afterwards, mod_aggregate returns the chunks it acted on.
+        '''
+        agg_fun = '{0}.mod_aggregate'.format(low['state'])
+        if not self.opts.get('state_aggregate', False) \
+                or agg_fun not in self.states:
+            return
+        if '__agg__' in low:
+            return
+        lows = []
+        for chunk in chunks:
+            if chunk['state'] != low['state'] or '__agg__' in chunk:
+                continue
+            if _gen_tag(chunk) in running:
+                continue
+            if chunk is not low:
+                if self.check_requisite(chunk, running, chunks) != 'met':
+                    continue
+            lows.append(chunk)
+        for chunk in lows:
+            chunk['__agg__'] = True
+        if len(lows) < 2:
+            return
+        acted = self.states[agg_fun](lows)
+        if acted:
+            log.info('Aggregated {0} {1} states'.format(
+                len(acted), low['state']))
+
     def call_chunk(self, low, running, chunks):
         '''
         Check if a chunk has any requires, execute the requires and then
@@ -1040,6 +1239,7 @@ class State(object):
                 running['__FAILHARD__'] = True
                 return running
         elif status == 'met':
+            self.aggregate(low, running, chunks)
             running[tag] = self.call(low)
         elif status == 'fail':
             running[tag] = {'changes': {},
@@ -1055,6 +1255,7 @@ class State(object):
                 ret = self.call(low)
             running[tag] = ret
         else:
+            self.aggregate(low, running, chunks)
             running[tag] = self.call(low)
         return running
 
@@ -1434,6 +1635,8 @@ class BaseHighState(object):
             self.opts['grains'] = salt.loader.grains(self.opts)
         faux = {'state': 'file', 'fun': 'recurse'}
         self.state.module_refresh(faux)
+        # The synced modules can be used when rendering the sls files
+        self.state.refresh_modules()
 
     def render_state(self, sls, env, mods):
         '''
@@ -1441,17 +1644,29 @@ class BaseHighState(object):
         '''
         err = ''
         errors = []
-        fn_ = self.client.get_state(sls, env)
-        if not fn_:
-            errors.append(('Specified SLS {0} in environment {1} is not'
-                           ' available on the salt master').format(sls, env))
         state = None
-        try:
-            state = compile_template(
-                fn_, self.state.rend, self.state.opts['renderer'], env, sls)
-        except Exception as exc:
-            errors.append(('Rendering SLS {0} failed, render error:\n{1}'
-                           .format(sls, exc)))
+        if self.opts.get('render_cache', False):
+            # Ask the master for the sls rendered with the same grains and
+            # pillar values before rendering it here
+            state = self.client.render_sls(
+                    sls,
+                    env,
+                    self.state.opts['renderer'],
+                    self.state.opts['grains'],
+                    self.state.opts.get('pillar', {}))
+        if state is None:
+            fn_ = self.client.get_state(sls, env)
+            if not fn_:
+                errors.append(('Specified SLS {0} in environment {1} is not'
+                               ' available on the salt master'
+                               ).format(sls, env))
+            try:
+                state = compile_template(
+                    fn_, self.state.rend, self.state.opts['renderer'], env,
+                    sls)
+            except Exception as exc:
+                errors.append(('Rendering SLS {0} failed, render error:\n{1}'
+                               .format(sls, exc)))
         mods.add(sls)
         nstate = None
         if state:
@@ -1703,7 +1918,8 @@ class HighState(BaseHighState):
         self.client = salt.fileclient.get_file_client(opts)
         BaseHighState.__init__(self, opts)
         self.state = State(self.opts)
-        self.matcher = salt.minion.Matcher(self.opts)
+        # Loading the modules again would cut them off the run's context
+        self.matcher = salt.minion.Matcher(self.opts, self.state.functions)
 
 
 class MasterState(State):
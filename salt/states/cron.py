@@ -34,6 +34,9 @@ then a new cron job will be added to the user's crontab.
 '''
 # Import python libs
 import os
+import logging
+
+log = logging.getLogger(__name__)
 
 
 def _check_cron(cmd, user, minute, hour, dom, month, dow):
@@ -73,6 +76,14 @@ def _get_cron_info():
     return owner,group,crontab_dir
 
 
+def _aggregated(fun, user, name):
+    '''
+    Return the status mod_aggregate set for the named cron job, None if the
+    job was not part of an aggregated crontab edit
+    '''
+    return __context__.get('cron.aggregate', {}).pop((fun, user, name), None)
+
+
 def present(name,
         user='root',
         minute='*',
@@ -137,15 +148,17 @@ def present(name,
             ret['comment'] = 'Cron {0} is set to be updated'.format(name)
         return ret
 
-    data = __salt__['cron.set_job'](
-            dom=daymonth,
-            dow=dayweek,
-            hour=hour,
-            minute=minute,
-            month=month,
-            cmd=name,
-            user=user
-            )
+    data = _aggregated('present', user, name)
+    if data is None:
+        data = __salt__['cron.set_job'](
+                dom=daymonth,
+                dow=dayweek,
+                hour=hour,
+                minute=minute,
+                month=month,
+                cmd=name,
+                user=user
+                )
     if data == 'present':
         ret['comment'] = 'Cron {0} already present'.format(name)
         return ret
@@ -224,15 +237,17 @@ def absent(name,
             ret['comment'] = 'Cron {0} is set to be removed'.format(name)
         return ret
 
-    data = __salt__['cron.rm_job'](
-            user,
-            minute,
-            hour,
-            daymonth,
-            month,
-            dayweek,
-            name,
-            )
+    data = _aggregated('absent', user, name)
+    if data is None:
+        data = __salt__['cron.rm_job'](
+                user,
+                minute,
+                hour,
+                daymonth,
+                month,
+                dayweek,
+                name,
+                )
     if data == 'absent':
         ret['comment'] = "Cron {0} already absent".format(name)
         return ret
@@ -377,3 +392,54 @@ def file(name,
                              'update cron daemon'
             ret['result'] = False
         return ret
+
+
+def mod_aggregate(lows):
+    '''
+    Edit the crontab of each user once for all of the cron.present and
+    cron.absent states which are ready to run at the same time. The states
+    pick up the status of their job when they are called, a job which is
+    named by more than one of the states is left to the states.
+
+    Returns the states whose jobs were edited.
+    '''
+    if __opts__['test']:
+        return []
+    edits = {}
+    for low in lows:
+        if low['fun'] != 'present' and low['fun'] != 'absent':
+            continue
+        user = low.get('user', 'root')
+        edit = edits.setdefault(
+                user,
+                {'present': [], 'absent': [], 'lows': [], 'names': {}})
+        name = low['name']
+        if low['fun'] == 'present':
+            name = name.strip()
+        edit['names'][name] = edit['names'].get(name, 0) + 1
+        edit['lows'].append((low, name))
+    acted = []
+    results = __context__.setdefault('cron.aggregate', {})
+    for user, edit in edits.items():
+        batch = [(low, name) for low, name in edit['lows']
+                if edit['names'][name] == 1]
+        if len(batch) < 2:
+            continue
+        for low, name in batch:
+            if low['fun'] == 'present':
+                job = {'cmd': name}
+                for arg in ('minute', 'hour', 'daymonth', 'month', 'dayweek'):
+                    job[arg] = low.get(arg, '*')
+                edit['present'].append(job)
+            else:
+                edit['absent'].append(name)
+        log.info('Editing {0} cron jobs of user {1} at once'.format(
+            len(batch), user))
+        data = __salt__['cron.edit_jobs'](
+                user,
+                edit['present'],
+                edit['absent'])
+        for low, name in batch:
+            results[(low['fun'], user, name)] = data[name]
+            acted.append(low)
+    return acted
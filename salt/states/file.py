@@ -474,6 +474,7 @@ def managed(name,
         defaults=None,
         env=None,
         backup='',
+        show_diff=None,
         **kwargs):
     '''
     Manage a given file, this function allows for a file to be downloaded from
@@ -534,6 +535,13 @@ def managed(name,
 
     backup
         Overrides the default backup mode for this specific file
+
+    show_diff
+        By default the diff of the changed contents is cut short or replaced
+        with a summary of the sizes and hashes of the old and new file as set
+        by the diff_max_bytes and diff_max_lines minion options. Set to False
+        to never show the diff of this file, or to True to always show all of
+        it.
     '''
     # Initial set up
     mode = __salt__['config.manage_mode'](mode)
@@ -587,6 +595,7 @@ def managed(name,
                 context,
                 defaults,
                 env,
+                show_diff,
                 **kwargs
                 )
         return ret
@@ -624,7 +633,8 @@ def managed(name,
                                             group,
                                             mode,
                                             env,
-                                            backup)
+                                            backup,
+                                            show_diff)
 
 
 def directory(name,
@@ -18,6 +18,14 @@ from distutils.version import LooseVersion
 
 logger = logging.getLogger(__name__)
 
+# The providers whose install function accepts a space delimited list of
+# packages
+MULTI_INSTALL = ('apt', 'yumpkg', 'yumpkg5', 'pacman', 'zypper')
+
+# Arguments which only apply to a single package, states using them are not
+# aggregated
+SINGLE_ARGS = ('version', 'source', 'eq', 'gt', 'lt', 'debconf')
+
 
 def __gen_rtag():
     '''
@@ -26,6 +34,49 @@ def __gen_rtag():
     return os.path.join(__opts__['cachedir'], 'pkg_refresh')
 
 
+def _version(name):
+    '''
+    Return the installed version of the named package, the list of installed
+    packages is only gathered once per state run, until something is
+    installed or removed
+    '''
+    if 'pkg.list_pkgs' in __salt__:
+        if 'pkg.list_pkgs' not in __context__:
+            __context__['pkg.list_pkgs'] = __salt__['pkg.list_pkgs']()
+        if name in __context__['pkg.list_pkgs']:
+            return __context__['pkg.list_pkgs'][name]
+    # Virtual packages and the like are only resolved by pkg.version
+    return __salt__['pkg.version'](name)
+
+
+def _install(name, refresh=False, **kwargs):
+    '''
+    Install the named package(s), the refresh tag is honored and the
+    installed package list is invalidated
+    '''
+    rtag = __gen_rtag()
+    if refresh or os.path.isfile(rtag):
+        changes = __salt__['pkg.install'](name, True, **kwargs)
+        if os.path.isfile(rtag):
+            os.remove(rtag)
+    else:
+        changes = __salt__['pkg.install'](name, **kwargs)
+    __context__.pop('pkg.list_pkgs', None)
+    return changes
+
+
+def _aggregated(name):
+    '''
+    Return the changes made for the named package by mod_aggregate, None if
+    the package was not part of an aggregated install or failed to install
+    in it
+    '''
+    changes = __context__.get('pkg.aggregate', {}).pop(name, None)
+    if changes:
+        return changes
+    return None
+
+
 def installed(
         name,
         version=None,
@@ -56,8 +107,13 @@ def installed(
             - skip_verify: True
             - version: 2.0.6~ubuntu3
     '''
-    rtag = __gen_rtag()
-    cver = __salt__['pkg.version'](name)
+    changes = _aggregated(name)
+    if changes:
+        return {'name': name,
+                'changes': changes,
+                'result': True,
+                'comment': 'Package {0} installed'.format(name)}
+    cver = _version(name)
     if cver == version:
         # The package is installed and is the correct version
         return {'name': name,
@@ -78,21 +134,12 @@ def installed(
                 'result': None,
                 'comment': 'Package {0} is set to be installed'.format(name)}
 
-    if refresh or os.path.isfile(rtag):
-        changes = __salt__['pkg.install'](name,
-                          True,
-                          version=version,
-                          repo=repo,
-                          skip_verify=skip_verify,
-                          **kwargs)
-        if os.path.isfile(rtag):
-            os.remove(rtag)
-    else:
-        changes = __salt__['pkg.install'](name,
-                          version=version,
-                          repo=repo,
-                          skip_verify=skip_verify,
-                          **kwargs)
+    changes = _install(name,
+                       refresh,
+                       version=version,
+                       repo=repo,
+                       skip_verify=skip_verify,
+                       **kwargs)
     if not changes:
         return {'name': name,
                 'changes': changes,
@@ -119,10 +166,16 @@ def latest(name, refresh=False, repo='', skip_verify=False, **kwargs):
     skip_verify : False
         Skip the GPG verification check for the package to be installed
     '''
-    rtag = __gen_rtag()
     ret = {'name': name, 'changes': {}, 'result': False, 'comment': ''}
 
-    version = __salt__['pkg.version'](name)
+    changes = _aggregated(name)
+    if changes:
+        ret['changes'] = changes
+        ret['comment'] = 'Package {0} upgraded to latest'.format(name)
+        ret['result'] = True
+        return ret
+
+    version = _version(name)
     avail = __salt__['pkg.available_version'](name)
 
     if not version:
@@ -148,20 +201,11 @@ def latest(name, refresh=False, repo='', skip_verify=False, **kwargs):
             ret['result'] = None
             ret['comment'] = 'Package {0} is set to be upgraded'.format(name)
             return ret
-        if refresh or os.path.isfile(rtag):
-            ret['changes'] = __salt__['pkg.install'](name,
-                             True,
-                             repo=repo,
-                             skip_verify=skip_verify,
-                             **kwargs)
-            if os.path.isfile(rtag):
-                os.remove(rtag)
-
-        else:
-            ret['changes'] = __salt__['pkg.install'](name,
-                             repo=repo,
-                             skip_verify=skip_verify,
-                             **kwargs)
+        ret['changes'] = _install(name,
+                                  refresh,
+                                  repo=repo,
+                                  skip_verify=skip_verify,
+                                  **kwargs)
 
         if ret['changes']:
             ret['comment'] = 'Package {0} upgraded to latest'.format(name)
@@ -186,7 +230,7 @@ def removed(name):
         The name of the package to be removed
     '''
     changes = {}
-    if not __salt__['pkg.version'](name):
+    if not _version(name):
         return {'name': name,
                 'changes': {},
                 'result': True,
@@ -199,6 +243,7 @@ def removed(name):
                     'comment': 'Package {0} is set to be installed'.format(
                         name)}
         changes['removed'] = __salt__['pkg.remove'](name)
+        __context__.pop('pkg.list_pkgs', None)
     if not changes:
         return {'name': name,
                 'changes': changes,
@@ -219,7 +264,7 @@ def purged(name):
         The name of the package to be purged
     '''
     changes = {}
-    if not __salt__['pkg.version'](name):
+    if not _version(name):
         return {'name': name,
                 'changes': {},
                 'result': True,
@@ -231,6 +276,7 @@ def purged(name):
                     'result': None,
                     'comment': 'Package {0} is set to be purged'.format(name)}
         changes['removed'] = __salt__['pkg.purge'](name)
+        __context__.pop('pkg.list_pkgs', None)
 
     if not changes:
         return {'name': name,
@@ -260,3 +306,75 @@ def mod_init(low):
             open(rtag, 'w+').write('')
         return True
     return False
+
+
+def mod_aggregate(lows):
+    '''
+    Install the packages of a number of pkg.installed and pkg.latest states
+    in a single transaction. This is called by the state system with all of
+    the pkg states which are ready to run at the same time, the states pick
+    up the changes for their package when they are called. A package which
+    fails to install in the transaction is installed again by its own state,
+    so that the failure is reported against the right state.
+
+    Returns the states whose packages were passed to the package manager.
+    '''
+    if __opts__['test']:
+        return []
+    provider = __salt__['pkg.install'].__module__.split('.')[-1]
+    if provider not in MULTI_INSTALL:
+        return []
+    groups = {}
+    for low in lows:
+        if low['fun'] != 'installed' and low['fun'] != 'latest':
+            continue
+        if [arg for arg in SINGLE_ARGS if low.get(arg) is not None]:
+            continue
+        key = (bool(low.get('refresh', False)),
+               low.get('repo', ''),
+               bool(low.get('skip_verify', False)))
+        groups.setdefault(key, []).append(low)
+    acted = []
+    for (refresh, repo, skip_verify), group in groups.items():
+        names = []
+        for low in group:
+            if low['name'] in names:
+                continue
+            version = _version(low['name'])
+            if low['fun'] == 'installed':
+                if version:
+                    continue
+            elif version:
+                avail = __salt__['pkg.available_version'](low['name'])
+                try:
+                    if not avail or \
+                            LooseVersion(avail) <= LooseVersion(version):
+                        continue
+                except AttributeError:
+                    # The state reports the broken version
+                    continue
+            names.append(low['name'])
+            acted.append(low)
+        if not names:
+            continue
+        logger.info(
+                'Installing {0} packages in a single transaction'.format(
+                    len(names)))
+        changes = _install(' '.join(names),
+                           refresh,
+                           repo=repo,
+                           skip_verify=skip_verify) or {}
+        results = __context__.setdefault('pkg.aggregate', {})
+        extra = {}
+        for pkg in changes:
+            if pkg not in names:
+                extra[pkg] = changes[pkg]
+        for name in names:
+            results[name] = {}
+            if name in changes:
+                results[name][name] = changes[name]
+                # The dependencies pulled in by the transaction are reported
+                # with the first package which was installed
+                results[name].update(extra)
+                extra = {}
+    return acted
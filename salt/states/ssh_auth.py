@@ -39,6 +39,46 @@ name.
 
 # Import python libs
 import re
+import logging
+
+log = logging.getLogger(__name__)
+
+
+def _parse_key(name, enc, comment, options):
+    '''
+    Split the name of a key into the key, enc, comment and options, the
+    name can be of the form "{options} {enc} {key} {comment}" or
+    "{key} {comment}"
+    '''
+    # check if this is of form {options} {enc} {key} {comment}
+    sshre = re.compile(r'^(.*?)\s?((?:ssh\-|ecds).+)$')
+    fullkey = sshre.search(name)
+    # if it is {key} [comment]
+    if not fullkey:
+        key_and_comment = name.split()
+        name = key_and_comment[0]
+        if len(key_and_comment) == 2:
+            comment = key_and_comment[1]
+    else:
+        # if there are options, set them
+        if fullkey.group(1):
+            options = fullkey.group(1).split(',')
+        # key is of format: {enc} {key} [comment]
+        comps = fullkey.group(2).split()
+        enc = comps[0]
+        name = comps[1]
+        if len(comps) == 3:
+            comment = comps[2]
+    return name, enc, comment, options
+
+
+def _aggregated(fun, user, config, name):
+    '''
+    Return the status mod_aggregate set for the named key, None if the key
+    was not part of an aggregated edit of the authorized keys file
+    '''
+    return __context__.get('ssh_auth.aggregate', {}).pop(
+            (fun, user, config, name), None)
 
 
 def _present_test(user, name, enc, comment, options, source, config, env):
@@ -149,33 +189,16 @@ def present(
                 config,
                 kwargs.get('__env__', 'base'))
     else:
-        # check if this is of form {options} {enc} {key} {comment}
-        sshre = re.compile(r'^(.*?)\s?((?:ssh\-|ecds).+)$')
-        fullkey = sshre.search(name)
-        # if it is {key} [comment]
-        if not fullkey:
-            key_and_comment = name.split()
-            name = key_and_comment[0]
-            if len(key_and_comment) == 2:
-                comment = key_and_comment[1]
-        else:
-            # if there are options, set them
-            if fullkey.group(1):
-                options = fullkey.group(1).split(',')
-            # key is of format: {enc} {key} [comment]
-            comps = fullkey.group(2).split()
-            enc = comps[0]
-            name = comps[1]
-            if len(comps) == 3:
-                comment = comps[2]
-
-        data = __salt__['ssh.set_auth_key'](
-                user,
-                name,
-                enc,
-                comment,
-                options,
-                config)
+        data = _aggregated('present', user, config, name)
+        name, enc, comment, options = _parse_key(name, enc, comment, options)
+        if data is None:
+            data = __salt__['ssh.set_auth_key'](
+                    user,
+                    name,
+                    enc,
+                    comment,
+                    options,
+                    config)
 
     if data == 'replace':
         ret['changes'][name] = 'Updated'
@@ -235,12 +258,73 @@ def absent(name, user, config='.ssh/authorized_keys'):
             ret['comment'] = 'Key is already absent'
             return ret
 
-    ret['comment'] = __salt__['ssh.rm_auth_key'](user, name, config)
+    ret['comment'] = _aggregated('absent', user, config, name)
+    if ret['comment'] is None:
+        ret['comment'] = __salt__['ssh.rm_auth_key'](user, name, config)
 
-    if ret['comment'] == 'User authorized keys file not present':
+    if ret['comment'] in ('User authorized keys file not present',
+                          'Failed to write the authorized keys file'):
         ret['result'] = False
         return ret
     elif ret['comment'] == 'Key removed':
         ret['changes'][name] = 'Removed'
 
     return ret
+
+
+def mod_aggregate(lows):
+    '''
+    Edit each authorized keys file once for all of the ssh_auth.present and
+    ssh_auth.absent states which are ready to run at the same time. The
+    states pick up the status of their key when they are called, states
+    with a source and keys which are named by more than one of the states
+    are left to the states.
+
+    Returns the states whose keys were edited.
+    '''
+    if __opts__['test']:
+        return []
+    edits = {}
+    for low in lows:
+        if low['fun'] != 'present' and low['fun'] != 'absent':
+            continue
+        if low.get('source') or 'user' not in low:
+            continue
+        config = low.get('config', '.ssh/authorized_keys')
+        edit = edits.setdefault(
+                (low['user'], config),
+                {'present': [], 'absent': [], 'lows': [], 'keys': {}})
+        if low['fun'] == 'present':
+            key, enc, comment, options = _parse_key(
+                    low['name'],
+                    low.get('enc', 'ssh-rsa'),
+                    low.get('comment', ''),
+                    low.get('options', []))
+            entry = {'key': key,
+                     'enc': enc,
+                     'comment': comment,
+                     'options': options}
+        else:
+            key = entry = low['name']
+        edit['keys'][key] = edit['keys'].get(key, 0) + 1
+        edit['lows'].append((low, key, entry))
+    acted = []
+    results = __context__.setdefault('ssh_auth.aggregate', {})
+    for (user, config), edit in edits.items():
+        batch = [(low, key, entry) for low, key, entry in edit['lows']
+                 if edit['keys'][key] == 1]
+        if len(batch) < 2:
+            continue
+        for low, key, entry in batch:
+            edit[low['fun']].append(entry)
+        log.info('Editing {0} keys in {1} of user {2} at once'.format(
+            len(batch), config, user))
+        data = __salt__['ssh.edit_auth_keys'](
+                user,
+                edit['present'],
+                edit['absent'],
+                config)
+        for low, key, entry in batch:
+            results[(low['fun'], user, config, low['name'])] = data[key]
+            acted.append(low)
+    return acted
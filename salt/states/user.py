@@ -48,51 +48,46 @@ def _changes(
     '''
 
     change = {}
-    found = False
 
     if __grains__['os'] != 'FreeBSD':
         lshad = __salt__['shadow.info'](name)
 
-    for lusr in __salt__['user.getent']():
-        # Scan over the users
-        if lusr['name'] == name:
-            found = True
-            wanted_groups = sorted(
-                    list(set((groups or []) + (optional_groups or []))))
-            if uid:
-                if lusr['uid'] != uid:
-                    change['uid'] = uid
-            if gid:
-                if lusr['gid'] != gid:
-                    change['gid'] = gid
-            if wanted_groups:
-                if lusr['groups'] != wanted_groups:
-                    change['groups'] = wanted_groups
-            if home:
-                if lusr['home'] != home:
-                    if not home is True:
-                        change['home'] = home
-            if shell:
-                if lusr['shell'] != shell:
-                    change['shell'] = shell
-            if password:
-                if __grains__['os'] != 'FreeBSD':
-                    if lshad['pwd'] == '!' or \
-                            lshad['pwd'] != '!' and enforce_password:
-                        if lshad['pwd'] != password:
-                            change['passwd'] = password
-            # GECOS fields
-            if lusr['fullname'] != fullname:
-                change['fullname'] = fullname
-            if lusr['roomnumber'] != roomnumber:
-                change['roomnumber'] = roomnumber
-            if lusr['workphone'] != workphone:
-                change['workphone'] = workphone
-            if lusr['homephone'] != homephone:
-                change['homephone'] = homephone
-
-    if not found:
+    lusr = __salt__['user.info'](name)
+    if not lusr or lusr.get('name') != name:
         return False
+    wanted_groups = sorted(
+            list(set((groups or []) + (optional_groups or []))))
+    if uid:
+        if lusr['uid'] != uid:
+            change['uid'] = uid
+    if gid:
+        if lusr['gid'] != gid:
+            change['gid'] = gid
+    if wanted_groups:
+        if lusr['groups'] != wanted_groups:
+            change['groups'] = wanted_groups
+    if home:
+        if lusr['home'] != home:
+            if not home is True:
+                change['home'] = home
+    if shell:
+        if lusr['shell'] != shell:
+            change['shell'] = shell
+    if password:
+        if __grains__['os'] != 'FreeBSD':
+            if lshad['pwd'] == '!' or \
+                    lshad['pwd'] != '!' and enforce_password:
+                if lshad['pwd'] != password:
+                    change['passwd'] = password
+    # GECOS fields
+    if lusr['fullname'] != fullname:
+        change['fullname'] = fullname
+    if lusr['roomnumber'] != roomnumber:
+        change['roomnumber'] = roomnumber
+    if lusr['workphone'] != workphone:
+        change['workphone'] = workphone
+    if lusr['homephone'] != homephone:
+        change['homephone'] = homephone
     return change
 
 
@@ -324,22 +319,21 @@ def absent(name, purge=False, force=False):
            'result': True,
            'comment': ''}
 
-    for lusr in __salt__['user.getent']():
-        # Scan over the users
-        if lusr['name'] == name:
-            # The user is present, make it not present
-            if __opts__['test']:
-                ret['result'] = None
-                ret['comment'] = 'User {0} set for removal'.format(name)
-                return ret
-            ret['result'] = __salt__['user.delete'](name, purge, force)
-            if ret['result']:
-                ret['changes'] = {name: 'removed'}
-                ret['comment'] = 'Removed user {0}'.format(name)
-            else:
-                ret['result'] = False
-                ret['comment'] = 'Failed to remove user {0}'.format(name)
+    lusr = __salt__['user.info'](name)
+    if lusr and lusr.get('name') == name:
+        # The user is present, make it not present
+        if __opts__['test']:
+            ret['result'] = None
+            ret['comment'] = 'User {0} set for removal'.format(name)
             return ret
+        ret['result'] = __salt__['user.delete'](name, purge, force)
+        if ret['result']:
+            ret['changes'] = {name: 'removed'}
+            ret['comment'] = 'Removed user {0}'.format(name)
+        else:
+            ret['result'] = False
+            ret['comment'] = 'Failed to remove user {0}'.format(name)
+        return ret
 
     ret['comment'] = 'User {0} is not present'.format(name)
 
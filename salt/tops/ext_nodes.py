@@ -17,16 +17,14 @@ The cobbler-ext-nodes command can be used with this configuration:
 It is noteworthy that the Salt system does not directly ingest the data
 sent from the ``cobbler-ext-nodes`` command, but converts the data into
 information that is used by a Salt top file.
-'''
-
-# Import python libs
-import subprocess
 
-# Import third party libs
-import yaml
+With the ``tops_cache_ttl`` and ``external_nodes_batch`` master options set,
+the command is run for many minions at once and has to return a mapping of
+the minion ids to the data it returns for a single minion.
+'''
 
-# Import Salt libs
-import salt.utils
+# Import salt libs
+import salt.utils.topscache
 
 
 def __virtual__():
@@ -44,28 +42,8 @@ def top(**kwargs):
     '''
     if not 'id' in kwargs['opts']:
         return {}
-    cmd = '{0} {1}'.format(
+    ndata = salt.utils.topscache.TopsCache(__opts__).enc(
             __opts__['master_tops']['ext_nodes'],
             kwargs['opts']['id']
             )
-    ndata = yaml.safe_load(
-            subprocess.Popen(
-                cmd,
-                shell=True,
-                stdout=subprocess.PIPE
-                ).communicate()[0])
-    print ndata
-    ret = {}
-    if 'environment' in ndata:
-        env = ndata['environment']
-    else:
-        env = 'base'
-
-    if 'classes' in ndata:
-        if isinstance(ndata['classes'], dict):
-            ret[env] = list(ndata['classes'])
-        elif isinstance(ndata['classes'], list):
-            ret[env] = ndata['classes']
-        else:
-            return ret
-    return ret 
+    return salt.utils.topscache.parse_enc(ndata)
@@ -23,7 +23,6 @@ import platform
 from calendar import month_abbr as months
 
 # Import Salt libs
-import salt.minion
 import salt.payload
 from salt.exceptions import SaltClientError, CommandNotFoundError
 
@@ -189,6 +188,7 @@ def daemonize_if(opts, **kwargs):
             data[key[6:]] = val
     if not 'jid' in data:
         return
+    import salt.minion
     serial = salt.payload.Serial(opts)
     proc_dir = salt.minion.get_proc_dir(opts['cachedir'])
     fn_ = os.path.join(proc_dir, data['jid'])
@@ -376,11 +376,18 @@ def required_modules_error(name, docstring):
     return msg.format(filename, ', '.join(modules))
 
 
+def gen_jid():
+    '''
+    Return a job id made of the current time
+    '''
+    return "{0:%Y%m%d%H%M%S%f}".format(datetime.datetime.now())
+
+
 def prep_jid(cachedir, sum_type, user='root'):
     '''
     Return a job id and prepare the job id directory
     '''
-    jid = "{0:%Y%m%d%H%M%S%f}".format(datetime.datetime.now())
+    jid = gen_jid()
 
     jid_dir_ = jid_dir(jid, cachedir, sum_type)
     if not os.path.isdir(jid_dir_):
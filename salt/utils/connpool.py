@@ -0,0 +1,236 @@
+'''
+Process wide pools of connections to databases and other services
+
+Execution modules which talk to a service over a connection which is
+expensive to set up check their connections out of a pool, and close them
+when they are done, in a finally clause, to release them. A released
+connection is kept open, so that the next function call in the same job, or
+in a later job run by the same process, does not have to connect again. The
+connections are keyed by the target and the credentials they were opened
+with.
+
+The pools live as long as the process. The master workers and a minion with
+multiprocessing set to False keep them across jobs. With the default
+multiprocessing: True every job of the minion runs in a new process which
+starts without idle connections, so the connections are only reused within
+a job.
+
+The pools are configured with the connection_pool_size and
+connection_pool_idle_timeout minion and master options.
+'''
+
+# Import python libs
+import os
+import time
+import logging
+import threading
+
+log = logging.getLogger(__name__)
+
+_POOLS = {}
+_LOCK = threading.Lock()
+
+
+def get_pool(name, opts, check=None, close=None):
+    '''
+    Return the named connection pool of the process, the pool is created
+    the first time it is asked for.
+
+    check is called with an idle connection before it is reused and returns
+    False or raises an exception if the connection is broken, close is
+    called to close a connection, by default the close method of the
+    connection is called.
+    '''
+    with _LOCK:
+        if name not in _POOLS:
+            _POOLS[name] = Pool(
+                    name,
+                    opts.get('connection_pool_size', 4),
+                    opts.get('connection_pool_idle_timeout', 300),
+                    check,
+                    close)
+        return _POOLS[name]
+
+
+def close_all():
+    '''
+    Close the idle connections of all of the pools and forget the pools
+    '''
+    with _LOCK:
+        pools = _POOLS.values()
+        _POOLS.clear()
+    for pool in pools:
+        pool.clear()
+
+
+class Pool(object):
+    '''
+    A pool of connections of the same kind. Up to size idle connections are
+    kept for each key, a connection which was idle for longer than
+    idle_timeout seconds is closed. Connections are never shared, when all
+    of the connections for a key are in use a new one is opened.
+    '''
+    def __init__(self, name, size=4, idle_timeout=300, check=None,
+            close=None):
+        self.name = name
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.check = check
+        self._close = close
+        self.idle = {}
+        self.stats = {'created': 0, 'reused': 0, 'closed': 0}
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+
+    def _fork_check(self):
+        '''
+        Forget the connections of the parent process after a fork, they are
+        still used by the parent and must not be closed or used here
+        '''
+        if self.pid != os.getpid():
+            self.idle = {}
+            self.pid = os.getpid()
+
+    def _expired(self):
+        '''
+        Remove the connections which were idle for too long and return them
+        '''
+        expired = []
+        limit = time.time() - self.idle_timeout
+        for key in self.idle.keys():
+            keep = []
+            for conn, stamp in self.idle[key]:
+                if stamp < limit:
+                    expired.append(conn)
+                else:
+                    keep.append((conn, stamp))
+            if keep:
+                self.idle[key] = keep
+            else:
+                self.idle.pop(key)
+        return expired
+
+    def close(self, conn):
+        '''
+        Close a connection, errors are logged and ignored
+        '''
+        self.stats['closed'] += 1
+        try:
+            if self._close is None:
+                conn.close()
+            else:
+                self._close(conn)
+        except Exception as exc:
+            log.debug('Failed to close a {0} connection: {1}'.format(
+                self.name, exc))
+
+    def healthy(self, conn):
+        '''
+        Return True if the idle connection can be used again
+        '''
+        if self.check is None:
+            return True
+        try:
+            return self.check(conn) is not False
+        except Exception as exc:
+            log.debug('Dropping a broken {0} connection: {1}'.format(
+                self.name, exc))
+            return False
+
+    def acquire(self, key, create):
+        '''
+        Check a connection for key out of the pool, create is called to open
+        a new connection when there is no usable idle connection. Returns a
+        Connection which goes back to the pool when it is closed or no
+        longer referenced.
+        '''
+        while True:
+            with self.lock:
+                self._fork_check()
+                expired = self._expired()
+                idle = self.idle.get(key)
+                conn = idle.pop()[0] if idle else None
+            for old in expired:
+                self.close(old)
+            if conn is None:
+                break
+            if self.healthy(conn):
+                self.stats['reused'] += 1
+                return Connection(self, key, conn, True)
+            self.close(conn)
+        conn = create()
+        self.stats['created'] += 1
+        return Connection(self, key, conn, False)
+
+    def release(self, key, conn):
+        '''
+        Return a connection to the pool, it is closed if the pool is full
+        '''
+        with self.lock:
+            self._fork_check()
+            idle = self.idle.setdefault(key, [])
+            if len(idle) < self.size:
+                idle.append((conn, time.time()))
+                return
+            if not idle:
+                self.idle.pop(key)
+        self.close(conn)
+
+    def clear(self):
+        '''
+        Close all of the idle connections
+        '''
+        with self.lock:
+            self._fork_check()
+            idle = self.idle
+            self.idle = {}
+        for conns in idle.values():
+            for conn, stamp in conns:
+                self.close(conn)
+
+
+class Connection(object):
+    '''
+    A connection checked out of a Pool, attribute and item access is passed
+    on to the connection. Closing the Connection returns the connection to
+    the pool, the users close it explicitly. A Connection which is collected
+    without being closed is only returned as a last resort.
+    '''
+    def __init__(self, pool, key, conn, reused):
+        self._pool = pool
+        self._key = key
+        self._conn = conn
+        self._pid = os.getpid()
+        self.reused = reused
+
+    def __getattr__(self, attr):
+        conn = self.__dict__.get('_conn')
+        if conn is None:
+            raise AttributeError(attr)
+        return getattr(conn, attr)
+
+    def __getitem__(self, key):
+        return self._conn[key]
+
+    def close(self):
+        '''
+        Return the connection to the pool
+        '''
+        conn = self.__dict__.get('_conn')
+        self._conn = None
+        # A connection inherited from the parent process is left alone
+        if conn is not None and self._pid == os.getpid():
+            self._pool.release(self._key, conn)
+
+    def discard(self):
+        '''
+        Close the connection for good, for connections which broke while
+        they were used
+        '''
+        conn = self.__dict__.get('_conn')
+        self._conn = None
+        if conn is not None and self._pid == os.getpid():
+            self._pool.close(conn)
+
+    def __del__(self):
+        self.close()
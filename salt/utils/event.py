@@ -213,3 +213,25 @@ class EventPublisher(multiprocessing.Process):
         except KeyboardInterrupt:
             epub_sock.close()
             epull_sock.close()
+
+
+def minion_refresh(opts, pillar=False):
+    '''
+    Ask the running minion to reload its modules, and to compile its pillar
+    again if pillar is True. The request is left in the module_refresh file
+    of the cachedir, where the minion reads it when it starts, and an event
+    tagged module_refresh wakes up the running minion to read it right away.
+    '''
+    fn_ = os.path.join(opts['cachedir'], 'module_refresh')
+    with open(fn_, 'a+') as fp_:
+        fp_.write('pillar' if pillar else '')
+    try:
+        event = MinionEvent(**opts)
+        event.connect_pull()
+        # Do not hang on exit when no minion is listening
+        event.push.setsockopt(zmq.LINGER, 100)
+        event.fire_event({'pillar': pillar}, 'module_refresh')
+        event.push.close()
+        event.context.term()
+    except Exception as exc:
+        log.debug('Failed to fire the module_refresh event: {0}'.format(exc))
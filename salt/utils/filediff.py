@@ -0,0 +1,110 @@
+'''
+Diffs of managed files with bounded memory and size
+
+The diff of a managed file ends up in the state return, which is encrypted,
+sent to the master, written to the job cache and printed. Files larger than
+diff_max_bytes are not read into memory to be diffed, and diffs longer than
+diff_max_lines lines are cut short. In both cases, and for binary files, the
+diff is replaced with a summary of the sizes and hashes of the two files and
+the first line they differ on.
+'''
+from __future__ import absolute_import
+
+# Import python libs
+import os
+import difflib
+import itertools
+from contextlib import nested  # For < 2.7 compat
+
+# Import salt libs
+import salt.utils.hashcache
+
+# The bytes read to tell binary files from text files
+BLOCK_SIZE = 8192
+# The characters found in text files
+TEXT_CHARS = ''.join(map(chr, [7, 8, 9, 10, 12, 13, 27] + range(0x20, 0x100)))
+
+
+def is_binary(path):
+    '''
+    Return True if the file looks like a binary file, judged from its first
+    block: a NULL byte or more than 30% of control characters make a binary
+    file
+    '''
+    with open(path, 'rb') as fp_:
+        block = fp_.read(BLOCK_SIZE)
+    if not block:
+        return False
+    if '\0' in block:
+        return True
+    return len(block.translate(None, TEXT_CHARS)) > len(block) * 0.3
+
+
+def first_difference(old, new):
+    '''
+    Return the number of the first line the files differ on, the files are
+    compared line by line without reading them into memory
+    '''
+    with nested(open(old, 'rb'), open(new, 'rb')) as (ofp, nfp):
+        num = 0
+        for num, (oline, nline) in enumerate(
+                itertools.izip_longest(ofp, nfp), 1):
+            if oline != nline:
+                return num
+    return num + 1
+
+
+def summary(old, new, reason, hash_type='md5', opts=None):
+    '''
+    Return a summary of the change from the file old to the file new
+    '''
+    ret = ['{0}, diff not shown'.format(reason)]
+    for label, path in (('old', old), ('new', new)):
+        ret.append('{0}: {1} bytes, {2}={3}'.format(
+            label,
+            os.path.getsize(path),
+            hash_type,
+            salt.utils.hashcache.get_hash(path, hash_type, opts)))
+    if reason != 'Binary file':
+        ret.append('First difference on line {0}'.format(
+            first_difference(old, new)))
+    return '\n'.join(ret) + '\n'
+
+
+def file_diff(old, new, opts=None, show_diff=None):
+    '''
+    Return the unified diff of the file old to the file new, like diff -u,
+    or a summary if a file is binary or a limit of the opts is hit.
+    show_diff set to False always returns the summary, set to True it lifts
+    the limits.
+    '''
+    opts = opts or {}
+    max_bytes = opts.get('diff_max_bytes', 1048576)
+    max_lines = opts.get('diff_max_lines', 1000)
+    if show_diff is True:
+        max_bytes = max_lines = None
+    if is_binary(old) or is_binary(new):
+        return summary(old, new, 'Binary file', opts=opts)
+    if show_diff is False:
+        return summary(old, new, 'Diff disabled', opts=opts)
+    if max_bytes is not None and max(os.path.getsize(old),
+                                     os.path.getsize(new)) > max_bytes:
+        return summary(
+            old,
+            new,
+            'File larger than {0} bytes'.format(max_bytes),
+            opts=opts)
+    with nested(open(old, 'rb'), open(new, 'rb')) as (ofp, nfp):
+        olines = ofp.readlines()
+        nlines = nfp.readlines()
+    ret = []
+    for num, line in enumerate(difflib.unified_diff(olines, nlines), 1):
+        if max_lines is not None and num > max_lines:
+            ret.append(summary(
+                old,
+                new,
+                'Diff longer than {0} lines'.format(max_lines),
+                opts=opts))
+            break
+        ret.append(line)
+    return ''.join(ret)
@@ -0,0 +1,187 @@
+'''
+A persistent cache of the hashes of the files on the minion
+
+The file states hash the managed files and the files cached from the master
+on every run, which reads every byte of them even when nothing changed. The
+hashes are kept in the hash_cache.p file of the minion cachedir, keyed by the
+device, inode and hash type of the file, and are reused as long as the size,
+mtime and ctime of the file stay the same. A file which changed within the
+last RACY_WINDOW seconds is hashed but its hash is not kept, its timestamps
+could stay the same after one more write.
+
+The bytes which were hashed and the bytes which did not need to be hashed
+are counted in STATS, the state system returns them for each run under the
+__run_stats__ key of the state return.
+'''
+from __future__ import absolute_import
+
+# Import python libs
+import os
+import time
+import hashlib
+import logging
+import threading
+
+# Import salt libs
+import salt.payload
+import salt.utils.atomicfile
+
+log = logging.getLogger(__name__)
+
+CHUNK_SIZE = 65536
+# Files changed this many seconds ago or less are not cached
+RACY_WINDOW = 2
+# The most entries the cache file holds
+MAX_ENTRIES = 100000
+
+# The number of bytes which were hashed and which were served from the cache
+# in this process
+STATS = {'hashed': 0, 'cached': 0}
+
+# The caches loaded in this process, keyed by the cachedir
+_CACHES = {}
+_LOCK = threading.Lock()
+
+
+def digest(path, hash_type):
+    '''
+    Return the hex digest of the file at path, the file is read in chunks
+    '''
+    hasher = getattr(hashlib, hash_type)()
+    with open(path, 'rb') as fp_:
+        while True:
+            chunk = fp_.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _ns(stamp):
+    '''
+    Return a timestamp of the stat result in nanoseconds
+    '''
+    return int(round(stamp * 1000000000))
+
+
+def stamp(st_):
+    '''
+    Return the stamp of a file from its stat result, a hash of the file stays
+    valid as long as the stamp does
+    '''
+    return [st_.st_size, _ns(st_.st_mtime), _ns(st_.st_ctime)]
+
+
+def racy(st_):
+    '''
+    Return True if the file changed too recently for its hash to be kept, a
+    write in the same tick of the clock would keep the stamp the same
+    '''
+    return time.time() - st_.st_mtime <= RACY_WINDOW
+
+
+class HashCache(object):
+    '''
+    The hashes of the files on the minion, loaded from and saved to the
+    hash_cache.p file of the cachedir
+    '''
+    def __init__(self, opts):
+        self.path = os.path.join(opts['cachedir'], 'hash_cache.p')
+        self.serial = salt.payload.Serial(opts)
+        self.entries = self._load()
+        self.new = {}
+
+    def _load(self):
+        '''
+        Return the entries saved in the cache file
+        '''
+        if not os.path.isfile(self.path):
+            return {}
+        try:
+            with open(self.path, 'rb') as fp_:
+                entries = self.serial.loads(fp_.read())
+        except Exception as exc:
+            log.debug('Failed to read the hash cache {0}: {1}'.format(
+                self.path, exc))
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    def get(self, path, hash_type):
+        '''
+        Return the hash of the file at path, from the cache when the file did
+        not change since it was hashed
+        '''
+        st_ = os.stat(path)
+        key = '{0}:{1}:{2}'.format(st_.st_dev, st_.st_ino, hash_type)
+        fstamp = stamp(st_)
+        with _LOCK:
+            entry = self.new.get(key, self.entries.get(key))
+        if entry and list(entry[0]) == fstamp:
+            STATS['cached'] += st_.st_size
+            return entry[1]
+        hsum = digest(path, hash_type)
+        STATS['hashed'] += st_.st_size
+        if not racy(st_):
+            with _LOCK:
+                self.new[key] = [fstamp, hsum]
+        return hsum
+
+    def save(self):
+        '''
+        Write the new hashes to the cache file, merged with the hashes other
+        processes saved since it was loaded
+        '''
+        with _LOCK:
+            if not self.new:
+                return
+            new, self.new = self.new, {}
+        entries = self._load()
+        entries.update(new)
+        if len(entries) > MAX_ENTRIES:
+            # Keep the hashes of this run and as many of the others as fit
+            keep = dict(list(entries.items())[:MAX_ENTRIES - len(new)])
+            keep.update(new)
+            entries = keep
+        try:
+            with salt.utils.atomicfile.atomic_open(self.path, 'wb') as fp_:
+                fp_.write(self.serial.dumps(entries))
+        except (IOError, OSError) as exc:
+            log.error('Failed to write the hash cache {0}: {1}'.format(
+                self.path, exc))
+        self.entries = entries
+
+
+def get_hash(path, hash_type, opts=None):
+    '''
+    Return the hash of the file at path, with the opts of a minion the hash
+    comes from the hash cache in its cachedir unless hash_cache is False
+    '''
+    if not opts or not opts.get('hash_cache', True) \
+            or 'cachedir' not in opts:
+        hsum = digest(path, hash_type)
+        STATS['hashed'] += os.path.getsize(path)
+        return hsum
+    with _LOCK:
+        if opts['cachedir'] not in _CACHES:
+            _CACHES[opts['cachedir']] = HashCache(opts)
+        cache = _CACHES[opts['cachedir']]
+    return cache.get(path, hash_type)
+
+
+def save():
+    '''
+    Save the new hashes of all of the caches loaded in this process
+    '''
+    for cache in list(_CACHES.values()):
+        cache.save()
+
+
+def stats():
+    '''
+    Return the number of bytes hashed and served from the cache in this
+    process, and reset the counters
+    '''
+    ret = dict(STATS)
+    STATS['hashed'] = 0
+    STATS['cached'] = 0
+    return ret
@@ -0,0 +1,197 @@
+'''
+Snapshots of the passwd, group and shadow databases
+
+During a state run the user, group and shadow execution modules share a
+single snapshot of the databases through the loader context. The snapshot
+is read once and the functions which change users and groups update the
+entries they touched, so that the states can look up users and groups
+without enumerating the databases over and over again. Users and groups
+can also be added by other states, like a package which creates its own
+user, so a name which is not in the snapshot is looked up again.
+'''
+
+# Import python libs
+try:
+    import pwd
+    import grp
+except ImportError:
+    pass
+try:
+    import spwd
+    HAS_SPWD = True
+except ImportError:
+    HAS_SPWD = False
+
+
+def get(context):
+    '''
+    Return the inventory kept in the passed loader context, None when the
+    context does not belong to a state run
+    '''
+    if not context.get('state.run'):
+        return None
+    if 'inventory' not in context:
+        context['inventory'] = Inventory()
+    return context['inventory']
+
+
+class Inventory(object):
+    '''
+    The passwd, group and shadow databases. Each database is read in full
+    the first time it is used, afterwards only the changed entries are read
+    again.
+    '''
+    def __init__(self):
+        self._users = None
+        self._groups = None
+        self._gids = None
+        self._members = None
+        self._shadow = None
+
+    def _load_users(self):
+        '''
+        Read the passwd database
+        '''
+        if self._users is None:
+            self._users = {}
+            for ent in pwd.getpwall():
+                self._users.setdefault(ent.pw_name, ent)
+        return self._users
+
+    def _load_groups(self):
+        '''
+        Read the group database and index it by gid and by member
+        '''
+        if self._groups is None:
+            self._groups = {}
+            self._gids = {}
+            self._members = {}
+            for ent in grp.getgrall():
+                if ent.gr_name in self._groups:
+                    continue
+                self._add_group(ent)
+        return self._groups
+
+    def _load_shadow(self):
+        '''
+        Read the shadow database
+        '''
+        if self._shadow is None:
+            self._shadow = {}
+            if HAS_SPWD:
+                for ent in spwd.getspall():
+                    self._shadow.setdefault(ent.sp_nam, ent)
+        return self._shadow
+
+    def _add_group(self, ent):
+        '''
+        Add a group entry to the group indexes
+        '''
+        self._groups[ent.gr_name] = ent
+        self._gids.setdefault(ent.gr_gid, ent.gr_name)
+        for member in ent.gr_mem:
+            self._members.setdefault(member, set()).add(ent.gr_name)
+
+    def _remove_group(self, name):
+        '''
+        Remove a group entry from the group indexes
+        '''
+        ent = self._groups.pop(name, None)
+        if ent is None:
+            return
+        if self._gids.get(ent.gr_gid) == name:
+            self._gids.pop(ent.gr_gid)
+        for member in ent.gr_mem:
+            self._members.get(member, set()).discard(name)
+
+    def user(self, name):
+        '''
+        Return the passwd entry of the named user, None if it does not exist
+        '''
+        users = self._load_users()
+        if name not in users:
+            try:
+                users[name] = pwd.getpwnam(name)
+            except KeyError:
+                return None
+        return users[name]
+
+    def users(self):
+        '''
+        Return all of the passwd entries
+        '''
+        return self._load_users().values()
+
+    def group(self, name):
+        '''
+        Return the group entry of the named group, None if it does not exist
+        '''
+        groups = self._load_groups()
+        if name not in groups:
+            try:
+                self._add_group(grp.getgrnam(name))
+            except KeyError:
+                return None
+        return groups[name]
+
+    def groups(self):
+        '''
+        Return all of the group entries
+        '''
+        return self._load_groups().values()
+
+    def user_groups(self, name):
+        '''
+        Return the sorted names of the groups the named user belongs to, a
+        KeyError is raised if the user or its primary group do not exist
+        '''
+        ent = self.user(name)
+        if ent is None:
+            raise KeyError(name)
+        self._load_groups()
+        if ent.pw_gid not in self._gids:
+            # The primary group may have been added since the snapshot
+            self._add_group(grp.getgrgid(ent.pw_gid))
+        ugrp = set(self._members.get(name, ()))
+        ugrp.add(self._gids[ent.pw_gid])
+        return sorted(ugrp)
+
+    def shadow(self, name):
+        '''
+        Return the shadow entry of the named user, None if it does not exist
+        '''
+        shadow = self._load_shadow()
+        if name not in shadow and HAS_SPWD:
+            try:
+                shadow[name] = spwd.getspnam(name)
+            except KeyError:
+                return None
+        return shadow.get(name)
+
+    def update_user(self, name):
+        '''
+        Read the passwd and shadow entries of the named user again after it
+        was changed
+        '''
+        if self._users is not None:
+            try:
+                self._users[name] = pwd.getpwnam(name)
+            except KeyError:
+                self._users.pop(name, None)
+        if self._shadow is not None and HAS_SPWD:
+            try:
+                self._shadow[name] = spwd.getspnam(name)
+            except KeyError:
+                self._shadow.pop(name, None)
+
+    def update_group(self, name):
+        '''
+        Read the entry of the named group again after it was changed
+        '''
+        if self._groups is None:
+            return
+        self._remove_group(name)
+        try:
+            self._add_group(grp.getgrnam(name))
+        except KeyError:
+            pass
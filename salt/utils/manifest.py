@@ -0,0 +1,88 @@
+'''
+Manifests of the directories on the file server
+
+A manifest lists the files below a directory of an environment with their
+size, mode and hash, so that a minion can find out which of its cached files
+are out of date with a single request to the master.
+'''
+
+# Import python libs
+import os
+import stat
+
+# Import salt libs
+import salt.utils.hashcache
+
+
+def hash_file(path, hash_type, cache=None):
+    '''
+    Return the hex digest of the file at path, the file is read in chunks.
+    When a cache dict is passed the digest is kept in it, keyed by the path,
+    and reused as long as the stamp of the file stays the same, like in the
+    hash cache of the minion. The digest of a file which changed in the last
+    RACY_WINDOW seconds is not kept.
+    '''
+    if cache is None:
+        return salt.utils.hashcache.digest(path, hash_type)
+    st_ = os.stat(path)
+    stamp = salt.utils.hashcache.stamp(st_) + [hash_type]
+    if path in cache and cache[path][0] == stamp:
+        return cache[path][1]
+    hsum = salt.utils.hashcache.digest(path, hash_type)
+    if salt.utils.hashcache.racy(st_):
+        cache.pop(path, None)
+    else:
+        cache[path] = (stamp, hsum)
+    return hsum
+
+
+def in_dir(fn_, path):
+    '''
+    Return True if the relative path fn_ is the directory path, or is found
+    below it. An empty path is the root of the environment.
+    '''
+    path = path.strip('/')
+    if not path:
+        return True
+    return fn_ == path or fn_.startswith(path + '/')
+
+
+def build(roots, path, hash_type, cache=None):
+    '''
+    Return the manifest of the directory path in the passed file roots. The
+    files are listed with their path relative to the root they were found
+    in, when the same file is found in several roots the first root wins,
+    like it does when the file is served.
+    '''
+    ret = {'hash_type': hash_type,
+           'files': {},
+           'empty_dirs': []}
+    path = path.strip('/')
+    if os.path.isabs(path) or '..' in path.split('/'):
+        return ret
+    for root in roots:
+        full = os.path.join(root, path)
+        if os.path.isfile(full):
+            walk = [(os.path.dirname(full), [], [os.path.basename(full)])]
+        else:
+            walk = os.walk(full, followlinks=True)
+        for dirpath, dirs, files in walk:
+            if not dirs and not files:
+                rel = os.path.relpath(dirpath, root)
+                if rel not in ret['empty_dirs']:
+                    ret['empty_dirs'].append(rel)
+            for name in files:
+                fn_ = os.path.join(dirpath, name)
+                rel = os.path.relpath(fn_, root)
+                if rel in ret['files']:
+                    continue
+                try:
+                    st_ = os.stat(fn_)
+                    hsum = hash_file(fn_, hash_type, cache)
+                except (IOError, OSError):
+                    # The file went away or can not be read
+                    continue
+                ret['files'][rel] = {'size': st_.st_size,
+                                     'mode': stat.S_IMODE(st_.st_mode),
+                                     'hsum': hsum}
+    return ret
@@ -0,0 +1,220 @@
+'''
+Conditional requests for the metadata the minions ask the master for
+
+Every HighState object asks the master for its options and for the list of
+the files of every environment, and the file client asks for the file lists
+again in many of its calls. The data rarely changes, so a minion sends the
+version of the copy it kept of the last reply with each of these requests
+and the master only answers that the copy is current when it is. The
+version is a hash of the data, so all of the master workers agree on it and
+it changes as soon as the master configuration or the files in the
+file_roots change.
+
+The master keeps the lists of an environment until one of the directories
+they were made from changes, so the file_roots are not walked for minions
+whose copy is current. The minion keeps the last replies in its cachedir.
+A master which does not know about versions sends the data every time, and
+a minion which does not send a version always gets the data.
+'''
+from __future__ import absolute_import
+
+# Import python libs
+import os
+import json
+import time
+import hashlib
+import logging
+
+# Import salt libs
+import salt.payload
+import salt.utils.atomicfile
+
+log = logging.getLogger(__name__)
+
+# The master options the minions use
+MASTER_OPTS = ('file_roots', 'renderer', 'failhard', 'state_top', 'nodegroups')
+
+# The lists made by a walk of the file_roots are only kept when the mtimes
+# of the directories are older than the walk by this many seconds, changes
+# made while the directories were walked would be missed otherwise
+MTIME_SLACK = 1
+
+
+def version(data):
+    '''
+    Return the version of the passed data
+    '''
+    return hashlib.md5(
+            json.dumps(data, sort_keys=True, default=repr)).hexdigest()
+
+
+def reply(load, data, ver=None):
+    '''
+    Return the reply of the master to the metadata request load, the data is
+    left out when the minion sent the current version of it
+    '''
+    if 'version' not in load:
+        return data
+    if ver is None:
+        ver = version(data)
+    if load['version'] == ver:
+        return {'version': ver, 'current': True}
+    return {'version': ver, 'data': data}
+
+
+def master_opts(opts):
+    '''
+    Return the master options the minions use
+    '''
+    return dict((key, opts[key]) for key in MASTER_OPTS if key in opts)
+
+
+def _mtime(path):
+    '''
+    Return the mtime of the path, None if it does not exist
+    '''
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+class FileLists(object):
+    '''
+    The lists of the files, the empty directories and the directories of the
+    environments of the master file server, and their versions
+    '''
+    def __init__(self, opts):
+        self.opts = opts
+        self.envs = {}
+
+    def _current(self, entry):
+        '''
+        Return True if none of the directories the entry was made from
+        changed since
+        '''
+        for path, mtime in entry['stamp'].items():
+            if _mtime(path) != mtime:
+                return False
+        return True
+
+    def _walk(self, env):
+        '''
+        Walk the roots of the environment and return the entry of its lists
+        '''
+        start = time.time()
+        entry = {'files': [],
+                 'emptydirs': [],
+                 'dirs': [],
+                 'stamp': {},
+                 'versions': {}}
+        for path in self.opts['file_roots'].get(env, []):
+            entry['stamp'][path] = _mtime(path)
+            for root, dirs, files in os.walk(path, followlinks=True):
+                entry['stamp'][root] = _mtime(root)
+                rel = os.path.relpath(root, path)
+                entry['dirs'].append(rel)
+                if not dirs and not files:
+                    entry['emptydirs'].append(rel)
+                for fn_ in files:
+                    entry['files'].append(
+                            os.path.relpath(os.path.join(root, fn_), path))
+        entry['keep'] = env in self.opts['file_roots'] and all(
+                mtime is None or mtime < start - MTIME_SLACK
+                for mtime in entry['stamp'].values())
+        return entry
+
+    def get(self, env, kind):
+        '''
+        Return the list of the environment of the passed kind, files,
+        emptydirs or dirs, and its version
+        '''
+        entry = self.envs.get(env)
+        if entry is None or not self._current(entry):
+            self.envs.pop(env, None)
+            entry = self._walk(env)
+            if entry['keep']:
+                self.envs[env] = entry
+        if kind not in entry['versions']:
+            entry['versions'][kind] = version(entry[kind])
+        return entry[kind], entry['versions'][kind]
+
+
+class MinionCache(object):
+    '''
+    The last replies of the master to the metadata requests of the minion,
+    kept in the minion cachedir
+    '''
+    def __init__(self, opts):
+        self.cachedir = os.path.join(opts['cachedir'], 'meta')
+        self.serial = salt.payload.Serial(opts)
+        self.replies = {}
+
+    def _path(self, load):
+        '''
+        Return the cache file of the request, None for environments which
+        can not be used in a file name
+        '''
+        name = load['cmd'].lstrip('_')
+        if 'env' in load:
+            env = load['env']
+            if not env or os.sep in env or env.startswith('.'):
+                return None
+            name = '{0}_{1}'.format(name, env)
+        return os.path.join(self.cachedir, '{0}.p'.format(name))
+
+    def _read(self, path):
+        '''
+        Return the cached reply
+        '''
+        if path in self.replies:
+            return self.replies[path]
+        if not os.path.isfile(path):
+            return None
+        try:
+            with open(path, 'rb') as fp_:
+                cached = self.serial.loads(fp_.read())
+        except Exception as exc:
+            log.debug('Failed to read the cached reply {0}: {1}'.format(
+                path, exc))
+            return None
+        if not isinstance(cached, dict) or 'version' not in cached:
+            return None
+        self.replies[path] = cached
+        return cached
+
+    def _write(self, path, cached):
+        '''
+        Cache the reply
+        '''
+        self.replies[path] = cached
+        try:
+            if not os.path.isdir(self.cachedir):
+                os.makedirs(self.cachedir)
+            with salt.utils.atomicfile.atomic_open(path, 'w+b') as fp_:
+                fp_.write(self.serial.dumps(cached))
+        except (IOError, OSError) as exc:
+            log.debug('Failed to cache the reply {0}: {1}'.format(path, exc))
+
+    def request(self, load, send):
+        '''
+        Send the load with the version of the cached reply and return the
+        data, send is called with the load to send it to the master and
+        returns the reply
+        '''
+        path = self._path(load)
+        if path is None:
+            return send(load)
+        cached = self._read(path)
+        ret = send(dict(load, version=cached and cached['version']))
+        if not isinstance(ret, dict) or 'version' not in ret:
+            # The master does not know about versions
+            return ret
+        if set(ret) == set(['version', 'current']):
+            if cached and cached['version'] == ret['version']:
+                return cached['data']
+            return send(load)
+        if set(ret) == set(['version', 'data']):
+            self._write(path, ret)
+            return ret['data']
+        return ret
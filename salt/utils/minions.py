@@ -1,6 +1,12 @@
 '''
 This module contains routines used to verify the matcher against the minions
 expected to return
+
+The authorization checks of the master compile the ACLs they are given once,
+resolve the targets in them against the accepted minion keys once and keep
+their decisions, so that a publication is not authorized by scanning the pki
+directory. The target sets and the decisions are dropped when the accepted
+keys change.
 '''
 # Import Python libs
 import os
@@ -11,6 +17,34 @@ import re
 # Import Salt libs
 import salt.payload
 
+# The most compiled patterns, target sets and decisions kept by a process
+ACL_CACHE_SIZE = 10000
+
+# The compiled regular expressions of the ACLs
+_REGEXES = {}
+
+
+def _compile(regex):
+    '''
+    Return the compiled regular expression
+    '''
+    try:
+        return _REGEXES[regex]
+    except KeyError:
+        if len(_REGEXES) >= ACL_CACHE_SIZE:
+            _REGEXES.clear()
+        _REGEXES[regex] = re.compile(regex)
+        return _REGEXES[regex]
+
+
+def _hashable(obj):
+    '''
+    Return the function or target of a publication as a dict key
+    '''
+    if isinstance(obj, list):
+        return tuple(obj)
+    return obj
+
 
 def nodegroup_comp(group, nodegroups, skip=None):
     '''
@@ -41,6 +75,13 @@ class CkMinions(object):
     def __init__(self, opts):
         self.opts = opts
         self.serial = salt.payload.Serial(opts)
+        # The compiled ACLs, the minions matched by targets, the decisions
+        # and the peer permissions of the minions
+        self._acls = {}
+        self._targets = {}
+        self._decisions = {}
+        self._perms = {}
+        self._keys_stamp = None
 
     def _check_glob_minions(self, expr):
         '''
@@ -186,10 +227,47 @@ class CkMinions(object):
             minions = expr
         return minions
 
-    def validate_tgt(self, valid, expr, expr_form):
+    def _keys_changed(self):
         '''
-        Return a Bool. This function returns if the expresion sent in is within
-        the scope of the valid expression
+        Drop the target sets and the decisions when a minion key was accepted
+        or deleted since they were made, one stat of the minions directory of
+        the pki_dir tells
+        '''
+        try:
+            st_ = os.stat(os.path.join(self.opts['pki_dir'], 'minions'))
+            stamp = (st_.st_ino, st_.st_mtime)
+        except OSError:
+            stamp = None
+        if stamp != self._keys_stamp:
+            self._keys_stamp = stamp
+            self._targets.clear()
+            self._decisions.clear()
+
+    def _dynamic(self, expr_form):
+        '''
+        Return True if the minions matched by the target form depend on more
+        than the accepted keys, they are not kept then
+        '''
+        return expr_form in ('grain', 'grain_pcre') \
+                and self.opts.get('minion_data_cache', False)
+
+    def _target_minions(self, expr, expr_form):
+        '''
+        Return the set of minions matched by the target, the set is kept
+        until the accepted keys change
+        '''
+        if self._dynamic(expr_form):
+            return set(self.check_minions(expr, expr_form))
+        key = (_hashable(expr), expr_form)
+        if key not in self._targets:
+            if len(self._targets) >= ACL_CACHE_SIZE:
+                self._targets.clear()
+            self._targets[key] = set(self.check_minions(expr, expr_form))
+        return self._targets[key]
+
+    def _parse_valid(self, valid):
+        '''
+        Return the target form and the expression of a target of an ACL
         '''
         ref = {'G': 'grain',
                'P': 'grain_pcre',
@@ -199,6 +277,16 @@ class CkMinions(object):
                'S': 'ipcidr',
                'E': 'pcre',
                'N': 'node'}
+        if '@' in valid and valid[1] == '@':
+            comps = valid.split('@')
+            return ref.get(comps[0]), comps[1]
+        return 'glob', valid
+
+    def validate_tgt(self, valid, expr, expr_form):
+        '''
+        Return a Bool. This function returns if the expresion sent in is within
+        the scope of the valid expression
+        '''
         infinite = [
                 'node',
                 'ipcidr',
@@ -209,25 +297,19 @@ class CkMinions(object):
             infinite.append('grain')
             infinite.append('grain_pcre')
 
-        if '@' in valid and valid[1] == '@':
-            comps = valid.split('@')
-            v_matcher = ref.get(comps[0])
-            v_expr = comps[1]
-        else:
-            v_matcher = 'glob'
-            v_expr = valid
+        v_matcher, v_expr = self._parse_valid(valid)
         if v_matcher in infinite:
             # We can't be sure what the subset is, only match the identical
             # target
             if not v_matcher == expr_form:
                 return False
             return v_expr == expr
-        v_minions = set(self.check_minions(v_expr, v_matcher))
-        minions = set(self.check_minions(expr, expr_form))
-        d_bool = bool(minions.difference(v_minions))
-        if len(v_minions) == len(minions) and not d_bool:
+        v_minions = self._target_minions(v_expr, v_matcher)
+        minions = self._target_minions(expr, expr_form)
+        if minions == v_minions:
             return True
-        return d_bool
+        # A target which matches no minions is not known to be in the scope
+        return bool(minions) and minions.issubset(v_minions)
 
     def match_check(self, regex, fun):
         '''
@@ -235,15 +317,64 @@ class CkMinions(object):
         can be a list of functions. It is all or nothing for a list of
         functions
         '''
-        vals = []
         if isinstance(fun, str):
             fun = [fun]
+        reg = _compile(regex)
         for func in fun:
-            if re.match(regex, func):
-                vals.append(True)
-            else:
-                vals.append(False)
-        return all(vals)
+            if not reg.match(func):
+                return False
+        return True
+
+    def peer_perms(self, conf, id_):
+        '''
+        Return the functions the peer or peer_run option, named by conf,
+        allows the minion to call
+        '''
+        key = (conf, id_)
+        if key not in self._perms:
+            perms = []
+            for match in self.opts[conf]:
+                if _compile(match).match(id_):
+                    # This is the list of funcs/modules!
+                    if isinstance(self.opts[conf][match], list):
+                        perms.extend(self.opts[conf][match])
+            if len(self._perms) >= ACL_CACHE_SIZE:
+                self._perms.clear()
+            self._perms[key] = perms
+        return self._perms[key]
+
+    def _compile_acl(self, auth_list):
+        '''
+        Return the key of the ACL, the ACL compiled to a list of
+        (target, regexes) pairs and whether its decisions can be kept. The
+        target is None for the functions allowed on all minions.
+        '''
+        key = repr(auth_list)
+        if key not in self._acls:
+            compiled = []
+            static = True
+            for ind in auth_list:
+                if isinstance(ind, str):
+                    # Allowed for all minions
+                    compiled.append((None, [_compile(ind)]))
+                elif isinstance(ind, dict):
+                    if len(ind) != 1:
+                        # Invalid argument
+                        continue
+                    valid = ind.keys()[0]
+                    if isinstance(ind[valid], str):
+                        regexes = [_compile(ind[valid])]
+                    elif isinstance(ind[valid], list):
+                        regexes = [_compile(regex) for regex in ind[valid]]
+                    else:
+                        continue
+                    if self._dynamic(self._parse_valid(valid)[0]):
+                        static = False
+                    compiled.append((valid, regexes))
+            if len(self._acls) >= ACL_CACHE_SIZE:
+                self._acls.clear()
+            self._acls[key] = (compiled, static)
+        return (key,) + self._acls[key]
 
     def auth_check(self, auth_list, fun, tgt, tgt_type='glob'):
         '''
@@ -251,30 +382,31 @@ class CkMinions(object):
         Used to evaluate the standard structure under external master
         authentication interfaces, like eauth, peer, peer_run, etc.
         '''
-        for ind in auth_list:
-            if isinstance(ind, str):
-                # Allowed for all minions
-                if self.match_check(ind, fun):
-                    return True
-            elif isinstance(ind, dict):
-                if len(ind) != 1:
-                    # Invalid argument
-                    continue
-                valid = ind.keys()[0]
-                # Check if minions are allowed
-                if self.validate_tgt(
-                        valid,
-                        tgt,
-                        tgt_type):
-                    # Minions are allowed, verify function in allowed list
-                    if isinstance(ind[valid], str):
-                        if self.match_check(ind[valid], fun):
-                            return True
-                    elif isinstance(ind[valid], list):
-                        for regex in ind[valid]:
-                            if self.match_check(regex, fun):
-                                return True
-        return False
+        self._keys_changed()
+        acl_key, compiled, static = self._compile_acl(auth_list)
+        static = static and not self._dynamic(tgt_type)
+        key = (acl_key, _hashable(fun), _hashable(tgt), tgt_type)
+        if static and key in self._decisions:
+            return self._decisions[key]
+        if isinstance(fun, str):
+            fun = [fun]
+        ret = False
+        for valid, regexes in compiled:
+            # Check if minions are allowed
+            if valid is not None and not self.validate_tgt(
+                    valid,
+                    tgt,
+                    tgt_type):
+                continue
+            # Minions are allowed, verify function in allowed list
+            if any(all(reg.match(func) for func in fun) for reg in regexes):
+                ret = True
+                break
+        if static:
+            if len(self._decisions) >= ACL_CACHE_SIZE:
+                self._decisions.clear()
+            self._decisions[key] = ret
+        return ret
 
     def wheel_check(self, auth_list, mod, fun):
         '''
@@ -576,6 +576,16 @@ class OutputOptionsMixIn(object):
             if not hasattr(self, funcname):
                 setattr(self, funcname, partial(process, option))
 
+        group.add_option(
+            '--state-output',
+            default=None,
+            type='choice',
+            choices=['full', 'terse', 'summary'],
+            help=('Override the state_output option for the state returns: '
+                  'full, terse or summary, which prints the number of '
+                  'unchanged, changed and failed states of each minion.')
+        )
+
     def _mixin_after_parsed(self):
         group_options_selected = filter(
             lambda option: getattr(self.options, option.dest) and
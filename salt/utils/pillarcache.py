@@ -0,0 +1,246 @@
+'''
+A cache of the data returned by the ext_pillar interfaces
+
+An ext_pillar module opts into the cache by decorating its ext_pillar
+function with ``cacheable``, naming the minion data the result depends on
+besides the arguments the interface is configured with:
+
+.. code-block:: python
+
+    import salt.utils.pillarcache
+
+    @salt.utils.pillarcache.cacheable('id')
+    def ext_pillar(collection='pillar'):
+        ...
+
+The inputs are ``id`` for the minion id, ``grains`` for all of the grains
+and ``grains:<name>`` for a single grain. An interface which declares no
+inputs returns the same data for every minion.
+
+The results are kept for ext_pillar_cache_ttl seconds in the master
+cachedir, where all of the worker processes share them. A worker which
+finds no current result for a key takes a lock on the key before it asks the
+backend, so that the workers asking for the same key at the same time wait
+for that one query instead of sending their own. The lock file is removed
+once the result is written, and the expired results of a backend are
+removed every PRUNE_INTERVAL seconds.
+'''
+from __future__ import absolute_import
+
+# Import python libs
+import os
+import time
+import json
+import hashlib
+import logging
+import contextlib
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+
+# Import salt libs
+import salt.payload
+import salt.utils.atomicfile
+
+log = logging.getLogger(__name__)
+
+# The hits and misses of the cache in this process, keyed by backend
+STATS = {}
+# How often the hit rates are logged, in seconds
+STATS_INTERVAL = 300
+_LAST_REPORT = [time.time()]
+# How often the expired results of a backend are removed, in seconds
+PRUNE_INTERVAL = 300
+# The last time the results of the backend directories were pruned
+_LAST_PRUNE = {}
+
+
+def cacheable(*inputs):
+    '''
+    Declare that the results of the decorated ext_pillar function can be
+    cached, the results depend on the arguments of the function and on the
+    passed inputs of the minion
+    '''
+    def decorator(func):
+        func.pillar_cache_inputs = inputs
+        return func
+    return decorator
+
+
+def cache_ttl(opts, backend):
+    '''
+    Return the number of seconds the results of the backend are cached for,
+    ext_pillar_cache_ttl is either a number or a dict of numbers keyed by
+    backend
+    '''
+    ttl = opts.get('ext_pillar_cache_ttl', 0)
+    if isinstance(ttl, dict):
+        ttl = ttl.get(backend, 0)
+    try:
+        return int(ttl)
+    except (TypeError, ValueError):
+        log.error('The ext_pillar_cache_ttl of {0} is not a number'.format(
+            backend))
+        return 0
+
+
+def cache_key(inputs, args, opts):
+    '''
+    Return the key of the result of an ext_pillar call with the passed
+    arguments, for the minion described by opts
+    '''
+    data = [args]
+    for name in inputs:
+        if name == 'id':
+            data.append(opts.get('id'))
+        elif name == 'grains':
+            data.append(opts.get('grains', {}))
+        elif name.startswith('grains:'):
+            data.append(opts.get('grains', {}).get(name[7:]))
+        else:
+            raise ValueError('Unknown ext_pillar cache input {0}'.format(name))
+    return hashlib.md5(
+            json.dumps(data, sort_keys=True, default=repr)).hexdigest()
+
+
+def stats():
+    '''
+    Return the hit rate of the cache per backend in this process
+    '''
+    ret = {}
+    for backend, counts in STATS.items():
+        total = counts['hits'] + counts['misses']
+        ret[backend] = dict(counts)
+        ret[backend]['hit_rate'] = 0.0
+        if total:
+            ret[backend]['hit_rate'] = float(counts['hits']) / total
+    return ret
+
+
+def _count(backend, hit):
+    '''
+    Count a hit or a miss and log the hit rates every STATS_INTERVAL seconds
+    '''
+    counts = STATS.setdefault(backend, {'hits': 0, 'misses': 0})
+    counts['hits' if hit else 'misses'] += 1
+    if time.time() - _LAST_REPORT[0] < STATS_INTERVAL:
+        return
+    _LAST_REPORT[0] = time.time()
+    for name, data in sorted(stats().items()):
+        log.info(
+            'ext_pillar cache of {0}: {1:.1%} hit rate, {2} hits, '
+            '{3} misses'.format(
+                name, data['hit_rate'], data['hits'], data['misses']))
+
+
+class PillarCache(object):
+    '''
+    The on disk cache of the ext_pillar results
+    '''
+    def __init__(self, opts):
+        self.opts = opts
+        self.cachedir = os.path.join(opts['cachedir'], 'ext_pillar')
+        self.serial = salt.payload.Serial(opts)
+
+    def _read(self, path, ttl):
+        '''
+        Return the data cached in path if it is current, else None
+        '''
+        if not os.path.isfile(path):
+            return None
+        try:
+            with open(path, 'rb') as fp_:
+                entry = self.serial.loads(fp_.read())
+        except Exception as exc:
+            log.debug('Failed to read the ext_pillar cache {0}: {1}'.format(
+                path, exc))
+            return None
+        if not isinstance(entry, dict) or time.time() - entry['stamp'] >= ttl:
+            return None
+        return entry['data']
+
+    def _write(self, path, data):
+        '''
+        Cache data in path
+        '''
+        try:
+            with salt.utils.atomicfile.atomic_open(path, 'wb') as fp_:
+                fp_.write(self.serial.dumps({'stamp': time.time(),
+                                             'data': data}))
+        except (IOError, OSError) as exc:
+            log.error('Failed to write the ext_pillar cache {0}: {1}'.format(
+                path, exc))
+
+    @contextlib.contextmanager
+    def _lock(self, path):
+        '''
+        Hold an exclusive lock on path, without fcntl nothing is locked
+        '''
+        if not HAS_FCNTL:
+            yield
+            return
+        with open(path, 'a') as fp_:
+            fcntl.flock(fp_.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fp_.fileno(), fcntl.LOCK_UN)
+
+    def _prune(self, bdir, ttl):
+        '''
+        Remove the results and the lock files in the backend directory which
+        are older than ttl, at most every PRUNE_INTERVAL seconds
+        '''
+        now = time.time()
+        if now - _LAST_PRUNE.get(bdir, 0) < PRUNE_INTERVAL:
+            return
+        _LAST_PRUNE[bdir] = now
+        for fn_ in os.listdir(bdir):
+            if not fn_.endswith(('.p', '.lock')):
+                continue
+            path = os.path.join(bdir, fn_)
+            try:
+                if now - os.stat(path).st_mtime >= ttl:
+                    os.remove(path)
+            except OSError:
+                continue
+
+    def get(self, backend, key, ttl, fetch):
+        '''
+        Return the cached result of the backend for key, fetch is called
+        without arguments to query the backend when there is no current
+        result
+        '''
+        bdir = os.path.join(self.cachedir, backend)
+        if not os.path.isdir(bdir):
+            try:
+                os.makedirs(bdir)
+            except OSError:
+                if not os.path.isdir(bdir):
+                    raise
+        path = os.path.join(bdir, '{0}.p'.format(key))
+        data = self._read(path, ttl)
+        if data is not None:
+            _count(backend, True)
+            return data
+        lock = os.path.join(bdir, '{0}.lock'.format(key))
+        with self._lock(lock):
+            # Another worker may have queried the backend while this one
+            # waited for the lock
+            data = self._read(path, ttl)
+            if data is not None:
+                _count(backend, True)
+                return data
+            _count(backend, False)
+            data = fetch()
+            self._write(path, data)
+            # The workers which wait for the lock find the result once they
+            # hold it, later ones find it before they take the lock
+            try:
+                os.remove(lock)
+            except OSError:
+                pass
+        self._prune(bdir, ttl)
+        return data
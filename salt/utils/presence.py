@@ -0,0 +1,174 @@
+'''
+Track which minions are connected to the master
+
+When the presence option is set the master runs a Tracker process which
+listens to the master event bus and records when each minion was last seen:
+when it authenticated, when it started, when it returned a job and when it
+sent a heartbeat, minions send a heartbeat every presence_interval seconds
+when that minion option is set. The table is kept in memory and saved to the
+presence.p file of the master cachedir every few seconds, the manage runners
+answer from it without publishing to the minions.
+'''
+
+# Import python libs
+import os
+import re
+import time
+import errno
+import signal
+import logging
+import multiprocessing
+
+# Import third party libs
+import zmq
+
+# Import salt libs
+import salt.payload
+import salt.utils.event
+import salt.utils.atomicfile
+
+log = logging.getLogger(__name__)
+
+# Save the table at most this often, in seconds
+SAVE_INTERVAL = 5
+
+# The event tag of the minion heartbeat
+HEARTBEAT_TAG = 'presence'
+
+JID_RE = re.compile(r'^\d{20}$')
+
+
+def snapshot_path(opts):
+    '''
+    Return the path of the file the presence table is saved to
+    '''
+    return os.path.join(opts['cachedir'], 'presence.p')
+
+
+def load(opts):
+    '''
+    Return the last saved presence table, a dict mapping the minion ids to
+    a dict of the time they were last seen and what they were seen doing
+    '''
+    path = snapshot_path(opts)
+    if not os.path.isfile(path):
+        return {}
+    try:
+        with open(path, 'rb') as fp_:
+            table = salt.payload.Serial(opts).loads(fp_.read())
+    except Exception as exc:
+        log.debug('Failed to read the presence table {0}: {1}'.format(
+            path, exc))
+        return {}
+    return table if isinstance(table, dict) else {}
+
+
+def event_source(tag, data):
+    '''
+    Return the minion id and the activity an event of the master event bus
+    shows, or None if the event does not come from a minion
+    '''
+    if not isinstance(data, dict) or not isinstance(data.get('id'), str):
+        return None
+    if tag == 'auth':
+        if data.get('result') is True and data.get('act') == 'accept':
+            return data['id'], 'auth'
+        return None
+    if tag == 'minion_start':
+        return data['id'], 'start'
+    if tag == HEARTBEAT_TAG:
+        return data['id'], 'heartbeat'
+    if JID_RE.match(tag) and 'return' in data:
+        return data['id'], 'return'
+    return None
+
+
+def status(opts, minions):
+    '''
+    Return the presence of the minions, a dict mapping the minion ids to
+    whether they are up, when they were last seen and what they were seen
+    doing. Minions seen in the last presence_timeout seconds are up.
+    '''
+    table = load(opts)
+    limit = time.time() - opts.get('presence_timeout', 180)
+    ret = {}
+    for id_ in minions:
+        entry = table.get(id_, {})
+        seen = entry.get('seen')
+        ret[id_] = {'up': bool(seen and seen >= limit),
+                    'last_seen': seen,
+                    'via': entry.get('via')}
+    return ret
+
+
+class Tracker(multiprocessing.Process):
+    '''
+    Keep the presence table up to date from the master event bus
+    '''
+    def __init__(self, opts):
+        super(Tracker, self).__init__()
+        self.opts = opts
+        self.serial = salt.payload.Serial(opts)
+        self.table = {}
+        self.dirty = False
+
+    def seen(self, id_, via, stamp=None):
+        '''
+        Record that the minion was seen
+        '''
+        self.table[id_] = {'seen': stamp or time.time(), 'via': via}
+        self.dirty = True
+
+    def handle(self, tag, data):
+        '''
+        Record the minion an event of the master event bus comes from
+        '''
+        source = event_source(tag, data)
+        if source:
+            self.seen(*source)
+
+    def save(self):
+        '''
+        Write the table to the presence.p file
+        '''
+        path = snapshot_path(self.opts)
+        try:
+            with salt.utils.atomicfile.atomic_open(path, 'wb') as fp_:
+                fp_.write(self.serial.dumps(self.table))
+        except (IOError, OSError) as exc:
+            log.error('Failed to write the presence table {0}: {1}'.format(
+                path, exc))
+        self.dirty = False
+
+    def run(self):
+        '''
+        Listen to the master event bus, the table is saved when the process
+        is stopped
+        '''
+        signal.signal(signal.SIGTERM, _sigterm)
+        self.table = load(self.opts)
+        event = salt.utils.event.MasterEvent(self.opts['sock_dir'])
+        last = time.time()
+        try:
+            while True:
+                try:
+                    ret = event.get_event(wait=SAVE_INTERVAL, full=True)
+                except zmq.ZMQError as exc:
+                    if exc.errno == errno.EINTR:
+                        continue
+                    raise
+                if ret:
+                    self.handle(ret['tag'], ret['data'])
+                if self.dirty and time.time() - last >= SAVE_INTERVAL:
+                    self.save()
+                    last = time.time()
+        except (KeyboardInterrupt, SystemExit):
+            if self.dirty:
+                self.save()
+
+
+def _sigterm(signum, frame):
+    '''
+    Stop the tracker on SIGTERM like on SIGINT
+    '''
+    raise SystemExit
@@ -0,0 +1,501 @@
+'''
+A cache of the sls files the master renders for the minions
+
+Many minions with the same role render the same sls files with the same
+grains and pillar values. With the render_cache option set on the master and
+the minions, a minion asks the master for an sls file before it renders the
+file itself. The minion sends a digest of each of its grains and pillar keys,
+the master renders the file once for every distinct set of values the file
+actually uses and hands the result to every minion which sends the same
+values.
+
+The master renders the yaml_jinja files on its own, with grains and pillar
+dicts which record the keys the template reads. The cache key of a result is
+made of the environment, the sls name, the hashes of the template files and
+the digests of the grains and pillar keys which were read. A template which
+calls the salt execution modules or reads the opts can not be rendered on the
+master, the minion renders such files itself.
+
+The results are kept in the master cachedir in one directory per
+environment. Every environment holds up to render_cache_size bytes, the
+results which were used the longest time ago are removed first.
+'''
+from __future__ import absolute_import
+
+# Import python libs
+import os
+import json
+import hashlib
+import logging
+import warnings
+
+# Import third party libs
+import jinja2
+
+# Import salt libs
+import salt.payload
+import salt.utils.atomicfile
+import salt.utils.manifest
+from salt.utils.yaml import CustomLoader, load
+
+log = logging.getLogger(__name__)
+
+# The renderers the master runs for the minions
+RENDERERS = ('yaml_jinja',)
+
+class Uncacheable(Exception):
+    '''
+    Raised when a template uses data which the master does not have
+    '''
+
+
+def digest(value):
+    '''
+    Return the digest of a grain or pillar value
+    '''
+    return hashlib.md5(
+            json.dumps(value, sort_keys=True, default=repr)).hexdigest()
+
+
+def digests(data):
+    '''
+    Return the digests of the values in the passed grains or pillar dict
+    '''
+    return dict((key, digest(val)) for key, val in data.items())
+
+
+class Tracked(dict):
+    '''
+    A dict which records the keys which are read from it, reading all of the
+    keys at once sets whole
+    '''
+    def __init__(self, *args, **kwargs):
+        dict.__init__(self, *args, **kwargs)
+        self.used = set()
+        self.whole = False
+
+    def __getitem__(self, key):
+        self.used.add(key)
+        return dict.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        self.used.add(key)
+        return dict.get(self, key, default)
+
+    def __contains__(self, key):
+        self.used.add(key)
+        return dict.__contains__(self, key)
+
+    def has_key(self, key):
+        return self.__contains__(key)
+
+    def __iter__(self):
+        self.whole = True
+        return dict.__iter__(self)
+
+    def __len__(self):
+        self.whole = True
+        return dict.__len__(self)
+
+    def __repr__(self):
+        self.whole = True
+        return dict.__repr__(self)
+
+    __str__ = __repr__
+
+    def keys(self):
+        self.whole = True
+        return dict.keys(self)
+
+    def values(self):
+        self.whole = True
+        return dict.values(self)
+
+    def items(self):
+        self.whole = True
+        return dict.items(self)
+
+    def iterkeys(self):
+        self.whole = True
+        return dict.iterkeys(self)
+
+    def itervalues(self):
+        self.whole = True
+        return dict.itervalues(self)
+
+    def iteritems(self):
+        self.whole = True
+        return dict.iteritems(self)
+
+    def copy(self):
+        self.whole = True
+        return dict.copy(self)
+
+    def deps(self):
+        '''
+        Return the sorted keys which were read, None if all of them were
+        '''
+        if self.whole:
+            return None
+        return sorted(self.used)
+
+
+class Functions(object):
+    '''
+    Stand in for the execution modules of the minion, only the functions
+    which read the grains can be called
+    '''
+    def __init__(self, grains):
+        self.grains = grains
+
+    def __getitem__(self, fun):
+        if fun == 'grains.item':
+            return lambda key=None: self.grains.get(key, '')
+        if fun == 'grains.items':
+            return lambda: dict(self.grains.items())
+        if fun == 'grains.ls':
+            return lambda: sorted(self.grains.keys())
+        raise Uncacheable('The template calls {0}'.format(fun))
+
+    def __contains__(self, fun):
+        raise Uncacheable('The template looks up {0}'.format(fun))
+
+    def __getattr__(self, name):
+        raise Uncacheable('The template reads salt.{0}'.format(name))
+
+
+class Forbidden(object):
+    '''
+    Stand in for data which the master does not have
+    '''
+    def __init__(self, name):
+        self.name = name
+
+    def __getitem__(self, key):
+        raise Uncacheable('The template reads {0}'.format(self.name))
+
+    __contains__ = __getitem__
+
+    def __getattr__(self, name):
+        raise Uncacheable('The template reads {0}'.format(self.name))
+
+
+class TrackedLoader(jinja2.FileSystemLoader):
+    '''
+    A jinja loader for the file roots of an environment which records the
+    hash of every template it loads
+    '''
+    def __init__(self, roots, hash_type, hash_cache=None):
+        jinja2.FileSystemLoader.__init__(self, roots)
+        self.roots = roots
+        self.hash_type = hash_type
+        self.hash_cache = hash_cache
+        self.files = {}
+
+    def get_source(self, environment, template):
+        contents, filename, uptodate = jinja2.FileSystemLoader.get_source(
+                self, environment, template)
+        self.files[template] = salt.utils.manifest.hash_file(
+                filename, self.hash_type, self.hash_cache)
+        return contents, filename, uptodate
+
+
+def find_file(roots, rel):
+    '''
+    Return the full path of the relative path in the roots, the first root
+    holding the file wins
+    '''
+    for root in roots:
+        full = os.path.join(root, rel)
+        if os.path.isfile(full):
+            return full
+    return ''
+
+
+def find_sls(roots, sls):
+    '''
+    Return the relative path and the full path of the sls file, the first
+    root holding the file wins
+    '''
+    base = sls.replace('.', '/')
+    for rel in ('{0}.sls'.format(base), '{0}/init.sls'.format(base)):
+        full = find_file(roots, rel)
+        if full:
+            return rel, full
+    return '', ''
+
+
+def shebang(path, default):
+    '''
+    Return the renderer of the sls file, like salt.template.template_shebang
+    '''
+    with open(path, 'r') as fp_:
+        line = fp_.readline()
+    if line.startswith('#!'):
+        return line.strip()[2:]
+    return default
+
+
+def render(roots, rel, env, sls, grains, pillar, allow_undefined=False,
+           hash_type='md5', hash_cache=None):
+    '''
+    Render the yaml_jinja sls file rel in the roots, grains and pillar have
+    to be Tracked dicts. Returns the rendered data and the hashes of the
+    template files which were read.
+    '''
+    loader = TrackedLoader(roots, hash_type, hash_cache)
+    if allow_undefined:
+        jenv = jinja2.Environment(loader=loader)
+    else:
+        jenv = jinja2.Environment(loader=loader,
+                                  undefined=jinja2.StrictUndefined)
+    template = jenv.get_template(rel)
+    source = template.render(
+            salt=Functions(grains),
+            grains=grains,
+            opts=Forbidden('opts'),
+            pillar=pillar,
+            env=env,
+            sls=sls)
+    if not source.strip():
+        return {}, loader.files
+    with warnings.catch_warnings(record=True) as warn_list:
+        data = load(source, Loader=CustomLoader)
+        for item in warn_list:
+            log.warn('{0} found in {1}'.format(item.message, rel))
+    if data is None:
+        data = {}
+    return data, loader.files
+
+
+class RenderCache(object):
+    '''
+    The on disk cache of the rendered sls files, sharded by environment
+    '''
+    def __init__(self, opts, hash_cache=None):
+        self.opts = opts
+        self.cachedir = os.path.join(opts['cachedir'], 'render_cache')
+        self.size = opts.get('render_cache_size', 104857600)
+        self.serial = salt.payload.Serial(opts)
+        self.hash_cache = {} if hash_cache is None else hash_cache
+
+    def _shard(self, env):
+        '''
+        Return the cache directory of the environment, None for environments
+        which can not be served
+        '''
+        if env not in self.opts['file_roots']:
+            return None
+        if not env or os.sep in env or env.startswith('.'):
+            return None
+        return os.path.join(self.cachedir, env)
+
+    def _read(self, path):
+        '''
+        Return the data serialized in path, None if there is none
+        '''
+        if not os.path.isfile(path):
+            return None
+        try:
+            with open(path, 'rb') as fp_:
+                return self.serial.loads(fp_.read())
+        except Exception as exc:
+            log.debug('Failed to read the render cache {0}: {1}'.format(
+                path, exc))
+            return None
+
+    def _write(self, path, data):
+        '''
+        Serialize data to path, returns the number of bytes written
+        '''
+        payload = self.serial.dumps(data)
+        dirname = os.path.dirname(path)
+        try:
+            if not os.path.isdir(dirname):
+                os.makedirs(dirname)
+            with salt.utils.atomicfile.atomic_open(path, 'wb') as fp_:
+                fp_.write(payload)
+        except (IOError, OSError) as exc:
+            log.error('Failed to write the render cache {0}: {1}'.format(
+                path, exc))
+            return 0
+        return len(payload)
+
+    def _index(self, shard, sls):
+        '''
+        Return the index file of the sls, which lists the dependencies of
+        its cached results
+        '''
+        return os.path.join(
+                shard, 'index', '{0}.p'.format(hashlib.md5(sls).hexdigest()))
+
+    def _current(self, roots, files):
+        '''
+        Return True if the template files still have the recorded hashes
+        '''
+        for rel, hsum in files.items():
+            full = find_file(roots, rel)
+            if not full:
+                return False
+            if salt.utils.manifest.hash_file(
+                    full,
+                    self.opts['hash_type'],
+                    self.hash_cache) != hsum:
+                return False
+        return True
+
+    def _key(self, env, sls, variant, grains, pillar):
+        '''
+        Return the cache key of a result of the sls for the digests of the
+        grains and pillar sent by the minion
+        '''
+        data = [env, sls, variant['renderer'], variant['allow_undefined'],
+                sorted(variant['files'].items())]
+        for deps, sent in ((variant['grains'], grains),
+                           (variant['pillar'], pillar)):
+            if deps is None:
+                data.append(sorted(sent.items()))
+            else:
+                data.append([(key, sent.get(key)) for key in deps])
+        return hashlib.md5(json.dumps(data)).hexdigest()
+
+    def get(self, env, sls, renderer, allow_undefined, grains, pillar):
+        '''
+        Look up the result of the sls for the grains and pillar digests.
+        Returns a dict holding the rendered data under state on a hit,
+        local if the sls has to be rendered on the minion, or need if the
+        master needs the grains and pillar values to render it.
+        '''
+        shard = self._shard(env)
+        if shard is None:
+            return {'local': True}
+        roots = self.opts['file_roots'][env]
+        rel, full = find_sls(roots, sls)
+        if not full:
+            return {'local': True}
+        if shebang(full, renderer) not in RENDERERS:
+            return {'local': True}
+        variants = self._read(self._index(shard, sls)) or []
+        for variant in variants:
+            if variant['renderer'] != renderer:
+                continue
+            if variant['allow_undefined'] != allow_undefined:
+                continue
+            if not self._current(roots, variant['files']):
+                continue
+            if variant.get('local'):
+                return {'local': True}
+            path = os.path.join(
+                    shard,
+                    '{0}.p'.format(
+                        self._key(env, sls, variant, grains, pillar)))
+            data = self._read(path)
+            if data is not None:
+                try:
+                    # Keep the result which was used last at the end of the
+                    # eviction queue
+                    os.utime(path, None)
+                except OSError:
+                    pass
+                return {'state': data}
+        return {'need': True}
+
+    def render(self, env, sls, renderer, allow_undefined, grains, pillar):
+        '''
+        Render the sls with the full grains and pillar of a minion, cache
+        the result and return it like get
+        '''
+        shard = self._shard(env)
+        if shard is None:
+            return {'local': True}
+        roots = self.opts['file_roots'][env]
+        rel, full = find_sls(roots, sls)
+        if not full or shebang(full, renderer) not in RENDERERS:
+            return {'local': True}
+        tgrains = Tracked(grains)
+        tpillar = Tracked(pillar)
+        variant = {'renderer': renderer,
+                   'allow_undefined': allow_undefined}
+        try:
+            data, files = render(
+                    roots,
+                    rel,
+                    env,
+                    sls,
+                    tgrains,
+                    tpillar,
+                    allow_undefined,
+                    self.opts['hash_type'],
+                    self.hash_cache)
+        except Uncacheable as exc:
+            log.debug('Not caching the sls {0} in {1}: {2}'.format(
+                sls, env, exc))
+            variant['local'] = True
+            variant['files'] = {rel: salt.utils.manifest.hash_file(
+                full, self.opts['hash_type'], self.hash_cache)}
+            self._add_variant(env, sls, variant)
+            return {'local': True}
+        except Exception as exc:
+            # Let the minion render the sls and report the error
+            log.debug('Failed to render the sls {0} in {1}: {2}'.format(
+                sls, env, exc))
+            return {'local': True}
+        variant['files'] = files
+        variant['grains'] = tgrains.deps()
+        variant['pillar'] = tpillar.deps()
+        path = os.path.join(
+                shard,
+                '{0}.p'.format(self._key(env, sls, variant,
+                                         digests(grains), digests(pillar))))
+        try:
+            written = self._write(path, data)
+        except Exception as exc:
+            # The rendered data can not be serialized
+            log.debug('Not caching the sls {0} in {1}: {2}'.format(
+                sls, env, exc))
+            return {'local': True}
+        self._add_variant(env, sls, variant)
+        if written:
+            self._evict(shard)
+        return {'state': data}
+
+    def _add_variant(self, env, sls, variant):
+        '''
+        Record the dependencies of a result in the index of the sls, the
+        variants for outdated template files are dropped
+        '''
+        index = self._index(self._shard(env), sls)
+        roots = self.opts['file_roots'][env]
+        variants = [old for old in self._read(index) or []
+                    if old != variant and self._current(roots, old['files'])]
+        variants.append(variant)
+        self._write(index, variants)
+
+    def _evict(self, shard):
+        '''
+        Remove the results of the environment which were used the longest
+        time ago until it holds no more than render_cache_size bytes
+        '''
+        entries = []
+        total = 0
+        for fn_ in os.listdir(shard):
+            if not fn_.endswith('.p'):
+                continue
+            path = os.path.join(shard, fn_)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        if total <= self.size:
+            return
+        for mtime, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.size:
+                break
+
@@ -0,0 +1,135 @@
+'''
+Chunked job returns
+
+A job return which is a list, or a generator, is sent by the minion in chunks
+of about return_chunk_size serialized bytes with the _return_chunk command,
+followed by the usual _return command with no return data and the number of
+chunks sent. The master keeps the chunks in a hidden directory of the job
+cache, fires a return_chunk event for each of them, and writes the return.p
+file of the minion from them when the last message comes in. The return.p
+file is written and read one item at a time, so neither the master nor the
+clients hold a large return in one piece more than they have to.
+'''
+from __future__ import absolute_import
+
+# Import python libs
+import os
+import shutil
+import struct
+import logging
+import tempfile
+
+# Import salt libs
+import salt.utils.atomicfile
+from salt.payload import msgpack
+
+log = logging.getLogger(__name__)
+
+# The tag of the progress events of chunked returns
+CHUNK_TAG = 'return_chunk'
+
+
+def split(items, size, serial):
+    '''
+    Return a generator of the lists of the items, each list but the last is
+    at least size serialized bytes long
+    '''
+    chunk = []
+    chunk_size = 0
+    for item in items:
+        chunk.append(item)
+        chunk_size += len(serial.dumps(item))
+        if chunk_size >= size:
+            yield chunk
+            chunk = []
+            chunk_size = 0
+    if chunk:
+        yield chunk
+
+
+def chunk_dir(jid_dir, id_):
+    '''
+    Return the directory the chunks of the return of the minion are kept in,
+    the directory is hidden from the clients reading the job cache
+    '''
+    return os.path.join(jid_dir, '.chunks_{0}'.format(id_))
+
+
+def store_chunk(jid_dir, id_, seq, chunk, serial):
+    '''
+    Write a chunk of the return of the minion
+    '''
+    cdir = chunk_dir(jid_dir, id_)
+    if not os.path.isdir(cdir):
+        os.makedirs(cdir)
+    with salt.utils.atomicfile.atomic_open(
+            os.path.join(cdir, '{0}.p'.format(int(seq))), 'w+b') as fp_:
+        fp_.write(serial.dumps(chunk))
+
+
+def discard(jid_dir, id_):
+    '''
+    Remove the chunks of the return of the minion
+    '''
+    shutil.rmtree(chunk_dir(jid_dir, id_), ignore_errors=True)
+
+
+def array_header(count):
+    '''
+    Return the msgpack header of an array of count items
+    '''
+    if count < 16:
+        return chr(0x90 | count)
+    if count < 0x10000:
+        return '\xdc' + struct.pack('>H', count)
+    return '\xdd' + struct.pack('>I', count)
+
+
+def assemble(jid_dir, id_, chunks, path, serial):
+    '''
+    Write the items of the chunks of the return of the minion to path as a
+    msgpack list, one chunk at a time, and remove the chunks. Return False
+    if a chunk is missing.
+    '''
+    cdir = chunk_dir(jid_dir, id_)
+    count = 0
+    with tempfile.TemporaryFile(dir=jid_dir) as items:
+        for seq in range(chunks):
+            cpath = os.path.join(cdir, '{0}.p'.format(seq))
+            if not os.path.isfile(cpath):
+                log.error(
+                    'Chunk {0} of {1} of the return of {2} is missing'.format(
+                        seq + 1, chunks, id_))
+                discard(jid_dir, id_)
+                return False
+            with open(cpath, 'rb') as fp_:
+                chunk = serial.loads(fp_.read())
+            for item in chunk:
+                items.write(msgpack.dumps(item))
+                count += 1
+        items.seek(0)
+        with salt.utils.atomicfile.atomic_open(path, 'w+b') as fp_:
+            fp_.write(array_header(count))
+            shutil.copyfileobj(items, fp_)
+    discard(jid_dir, id_)
+    return True
+
+
+def iter_items(path, serial):
+    '''
+    Return a generator of the items of the list stored at path, the file is
+    read an item at a time when the msgpack library can stream it. A return
+    which is not a list is the only item.
+    '''
+    with open(path, 'rb') as fp_:
+        head = fp_.read(1)
+        fp_.seek(0)
+        if not hasattr(msgpack, 'Unpacker') or not head \
+                or not (ord(head) & 0xf0 == 0x90 or head in '\xdc\xdd'):
+            data = serial.loads(fp_.read())
+            for item in data if isinstance(data, list) else [data]:
+                yield item
+            return
+        unpacker = msgpack.Unpacker(fp_, use_list=True)
+        for _ in range(unpacker.read_array_header()):
+            yield unpacker.unpack()
@@ -0,0 +1,200 @@
+'''
+The scheduler of the minion
+
+The jobs in the schedule minion option, and in the schedule key of the
+pillar, are run by the minion daemon itself with the modules it has loaded
+and return to the master like the jobs the master publishes, instead of a
+salt-call started by cron which loads and authenticates all over again:
+
+.. code-block:: yaml
+
+    schedule:
+      highstate:
+        function: state.highstate
+        minutes: 60
+      logs:
+        function: cmd.run
+        args:
+          - logrotate -f /etc/logrotate.conf
+        hours: 24
+        splay: 3600
+        returner: mongo_return
+
+The interval of a job is the sum of its seconds, minutes, hours and days.
+The runs of a job are at a fixed offset from the multiples of the interval
+since the epoch. The offset is derived from the minion id and the job name
+and lies within the splay seconds of the job, the whole interval when no
+splay is set, so the minions which share a schedule spread their runs
+instead of all running at once. A job is not started again while its last
+run is still going.
+
+Every run gets a job id of its own from the minion, which the returners and
+the proc file of the run use, the master gives it a job id of its own as it
+does for the other standalone jobs.
+'''
+
+# Import python libs
+import time
+import hashlib
+import logging
+
+# Import salt libs
+import salt.utils
+from salt._compat import string_types
+
+log = logging.getLogger(__name__)
+
+# The units of the intervals of the jobs
+UNITS = (('seconds', 1), ('minutes', 60), ('hours', 3600), ('days', 86400))
+
+
+def interval(job):
+    '''
+    Return the interval of the job in seconds, 0 if it has none
+    '''
+    ret = 0
+    for unit, seconds in UNITS:
+        try:
+            ret += int(job.get(unit, 0)) * seconds
+        except (TypeError, ValueError):
+            return 0
+    return ret
+
+
+def offset(id_, name, splay):
+    '''
+    Return the offset of the runs of the job of the minion within the splay
+    '''
+    if splay <= 0:
+        return 0
+    return int(hashlib.md5('{0}:{1}'.format(id_, name)).hexdigest(),
+               16) % splay
+
+
+def next_run(now, ival, off):
+    '''
+    Return the first run time of a job with the interval and offset which is
+    not before now
+    '''
+    return now + (off - now) % ival
+
+
+class Schedule(object):
+    '''
+    Run the jobs of the schedule of the minion, handle is called with the
+    data of a job to start it and returns the thread or process running it
+    '''
+    def __init__(self, opts, handle):
+        self.opts = opts
+        self.handle = handle
+        # The next run time, interval and offset of the jobs, by name
+        self.next = {}
+        # The threads or processes running the jobs, by name
+        self.running = {}
+        # The names of the invalid jobs which have been logged
+        self.invalid = set()
+        # The job id of the last run
+        self.jid = None
+
+    def jobs(self):
+        '''
+        Return the valid jobs of the schedule option and the pillar, the
+        jobs in the pillar replace the jobs of the same name in the option
+        '''
+        ret = {}
+        for source in (self.opts.get('schedule'),
+                       self.opts.get('pillar', {}).get('schedule')):
+            if not isinstance(source, dict):
+                continue
+            for name, job in source.items():
+                if not isinstance(job, dict) or not isinstance(
+                        job.get('function'), string_types) \
+                        or interval(job) <= 0:
+                    if name not in self.invalid:
+                        log.error(
+                            'The scheduled job {0} needs a function and an '
+                            'interval'.format(name))
+                        self.invalid.add(name)
+                    continue
+                self.invalid.discard(name)
+                ret[name] = job
+        return ret
+
+    def _jid(self):
+        '''
+        Return a new job id, the runs started at once get distinct job ids
+        '''
+        jid = salt.utils.gen_jid()
+        while jid == self.jid:
+            jid = salt.utils.gen_jid()
+        self.jid = jid
+        return jid
+
+    def _data(self, job):
+        '''
+        Return the data of a run of the job, like the data of a job published
+        by the master
+        '''
+        args = list(job.get('args', []))
+        for key, val in (job.get('kwargs') or {}).items():
+            args.append('{0}={1}'.format(key, val))
+        returner = job.get('returner', '')
+        if isinstance(returner, (list, tuple)):
+            returner = ','.join(returner)
+        return {'fun': job['function'],
+                'arg': args,
+                'jid': self._jid(),
+                'standalone': True,
+                'ret': returner}
+
+    def run(self, name, job):
+        '''
+        Start a run of the job unless the last one is still running
+        '''
+        proc = self.running.get(name)
+        if proc is not None and proc.is_alive():
+            log.info(
+                'Skipping the scheduled job {0}, the last run is still '
+                'running'.format(name))
+            return
+        log.info('Running the scheduled job {0}'.format(name))
+        try:
+            self.running[name] = self.handle(self._data(job))
+        except Exception as exc:
+            log.error('Failed to run the scheduled job {0}: {1}'.format(
+                name, exc))
+
+    def eval(self, now=None):
+        '''
+        Start the jobs which are due and return the seconds until the next
+        job is due, None when there are no jobs
+        '''
+        if now is None:
+            now = time.time()
+        jobs = self.jobs()
+        for name in set(self.next) - set(jobs):
+            del self.next[name]
+            self.running.pop(name, None)
+        wait = None
+        for name in sorted(jobs):
+            job = jobs[name]
+            ival = interval(job)
+            try:
+                splay = int(job.get('splay', ival))
+            except (TypeError, ValueError):
+                splay = ival
+            off = offset(self.opts['id'], name, splay)
+            entry = self.next.get(name)
+            if entry is None or entry[1:] != (ival, off):
+                # The job is new or its timing changed
+                self.next[name] = (next_run(now, ival, off), ival, off)
+            due = self.next[name][0]
+            if due <= now:
+                self.run(name, job)
+                due = next_run(now, ival, off)
+                if due <= now:
+                    due += ival
+                self.next[name] = (due, ival, off)
+            if wait is None or due - now < wait:
+                wait = due - now
+        return wait
@@ -0,0 +1,253 @@
+'''
+A cache of the top data which the master gathers for the minions from the
+external node classifier and the master_tops interfaces
+
+Gathering the top data can mean running a slow external command every time
+a minion runs a highstate. With the tops_cache_ttl master option set the
+results are kept in the master cachedir, where all of the worker processes
+share them, keyed by the minion id and a hash of the grains of the minion.
+An entry older than tops_cache_ttl seconds is still used while it is
+gathered again in the background, an entry older than twice the ttl is
+gathered again before it is used.
+
+With external_nodes_batch set as well the external node classifier is run
+for up to that many minions at once, with all of the minion ids on the
+command line, and has to return a mapping of the minion ids to the data it
+returns for a single minion.
+
+The cache is cleared with the tops.invalidate runner.
+'''
+from __future__ import absolute_import
+
+# Import python libs
+import os
+import time
+import json
+import pipes
+import fnmatch
+import hashlib
+import logging
+import threading
+import subprocess
+
+# Import third party libs
+import yaml
+
+# Import salt libs
+import salt.payload
+import salt.utils.atomicfile
+
+log = logging.getLogger(__name__)
+
+
+def grains_hash(grains):
+    '''
+    Return a hash of the passed grains, None if the grains can not be hashed
+    '''
+    try:
+        return hashlib.md5(
+                json.dumps(grains, sort_keys=True, default=repr)).hexdigest()
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_enc(ndata):
+    '''
+    Return the top data from the output of an external node classifier
+    '''
+    ret = {}
+    if not isinstance(ndata, dict):
+        return ret
+    env = ndata.get('environment', 'base')
+    if isinstance(ndata.get('classes'), dict):
+        ret[env] = list(ndata['classes'])
+    elif isinstance(ndata.get('classes'), list):
+        ret[env] = ndata['classes']
+    return ret
+
+
+def run_enc(cmd, ids):
+    '''
+    Run the external node classifier with the passed minion ids and return
+    the loaded yaml output
+    '''
+    cmd = '{0} {1}'.format(cmd, ' '.join([pipes.quote(id_) for id_ in ids]))
+    return yaml.safe_load(
+            subprocess.Popen(
+                cmd,
+                shell=True,
+                stdout=subprocess.PIPE
+                ).communicate()[0])
+
+
+class TopsCache(object):
+    '''
+    The on disk cache of the top data of the minions
+    '''
+    def __init__(self, opts):
+        self.opts = opts
+        self.ttl = opts.get('tops_cache_ttl', 0)
+        self.batch = opts.get('external_nodes_batch', 0)
+        self.cachedir = os.path.join(opts['cachedir'], 'tops')
+        self.serial = salt.payload.Serial(opts)
+        self.refreshing = set()
+        self.lock = threading.Lock()
+
+    def _path(self, id_):
+        '''
+        Return the cache file of the minion, None for ids which can not be
+        used as a file name
+        '''
+        if not id_ or os.sep in id_ or id_.startswith('.'):
+            return None
+        return os.path.join(self.cachedir, '{0}.p'.format(id_))
+
+    def _read(self, id_):
+        '''
+        Return the cached data of the minion
+        '''
+        path = self._path(id_)
+        if path is None or not os.path.isfile(path):
+            return {}
+        try:
+            with open(path, 'rb') as fp_:
+                data = self.serial.loads(fp_.read())
+        except Exception as exc:
+            log.debug('Failed to read the tops cache of {0}: {1}'.format(
+                id_, exc))
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _write(self, id_, data):
+        '''
+        Write the cached data of the minion
+        '''
+        path = self._path(id_)
+        if path is None:
+            return
+        try:
+            if not os.path.isdir(self.cachedir):
+                os.makedirs(self.cachedir)
+            with salt.utils.atomicfile.atomic_open(path, 'wb') as fp_:
+                fp_.write(self.serial.dumps(data))
+        except (IOError, OSError) as exc:
+            log.error('Failed to write the tops cache of {0}: {1}'.format(
+                id_, exc))
+
+    def get(self, id_, grains, gather):
+        '''
+        Return the top data of the minion, gather is called without arguments
+        to gather the top data when there is no usable cache entry
+        '''
+        ghash = grains_hash(grains)
+        if not self.ttl or ghash is None or self._path(id_) is None:
+            return gather()
+        entry = self._read(id_).get('tops')
+        if entry and entry.get('grains') == ghash:
+            age = time.time() - entry['stamp']
+            if age < self.ttl:
+                return entry['data']
+            if age < self.ttl * 2:
+                self._refresh_later(id_, ghash, gather)
+                return entry['data']
+        return self._refresh(id_, ghash, gather)
+
+    def _refresh(self, id_, ghash, gather):
+        '''
+        Gather the top data of the minion and cache it
+        '''
+        data = gather()
+        cache = self._read(id_)
+        cache['tops'] = {'stamp': time.time(),
+                         'grains': ghash,
+                         'data': data}
+        self._write(id_, cache)
+        return data
+
+    def _refresh_later(self, id_, ghash, gather):
+        '''
+        Gather the top data of the minion again in a background thread
+        '''
+        with self.lock:
+            if id_ in self.refreshing:
+                return
+            self.refreshing.add(id_)
+
+        def refresh():
+            try:
+                self._refresh(id_, ghash, gather)
+            except Exception as exc:
+                log.error('Failed to refresh the top data of {0}: {1}'.format(
+                    id_, exc))
+            finally:
+                with self.lock:
+                    self.refreshing.discard(id_)
+        thread = threading.Thread(target=refresh)
+        thread.daemon = True
+        thread.start()
+
+    def _stale_enc(self, cmd, skip, limit):
+        '''
+        Return the ids of up to limit accepted minions, other than skip,
+        which have no current output of the classifier cmd cached. The
+        cache files are only read until enough of them are found.
+        '''
+        mdir = os.path.join(self.opts['pki_dir'], 'minions')
+        if limit <= 0 or not os.path.isdir(mdir):
+            return []
+        ret = []
+        now = time.time()
+        for id_ in sorted(os.listdir(mdir)):
+            if id_ == skip:
+                continue
+            entry = self._read(id_).get('enc', {}).get(cmd)
+            if not entry or now - entry['stamp'] >= self.ttl:
+                ret.append(id_)
+                if len(ret) >= limit:
+                    break
+        return ret
+
+    def enc(self, cmd, id_):
+        '''
+        Return the output of the external node classifier cmd for the minion,
+        in batch mode the classifier is run for a batch of the accepted
+        minions which have no current output cached
+        '''
+        if not self.batch or not self.ttl or self._path(id_) is None:
+            return run_enc(cmd, [id_])
+        entry = self._read(id_).get('enc', {}).get(cmd)
+        if entry and time.time() - entry['stamp'] < self.ttl:
+            return entry['data']
+        ids = [id_] + self._stale_enc(cmd, id_, self.batch - 1)
+        ndata = run_enc(cmd, ids)
+        if not isinstance(ndata, dict):
+            log.error(('The external node classifier {0} did not return a '
+                       'mapping of minion ids in batch mode').format(cmd))
+            return {}
+        now = time.time()
+        for minion in ids:
+            if minion not in ndata:
+                continue
+            cache = self._read(minion)
+            cache.setdefault('enc', {})[cmd] = {'stamp': now,
+                                                'data': ndata[minion]}
+            self._write(minion, cache)
+        return ndata.get(id_)
+
+    def invalidate(self, tgt='*'):
+        '''
+        Remove the cache entries of the minions matching the glob tgt, the
+        ids of the removed entries are returned
+        '''
+        ret = []
+        if not os.path.isdir(self.cachedir):
+            return ret
+        for fn_ in sorted(os.listdir(self.cachedir)):
+            if not fn_.endswith('.p') or not fnmatch.fnmatch(fn_[:-2], tgt):
+                continue
+            try:
+                os.remove(os.path.join(self.cachedir, fn_))
+            except OSError:
+                continue
+            ret.append(fn_[:-2])
+        return ret
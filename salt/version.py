@@ -3,14 +3,17 @@ import sys
 __version_info__ = (0, 10, 4)
 __version__ = '.'.join(map(str, __version_info__))
 
-# If we can get a version from Git use that instead, otherwise carry on
+# If we can get a version from Git use that instead, otherwise carry on. Only
+# a git checkout of salt is described, an installed salt starts no process.
 try:
+    import os
     import subprocess
     from salt.utils import which
 
+    srcdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     git = which('git')
-    if git:
-        p = subprocess.Popen([git, 'describe'],
+    if git and os.path.exists(os.path.join(srcdir, '.git')):
+        p = subprocess.Popen([git, 'describe'], cwd=srcdir,
                 stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
         out, err = p.communicate()
         if out:
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+'''
+The connbench script measures what the minion's connection pool saves the
+execution modules which talk to databases and other services. It calls an
+execution module function a number of times with the pool disabled and
+then with the pool enabled, and reports the time taken per call.
+
+The function runs against the services configured in the minion config,
+which can be overridden on the command line, for example against a local
+MySQL server or the libvirt test driver:
+
+    connbench.py -f mysql.version -o mysql.host=127.0.0.1 -o mysql.user=root
+    connbench.py -f virt.node_info -o virt.connect_uri=test:///default
+'''
+
+# Import Python Libs
+import time
+import optparse
+
+# Import salt libs
+import salt.config
+import salt.loader
+import salt.utils.connpool
+
+
+def parse():
+    '''
+    Parse the cli options
+    '''
+    parser = optparse.OptionParser()
+    parser.add_option('-c',
+            '--config',
+            dest='config',
+            default='/etc/salt/minion',
+            help='The salt minion configuration file')
+    parser.add_option('-f',
+            '--function',
+            dest='function',
+            default='mysql.version',
+            help='The execution module function to call')
+    parser.add_option('-a',
+            '--arg',
+            dest='args',
+            default=[],
+            action='append',
+            help='An argument to pass to the function, can be repeated')
+    parser.add_option('-o',
+            '--opt',
+            dest='opts',
+            default=[],
+            action='append',
+            help='A key=value minion option to set, can be repeated')
+    parser.add_option('-n',
+            '--calls',
+            dest='calls',
+            default=200,
+            type='int',
+            help='The number of calls to make')
+
+    options, args = parser.parse_args()
+
+    opts = {}
+
+    for key, val in options.__dict__.items():
+        opts[key] = val
+
+    return opts
+
+
+class ConnBench(object):
+    '''
+    Call a function with and without the connection pool
+    '''
+    def __init__(self, opts):
+        self.opts = opts
+        self.minion_opts = salt.config.minion_config(opts['config'])
+        for opt in opts['opts']:
+            key, val = opt.split('=', 1)
+            self.minion_opts[key] = val
+        self.minion_opts['grains'] = salt.loader.grains(self.minion_opts)
+        self.functions = salt.loader.minion_mods(self.minion_opts)
+
+    def time_calls(self, size):
+        '''
+        Return the seconds taken by the calls with the passed pool size
+        '''
+        salt.utils.connpool.close_all()
+        self.minion_opts['connection_pool_size'] = size
+        func = self.functions[self.opts['function']]
+        start = time.time()
+        for ind in range(self.opts['calls']):
+            func(*self.opts['args'])
+        return time.time() - start
+
+    def run(self):
+        '''
+        Run the calls and report the results
+        '''
+        if self.opts['function'] not in self.functions:
+            print('The function {0} is not available'.format(
+                self.opts['function']))
+            return
+        # Warm up the modules and check that the function works
+        print('{0} returned: {1}'.format(
+            self.opts['function'],
+            self.functions[self.opts['function']](*self.opts['args'])))
+        calls = self.opts['calls']
+        size = self.minion_opts.get('connection_pool_size', 4) or 4
+        without = self.time_calls(0)
+        with_pool = self.time_calls(size)
+        print('{0} calls without the pool: {1:.3f}s ({2:.2f}ms/call)'.format(
+            calls, without, without * 1000 / calls))
+        print('{0} calls with the pool:    {1:.3f}s ({2:.2f}ms/call)'.format(
+            calls, with_pool, with_pool * 1000 / calls))
+        print('Speedup: {0:.1f}x'.format(without / max(with_pool, 0.000001)))
+        salt.utils.connpool.close_all()
+
+
+if __name__ == '__main__':
+    ConnBench(parse()).run()
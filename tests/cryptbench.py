@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+'''
+The cryptbench script measures the throughput of the Crypticle, which
+encrypts every payload sent between the master and the minions, for
+payload sizes from 1KB up to 100MB
+'''
+
+# Import Python Libs
+import os
+import time
+import optparse
+
+# Import salt libs
+import salt.crypt
+
+SIZES = '1K,64K,1M,10M,50M,100M'
+UNITS = {'K': 1024, 'M': 1024 ** 2}
+
+
+def parse():
+    '''
+    Parse the cli options
+    '''
+    parser = optparse.OptionParser()
+    parser.add_option('-s',
+            '--sizes',
+            dest='sizes',
+            default=SIZES,
+            help=('A comma delimited list of payload sizes to test, '
+                  'default: {0}').format(SIZES))
+    parser.add_option('-i',
+            '--iterations',
+            dest='iterations',
+            default=0,
+            type='int',
+            help=('The number of times to run each size, by default this '
+                  'scales down from 1000 for small payloads to 3 for large '
+                  'ones'))
+    parser.add_option('-z',
+            '--compression',
+            dest='compression',
+            default='',
+            help=('Benchmark dumps/loads with the named payload compression '
+                  'algorithm instead of the raw encrypt/decrypt path'))
+
+    options, args = parser.parse_args()
+
+    opts = {}
+
+    for key, val in options.__dict__.items():
+        opts[key] = val
+
+    return opts
+
+
+def to_bytes(size):
+    '''
+    Convert a size like 10M into a number of bytes
+    '''
+    size = size.strip().upper()
+    if size[-1] in UNITS:
+        return int(size[:-1]) * UNITS[size[-1]]
+    return int(size)
+
+
+class Bench(object):
+    '''
+    Time the Crypticle for a range of payload sizes
+    '''
+    def __init__(self, opts):
+        self.opts = opts
+        compression = []
+        if opts['compression']:
+            compression = [opts['compression']]
+        self.crypticle = salt.crypt.Crypticle(
+                {},
+                salt.crypt.Crypticle.generate_key_string(),
+                compression=compression)
+
+    def iterations(self, size):
+        '''
+        Return the number of iterations to run for a given size
+        '''
+        if self.opts['iterations']:
+            return self.opts['iterations']
+        return max(3, min(1000, (64 * UNITS['M']) // size))
+
+    def run_size(self, size):
+        '''
+        Time encryption and decryption of a single payload size, returns the
+        average seconds spent in each
+        '''
+        if self.opts['compression']:
+            # Repetitive data so that compression has something to do
+            data = ('salt' * (size // 4 + 1))[:size]
+            enc, dec = self.crypticle.dumps, self.crypticle.loads
+        else:
+            data = os.urandom(size)
+            enc, dec = self.crypticle.encrypt, self.crypticle.decrypt
+        count = self.iterations(size)
+        start = time.time()
+        for _ in range(count):
+            blob = enc(data)
+        enc_time = (time.time() - start) / count
+        start = time.time()
+        for _ in range(count):
+            dec(blob)
+        dec_time = (time.time() - start) / count
+        return enc_time, dec_time
+
+    def run(self):
+        '''
+        Run the benchmark and print the results
+        '''
+        fmt = '{0:>10} {1:>8} {2:>14} {3:>14}'
+        print(fmt.format('size', 'runs', 'encrypt MB/s', 'decrypt MB/s'))
+        for size in self.opts['sizes'].split(','):
+            nbytes = to_bytes(size)
+            enc_time, dec_time = self.run_size(nbytes)
+            mbytes = float(nbytes) / UNITS['M']
+            print(fmt.format(
+                size,
+                self.iterations(nbytes),
+                '{0:.1f}'.format(mbytes / enc_time if enc_time else 0),
+                '{0:.1f}'.format(mbytes / dec_time if dec_time else 0),
+                ))
+
+
+if __name__ == '__main__':
+    Bench(parse()).run()
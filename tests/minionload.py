@@ -0,0 +1,655 @@
+#!/usr/bin/env python
+'''
+The minionload script simulates thousands of minions inside a few processes
+to benchmark a real salt-master. Unlike minionswarm, which starts a full
+salt-minion for every id, the simulated minions share a small pool of keys
+and only speak the wire protocol: they authenticate with ``_auth``, listen
+on the publisher, answer publications with ``_return`` and can request
+``_pillar`` data and ``_serve_file`` chunks.
+
+The results are written out as JSON so they can be compared across releases.
+The master needs to accept the simulated minions, either run it with
+auto_accept or pass --accept to write the keys into the master's pki_dir.
+'''
+
+# Import Python Libs
+import os
+import sys
+import json
+import time
+import Queue
+import fnmatch
+import datetime
+import collections
+import optparse
+import tempfile
+import shutil
+import multiprocessing
+
+# Import salt libs
+import salt.config
+import salt.crypt
+import salt.loader
+import salt.payload
+import salt.utils.event
+
+# Import third party libs
+import zmq
+from M2Crypto import RSA
+
+
+def parse():
+    '''
+    Parse the cli options
+    '''
+    parser = optparse.OptionParser()
+    parser.add_option('-m',
+            '--minions',
+            dest='minions',
+            default=1000,
+            type='int',
+            help='The number of minions to simulate')
+    parser.add_option('-p',
+            '--procs',
+            dest='procs',
+            default=4,
+            type='int',
+            help='The number of processes to spread the minions over')
+    parser.add_option('-k',
+            '--keys',
+            dest='keys',
+            default=8,
+            type='int',
+            help='The size of the key pool shared by the minions')
+    parser.add_option('--keysize',
+            dest='keysize',
+            default=4096,
+            type='int',
+            help='The size of the keys in the key pool')
+    parser.add_option('--concurrency',
+            dest='concurrency',
+            default=16,
+            type='int',
+            help='The number of requests each process keeps in flight')
+    parser.add_option('-c',
+            '--config',
+            dest='config',
+            default='/etc/salt/master',
+            help='The configuration file of the master under test')
+    parser.add_option('--minion-config',
+            dest='minion_config',
+            default='/etc/salt/minion',
+            help=('A minion configuration file, the grains of this system '
+                  'are loaded with it and sent by every simulated minion'))
+    parser.add_option('--master',
+            dest='master',
+            default='127.0.0.1',
+            help='The address of the master under test')
+    parser.add_option('--prefix',
+            dest='prefix',
+            default='loadgen',
+            help='The prefix of the simulated minion ids')
+    parser.add_option('--accept',
+            dest='accept',
+            default=False,
+            action='store_true',
+            help=('Write the minion keys into the master\'s pki_dir so '
+                  'they are accepted, and remove them again afterwards'))
+    parser.add_option('--publish',
+            dest='publish',
+            default=10,
+            type='int',
+            help='The number of test.ping jobs to publish to the minions')
+    parser.add_option('--publish-interval',
+            dest='publish_interval',
+            default=2.0,
+            type='float',
+            help='Seconds to wait between publications')
+    parser.add_option('--pillar',
+            dest='pillar',
+            default=0,
+            type='int',
+            help='The number of minions in each process that request pillar')
+    parser.add_option('--file',
+            dest='file',
+            default='',
+            help=('A salt:// path which minions in each process request '
+                  'with _serve_file, one chunk per minion'))
+    parser.add_option('--timeout',
+            dest='timeout',
+            default=30,
+            type='int',
+            help=('Seconds to wait for returns after the last publication, '
+                  'and for the reply to a request before it counts as '
+                  'failed'))
+    parser.add_option('-o',
+            '--out',
+            dest='out',
+            default='',
+            help='Write the JSON report to this file instead of stdout')
+
+    options, args = parser.parse_args()
+
+    opts = {}
+
+    for key, val in options.__dict__.items():
+        opts[key] = val
+
+    return opts
+
+
+def percentiles(samples):
+    '''
+    Return a summary of a list of samples in milliseconds
+    '''
+    if not samples:
+        return {}
+    samples = sorted(samples)
+    ret = {'count': len(samples),
+           'max': samples[-1] * 1000,
+           'mean': sum(samples) / len(samples) * 1000}
+    for pct in (50, 90, 95, 99):
+        ind = min(len(samples) - 1, int(len(samples) * pct / 100.0))
+        ret['p{0}'.format(pct)] = samples[ind] * 1000
+    return ret
+
+
+def proc_cpu(pattern):
+    '''
+    Return the cpu seconds used by the processes with the pattern in their
+    command line, keyed by pid
+    '''
+    ret = {}
+    tick = float(os.sysconf(os.sysconf_names['SC_CLK_TCK']))
+    for pid in os.listdir('/proc'):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(os.path.join('/proc', pid, 'cmdline')) as fp_:
+                if pattern not in fp_.read():
+                    continue
+            with open(os.path.join('/proc', pid, 'stat')) as fp_:
+                stat = fp_.read().rsplit(')', 1)[1].split()
+        except (IOError, OSError):
+            continue
+        # utime and stime are the 14th and 15th fields of the stat file
+        ret[pid] = (int(stat[11]) + int(stat[12])) / tick
+    return ret
+
+
+class KeyPool(object):
+    '''
+    A small pool of minion keys shared by all of the simulated minions
+    '''
+    def __init__(self, opts):
+        self.opts = opts
+        self.dir = tempfile.mkdtemp(prefix='minionload-')
+        self.keys = []
+        for ind in range(opts['keys']):
+            name = 'key{0}'.format(ind)
+            salt.crypt.gen_keys(self.dir, name, opts['keysize'])
+            with open(os.path.join(self.dir, name + '.pub')) as fp_:
+                self.keys.append(
+                        (os.path.join(self.dir, name + '.pem'), fp_.read())
+                        )
+
+    def get(self, ind):
+        '''
+        Return the (private key path, public key string) for a minion
+        '''
+        return self.keys[ind % len(self.keys)]
+
+    def clean(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+class RequestPool(object):
+    '''
+    Keep a number of requests in flight to the master's ret port, each
+    socket handles one request at a time like the REQ socket of a minion.
+    A request which gets no reply within timeout seconds is dropped and
+    counted in expired.
+    '''
+    def __init__(self, context, uri, size, timeout):
+        self.context = context
+        self.uri = uri
+        self.timeout = timeout
+        self.serial = salt.payload.Serial('msgpack')
+        self.poller = zmq.Poller()
+        self.idle = []
+        self.busy = {}
+        self.queue = collections.deque()
+        self.expired = 0
+        for ind in range(size):
+            self.idle.append(self._socket())
+
+    def _socket(self):
+        sock = self.context.socket(zmq.REQ)
+        sock.linger = 0
+        sock.connect(self.uri)
+        self.poller.register(sock, zmq.POLLIN)
+        return sock
+
+    def submit(self, payload, callback):
+        '''
+        Queue a payload to send, the callback is passed the decoded reply and
+        the number of seconds the request took
+        '''
+        self.queue.append((self.serial.dumps(payload), callback))
+        self._send()
+
+    def _send(self):
+        while self.idle and self.queue:
+            sock = self.idle.pop()
+            package, callback = self.queue.popleft()
+            sock.send(package)
+            self.busy[sock] = (time.time(), callback)
+
+    def pending(self):
+        return len(self.queue) + len(self.busy)
+
+    def poll(self, timeout):
+        '''
+        Wait up to timeout milliseconds for replies and run their callbacks
+        '''
+        for sock, _ in self.poller.poll(timeout):
+            reply = self.serial.loads(sock.recv())
+            start, callback = self.busy.pop(sock)
+            self.idle.append(sock)
+            callback(reply, time.time() - start)
+        self._expire()
+        self._send()
+
+    def _expire(self):
+        '''
+        Drop the requests which are busy past the timeout, a REQ socket can
+        not send again before it got its reply, so it is replaced
+        '''
+        now = time.time()
+        for sock, (start, callback) in list(self.busy.items()):
+            if now - start < self.timeout:
+                continue
+            del self.busy[sock]
+            self.poller.unregister(sock)
+            sock.close()
+            self.idle.append(self._socket())
+            self.expired += 1
+
+
+class FakeMinions(multiprocessing.Process):
+    '''
+    Simulate a group of minions inside of a single process
+    '''
+    def __init__(self, opts, ids, keys, results, ready):
+        super(FakeMinions, self).__init__()
+        self.opts = opts
+        self.ids = ids
+        self.keys = keys
+        self.results = results
+        self.ready = ready
+        self.stats = {'auth_ok': 0,
+                      'auth_failed': 0,
+                      'auth_time': [],
+                      'returns': 0,
+                      'return_latency': [],
+                      'first_return': 0,
+                      'last_return': 0,
+                      'pillar_time': [],
+                      'file_time': [],
+                      'publications': 0,
+                      'timeouts': 0}
+
+    def authenticate(self):
+        '''
+        Sign in every minion, returns the crypticle for the master AES key
+        '''
+        aes = []
+        privs = {}
+
+        def on_auth(reply, elapsed, priv):
+            if 'aes' not in reply:
+                self.stats['auth_failed'] += 1
+                return
+            self.stats['auth_ok'] += 1
+            self.stats['auth_time'].append(elapsed)
+            if not aes:
+                if priv not in privs:
+                    privs[priv] = RSA.load_key(priv)
+                aes.append(privs[priv].private_decrypt(reply['aes'], 4))
+
+        start = time.time()
+        for ind, id_ in enumerate(self.ids):
+            priv, pub = self.keys.get(ind)
+            payload = {'enc': 'clear',
+                       'load': {'cmd': '_auth', 'id': id_, 'pub': pub}}
+            self.pool.submit(
+                    payload,
+                    lambda reply, elapsed, priv=priv: on_auth(
+                        reply, elapsed, priv)
+                    )
+        while self.pool.pending():
+            self.pool.poll(1000)
+        self.stats['auth_duration'] = time.time() - start
+        if not aes:
+            return None
+        return salt.crypt.Crypticle({}, aes[0])
+
+    def matches(self, data):
+        '''
+        Return the simulated minions that a publication targets
+        '''
+        tgt_type = data.get('tgt_type', 'glob')
+        if tgt_type == 'list':
+            tgt = data['tgt']
+            if isinstance(tgt, basestring):
+                tgt = tgt.split(',')
+            return [id_ for id_ in self.ids if id_ in tgt]
+        if tgt_type == 'glob':
+            return fnmatch.filter(self.ids, data['tgt'])
+        return []
+
+    def on_publish(self, data):
+        '''
+        Answer a publication for every targeted minion
+        '''
+        self.stats['publications'] += 1
+        try:
+            published = datetime.datetime.strptime(
+                    data['jid'], '%Y%m%d%H%M%S%f'
+                    )
+        except ValueError:
+            published = None
+
+        def on_return(reply, elapsed):
+            self.stats['returns'] += 1
+            now = time.time()
+            if not self.stats['first_return']:
+                self.stats['first_return'] = now
+            self.stats['last_return'] = now
+            if published:
+                delta = datetime.datetime.now() - published
+                self.stats['return_latency'].append(
+                        delta.days * 86400 + delta.seconds
+                        + delta.microseconds / 1000000.0
+                        )
+
+        for id_ in self.matches(data):
+            load = {'cmd': '_return',
+                    'id': id_,
+                    'jid': data['jid'],
+                    'fun': data['fun'],
+                    'return': True}
+            self.pool.submit(
+                    {'enc': 'aes', 'load': self.crypticle.dumps(load)},
+                    on_return)
+
+    def request_data(self):
+        '''
+        Request pillar data and file chunks for the configured minions
+        '''
+        def timer(key):
+            return lambda reply, elapsed: self.stats[key].append(elapsed)
+
+        for id_ in self.ids[:self.opts['pillar']]:
+            grains = dict(self.opts['grains'])
+            grains['id'] = id_
+            load = {'cmd': '_pillar',
+                    'id': id_,
+                    'grains': grains,
+                    'env': 'base'}
+            self.pool.submit(
+                    {'enc': 'aes', 'load': self.crypticle.dumps(load)},
+                    timer('pillar_time'))
+        if self.opts['file']:
+            path = self.opts['file']
+            if path.startswith('salt://'):
+                path = path[7:]
+            for id_ in self.ids:
+                load = {'cmd': '_serve_file',
+                        'path': path,
+                        'loc': 0,
+                        'env': 'base'}
+                self.pool.submit(
+                        {'enc': 'aes', 'load': self.crypticle.dumps(load)},
+                        timer('file_time'))
+
+    def run(self):
+        context = zmq.Context()
+        self.serial = salt.payload.Serial('msgpack')
+        self.pool = RequestPool(
+                context,
+                'tcp://{0}:{1}'.format(
+                    self.opts['master'],
+                    self.opts['master_opts']['ret_port']),
+                self.opts['concurrency'],
+                self.opts['timeout'])
+        self.crypticle = self.authenticate()
+        if self.crypticle is None:
+            self.ready.put(self.name)
+            self.stats['timeouts'] = self.pool.expired
+            self.results.put(self.stats)
+            return
+        sub = context.socket(zmq.SUB)
+        sub.setsockopt(zmq.SUBSCRIBE, '')
+        sub.connect('tcp://{0}:{1}'.format(
+            self.opts['master'],
+            self.opts['master_opts']['publish_port']))
+        # The publications are only sent once every process is listening
+        self.ready.put(self.name)
+        poller = zmq.Poller()
+        poller.register(sub, zmq.POLLIN)
+        self.request_data()
+        last = time.time()
+        while True:
+            socks = dict(poller.poll(10))
+            if socks.get(sub) == zmq.POLLIN:
+                payload = self.serial.loads(sub.recv())
+                if payload.get('enc') == 'aes':
+                    data = self.crypticle.loads(payload['load'])
+                    if 'jid' in data and 'tgt' in data:
+                        self.on_publish(data)
+                last = time.time()
+            if self.pool.pending():
+                self.pool.poll(10)
+                last = time.time()
+            elif time.time() - last > self.opts['idle']:
+                break
+        self.stats['timeouts'] = self.pool.expired
+        self.results.put(self.stats)
+
+
+class MinionLoad(object):
+    '''
+    Run the simulated minions against a master and report the results
+    '''
+    def __init__(self, opts):
+        self.opts = opts
+        self.opts['master_opts'] = salt.config.master_config(opts['config'])
+        # Pillar compilation needs a full set of grains, load them once
+        self.opts['grains'] = salt.loader.grains(
+                salt.config.minion_config(opts['minion_config'])
+                )
+        self.ids = [
+                '{0}-{1}'.format(opts['prefix'], ind)
+                for ind in range(opts['minions'])
+                ]
+
+    def accept(self, keys):
+        '''
+        Place the public keys of the simulated minions in the master pki_dir
+        '''
+        mdir = os.path.join(self.opts['master_opts']['pki_dir'], 'minions')
+        for ind, id_ in enumerate(self.ids):
+            with open(os.path.join(mdir, id_), 'w+') as fp_:
+                fp_.write(keys.get(ind)[1])
+
+    def unaccept(self):
+        mdir = os.path.join(self.opts['master_opts']['pki_dir'], 'minions')
+        for id_ in self.ids:
+            try:
+                os.remove(os.path.join(mdir, id_))
+            except OSError:
+                pass
+
+    def publish(self):
+        '''
+        Publish test.ping to the simulated minions
+        '''
+        import salt.client
+        local = salt.client.LocalClient(self.opts['config'])
+        jids = []
+        for ind in range(self.opts['publish']):
+            pub = local.pub(
+                    '{0}-*'.format(self.opts['prefix']),
+                    'test.ping')
+            jids.append(pub.get('jid'))
+            time.sleep(self.opts['publish_interval'])
+        return jids
+
+    def run(self):
+        keys = KeyPool(self.opts)
+        if self.opts['accept']:
+            self.accept(keys)
+        # The simulated minions stop once they have been idle this long
+        self.opts['idle'] = self.opts['publish_interval'] \
+                + self.opts['timeout']
+        results = multiprocessing.Queue()
+        ready = multiprocessing.Queue()
+        procs = []
+        try:
+            cpu_start = proc_cpu('salt-master')
+            start = time.time()
+            for ind in range(self.opts['procs']):
+                procs.append(FakeMinions(
+                    self.opts,
+                    self.ids[ind::self.opts['procs']],
+                    keys,
+                    results,
+                    ready))
+                procs[-1].start()
+            # Wait for the minions to sign in before publishing
+            self.wait_ready(procs, ready)
+            jids = self.publish() if self.opts['publish'] else []
+            stats = self.collect(procs, results)
+            elapsed = time.time() - start
+            cpu_end = proc_cpu('salt-master')
+        finally:
+            for proc in procs:
+                proc.join(1)
+                if proc.is_alive():
+                    proc.terminate()
+            if self.opts['accept']:
+                self.unaccept()
+            keys.clean()
+        self.report(stats, jids, elapsed, cpu_start, cpu_end)
+
+    def wait_ready(self, procs, ready):
+        '''
+        Wait until every process signed in its minions and listens on the
+        publisher, or died
+        '''
+        waiting = dict((proc.name, proc) for proc in procs)
+        while waiting:
+            try:
+                waiting.pop(ready.get(timeout=1), None)
+            except Queue.Empty:
+                if not any(proc.is_alive() for proc in waiting.values()):
+                    break
+        # Give the subscriptions time to reach the publisher
+        time.sleep(1)
+
+    def collect(self, procs, results):
+        '''
+        Return the stats of the processes, a process which does not finish
+        within the idle time and the request timeout after the publications
+        is left out and its minions count as failed
+        '''
+        stats = []
+        deadline = time.time() + self.opts['idle'] + self.opts['timeout']
+        for proc in procs:
+            try:
+                stats.append(results.get(
+                    timeout=max(deadline - time.time(), 0.1)))
+            except Queue.Empty:
+                break
+        missing = len(procs) - len(stats)
+        if missing:
+            sys.stderr.write(
+                '{0} processes did not report their results\n'.format(
+                    missing))
+        return stats
+
+    def report(self, stats, jids, elapsed, cpu_start, cpu_end):
+        '''
+        Write out the JSON report
+        '''
+        def merged(key):
+            ret = []
+            for stat in stats:
+                ret.extend(stat[key])
+            return ret
+
+        def total(key):
+            return sum(stat.get(key, 0) for stat in stats)
+
+        auth_duration = max(
+                [stat.get('auth_duration', 0) for stat in stats] or [0])
+        returns = total('returns')
+        latency = merged('return_latency')
+        ingest = 0
+        firsts = [stat['first_return'] for stat in stats
+                  if stat.get('first_return')]
+        if firsts:
+            window = max(stat['last_return'] for stat in stats) - min(firsts)
+            ingest = returns / max(window, 0.000001)
+        cpu = dict(
+                (pid, cpu_end[pid] - cpu_start.get(pid, 0))
+                for pid in cpu_end
+                )
+        report = {
+            'salt_version': salt.__version__,
+            'timestamp': time.time(),
+            'config': {
+                'minions': self.opts['minions'],
+                'procs': self.opts['procs'],
+                'keys': self.opts['keys'],
+                'concurrency': self.opts['concurrency'],
+                'publish': self.opts['publish'],
+                'pillar': self.opts['pillar'],
+                'file': self.opts['file'],
+                },
+            'elapsed': elapsed,
+            # The requests which got no reply within the timeout
+            'timeouts': total('timeouts'),
+            # The processes which did not report, their minions are missing
+            'missing_processes': self.opts['procs'] - len(stats),
+            'auth': {
+                'ok': total('auth_ok'),
+                'failed': total('auth_failed'),
+                'per_second': total('auth_ok') / max(auth_duration, 0.000001),
+                'latency_ms': percentiles(merged('auth_time')),
+                },
+            'publish': {
+                'jobs': len(jids),
+                'expected_returns': len(jids) * self.opts['minions'],
+                'returns': returns,
+                'ingest_per_second': ingest,
+                'latency_ms': percentiles(latency),
+                },
+            'pillar': {'latency_ms': percentiles(merged('pillar_time'))},
+            'serve_file': {'latency_ms': percentiles(merged('file_time'))},
+            'master_cpu': {
+                'total_seconds': sum(cpu.values()),
+                'per_process': cpu,
+                },
+            }
+        out = json.dumps(report, indent=2, sort_keys=True)
+        if self.opts['out']:
+            with open(self.opts['out'], 'w+') as fp_:
+                fp_.write(out)
+        else:
+            sys.stdout.write(out + '\n')
+
+
+if __name__ == '__main__':
+    MinionLoad(parse()).run()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+'''
+The pubbench script load tests the publisher of a running salt-master. It
+pushes publications straight into the publisher's publish_pull.ipc socket
+and counts how many of them arrive at a number of subscribers connected to
+the publish port.
+
+The publications are sent in the clear with an empty load, minions ignore
+clear publications so this is safe to run against a master with minions
+attached. The script needs to run as the user which runs the salt-master.
+'''
+
+# Import Python Libs
+import os
+import time
+import optparse
+import threading
+
+# Import salt libs
+import salt.config
+import salt.payload
+import salt.utils.event
+
+# Import third party libs
+import zmq
+
+
+def parse():
+    '''
+    Parse the cli options
+    '''
+    parser = optparse.OptionParser()
+    parser.add_option('-c',
+            '--config',
+            dest='config',
+            default='/etc/salt/master',
+            help='The salt master configuration file')
+    parser.add_option('-n',
+            '--publishes',
+            dest='publishes',
+            default=10000,
+            type='int',
+            help='The number of publications to send')
+    parser.add_option('-s',
+            '--subscribers',
+            dest='subscribers',
+            default=10,
+            type='int',
+            help='The number of subscribers to connect to the publisher')
+    parser.add_option('-r',
+            '--rate',
+            dest='rate',
+            default=0,
+            type='int',
+            help=('Publications to send per second, by default they are '
+                  'sent as fast as possible'))
+    parser.add_option('--size',
+            dest='size',
+            default=256,
+            type='int',
+            help='The size in bytes of the padding in each publication')
+    parser.add_option('-w',
+            '--wait',
+            dest='wait',
+            default=5,
+            type='int',
+            help='Seconds to wait for stragglers after the last publication')
+
+    options, args = parser.parse_args()
+
+    opts = {}
+
+    for key, val in options.__dict__.items():
+        opts[key] = val
+
+    return opts
+
+
+class Subscriber(threading.Thread):
+    '''
+    Count the load test publications which arrive on the publish port
+    '''
+    def __init__(self, context, uri):
+        super(Subscriber, self).__init__()
+        self.daemon = True
+        self.serial = salt.payload.Serial('msgpack')
+        self.sock = context.socket(zmq.SUB)
+        self.sock.setsockopt(zmq.SUBSCRIBE, '')
+        self.sock.connect(uri)
+        self.received = 0
+        self.last = 0
+        self.running = True
+
+    def run(self):
+        poller = zmq.Poller()
+        poller.register(self.sock, zmq.POLLIN)
+        while self.running:
+            if not poller.poll(100):
+                continue
+            payload = self.serial.loads(self.sock.recv())
+            if 'pubbench' not in payload.get('load', {}):
+                continue
+            self.received += 1
+            self.last = time.time()
+        self.sock.close()
+
+
+class PubBench(object):
+    '''
+    Drive the publisher of a running master
+    '''
+    def __init__(self, opts):
+        self.opts = opts
+        self.master_opts = salt.config.master_config(opts['config'])
+        self.serial = salt.payload.Serial(self.master_opts)
+        self.context = zmq.Context()
+
+    def run(self):
+        '''
+        Send the publications and report the results
+        '''
+        pub_uri = 'tcp://127.0.0.1:{0}'.format(
+                self.master_opts['publish_port']
+                )
+        pull_uri = 'ipc://{0}'.format(
+                os.path.join(self.master_opts['sock_dir'], 'publish_pull.ipc')
+                )
+        subs = []
+        for ind in range(self.opts['subscribers']):
+            subs.append(Subscriber(self.context, pub_uri))
+            subs[-1].start()
+        # Give the subscriptions time to reach the publisher
+        time.sleep(1)
+        push = self.context.socket(zmq.PUSH)
+        push.connect(pull_uri)
+        pad = 'x' * self.opts['size']
+        start = time.time()
+        for seq in range(self.opts['publishes']):
+            payload = {'enc': 'clear',
+                       'load': {'pubbench': seq, 'pad': pad}}
+            push.send_multipart([
+                '{0:.6f}'.format(time.time()),
+                self.serial.dumps(payload)])
+            if self.opts['rate']:
+                delay = start + float(seq + 1) / self.opts['rate'] \
+                        - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+        sent = time.time()
+        deadline = sent + self.opts['wait']
+        while time.time() < deadline:
+            if all(sub.received >= self.opts['publishes'] for sub in subs):
+                break
+            time.sleep(0.1)
+        for sub in subs:
+            sub.running = False
+        self.report(start, sent, subs)
+
+    def report(self, start, sent, subs):
+        '''
+        Print the throughput and loss seen by the subscribers
+        '''
+        total = self.opts['publishes']
+        print('Sent {0} publications in {1:.2f} seconds ({2:.0f}/s)'.format(
+            total, sent - start, total / max(sent - start, 0.000001)))
+        lost = 0
+        for ind, sub in enumerate(subs):
+            lost += total - sub.received
+            elapsed = max(sub.last - start, 0.000001)
+            print('subscriber {0:>4}: received {1}, dropped {2}, '
+                  '{3:.0f}/s'.format(
+                      ind,
+                      sub.received,
+                      total - sub.received,
+                      sub.received / elapsed))
+        print('Total dropped: {0} of {1}'.format(
+            lost, total * len(subs)))
+
+
+if __name__ == '__main__':
+    PubBench(parse()).run()
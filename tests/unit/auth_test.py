@@ -0,0 +1,98 @@
+'''
+    tests.unit.auth_test
+    ~~~~~~~~~~~~~~~~~~~~
+
+    Test the eauth token store and the cache of verified credentials
+'''
+
+# Import python libs
+import os
+import time
+import shutil
+import tempfile
+
+# Import salt libs
+from saltunittest import TestCase, TestLoader, TextTestRunner
+
+import salt.auth
+
+
+class TestLoadAuth(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.opts = {'extension_modules': self.tmp,
+                     'token_dir': self.tmp,
+                     'token_expire': 60,
+                     'eauth_cache_ttl': 0}
+        self.calls = []
+        self.loadauth = self.mk_loadauth()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def mk_loadauth(self):
+        loadauth = salt.auth.LoadAuth(self.opts)
+        loadauth.auth = {'fake.auth': self.fake_auth}
+        loadauth.max_fail = 0.01
+        return loadauth
+
+    def fake_auth(self, username, password):
+        self.calls.append(username)
+        return password == 'secret'
+
+    def load(self, password='secret'):
+        return {'eauth': 'fake', 'username': 'fred', 'password': password}
+
+    def test_tokens(self):
+        tdata = self.loadauth.mk_token(self.load())
+        self.assertEqual('fred', tdata['name'])
+        # The token is shared with the other workers through the token_dir
+        other = self.mk_loadauth()
+        self.assertEqual(tdata, other.get_tok(tdata['token']))
+        # and is served from memory afterwards
+        self.assertTrue(tdata['token'] in other.tokens)
+        # Removing the token file revokes it for all of the workers
+        os.remove(os.path.join(self.tmp, tdata['token']))
+        self.assertEqual({}, self.loadauth.get_tok(tdata['token']))
+        self.assertEqual({}, other.get_tok(tdata['token']))
+        self.assertEqual({}, other.get_tok('missing'))
+
+    def test_expired(self):
+        self.opts['token_expire'] = -1
+        tok = self.loadauth.mk_token(self.load())['token']
+        live = self.mk_loadauth()
+        live.opts = dict(self.opts, token_expire=60)
+        live_tok = live.mk_token(self.load())['token']
+        self.assertEqual(1, salt.auth.clean_expired_tokens(self.opts))
+        self.assertFalse(os.path.isfile(os.path.join(self.tmp, tok)))
+        self.assertEqual({}, self.loadauth.get_tok(tok))
+        self.assertTrue(self.loadauth.get_tok(live_tok))
+        # A token which is being written is left alone
+        tmp = os.path.join(self.tmp, '.___atomic_write' + live_tok)
+        open(tmp, 'w+').close()
+        self.assertEqual(0, salt.auth.clean_expired_tokens(self.opts))
+        self.assertTrue(os.path.isfile(tmp))
+
+    def test_auth_cache(self):
+        self.assertTrue(self.loadauth.time_auth(self.load()))
+        self.assertTrue(self.loadauth.time_auth(self.load()))
+        self.assertEqual(2, len(self.calls))
+        self.opts['eauth_cache_ttl'] = 60
+        self.assertTrue(self.loadauth.time_auth(self.load()))
+        self.assertTrue(self.loadauth.time_auth(self.load()))
+        self.assertEqual(3, len(self.calls))
+        # Failures are never cached and still take their time
+        for _ in range(2):
+            start = time.time()
+            self.assertFalse(self.loadauth.time_auth(self.load('wrong')))
+            self.assertTrue(time.time() - start >= 0.0075)
+        self.assertEqual(5, len(self.calls))
+        # The credentials are not kept in the cache
+        self.assertFalse('secret' in repr(self.loadauth.auth_cache))
+
+
+if __name__ == "__main__":
+    loader = TestLoader()
+    tests = loader.loadTestsFromTestCase(TestLoadAuth)
+    TextTestRunner(verbosity=1).run(tests)
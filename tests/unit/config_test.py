@@ -40,6 +40,34 @@ class ConfigTestCase(TestCase):
         self.assertEqual(config['log_file'], fpath)
         shutil.rmtree(tempdir)
 
+    def test_conf_cache(self):
+        tempdir = tempfile.mkdtemp()
+        fpath = os.path.join(tempdir, 'master')
+        cpath = os.path.join(tempdir, '.master.cache')
+        open(fpath, 'w').write('id: 1\ntimeout: 30\n')
+        os.chmod(fpath, 0o640)
+        self.assertEqual({'id': '1', 'timeout': 30},
+                         sconfig._read_conf_file(fpath))
+        self.assertEqual(0o640, os.stat(cpath).st_mode & 0o777)
+        parse = sconfig._parse_conf_file
+
+        def fail(path):
+            raise AssertionError('{0} was parsed'.format(path))
+        sconfig._parse_conf_file = fail
+        try:
+            self.assertEqual(30, sconfig.master_config(fpath)['timeout'])
+        finally:
+            sconfig._parse_conf_file = parse
+        # A changed file is parsed again
+        open(fpath, 'w').write('timeout: 60\n')
+        self.assertEqual({'timeout': 60}, sconfig._read_conf_file(fpath))
+        # Options marshal can not store are not cached
+        os.remove(cpath)
+        open(fpath, 'w').write('expires: 2012-12-21\n')
+        self.assertTrue('expires' in sconfig._read_conf_file(fpath))
+        self.assertFalse(os.path.exists(cpath))
+        shutil.rmtree(tempdir)
+
 
 if __name__ == "__main__":
     loader = TestLoader()
@@ -0,0 +1,148 @@
+'''
+    tests.unit.crypt_test
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Test the Crypticle encryption, payload framing and compression
+'''
+
+# Import python libs
+import os
+import hmac
+import hashlib
+
+# Import salt libs
+from saltunittest import TestCase, TestLoader, TextTestRunner, TestSuite
+
+import salt.crypt
+from salt.exceptions import AuthenticationError
+
+# Import third party libs
+from Crypto.Cipher import AES
+
+
+def legacy_encrypt(keys, data):
+    '''
+    The original, copying, implementation of Crypticle.encrypt
+    '''
+    aes_key, hmac_key = keys
+    pad = 16 - len(data) % 16
+    data = data + pad * chr(pad)
+    iv_bytes = os.urandom(16)
+    cypher = AES.new(aes_key, AES.MODE_CBC, iv_bytes)
+    data = iv_bytes + cypher.encrypt(data)
+    sig = hmac.new(hmac_key, data, hashlib.sha256).digest()
+    return data + sig
+
+
+class CrypticleTestCase(TestCase):
+    def setUp(self):
+        self.crypticle = salt.crypt.Crypticle(
+                {},
+                salt.crypt.Crypticle.generate_key_string()
+                )
+
+    def test_round_trip_block_boundaries(self):
+        for size in (0, 1, 15, 16, 17, 31, 32, 33, 1000, 65536, 70001):
+            data = os.urandom(size)
+            blob = self.crypticle.encrypt(data)
+            self.assertEqual(len(blob), 16 + (size // 16 + 1) * 16 + 32)
+            self.assertEqual(self.crypticle.decrypt(blob), data)
+
+    def test_header_split(self):
+        # The framing header is encrypted in line with the data
+        for hsize in (0, 3, 8, 16, 20):
+            for size in (0, 5, 12, 13, 40, 1000, 70000):
+                header = 'h' * hsize
+                data = os.urandom(size)
+                blob = self.crypticle._encrypt(header, data)
+                self.assertEqual(
+                    self.crypticle.decrypt(blob),
+                    header + data
+                )
+
+    def test_wire_compatibility(self):
+        data = os.urandom(5000)
+        self.assertEqual(
+            self.crypticle.decrypt(legacy_encrypt(self.crypticle.keys, data)),
+            data
+        )
+        blob = legacy_encrypt(
+                self.crypticle.keys,
+                self.crypticle.PICKLE_PAD + self.crypticle.serial.dumps([1])
+                )
+        self.assertEqual(self.crypticle.loads(blob), [1])
+
+    def test_tampered_message(self):
+        blob = self.crypticle.encrypt('some data')
+        tampered = blob[:20] + chr(ord(blob[20]) ^ 1) + blob[21:]
+        self.assertRaises(
+            AuthenticationError,
+            self.crypticle.decrypt,
+            tampered
+        )
+        self.assertRaises(
+            AuthenticationError,
+            self.crypticle.decrypt,
+            blob[:-1]
+        )
+
+
+class CrypticleCompressionTestCase(TestCase):
+    def setUp(self):
+        self.opts = {'payload_compression_threshold': 1024}
+        self.key = salt.crypt.Crypticle.generate_key_string()
+        self.data = {'return': ['the same line over and over'] * 1000}
+
+    def test_legacy_framing(self):
+        crypticle = salt.crypt.Crypticle(self.opts, self.key)
+        blob = crypticle.dumps(self.data)
+        self.assertTrue(
+            crypticle.decrypt(blob).startswith(crypticle.PICKLE_PAD)
+        )
+        self.assertEqual(crypticle.loads_peer(blob), (self.data, []))
+        self.assertEqual(crypticle.stats['compressed'], 0)
+
+    def test_compressed_round_trip(self):
+        sender = salt.crypt.Crypticle(
+                self.opts, self.key, compression=['zlib'])
+        receiver = salt.crypt.Crypticle(self.opts, self.key)
+        blob = sender.dumps(self.data)
+        self.assertTrue(
+            sender.decrypt(blob).startswith('zpickle:zlib::')
+        )
+        self.assertEqual(receiver.loads_peer(blob), (self.data, ['zlib']))
+        self.assertEqual(sender.stats['compressed'], 1)
+        self.assertTrue(sender.stats['saved_bytes'] > 0)
+        self.assertEqual(
+            sender.stats['raw_bytes'] - sender.stats['sent_bytes'],
+            sender.stats['saved_bytes']
+        )
+
+    def test_below_threshold(self):
+        sender = salt.crypt.Crypticle(
+                self.opts, self.key, compression=['zlib'])
+        blob = sender.dumps({'ret': True})
+        self.assertTrue(
+            sender.decrypt(blob).startswith('zpickle:none::')
+        )
+        # The peer still learns that compressed replies are understood
+        self.assertEqual(sender.loads_peer(blob), ({'ret': True}, ['zlib']))
+        self.assertEqual(sender.stats['compressed'], 0)
+
+    def test_unavailable_algorithm(self):
+        crypticle = salt.crypt.Crypticle(
+                self.opts, self.key, compression=['bogus', 'zlib'])
+        self.assertEqual(crypticle.compression, ['zlib'])
+        self.assertEqual(
+            salt.crypt.compression_algos({'payload_compression': 'bogus'}),
+            []
+        )
+
+
+if __name__ == "__main__":
+    loader = TestLoader()
+    tests = TestSuite([
+        loader.loadTestsFromTestCase(CrypticleTestCase),
+        loader.loadTestsFromTestCase(CrypticleCompressionTestCase)
+        ])
+    TextTestRunner(verbosity=1).run(tests)
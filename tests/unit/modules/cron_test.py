@@ -0,0 +1,78 @@
+import sys
+import os
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from saltunittest import TestCase, TestLoader, TextTestRunner, skipIf
+try:
+    from mock import MagicMock, patch
+    has_mock = True
+except ImportError:
+    has_mock = False
+
+import salt.modules.cron as cron
+cron.__salt__ = {}
+cron.__grains__ = {'os': 'Debian'}
+
+CRONTAB = '''# Some comment
+# Lines below here are managed by Salt, do not edit
+MAILTO=root
+5 * * * * /usr/bin/hourly
+0 2 * * * /usr/bin/nightly
+'''
+
+
+@skipIf(has_mock is False, "mock python module is unavailable")
+class TestCronModule(TestCase):
+
+    def setUp(self):
+        self.written = []
+
+        def run_all(cmd):
+            path = cmd.split()[-1]
+            self.written.append(open(path).read())
+            return {'retcode': 0, 'stderr': ''}
+        self.salt = {'cmd.run_stdout': MagicMock(return_value=CRONTAB),
+                     'cmd.run_all': MagicMock(side_effect=run_all)}
+
+    def test_edit_jobs(self):
+        with patch.dict(cron.__salt__, self.salt):
+            ret = cron.edit_jobs(
+                    'root',
+                    [{'cmd': '/usr/bin/hourly', 'minute': 5},
+                     {'cmd': '/usr/bin/nightly', 'hour': 3, 'minute': 0},
+                     {'cmd': '/usr/bin/weekly', 'dayweek': 1}],
+                    ['/usr/bin/gone'])
+            self.assertEqual({'/usr/bin/hourly': 'present',
+                              '/usr/bin/nightly': 'updated',
+                              '/usr/bin/weekly': 'new',
+                              '/usr/bin/gone': 'absent'}, ret)
+            self.assertEqual(1, self.salt['cmd.run_stdout'].call_count)
+            self.assertEqual(1, len(self.written))
+            self.assertTrue(
+                '0 3 * * * /usr/bin/nightly\n' in self.written[0])
+            self.assertTrue(
+                '* * * * 1 /usr/bin/weekly\n' in self.written[0])
+
+    def test_edit_jobs_unchanged(self):
+        with patch.dict(cron.__salt__, self.salt):
+            ret = cron.edit_jobs('root', absent=['/usr/bin/gone'])
+            self.assertEqual({'/usr/bin/gone': 'absent'}, ret)
+            self.assertEqual([], self.written)
+
+    def test_edit_jobs_failure(self):
+        self.salt['cmd.run_all'] = MagicMock(
+                return_value={'retcode': 1, 'stderr': 'denied'})
+        with patch.dict(cron.__salt__, self.salt):
+            ret = cron.edit_jobs(
+                    'root',
+                    [{'cmd': '/usr/bin/hourly', 'minute': 5}],
+                    ['/usr/bin/nightly'])
+            self.assertEqual({'/usr/bin/hourly': 'present',
+                              '/usr/bin/nightly': 'denied'}, ret)
+
+
+if __name__ == "__main__":
+    loader = TestLoader()
+    tests = loader.loadTestsFromTestCase(TestCronModule)
+    TextTestRunner(verbosity=1).run(tests)
@@ -0,0 +1,77 @@
+import sys
+import os
+import shutil
+import tempfile
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from saltunittest import TestCase, TestLoader, TextTestRunner, skipIf
+try:
+    from mock import MagicMock, patch
+    has_mock = True
+except ImportError:
+    has_mock = False
+
+import salt.modules.ssh as ssh
+ssh.__salt__ = {}
+
+KEY1 = 'AAAAB3NzaC1kc3MAAACBAL0sQ9fJ5bYTEyY=='
+KEY2 = 'AAAAB3NzaC1kcQ9fJFF435bYTEyY=='
+KEY3 = 'AAAAB3NzaC1kcQ9J5bYTEyY=='
+
+
+@skipIf(has_mock is False, "mock python module is unavailable")
+class TestSshModule(TestCase):
+
+    def setUp(self):
+        self.home = tempfile.mkdtemp()
+        self.full = os.path.join(self.home, '.ssh', 'authorized_keys')
+        self.uinfo = {'home': self.home, 'uid': os.getuid(),
+                      'gid': os.getgid()}
+
+    def tearDown(self):
+        shutil.rmtree(self.home)
+
+    def test_edit_auth_keys(self):
+        with patch.dict(ssh.__salt__,
+                        {'user.info': MagicMock(return_value=self.uinfo)}):
+            ret = ssh.edit_auth_keys(
+                    'foo',
+                    [{'key': KEY1, 'comment': 'one'},
+                     {'key': KEY2, 'enc': 'dsa'}],
+                    [KEY3])
+            self.assertEqual(
+                    {KEY1: 'new', KEY2: 'new', KEY3: 'Key not present'},
+                    ret)
+            self.assertEqual(0600, os.stat(self.full).st_mode & 0777)
+            ret = ssh.edit_auth_keys(
+                    'foo',
+                    [{'key': KEY1, 'comment': 'one'},
+                     {'key': KEY3}],
+                    [KEY2])
+            self.assertEqual(
+                    {KEY1: 'no change', KEY2: 'Key removed', KEY3: 'new'},
+                    ret)
+            self.assertEqual(
+                    ['ssh-rsa {0} one\n'.format(KEY1),
+                     'ssh-rsa {0} \n'.format(KEY3)],
+                    open(self.full).readlines())
+            ret = ssh.edit_auth_keys(
+                    'foo',
+                    [{'key': KEY3, 'options': ['no-pty']}])
+            self.assertEqual({KEY3: 'replace'}, ret)
+            self.assertEqual('update', ssh.check_key(
+                    'foo', KEY3, 'ssh-rsa', '', []))
+
+    def test_edit_auth_keys_no_home(self):
+        self.uinfo['home'] = os.path.join(self.home, 'missing')
+        with patch.dict(ssh.__salt__,
+                        {'user.info': MagicMock(return_value=self.uinfo)}):
+            ret = ssh.edit_auth_keys('foo', [{'key': KEY1}], [KEY2])
+            self.assertEqual({KEY1: 'fail', KEY2: 'Key not present'}, ret)
+
+
+if __name__ == "__main__":
+    loader = TestLoader()
+    tests = loader.loadTestsFromTestCase(TestSshModule)
+    TextTestRunner(verbosity=1).run(tests)
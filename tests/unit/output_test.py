@@ -0,0 +1,93 @@
+'''
+    tests.unit.output_test
+    ~~~~~~~~~~~~~~~~~~~~~~
+
+    Test the loading of the outputters and the highstate outputter
+'''
+
+# Import python libs
+import sys
+import copy
+import shutil
+import tempfile
+from StringIO import StringIO
+
+# Import salt libs
+from saltunittest import TestCase, TestLoader, TextTestRunner
+
+import salt.output
+
+
+STATES = {
+    'file_|-motd_|-/etc/motd_|-managed': {
+        'result': True, 'changes': {'diff': 'New file'},
+        'comment': 'File updated', '__run_num__': 1},
+    'pkg_|-vim_|-vim_|-installed': {
+        'result': True, 'changes': {},
+        'comment': 'Already installed', '__run_num__': 0},
+    'service_|-ntpd_|-ntpd_|-running': {
+        'result': False, 'changes': {},
+        'comment': 'Failed to start', '__run_num__': 2},
+    '__run_stats__': {'reloads': 1, 'reload_time': 0.2,
+                      'hashed': 100, 'cached': 4000},
+}
+
+
+class TestOutput(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.opts = {'extension_modules': self.tmp,
+                     'color': False,
+                     'state_verbose': False,
+                     'state_output': 'full'}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def display(self, data):
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            salt.output.display_output(data, 'highstate', self.opts)
+            return sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+
+    def test_loaded_once(self):
+        printout = salt.output.get_printout('highstate', self.opts)
+        outputters = salt.output._LOADED['outputters']
+        self.assertEqual(printout, salt.output.get_printout('highstate',
+                                                            self.opts))
+        self.assertTrue(outputters is salt.output._LOADED['outputters'])
+        salt.output.get_printout('highstate', dict(self.opts))
+        self.assertFalse(outputters is salt.output._LOADED['outputters'])
+
+    def test_highstate(self):
+        data = {'web1': copy.deepcopy(STATES)}
+        out = self.display(data)
+        # The return is not changed
+        self.assertEqual({'web1': STATES}, data)
+        self.assertTrue(out.startswith('web1:\n'))
+        self.assertFalse('vim' in out)
+        self.assertFalse('run_stats' in out)
+        self.assertTrue(out.index('/etc/motd') < out.index('ntpd'))
+        # The outputters are loaded again for other opts
+        self.opts = dict(self.opts, state_verbose=True)
+        self.assertTrue('vim' in self.display(data))
+        self.opts = dict(self.opts, state_output='terse')
+        out = self.display(data)
+        self.assertEqual(4, len(out.splitlines()))
+
+    def test_summary(self):
+        self.opts = dict(self.opts, state_output='summary')
+        out = self.display({'web1': STATES, 'web2': ['Rendering failed']})
+        self.assertTrue(
+            'web1: 1 unchanged, 1 changed, 1 failed\n' in out)
+        self.assertTrue('web2: Data failed to compile\n' in out)
+
+
+if __name__ == "__main__":
+    loader = TestLoader()
+    tests = loader.loadTestsFromTestCase(TestOutput)
+    TextTestRunner(verbosity=1).run(tests)
@@ -0,0 +1,76 @@
+'''
+    tests.unit.startup_test
+    ~~~~~~~~~~~~~~~~~~~~~~~
+
+    Keep track of the start up time of the command line clients
+'''
+
+# Import python libs
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+
+# Import salt libs
+from saltunittest import TestCase, TestLoader, TextTestRunner
+
+import salt
+
+# The seconds the salt command may take to import and load its
+# configuration, with the configuration cached
+STARTUP_BUDGET = 1.0
+
+# The modules only the commands which use them may import
+HEAVY = ('M2Crypto', 'jinja2', 'yaml', 'salt.minion', 'salt.pillar',
+         'salt.fileclient', 'salt.state')
+
+STARTUP = '''
+import sys
+import time
+start = time.time()
+import salt.scripts
+import salt.config
+salt.config.client_config(sys.argv[1])
+print(repr((time.time() - start, [mod for mod in {0!r} if mod in sys.modules])))
+'''.format(HEAVY)
+
+
+class TestStartup(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.conf = os.path.join(self.tmp, 'master')
+        with open(self.conf, 'w') as fp_:
+            fp_.write('timeout: 10\ncachedir: {0}\n'.format(self.tmp))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def startup(self):
+        env = os.environ.copy()
+        env['PYTHONPATH'] = os.path.dirname(
+                os.path.dirname(os.path.abspath(salt.__file__)))
+        proc = subprocess.Popen(
+                [sys.executable, '-c', STARTUP, self.conf],
+                stdout=subprocess.PIPE,
+                env=env)
+        out = proc.communicate()[0]
+        self.assertEqual(0, proc.returncode)
+        return eval(out.strip().splitlines()[-1])
+
+    def test_startup(self):
+        # The first run parses the configuration
+        self.assertTrue('yaml' in self.startup()[1])
+        runs = [self.startup() for _ in range(3)]
+        self.assertEqual([], runs[0][1])
+        best = min(run[0] for run in runs)
+        self.assertTrue(
+            best < STARTUP_BUDGET,
+            'The salt command took {0:.3f}s to start'.format(best))
+
+
+if __name__ == "__main__":
+    loader = TestLoader()
+    tests = loader.loadTestsFromTestCase(TestStartup)
+    TextTestRunner(verbosity=1).run(tests)
@@ -0,0 +1,86 @@
+import sys
+import os
+import tempfile
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from saltunittest import TestCase, TestLoader, TextTestRunner, skipIf
+try:
+    from mock import MagicMock, patch
+    has_mock = True
+except ImportError:
+    has_mock = False
+
+import salt.states.pkg as pkg
+pkg.__salt__ = {}
+pkg.__context__ = {}
+pkg.__opts__ = {'test': False, 'cachedir': tempfile.gettempdir()}
+
+
+def _low(name, fun='installed', **kwargs):
+    low = {'state': 'pkg', 'fun': fun, 'name': name, '__id__': name}
+    low.update(kwargs)
+    return low
+
+
+@skipIf(has_mock is False, "mock python module is unavailable")
+class TestPkgState(TestCase):
+
+    def setUp(self):
+        pkg.__context__.clear()
+        self.inventory = {'vim': '7.3'}
+
+        def install(name, refresh=False, **kwargs):
+            changes = {}
+            if 'bogus' in name.split(' '):
+                return {}
+            for pkg_name in name.split(' '):
+                self.inventory[pkg_name] = '1.0'
+                changes[pkg_name] = {'old': '', 'new': '1.0'}
+            return changes
+        self.list_pkgs = MagicMock(side_effect=lambda: dict(self.inventory))
+        self.install = MagicMock(side_effect=install)
+        self.install.__module__ = 'salt.loaded.int.module.apt'
+        self.salt = {'pkg.list_pkgs': self.list_pkgs,
+                     'pkg.version': MagicMock(return_value=''),
+                     'pkg.install': self.install}
+
+    def test_inventory_cached(self):
+        with patch.dict(pkg.__salt__, self.salt):
+            self.assertEqual(True, pkg.installed('vim')['result'])
+            self.assertEqual(True, pkg.removed('emacs')['result'])
+            self.assertEqual(1, self.list_pkgs.call_count)
+            ret = pkg.installed('git')
+            self.assertEqual({'old': '', 'new': '1.0'}, ret['changes']['git'])
+            # The install invalidates the inventory
+            pkg.installed('vim')
+            self.assertEqual(2, self.list_pkgs.call_count)
+
+    def test_aggregate(self):
+        lows = [_low('vim'), _low('git'), _low('curl'),
+                _low('nginx', version='1.2')]
+        with patch.dict(pkg.__salt__, self.salt):
+            acted = pkg.mod_aggregate(lows)
+            self.assertEqual(['git', 'curl'], [low['name'] for low in acted])
+            self.assertEqual(1, self.install.call_count)
+            self.assertEqual('git curl', self.install.call_args[0][0])
+            ret = pkg.installed('git')
+            self.assertEqual(True, ret['result'])
+            self.assertEqual(['git'], ret['changes'].keys())
+            self.assertEqual(True, pkg.installed('vim')['result'])
+            self.assertEqual(1, self.install.call_count)
+
+    def test_aggregate_failure(self):
+        lows = [_low('git'), _low('bogus')]
+        with patch.dict(pkg.__salt__, self.salt):
+            pkg.mod_aggregate(lows)
+            # The failed transaction is retried by each state on its own
+            self.assertEqual(True, pkg.installed('git')['result'])
+            self.assertEqual(False, pkg.installed('bogus')['result'])
+            self.assertEqual(3, self.install.call_count)
+
+
+if __name__ == "__main__":
+    loader = TestLoader()
+    tests = loader.loadTestsFromTestCase(TestPkgState)
+    TextTestRunner(verbosity=1).run(tests)
@@ -0,0 +1,85 @@
+'''
+    tests.unit.utils.connpool_test
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test the process wide connection pools
+'''
+
+# Import python libs
+import time
+
+# Import salt libs
+from saltunittest import TestCase, TestLoader, TextTestRunner
+
+from salt.utils import connpool
+
+
+class FakeConnection(object):
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+        self.alive = True
+
+    def close(self):
+        self.closed = True
+
+
+class TestPool(TestCase):
+
+    def setUp(self):
+        self.opened = []
+        self.pool = connpool.Pool(
+                'test',
+                size=1,
+                idle_timeout=300,
+                check=lambda conn: conn.alive)
+
+    def create(self):
+        conn = FakeConnection(len(self.opened))
+        self.opened.append(conn)
+        return conn
+
+    def test_reuse(self):
+        conn = self.pool.acquire('a', self.create)
+        self.assertFalse(conn.reused)
+        self.assertEqual(conn.name, 0)
+        conn.close()
+        # Released when no longer referenced
+        self.assertEqual(self.pool.acquire('a', self.create).name, 0)
+        self.assertEqual(self.pool.acquire('a', self.create).name, 0)
+        self.assertEqual(self.pool.acquire('b', self.create).name, 1)
+        self.assertEqual(self.pool.stats['created'], 2)
+        self.assertEqual(self.pool.stats['reused'], 2)
+
+    def test_size(self):
+        first = self.pool.acquire('a', self.create)
+        second = self.pool.acquire('a', self.create)
+        self.assertEqual([first.name, second.name], [0, 1])
+        first.close()
+        second.close()
+        # Only one idle connection is kept
+        self.assertFalse(self.opened[0].closed)
+        self.assertTrue(self.opened[1].closed)
+
+    def test_health(self):
+        self.pool.acquire('a', self.create)
+        self.opened[0].alive = False
+        conn = self.pool.acquire('a', self.create)
+        self.assertEqual(conn.name, 1)
+        self.assertTrue(self.opened[0].closed)
+        conn.discard()
+        self.assertTrue(self.opened[1].closed)
+        self.assertEqual(self.pool.idle, {})
+
+    def test_idle_timeout(self):
+        self.pool.acquire('a', self.create)
+        self.pool.idle['a'] = [(self.opened[0], time.time() - 301)]
+        self.assertEqual(self.pool.acquire('b', self.create).name, 1)
+        self.assertTrue(self.opened[0].closed)
+        self.assertEqual(self.pool.idle.keys(), ['b'])
+
+
+if __name__ == "__main__":
+    loader = TestLoader()
+    tests = loader.loadTestsFromTestCase(TestPool)
+    TextTestRunner(verbosity=1).run(tests)
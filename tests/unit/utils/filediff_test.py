@@ -0,0 +1,75 @@
+'''
+    tests.unit.utils.filediff_test
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test the bounded diffs of managed files
+'''
+
+# Import python libs
+import os
+import shutil
+import tempfile
+
+# Import salt libs
+from saltunittest import TestCase, TestLoader, TextTestRunner
+
+from salt.utils import filediff
+
+
+class TestFileDiff(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.old = os.path.join(self.tmp, 'old')
+        self.new = os.path.join(self.tmp, 'new')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def write(self, path, data):
+        with open(path, 'wb') as fp_:
+            fp_.write(data)
+
+    def test_diff(self):
+        self.write(self.old, 'a\nb\nc\n')
+        self.write(self.new, 'a\nB\nc\n')
+        diff = filediff.file_diff(self.old, self.new)
+        self.assertTrue('-b\n+B\n' in diff)
+        summary = filediff.file_diff(self.old, self.new, show_diff=False)
+        self.assertTrue(summary.startswith('Diff disabled, diff not shown'))
+        self.assertTrue('First difference on line 2' in summary)
+
+    def test_limits(self):
+        self.write(self.old, ''.join('{0}\n'.format(x) for x in range(100)))
+        self.write(self.new, ''.join('{0}\n'.format(x * 2) for x in range(100)))
+        diff = filediff.file_diff(self.old, self.new, {'diff_max_lines': 10})
+        self.assertEqual(10, len(diff.split('Diff longer')[0].splitlines()))
+        self.assertTrue('old: 290 bytes, md5=' in diff)
+        self.assertTrue('new: ' in diff)
+        diff = filediff.file_diff(self.old, self.new, {'diff_max_bytes': 100})
+        self.assertTrue(
+            diff.startswith('File larger than 100 bytes, diff not shown'))
+        self.assertTrue('First difference on line 2' in diff)
+        # The limits are lifted for the file
+        diff = filediff.file_diff(self.old,
+                                  self.new,
+                                  {'diff_max_bytes': 100, 'diff_max_lines': 10},
+                                  show_diff=True)
+        self.assertFalse('diff not shown' in diff)
+
+    def test_binary(self):
+        self.write(self.old, 'text\n')
+        self.write(self.new, '\x7fELF\x00\x01\x02')
+        self.assertFalse(filediff.is_binary(self.old))
+        self.assertTrue(filediff.is_binary(self.new))
+        self.write(os.path.join(self.tmp, 'utf8'), 'caf\xc3\xa9\n')
+        self.assertFalse(filediff.is_binary(os.path.join(self.tmp, 'utf8')))
+        diff = filediff.file_diff(self.old, self.new, show_diff=True)
+        self.assertTrue(diff.startswith('Binary file, diff not shown'))
+        self.assertFalse('First difference' in diff)
+
+
+if __name__ == "__main__":
+    loader = TestLoader()
+    tests = loader.loadTestsFromTestCase(TestFileDiff)
+    TextTestRunner(verbosity=1).run(tests)
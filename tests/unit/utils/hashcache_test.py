@@ -0,0 +1,82 @@
+'''
+    tests.unit.utils.hashcache_test
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test the persistent cache of the hashes of the files on the minion
+'''
+
+# Import python libs
+import os
+import time
+import shutil
+import hashlib
+import tempfile
+
+# Import salt libs
+from saltunittest import TestCase, TestLoader, TextTestRunner
+
+from salt.utils import hashcache
+
+
+class TestHashCache(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.opts = {'cachedir': self.tmp}
+        self.path = os.path.join(self.tmp, 'managed')
+        self.write('x' * 100000)
+        hashcache._CACHES.clear()
+        hashcache.stats()
+
+    def tearDown(self):
+        hashcache._CACHES.clear()
+        shutil.rmtree(self.tmp)
+
+    def write(self, data, age=60):
+        with open(self.path, 'w+') as fp_:
+            fp_.write(data)
+        stamp = time.time() - age
+        os.utime(self.path, (stamp, stamp))
+
+    def test_get_hash(self):
+        md5 = hashlib.md5('x' * 100000).hexdigest()
+        self.assertEqual(md5, hashcache.get_hash(self.path, 'md5', self.opts))
+        self.assertEqual(md5, hashcache.get_hash(self.path, 'md5', self.opts))
+        self.assertEqual({'hashed': 100000, 'cached': 100000},
+                         hashcache.stats())
+        # Other hash types are cached on their own
+        self.assertEqual(hashlib.sha256('x' * 100000).hexdigest(),
+                         hashcache.get_hash(self.path, 'sha256', self.opts))
+        # A change of the contents is noticed
+        self.write('y' * 100000, age=30)
+        self.assertEqual(hashlib.md5('y' * 100000).hexdigest(),
+                         hashcache.get_hash(self.path, 'md5', self.opts))
+        self.assertEqual({'hashed': 200000, 'cached': 0}, hashcache.stats())
+
+    def test_persist(self):
+        hashcache.get_hash(self.path, 'md5', self.opts)
+        hashcache.save()
+        hashcache._CACHES.clear()
+        hashcache.stats()
+        hashcache.get_hash(self.path, 'md5', self.opts)
+        self.assertEqual({'hashed': 0, 'cached': 100000}, hashcache.stats())
+
+    def test_racy(self):
+        # A file which was just written is not cached, the next write could
+        # keep its size and timestamps
+        self.write('x' * 100000, age=0)
+        hashcache.get_hash(self.path, 'md5', self.opts)
+        hashcache.get_hash(self.path, 'md5', self.opts)
+        self.assertEqual({'hashed': 200000, 'cached': 0}, hashcache.stats())
+
+    def test_disabled(self):
+        opts = {'cachedir': self.tmp, 'hash_cache': False}
+        hashcache.get_hash(self.path, 'md5', opts)
+        hashcache.get_hash(self.path, 'md5', opts)
+        self.assertEqual({'hashed': 200000, 'cached': 0}, hashcache.stats())
+
+
+if __name__ == "__main__":
+    loader = TestLoader()
+    tests = loader.loadTestsFromTestCase(TestHashCache)
+    TextTestRunner(verbosity=1).run(tests)
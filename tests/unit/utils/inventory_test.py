@@ -0,0 +1,106 @@
+'''
+    tests.unit.utils.inventory_test
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test the passwd, group and shadow snapshots shared during a state run
+'''
+
+# Import python libs
+import pwd
+import grp
+from collections import namedtuple
+
+# Import salt libs
+from saltunittest import TestCase, TestLoader, TextTestRunner, skipIf
+try:
+    from mock import patch
+    has_mock = True
+except ImportError:
+    has_mock = False
+
+from salt.utils import inventory
+
+PW = namedtuple('PW', 'pw_name pw_uid pw_gid')
+GR = namedtuple('GR', 'gr_name gr_gid gr_mem')
+
+
+@skipIf(has_mock is False, "mock python module is unavailable")
+class TestInventory(TestCase):
+
+    def setUp(self):
+        self.users = {'foo': PW('foo', 1000, 1000)}
+        self.groups = {'foo': GR('foo', 1000, []),
+                       'wheel': GR('wheel', 10, ['foo'])}
+
+    def _getpwnam(self, name):
+        return self.users[name]
+
+    def _getgrnam(self, name):
+        return self.groups[name]
+
+    def _getgrgid(self, gid):
+        for ent in self.groups.values():
+            if ent.gr_gid == gid:
+                return ent
+        raise KeyError(gid)
+
+    def test_get(self):
+        self.assertEqual(inventory.get({}), None)
+        context = {'state.run': True}
+        inv = inventory.get(context)
+        self.assertTrue(inv is inventory.get(context))
+
+    def test_snapshot(self):
+        getpwall = lambda: self.users.values()
+        getgrall = lambda: self.groups.values()
+        with patch.object(pwd, 'getpwall') as pwall, \
+                patch.object(grp, 'getgrall') as grall, \
+                patch.object(pwd, 'getpwnam', self._getpwnam), \
+                patch.object(grp, 'getgrnam', self._getgrnam):
+            pwall.side_effect = getpwall
+            grall.side_effect = getgrall
+            inv = inventory.Inventory()
+            self.assertEqual(inv.user_groups('foo'), ['foo', 'wheel'])
+            self.assertEqual(inv.user('bar'), None)
+            self.assertRaises(KeyError, inv.user_groups, 'bar')
+            # Only the changed entries are read again
+            self.users['bar'] = PW('bar', 1001, 1000)
+            self.groups['wheel'] = GR('wheel', 10, ['bar'])
+            inv.update_user('bar')
+            inv.update_group('wheel')
+            self.assertEqual(inv.user_groups('foo'), ['foo'])
+            self.assertEqual(inv.user_groups('bar'), ['foo', 'wheel'])
+            del self.groups['wheel']
+            inv.update_group('wheel')
+            self.assertEqual(inv.group('wheel'), None)
+            self.assertEqual(inv.user_groups('bar'), ['foo'])
+            self.assertEqual(pwall.call_count, 1)
+            self.assertEqual(grall.call_count, 1)
+
+    def test_added_outside(self):
+        getpwall = lambda: self.users.values()
+        getgrall = lambda: self.groups.values()
+        with patch.object(pwd, 'getpwall') as pwall, \
+                patch.object(grp, 'getgrall') as grall, \
+                patch.object(pwd, 'getpwnam', self._getpwnam), \
+                patch.object(grp, 'getgrnam', self._getgrnam), \
+                patch.object(grp, 'getgrgid', self._getgrgid):
+            pwall.side_effect = getpwall
+            grall.side_effect = getgrall
+            inv = inventory.Inventory()
+            self.assertEqual(inv.user('postgres'), None)
+            self.assertEqual(inv.group('postgres'), None)
+            # A package creates its user and group in the middle of the run
+            self.users['postgres'] = PW('postgres', 26, 26)
+            self.groups['postgres'] = GR('postgres', 26, [])
+            self.assertEqual(inv.user('postgres').pw_uid, 26)
+            self.assertEqual(inv.user_groups('postgres'), ['postgres'])
+            self.assertEqual(inv.group('postgres').gr_gid, 26)
+            self.assertEqual(pwall.call_count, 1)
+            self.assertEqual(grall.call_count, 1)
+
+
+if __name__ == "__main__":
+    loader = TestLoader()
+    tests = loader.loadTestsFromTestCase(TestInventory)
+    TextTestRunner(verbosity=1).run(tests)
@@ -0,0 +1,153 @@
+'''
+    tests.unit.utils.manifest_test
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test the directory manifests and the incremental directory sync
+'''
+
+# Import python libs
+import os
+import time
+import shutil
+import hashlib
+import tempfile
+
+# Import salt libs
+from saltunittest import TestCase, TestLoader, TextTestRunner, skipIf
+try:
+    from mock import MagicMock, patch
+    has_mock = True
+except ImportError:
+    has_mock = False
+
+import salt.fileclient
+from salt.utils import manifest
+
+
+def write(path, data):
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, 'w+') as fp_:
+        fp_.write(data)
+
+
+class TestManifest(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.roots = [os.path.join(self.tmp, 'one'),
+                      os.path.join(self.tmp, 'two')]
+        write(os.path.join(self.roots[0], 'dir', 'a'), 'first')
+        write(os.path.join(self.roots[0], 'dir', 'sub', 'b'), 'bb')
+        write(os.path.join(self.roots[0], 'dirfoo', 'c'), 'c')
+        write(os.path.join(self.roots[1], 'dir', 'a'), 'second')
+        write(os.path.join(self.roots[1], 'dir', 'd'), 'd')
+        os.makedirs(os.path.join(self.roots[1], 'dir', 'empty'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_build(self):
+        ret = manifest.build(self.roots, 'dir/', 'md5')
+        self.assertEqual('md5', ret['hash_type'])
+        self.assertEqual(['dir/a', 'dir/d', 'dir/sub/b'],
+                         sorted(ret['files']))
+        # The first root wins
+        self.assertEqual({'size': 5,
+                          'mode': os.stat(os.path.join(
+                              self.roots[0], 'dir', 'a')).st_mode & 0777,
+                          'hsum': hashlib.md5('first').hexdigest()},
+                         ret['files']['dir/a'])
+        self.assertEqual(['dir/empty'], ret['empty_dirs'])
+        self.assertEqual(['dir/sub/b'],
+                         list(manifest.build(self.roots, 'dir/sub/b', 'md5')[
+                             'files']))
+        self.assertEqual({}, manifest.build(self.roots, '../one', 'md5')[
+            'files'])
+
+    def test_hash_cache(self):
+        path = os.path.join(self.roots[0], 'dir', 'a')
+        cache = {}
+        hsum = manifest.hash_file(path, 'sha1', cache)
+        self.assertEqual(hashlib.sha1('first').hexdigest(), hsum)
+        # A file which just changed is not cached
+        self.assertEqual({}, cache)
+        past = time.time() - 60
+        os.utime(path, (past, past))
+        manifest.hash_file(path, 'sha1', cache)
+        cache[path] = (cache[path][0], 'cached')
+        self.assertEqual('cached', manifest.hash_file(path, 'sha1', cache))
+        self.assertEqual(hashlib.md5('first').hexdigest(),
+                         manifest.hash_file(path, 'md5', cache))
+        # A rewrite of the same size with the same mtime changes the ctime
+        manifest.hash_file(path, 'md5', cache)
+        cache[path] = (cache[path][0], 'cached')
+        time.sleep(0.01)
+        write(path, 'fresh')
+        os.utime(path, (past, past))
+        self.assertEqual(hashlib.md5('fresh').hexdigest(),
+                         manifest.hash_file(path, 'md5', cache))
+
+    def test_in_dir(self):
+        self.assertTrue(manifest.in_dir('dir/a', 'dir'))
+        self.assertTrue(manifest.in_dir('dir/a', 'dir/'))
+        self.assertTrue(manifest.in_dir('dir/a', ''))
+        self.assertFalse(manifest.in_dir('dirfoo/c', 'dir'))
+
+
+@skipIf(has_mock is False, "mock python module is unavailable")
+class TestRemoteCacheDir(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.root = os.path.join(self.tmp, 'root')
+        write(os.path.join(self.root, 'dir', 'same'), 'same')
+        write(os.path.join(self.root, 'dir', 'changed'), 'new')
+        write(os.path.join(self.root, 'dir', 'sub', 'missing'), 'missing')
+        self.cachedir = os.path.join(self.tmp, 'cache')
+        cached = os.path.join(self.cachedir, 'files', 'base', 'dir')
+        write(os.path.join(cached, 'same'), 'same')
+        write(os.path.join(cached, 'changed'), 'old')
+        opts = {'cachedir': self.cachedir,
+                'master_uri': 'tcp://127.0.0.1:4506',
+                'file_client_threads': 2}
+        with patch('salt.crypt.SAuth', MagicMock()):
+            with patch('salt.payload.SREQ', MagicMock()):
+                self.client = salt.fileclient.RemoteClient(opts)
+        self.fetched = []
+
+        def fetch_file(sreq, path, dest, env, hash_type):
+            self.fetched.append(path)
+            shutil.copyfile(os.path.join(self.root, path), dest)
+            return manifest.hash_file(dest, hash_type)
+        self.client._fetch_file = fetch_file
+        self.client.file_manifest = lambda path, env: manifest.build(
+                [self.root], path, 'md5')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_cache_dir(self):
+        with patch('salt.payload.SREQ', MagicMock()):
+            ret = self.client.cache_dir('salt://dir', 'base')
+        cached = os.path.join(self.cachedir, 'files', 'base', 'dir')
+        self.assertEqual([os.path.join(cached, 'changed'),
+                          os.path.join(cached, 'same'),
+                          os.path.join(cached, 'sub', 'missing')],
+                         ret)
+        self.assertEqual(['dir/changed', 'dir/sub/missing'],
+                         sorted(self.fetched))
+        self.assertEqual('new', open(os.path.join(cached, 'changed')).read())
+        self.assertEqual(hashlib.md5('new').hexdigest(),
+                         self.client.synced[('base', 'dir/changed')]['hsum'])
+        # Nothing is fetched when the cache is up to date
+        self.fetched = []
+        with patch('salt.payload.SREQ', MagicMock()):
+            self.assertEqual(ret, self.client.cache_dir('salt://dir/'))
+        self.assertEqual([], self.fetched)
+
+
+if __name__ == "__main__":
+    loader = TestLoader()
+    tests = loader.loadTestsFromTestCase(TestManifest)
+    TextTestRunner(verbosity=1).run(tests)
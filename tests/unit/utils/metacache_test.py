@@ -0,0 +1,126 @@
+'''
+    tests.unit.utils.metacache_test
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test the conditional requests for the metadata of the master
+'''
+
+# Import python libs
+import os
+import time
+import shutil
+import tempfile
+
+# Import salt libs
+from saltunittest import TestCase, TestLoader, TextTestRunner
+
+from salt.utils import metacache
+
+
+class FakeMaster(object):
+    '''
+    Answer the requests of the minion like the master, or like a master
+    which does not know about versions when versions is False
+    '''
+    def __init__(self, data, versions=True):
+        self.data = data
+        self.versions = versions
+        self.loads = []
+
+    def send(self, load):
+        self.loads.append(load)
+        if not self.versions:
+            return self.data
+        return metacache.reply(load, self.data)
+
+
+class TestMetaCache(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.root = os.path.join(self.tmp, 'root')
+        os.makedirs(os.path.join(self.root, 'web', 'files'))
+        os.makedirs(os.path.join(self.root, 'empty'))
+        for path in ('top.sls', 'web/init.sls', 'web/files/motd'):
+            open(os.path.join(self.root, path), 'w').close()
+        self.age()
+        self.opts = {'cachedir': self.tmp,
+                     'file_roots': {'base': [self.root]},
+                     'renderer': 'yaml_jinja',
+                     'aes': 'secret'}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def age(self):
+        '''
+        Make the directories of the file root older than the walks
+        '''
+        past = time.time() - 60
+        for root, dirs, files in os.walk(self.root):
+            os.utime(root, (past, past))
+
+    def test_reply(self):
+        self.assertEqual([1], metacache.reply({}, [1]))
+        ret = metacache.reply({'version': None}, [1])
+        self.assertEqual([1], ret['data'])
+        self.assertEqual({'version': ret['version'], 'current': True},
+                         metacache.reply({'version': ret['version']}, [1]))
+        mopts = metacache.master_opts(self.opts)
+        self.assertEqual(['file_roots', 'renderer'], sorted(mopts))
+
+    def test_file_lists(self):
+        lists = metacache.FileLists(self.opts)
+        files, ver = lists.get('base', 'files')
+        self.assertEqual(['top.sls', 'web/files/motd', 'web/init.sls'],
+                         sorted(files))
+        self.assertEqual(['empty'], lists.get('base', 'emptydirs')[0])
+        self.assertEqual(['.', 'empty', 'web', 'web/files'],
+                         sorted(lists.get('base', 'dirs')[0]))
+        self.assertEqual(([], metacache.version([])),
+                         lists.get('dev', 'files'))
+        self.assertEqual(['base'], list(lists.envs))
+        # The lists are not made again while the directories are unchanged
+        walk = lists._walk
+        lists._walk = None
+        try:
+            self.assertEqual((files, ver), lists.get('base', 'files'))
+        finally:
+            lists._walk = walk
+        open(os.path.join(self.root, 'web', 'files', 'issue'), 'w').close()
+        files, new_ver = lists.get('base', 'files')
+        self.assertTrue('web/files/issue' in files)
+        self.assertNotEqual(ver, new_ver)
+        # A fresh change is not kept, it could have been missed by the walk
+        self.assertEqual([], list(lists.envs))
+        self.age()
+        lists.get('base', 'files')
+        self.assertEqual(['base'], list(lists.envs))
+
+    def test_minion_cache(self):
+        master = FakeMaster(['top.sls'])
+        load = {'cmd': '_file_list', 'env': 'base'}
+        self.assertEqual(['top.sls'],
+                         metacache.MinionCache(self.opts).request(
+                             load, master.send))
+        self.assertEqual(None, master.loads[-1]['version'])
+        # A new minion process uses the cache on disk
+        cache = metacache.MinionCache(self.opts)
+        self.assertEqual(['top.sls'], cache.request(load, master.send))
+        self.assertTrue(master.loads[-1]['version'])
+        self.assertFalse('data' in master.send(master.loads[-1]))
+        master.data = ['top.sls', 'web.sls']
+        self.assertEqual(['top.sls', 'web.sls'],
+                         cache.request(load, master.send))
+        # A master which does not know about versions
+        master = FakeMaster(dict(self.opts), versions=False)
+        self.assertEqual(self.opts, cache.request({'cmd': '_master_opts'},
+                                                  master.send))
+        self.assertEqual(None, cache._path({'cmd': '_file_list',
+                                            'env': '../base'}))
+
+
+if __name__ == "__main__":
+    loader = TestLoader()
+    tests = loader.loadTestsFromTestCase(TestMetaCache)
+    TextTestRunner(verbosity=1).run(tests)
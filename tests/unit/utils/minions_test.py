@@ -0,0 +1,87 @@
+'''
+    tests.unit.utils.minions_test
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test the compiled ACLs of the authorization checks
+'''
+
+# Import python libs
+import os
+import time
+import shutil
+import tempfile
+
+# Import salt libs
+from saltunittest import TestCase, TestLoader, TextTestRunner
+
+from salt.utils import minions
+
+
+class TestAuthCheck(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.keys = os.path.join(self.tmp, 'minions')
+        os.makedirs(self.keys)
+        for id_ in ('web1', 'web2', 'db1'):
+            self.accept(id_)
+        self.opts = {'pki_dir': self.tmp,
+                     'peer': {'web.*': ['test.*'], '.*': ['grains.items']}}
+        self.ckminions = minions.CkMinions(self.opts)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def accept(self, id_):
+        open(os.path.join(self.keys, id_), 'w+').close()
+        # Make sure the minions directory looks changed
+        stamp = time.time() + len(os.listdir(self.keys))
+        os.utime(self.keys, (stamp, stamp))
+
+    def test_auth_check(self):
+        acl = ['test.ping', {'web*': ['pkg.*', 'service.status']}]
+        check = self.ckminions.auth_check
+        self.assertTrue(check(acl, 'test.ping', '*'))
+        self.assertTrue(check(acl, 'pkg.install', 'web*'))
+        self.assertTrue(check(acl, 'pkg.install', 'web1'))
+        self.assertTrue(check(acl, 'pkg.install', 'web[12]'))
+        self.assertTrue(check(acl, 'pkg.install', 'web\\d', 'pcre'))
+        self.assertTrue(check(acl, 'pkg.install', ['web1', 'web2'], 'list'))
+        self.assertTrue(check(acl, ['pkg.install', 'pkg.remove'], 'web1'))
+        # The target is wider than the one the ACL allows
+        self.assertFalse(check(acl, 'pkg.install', '*'))
+        self.assertFalse(check(acl, 'pkg.install', ['web1', 'db1'], 'list'))
+        self.assertFalse(check(acl, ['pkg.install', 'cmd.run'], 'web1'))
+        # A list of functions is all or nothing for each allowed pattern
+        self.assertFalse(check(acl, ['pkg.install', 'test.ping'], 'web1'))
+        self.assertFalse(check(acl, 'cmd.run', 'web1'))
+        # The decisions are kept
+        key = (repr(acl), 'pkg.install', 'web*', 'glob')
+        self.assertEqual(True, self.ckminions._decisions[key])
+
+    def test_keys_changed(self):
+        acl = [{'web*': ['pkg.*']}]
+        self.assertTrue(self.ckminions.auth_check(acl, 'pkg.install', 'web1'))
+        self.assertFalse(self.ckminions.auth_check(acl, 'pkg.install', 'web3'))
+        self.accept('web3')
+        self.assertTrue(self.ckminions.auth_check(acl, 'pkg.install', 'web3'))
+        # A key matching the target but not the ACL target
+        self.assertTrue(self.ckminions.auth_check(acl, 'pkg.install', '?eb1'))
+        self.accept('xeb1')
+        self.assertFalse(self.ckminions.auth_check(acl, 'pkg.install', '?eb1'))
+
+    def test_peer_perms(self):
+        self.assertEqual(
+            ['test.*', 'grains.items'],
+            sorted(self.ckminions.peer_perms('peer', 'web1'), reverse=True))
+        self.assertEqual(['grains.items'],
+                         self.ckminions.peer_perms('peer', 'db1'))
+        self.assertTrue(self.ckminions.match_check('test.*', 'test.ping'))
+        self.assertFalse(self.ckminions.match_check('test.*', ['test.ping',
+                                                               'cmd.run']))
+
+
+if __name__ == "__main__":
+    loader = TestLoader()
+    tests = loader.loadTestsFromTestCase(TestAuthCheck)
+    TextTestRunner(verbosity=1).run(tests)
@@ -0,0 +1,107 @@
+'''
+    tests.unit.utils.pillarcache_test
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test the cache of the ext_pillar results
+'''
+
+# Import python libs
+import os
+import time
+import shutil
+import tempfile
+import threading
+
+# Import salt libs
+from saltunittest import TestCase, TestLoader, TextTestRunner
+
+from salt.utils import pillarcache
+
+
+class TestPillarCache(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.cache = pillarcache.PillarCache({'cachedir': self.tmp})
+        self.fetched = []
+        pillarcache.STATS.clear()
+        pillarcache._LAST_PRUNE.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def fetch(self):
+        self.fetched.append(1)
+        time.sleep(0.2)
+        return {'count': len(self.fetched)}
+
+    def test_get(self):
+        self.assertEqual({'count': 1},
+                         self.cache.get('mongo', 'key', 60, self.fetch))
+        self.assertEqual({'count': 1},
+                         self.cache.get('mongo', 'key', 60, self.fetch))
+        self.assertEqual({'count': 2},
+                         self.cache.get('mongo', 'other', 60, self.fetch))
+        # Expired
+        self.assertEqual({'count': 3},
+                         self.cache.get('mongo', 'key', 0, self.fetch))
+        self.assertEqual({'hits': 1, 'misses': 3, 'hit_rate': 0.25},
+                         pillarcache.stats()['mongo'])
+
+    def test_stampede(self):
+        rets = []
+
+        def get():
+            rets.append(self.cache.get('cmd_yaml', 'key', 60, self.fetch))
+        threads = [threading.Thread(target=get) for ind in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(1, len(self.fetched))
+        self.assertEqual([{'count': 1}] * 5, rets)
+        self.assertEqual(4, pillarcache.stats()['cmd_yaml']['hits'])
+
+    def test_prune(self):
+        self.cache.get('mongo', 'old', 60, self.fetch)
+        bdir = os.path.join(self.tmp, 'ext_pillar', 'mongo')
+        self.assertEqual(['old.p'], os.listdir(bdir))
+        # An expired result and a lock left behind by a dead worker
+        past = time.time() - 120
+        open(os.path.join(bdir, 'dead.lock'), 'w+').close()
+        for fn_ in ('old.p', 'dead.lock'):
+            os.utime(os.path.join(bdir, fn_), (past, past))
+        self.cache.get('mongo', 'new', 60, self.fetch)
+        # Not pruned again within the interval
+        self.assertEqual(['dead.lock', 'new.p', 'old.p'],
+                         sorted(os.listdir(bdir)))
+        pillarcache._LAST_PRUNE.clear()
+        self.cache.get('mongo', 'other', 60, self.fetch)
+        self.assertEqual(['new.p', 'other.p'], sorted(os.listdir(bdir)))
+
+    def test_key(self):
+        opts = {'id': 'web1', 'grains': {'os': 'Debian', 'num_cpus': 4}}
+        key = pillarcache.cache_key(('id', 'grains:os'), {'a': 1}, opts)
+        self.assertEqual(key, pillarcache.cache_key(
+            ('id', 'grains:os'), {'a': 1}, dict(opts, grains={'os': 'Debian'})))
+        self.assertNotEqual(key, pillarcache.cache_key(
+            ('id', 'grains:os'), {'a': 1}, dict(opts, id='web2')))
+        self.assertNotEqual(key, pillarcache.cache_key(
+            ('id', 'grains:os'), {'a': 2}, opts))
+        self.assertEqual(pillarcache.cache_key((), 'cmd', opts),
+                         pillarcache.cache_key((), 'cmd', {'id': 'web2'}))
+
+    def test_ttl(self):
+        self.assertEqual(0, pillarcache.cache_ttl({}, 'mongo'))
+        self.assertEqual(60, pillarcache.cache_ttl(
+            {'ext_pillar_cache_ttl': 60}, 'mongo'))
+        self.assertEqual(30, pillarcache.cache_ttl(
+            {'ext_pillar_cache_ttl': {'mongo': 30}}, 'mongo'))
+        self.assertEqual(0, pillarcache.cache_ttl(
+            {'ext_pillar_cache_ttl': {'mongo': 30}}, 'hiera'))
+
+
+if __name__ == "__main__":
+    loader = TestLoader()
+    tests = loader.loadTestsFromTestCase(TestPillarCache)
+    TextTestRunner(verbosity=1).run(tests)
@@ -0,0 +1,76 @@
+'''
+    tests.unit.utils.presence_test
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test the presence table of the master
+'''
+
+# Import python libs
+import time
+import shutil
+import tempfile
+
+# Import salt libs
+from saltunittest import TestCase, TestLoader, TextTestRunner
+
+from salt.utils import presence
+
+
+class TestPresence(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.opts = {'cachedir': self.tmp, 'presence_timeout': 180}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_event_source(self):
+        self.assertEqual(
+            ('web1', 'auth'),
+            presence.event_source(
+                'auth', {'result': True, 'act': 'accept', 'id': 'web1'}))
+        self.assertEqual(
+            None,
+            presence.event_source(
+                'auth', {'result': True, 'act': 'pend', 'id': 'web1'}))
+        self.assertEqual(
+            None,
+            presence.event_source('auth', {'result': False, 'id': 'web1'}))
+        self.assertEqual(
+            ('web1', 'start'),
+            presence.event_source('minion_start', {'id': 'web1', 'data': ''}))
+        self.assertEqual(
+            ('web1', 'heartbeat'),
+            presence.event_source('presence', {'id': 'web1', 'data': {}}))
+        self.assertEqual(
+            ('web1', 'return'),
+            presence.event_source(
+                '20121019120000123456', {'id': 'web1', 'return': True}))
+        # The publications are not returns
+        self.assertEqual(
+            None,
+            presence.event_source(
+                '20121019120000123456', {'minions': ['web1']}))
+        self.assertEqual(None, presence.event_source('pub_stats', {}))
+
+    def test_status(self):
+        tracker = presence.Tracker(self.opts)
+        tracker.handle('presence', {'id': 'web1', 'data': {}})
+        tracker.seen('web2', 'return', time.time() - 600)
+        # Nothing is read before the table is saved
+        self.assertEqual({}, presence.load(self.opts))
+        tracker.save()
+        ret = presence.status(self.opts, ['web1', 'web2', 'db1'])
+        self.assertTrue(ret['web1']['up'])
+        self.assertEqual('heartbeat', ret['web1']['via'])
+        self.assertFalse(ret['web2']['up'])
+        self.assertEqual('return', ret['web2']['via'])
+        self.assertEqual({'up': False, 'last_seen': None, 'via': None},
+                         ret['db1'])
+
+
+if __name__ == "__main__":
+    loader = TestLoader()
+    tests = loader.loadTestsFromTestCase(TestPresence)
+    TextTestRunner(verbosity=1).run(tests)
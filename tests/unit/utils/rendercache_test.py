@@ -0,0 +1,124 @@
+'''
+    tests.unit.utils.rendercache_test
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test the cache of the sls files rendered by the master
+'''
+
+# Import python libs
+import os
+import time
+import shutil
+import tempfile
+
+# Import salt libs
+from saltunittest import TestCase, TestLoader, TextTestRunner
+
+from salt.utils import rendercache
+
+WEB = '''{% from 'macros.jinja' import port %}
+nginx:
+  pkg:
+    - installed
+{% if grains['os'] == 'Debian' %}
+  service.running:
+    - name: {{ port(pillar.get('port', 80)) }}
+{% endif %}
+'''
+
+MACROS = '''{% macro port(num) %}nginx-{{ num }}{% endmacro %}
+'''
+
+
+class TestRenderCache(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.root = os.path.join(self.tmp, 'base')
+        os.makedirs(os.path.join(self.root, 'web'))
+        self.write('web/init.sls', WEB)
+        self.write('macros.jinja', MACROS)
+        self.write('cmd.sls', "{{ salt['cmd.run']('hostname') }}: {}\n")
+        self.opts = {'cachedir': self.tmp,
+                     'file_roots': {'base': [self.root]},
+                     'hash_type': 'md5',
+                     'render_cache_size': 1024}
+        self.cache = rendercache.RenderCache(self.opts)
+        self.grains = {'os': 'Debian', 'id': 'web1', 'mem': 512}
+        self.pillar = {'port': 8080, 'users': ['root']}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def write(self, rel, data):
+        with open(os.path.join(self.root, rel), 'w+') as fp_:
+            fp_.write(data)
+
+    def get(self, sls, grains, pillar):
+        return self.cache.get('base', sls, 'yaml_jinja', False,
+                              rendercache.digests(grains),
+                              rendercache.digests(pillar))
+
+    def render(self, sls, grains, pillar):
+        return self.cache.render('base', sls, 'yaml_jinja', False,
+                                 grains, pillar)
+
+    def test_tracked(self):
+        grains = rendercache.Tracked(self.grains)
+        self.assertEqual('Debian', grains['os'])
+        self.assertFalse('kernel' in grains)
+        self.assertEqual(['kernel', 'os'], grains.deps())
+        grains.items()
+        self.assertEqual(None, grains.deps())
+
+    def test_render(self):
+        self.assertEqual({'need': True},
+                         self.get('web', self.grains, self.pillar))
+        ret = self.render('web', self.grains, self.pillar)
+        self.assertEqual(
+            {'nginx': {'pkg': ['installed'],
+                       'service.running': [{'name': 'nginx-8080'}]}},
+            ret['state'])
+        # Other values of the grains and pillar keys which are not read
+        # share the result
+        grains = dict(self.grains, id='web2', mem=1024)
+        pillar = dict(self.pillar, users=[])
+        self.assertEqual(ret, self.get('web', grains, pillar))
+        self.assertEqual({'need': True},
+                         self.get('web', dict(grains, os='Arch'), pillar))
+        self.assertEqual({'need': True},
+                         self.get('web', grains, dict(pillar, port=80)))
+        # Changing an imported template renders the sls again
+        time.sleep(0.01)
+        self.write('macros.jinja', MACROS.replace('nginx', 'httpd') + '\n')
+        self.assertEqual({'need': True}, self.get('web', grains, pillar))
+
+    def test_local(self):
+        self.assertEqual({'local': True},
+                         self.render('cmd', self.grains, self.pillar))
+        self.assertEqual({'local': True},
+                         self.get('cmd', self.grains, self.pillar))
+        self.assertEqual({'local': True},
+                         self.get('missing', self.grains, self.pillar))
+        self.assertEqual({'local': True},
+                         self.cache.get('dev', 'web', 'yaml_jinja', False,
+                                        {}, {}))
+
+    def test_evict(self):
+        for port in range(30):
+            pillar = dict(self.pillar, port=port)
+            self.assertTrue('state' in self.render('web', self.grains, pillar))
+        shard = os.path.join(self.tmp, 'render_cache', 'base')
+        sizes = [os.path.getsize(os.path.join(shard, fn_))
+                 for fn_ in os.listdir(shard) if fn_.endswith('.p')]
+        self.assertTrue(sum(sizes) <= 1024)
+        self.assertTrue(len(sizes) < 30)
+        # The latest results are kept
+        self.assertTrue(
+            'state' in self.get('web', self.grains, dict(pillar, port=29)))
+
+
+if __name__ == "__main__":
+    loader = TestLoader()
+    tests = loader.loadTestsFromTestCase(TestRenderCache)
+    TextTestRunner(verbosity=1).run(tests)
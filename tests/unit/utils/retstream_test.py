@@ -0,0 +1,241 @@
+'''
+    tests.unit.utils.retstream_test
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test the chunked job returns
+'''
+
+# Import python libs
+import os
+import shutil
+import tempfile
+
+# Import salt libs
+from saltunittest import TestCase, TestLoader, TextTestRunner
+
+import salt.utils
+import salt.utils.event
+import salt.master
+import salt.minion
+import salt.payload
+from salt.utils import retstream
+
+
+class FakeCrypticle(object):
+
+    def dumps(self, obj):
+        return obj
+
+    def loads(self, obj):
+        return obj
+
+
+class FakeSREQ(object):
+    '''
+    Take the loads the minion sends, like a master which takes chunks when
+    chunked is True
+    '''
+    def __init__(self, chunked=True):
+        self.chunked = chunked
+        self.loads = []
+
+    def send(self, enc, load, tries=1, timeout=60):
+        self.loads.append(load)
+        if load['cmd'] == '_return_chunk':
+            return {'seq': load['seq']} if self.chunked else False
+        return True
+
+
+class FakeSocket(object):
+
+    closed = False
+
+    def setsockopt(self, opt, val):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class FakeContext(object):
+
+    closed = False
+
+    def term(self):
+        self.closed = True
+
+
+class FakeMasterEvent(object):
+    '''
+    Hand out the return events of the local master of a syndic
+    '''
+    events = []
+    made = []
+
+    def __init__(self, sock_dir):
+        self.sub = FakeSocket()
+        self.context = FakeContext()
+        self.events = list(FakeMasterEvent.events)
+        FakeMasterEvent.made.append(self)
+
+    def connect_pub(self):
+        pass
+
+    def get_event(self, wait=5, tag=''):
+        if self.events:
+            return self.events.pop(0)
+        return None
+
+
+class TestRetStream(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.serial = salt.payload.Serial('msgpack')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_split(self):
+        items = ['x' * 10] * 10
+        chunks = list(retstream.split(items, 30, self.serial))
+        self.assertEqual([3, 3, 3, 1], [len(chunk) for chunk in chunks])
+        self.assertEqual(items, sum(chunks, []))
+        self.assertEqual([], list(retstream.split([], 30, self.serial)))
+
+    def test_assemble(self):
+        path = os.path.join(self.tmp, 'return.p')
+        for count in (3, 20, 70000):
+            items = [{'path': '/tmp/{0}'.format(num)} for num in range(count)]
+            chunks = list(retstream.split(items, 100000, self.serial))
+            for seq, chunk in enumerate(chunks):
+                retstream.store_chunk(self.tmp, 'web1', seq, chunk, self.serial)
+            self.assertTrue(retstream.assemble(
+                self.tmp, 'web1', len(chunks), path, self.serial))
+            self.assertFalse(
+                os.path.isdir(retstream.chunk_dir(self.tmp, 'web1')))
+            with open(path, 'rb') as fp_:
+                self.assertEqual(items, self.serial.loads(fp_.read()))
+            self.assertEqual(items, list(retstream.iter_items(path,
+                                                              self.serial)))
+        # A chunk went missing
+        retstream.store_chunk(self.tmp, 'web1', 1, ['a'], self.serial)
+        self.assertFalse(
+            retstream.assemble(self.tmp, 'web1', 2, path, self.serial))
+        self.assertFalse(os.path.isdir(retstream.chunk_dir(self.tmp, 'web1')))
+        # A return which is not a list
+        with open(path, 'wb') as fp_:
+            fp_.write(self.serial.dumps({'a': 1}))
+        self.assertEqual([{'a': 1}],
+                         list(retstream.iter_items(path, self.serial)))
+
+    def test_master_serial(self):
+        jid = '20121019120000000000'
+        os.makedirs(salt.utils.jid_dir(jid, self.tmp, 'md5'))
+        aes = salt.master.AESFuncs.__new__(salt.master.AESFuncs)
+        aes.opts = {'cachedir': self.tmp,
+                    'hash_type': 'md5',
+                    'job_cache': True,
+                    'serial': 'pickle'}
+        load = {'jid': jid, 'id': 'web1', 'seq': 0, 'chunk': ['x']}
+        # The assembled return would not be readable with pickle
+        self.assertFalse(aes._return_chunk(load))
+
+    def mk_minion(self):
+        minion = salt.minion.Minion.__new__(salt.minion.Minion)
+        minion.opts = {'return_chunk_size': 100}
+        minion.serial = self.serial
+        minion.crypticle = FakeCrypticle()
+        return minion
+
+    def load(self, ret):
+        return {'cmd': '_return', 'jid': '1' * 20, 'id': 'web1', 'return': ret}
+
+    def test_minion_chunks(self):
+        minion = self.mk_minion()
+        sreq = FakeSREQ()
+        items = ['x' * 40 for num in range(5)]
+        minion._return_chunks(sreq, self.load(iter(items)))
+        self.assertEqual(['_return_chunk'] * 2 + ['_return'],
+                         [load['cmd'] for load in sreq.loads])
+        self.assertEqual(items, sreq.loads[0]['chunk'] + sreq.loads[1]['chunk'])
+        self.assertEqual([0, 1], [load['seq'] for load in sreq.loads[:2]])
+        self.assertEqual(2, sreq.loads[-1]['chunks'])
+        self.assertEqual(None, sreq.loads[-1]['return'])
+        # A small return is sent at once
+        sreq = FakeSREQ()
+        minion._return_chunks(sreq, self.load(['x']))
+        self.assertEqual(1, len(sreq.loads))
+        self.assertEqual(['x'], sreq.loads[0]['return'])
+        # A master which does not take chunks gets the whole return
+        sreq = FakeSREQ(chunked=False)
+        minion._return_chunks(sreq, self.load(iter(items)))
+        self.assertEqual(['_return_chunk', '_return'],
+                         [load['cmd'] for load in sreq.loads])
+        self.assertEqual(items, sreq.loads[-1]['return'])
+        self.assertFalse('chunks' in sreq.loads[-1])
+
+    def test_minion_chunks_error(self):
+        def gen():
+            yield 'x' * 200
+            raise ValueError('disk on fire')
+        minion = self.mk_minion()
+        sreq = FakeSREQ()
+        minion._return_chunks(sreq, self.load(gen()))
+        self.assertFalse('chunks' in sreq.loads[-1])
+        self.assertTrue('disk on fire' in sreq.loads[-1]['return'])
+
+    def test_syndic_chunks(self):
+        jid = '20121019120000000000'
+        items = ['x' * 40 for num in range(5)]
+        opts = {'cachedir': self.tmp,
+                'hash_type': 'md5',
+                'syndic_batch_size': 10,
+                'syndic_batch_wait': 1}
+        # The local master assembled the chunked return in its job cache
+        mdir = os.path.join(salt.utils.jid_dir(jid, self.tmp, 'md5'), 'web1')
+        os.makedirs(mdir)
+        with open(os.path.join(mdir, 'return.p'), 'wb') as fp_:
+            fp_.write(self.serial.dumps(items))
+        syndic = salt.minion.Syndic.__new__(salt.minion.Syndic)
+        syndic.opts = opts
+        syndic.serial = self.serial
+        syndic.local_sock_dir = self.tmp
+        syndic.pub = lambda *args: {'jid': jid, 'minions': ['web1', 'web2']}
+        batches = []
+        syndic._return_batch = lambda data, batch, minions=None: \
+                batches.append(batch)
+        FakeMasterEvent.events = [
+                {'id': 'web1', 'jid': jid, 'return': None, 'chunks': 2},
+                {'id': 'web2', 'jid': jid, 'return': True}]
+        event = salt.utils.event.MasterEvent
+        salt.utils.event.MasterEvent = FakeMasterEvent
+        try:
+            syndic.syndic_cmd({'tgt': '*', 'fun': 'file.find', 'arg': [],
+                               'ret': '', 'jid': jid, 'to': 5})
+        finally:
+            salt.utils.event.MasterEvent = event
+        self.assertEqual([{}, {'web1': items, 'web2': True}], batches)
+
+    def test_syndic_no_minions(self):
+        syndic = salt.minion.Syndic.__new__(salt.minion.Syndic)
+        syndic.local_sock_dir = self.tmp
+        syndic.pub = lambda *args: {}
+        FakeMasterEvent.events = []
+        FakeMasterEvent.made = []
+        event = salt.utils.event.MasterEvent
+        salt.utils.event.MasterEvent = FakeMasterEvent
+        try:
+            syndic.syndic_cmd({'tgt': 'none', 'fun': 'test.ping', 'arg': [],
+                               'ret': '', 'jid': '1' * 20, 'to': 5})
+        finally:
+            salt.utils.event.MasterEvent = event
+        # The event socket and context are not leaked
+        self.assertTrue(FakeMasterEvent.made[0].sub.closed)
+        self.assertTrue(FakeMasterEvent.made[0].context.closed)
+
+
+if __name__ == "__main__":
+    loader = TestLoader()
+    tests = loader.loadTestsFromTestCase(TestRetStream)
+    TextTestRunner(verbosity=1).run(tests)
@@ -0,0 +1,103 @@
+'''
+    tests.unit.utils.schedule_test
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test the scheduler of the minion
+'''
+
+# Import salt libs
+from saltunittest import TestCase, TestLoader, TextTestRunner
+
+from salt.utils import schedule
+
+
+class FakeProc(object):
+
+    def __init__(self, data):
+        self.data = data
+        self.alive = True
+
+    def is_alive(self):
+        return self.alive
+
+
+class TestSchedule(TestCase):
+
+    def setUp(self):
+        self.started = []
+        self.opts = {'id': 'web1',
+                     'schedule': {
+                         'highstate': {'function': 'state.highstate',
+                                       'minutes': 10,
+                                       'splay': 60},
+                         'ping': {'function': 'test.echo',
+                                  'args': ['hi'],
+                                  'kwargs': {'test': True},
+                                  'seconds': 30,
+                                  'returner': ['mongo_return', 'redis_return']},
+                         'broken': {'function': 'test.ping'}},
+                     'pillar': {}}
+        self.sched = schedule.Schedule(self.opts, self.handle)
+
+    def handle(self, data):
+        proc = FakeProc(data)
+        self.started.append(proc)
+        return proc
+
+    def test_offset(self):
+        self.assertEqual(600, schedule.interval({'minutes': 10}))
+        self.assertEqual(90061, schedule.interval(
+            {'days': 1, 'hours': 1, 'minutes': 1, 'seconds': 1}))
+        self.assertEqual(0, schedule.interval({'minutes': 'often'}))
+        off = schedule.offset('web1', 'highstate', 600)
+        self.assertEqual(off, schedule.offset('web1', 'highstate', 600))
+        self.assertEqual(0, schedule.offset('web1', 'highstate', 0))
+        # The minions spread their runs over the splay
+        offs = [schedule.offset('web{0}'.format(num), 'highstate', 600)
+                for num in range(1000)]
+        self.assertTrue(all(0 <= off < 600 for off in offs))
+        self.assertTrue(len([off for off in offs if off < 300]) > 400)
+        self.assertTrue(len([off for off in offs if off >= 300]) > 400)
+        self.assertEqual(1205, schedule.next_run(1000, 600, 5))
+        self.assertEqual(1205, schedule.next_run(1205, 600, 5))
+
+    def test_eval(self):
+        self.assertEqual(['highstate', 'ping'], sorted(self.sched.jobs()))
+        # Nothing runs before its first run time
+        off = schedule.offset('web1', 'ping', 30)
+        # Away from the runs of the highstate job, within 60s after 3000
+        now = 3120 + off + 1
+        wait = self.sched.eval(now)
+        self.assertEqual([], self.started)
+        self.assertEqual(29, wait)
+        self.sched.eval(now + 29)
+        self.assertEqual(1, len(self.started))
+        jid = self.started[0].data.pop('jid')
+        self.assertEqual({'fun': 'test.echo',
+                          'arg': ['hi', 'test=True'],
+                          'standalone': True,
+                          'ret': 'mongo_return,redis_return'},
+                         self.started[0].data)
+        self.assertEqual(20, len(jid))
+        # The last run is still going
+        self.sched.eval(now + 59)
+        self.assertEqual(1, len(self.started))
+        self.started[0].alive = False
+        self.sched.eval(now + 89)
+        self.assertEqual(2, len(self.started))
+        # Every run has a job id of its own
+        self.assertNotEqual(jid, self.started[1].data['jid'])
+        self.assertNotEqual(self.sched._jid(), self.sched._jid())
+        # A job from the pillar replaces the job of the option
+        self.opts['pillar']['schedule'] = {
+                'ping': {'function': 'test.ping', 'hours': 1}}
+        self.sched.eval(now + 90)
+        self.assertEqual('test.ping',
+                         self.sched.jobs()['ping']['function'])
+        self.assertTrue(self.sched.next['ping'][0] > now + 119)
+
+
+if __name__ == "__main__":
+    loader = TestLoader()
+    tests = loader.loadTestsFromTestCase(TestSchedule)
+    TextTestRunner(verbosity=1).run(tests)
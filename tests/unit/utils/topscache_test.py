@@ -0,0 +1,123 @@
+'''
+    tests.unit.utils.topscache_test
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test the cache of the top data gathered by the master
+'''
+
+# Import python libs
+import os
+import time
+import shutil
+import tempfile
+
+# Import salt libs
+from saltunittest import TestCase, TestLoader, TextTestRunner
+
+from salt.utils import topscache
+
+ENC = '''#!/bin/sh
+echo "$@" >> {0}
+echo "{{"
+for id in "$@"; do
+    echo "$id: {{classes: [$id]}},"
+done
+echo "}}"
+'''
+
+
+class TestTopsCache(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.opts = {'cachedir': self.tmp,
+                     'pki_dir': self.tmp,
+                     'tops_cache_ttl': 60,
+                     'external_nodes_batch': 2}
+        self.cache = topscache.TopsCache(self.opts)
+        self.gathered = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def gather(self):
+        self.gathered.append(1)
+        return {'base': [str(len(self.gathered))]}
+
+    def test_get(self):
+        grains = {'os': 'Debian'}
+        self.assertEqual({'base': ['1']},
+                         self.cache.get('web1', grains, self.gather))
+        self.assertEqual({'base': ['1']},
+                         self.cache.get('web1', grains, self.gather))
+        # New grains make a new entry
+        self.assertEqual({'base': ['2']},
+                         self.cache.get('web1', {'os': 'Arch'}, self.gather))
+        self.assertEqual(['web1'], self.cache.invalidate('web*'))
+        self.assertEqual({'base': ['3']},
+                         self.cache.get('web1', grains, self.gather))
+        # Ids which are not file names are not cached
+        self.cache.get('../web1', grains, self.gather)
+        self.cache.get('../web1', grains, self.gather)
+        self.assertEqual(5, len(self.gathered))
+
+    def test_stale(self):
+        grains = {'os': 'Debian'}
+        self.cache.get('web1', grains, self.gather)
+        cache = self.cache._read('web1')
+        cache['tops']['stamp'] -= 90
+        self.cache._write('web1', cache)
+        # The stale entry is used while it is refreshed
+        self.assertEqual({'base': ['1']},
+                         self.cache.get('web1', grains, self.gather))
+        for ind in range(50):
+            if not self.cache.refreshing:
+                break
+            time.sleep(0.1)
+        self.assertEqual({'base': ['2']},
+                         self.cache.get('web1', grains, self.gather))
+        cache = self.cache._read('web1')
+        cache['tops']['stamp'] -= 150
+        self.cache._write('web1', cache)
+        self.assertEqual({'base': ['3']},
+                         self.cache.get('web1', grains, self.gather))
+
+    def test_enc_batch(self):
+        log = os.path.join(self.tmp, 'calls')
+        enc = os.path.join(self.tmp, 'enc')
+        with open(enc, 'w+') as fp_:
+            fp_.write(ENC.format(log))
+        os.chmod(enc, 0700)
+        os.makedirs(os.path.join(self.tmp, 'minions'))
+        for id_ in ('db1', 'web1', 'web2'):
+            open(os.path.join(self.tmp, 'minions', id_), 'w+').close()
+        self.assertEqual({'classes': ['web1']}, self.cache.enc(enc, 'web1'))
+        self.assertEqual({'classes': ['db1']}, self.cache.enc(enc, 'db1'))
+        self.assertEqual({'classes': ['web2']}, self.cache.enc(enc, 'web2'))
+        self.assertEqual(['web1 db1\n', 'web2\n'], open(log).readlines())
+        self.assertEqual({'base': ['web2']},
+                         topscache.parse_enc(self.cache.enc(enc, 'web2')))
+
+    def test_stale_enc(self):
+        os.makedirs(os.path.join(self.tmp, 'minions'))
+        for id_ in ('db1', 'db2', 'web1', 'web2'):
+            open(os.path.join(self.tmp, 'minions', id_), 'w+').close()
+        read = []
+        _read = self.cache._read
+
+        def counted(id_):
+            read.append(id_)
+            return _read(id_)
+        self.cache._read = counted
+        # The cache files are only read until the batch is full
+        self.assertEqual(['db2'], self.cache._stale_enc('enc', 'db1', 1))
+        self.assertEqual(['db2'], read)
+        self.assertEqual(['db1', 'db2', 'web2'],
+                         self.cache._stale_enc('enc', 'web1', 5))
+        self.assertEqual([], self.cache._stale_enc('enc', 'web1', 0))
+
+
+if __name__ == "__main__":
+    loader = TestLoader()
+    tests = loader.loadTestsFromTestCase(TestTopsCache)
+    TextTestRunner(verbosity=1).run(tests)